@@ -16,12 +16,17 @@ Usage:
     results = benchmark.run_all_benchmarks()
 """
 
+import importlib
+
 from .benchmark_clients import (
     ClientBenchmark,
     export_results,
     main,
     print_summary,
 )
+from .history import Comparison, History, compare, mann_whitney_u
+from .hotpaths import HOT_PATHS, run_hot_paths
+from .server import FakeServer
 from .utils import (
     DATASET_SIZES,
     BenchmarkResult,
@@ -31,15 +36,51 @@ from .utils import (
     generate_ohlcv_data,
     generate_ohlcv_dataframe,
     get_dataset_size,
+    latency_summary,
+    percentile,
     print_results_table,
     run_benchmark,
 )
 
 
+# imported on first use, so that ``python -m benchmarks.load`` (and
+# ``benchmarks.stream``, ``benchmarks.sweep``) do not find their module
+# already imported
+_LAZY = {
+    "Histogram": "load",
+    "LoadResult": "load",
+    "run_load": "load",
+    "saturation_curve": "load",
+    "StreamPublisher": "stream",
+    "StreamResult": "stream",
+    "run_stream": "stream",
+    "stream_benchmark": "stream",
+    "stream_curve": "stream",
+    "SweepResult": "sweep",
+    "run_sweep": "sweep",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        return getattr(importlib.import_module(f".{_LAZY[name]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 __all__ = [
     "BenchmarkResult",
     "ClientBenchmark",
+    "Comparison",
     "DATASET_SIZES",
+    "FakeServer",
+    "HOT_PATHS",
+    "Histogram",
+    "History",
+    "LoadResult",
+    "StreamPublisher",
+    "StreamResult",
+    "SweepResult",
+    "compare",
     "compare_results",
     "export_results",
     "format_duration",
@@ -47,8 +88,18 @@ __all__ = [
     "generate_ohlcv_data",
     "generate_ohlcv_dataframe",
     "get_dataset_size",
+    "latency_summary",
     "main",
+    "mann_whitney_u",
+    "percentile",
     "print_results_table",
     "print_summary",
     "run_benchmark",
+    "run_hot_paths",
+    "run_load",
+    "run_stream",
+    "run_sweep",
+    "saturation_curve",
+    "stream_benchmark",
+    "stream_curve",
 ]
@@ -0,0 +1,271 @@
+"""
+Benchmark history and regression checks.
+
+``History`` appends benchmark reports (as returned by ``run_sweep()``, with a
+``hot_paths`` list from ``run_hot_paths()``) to a JSON-lines file, one run per
+line.  Each report's ``meta`` records the machine it ran on and the git
+revision of the code, so runs are only ever compared with runs on the same
+machine.
+
+``compare()`` decides whether a run is slower than its baseline runs.  For
+each benchmark it pools the baseline's per-call samples and applies a
+one-sided Mann-Whitney U test, which makes no assumption about the shape of
+latency distributions.  A benchmark regresses only if the slowdown is both
+significant (p < ``alpha``) and larger than ``threshold``, so noise does not
+fail a build and neither do significant but negligible changes.
+
+Usage:
+    history = History("bench-history.jsonl")
+    baseline = history.baseline(report)
+    regressions = [c for c in compare(baseline, report) if c.regressed]
+    history.record(report)
+"""
+
+import fnmatch
+import hashlib
+import json
+import math
+import os
+import platform
+import subprocess
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from statistics import median
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pymarketstore
+
+
+def machine_info() -> dict:
+    """The machine and interpreter benchmarks run on, with a ``fingerprint``."""
+    info = {
+        "hostname": platform.node(),
+        "system": platform.system(),
+        "release": platform.release(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+    }
+    key = json.dumps([info[k] for k in sorted(info)])
+    info["fingerprint"] = hashlib.sha1(key.encode()).hexdigest()[:12]
+    return info
+
+
+def git_revision(path: Optional[str] = None) -> Optional[dict]:
+    """
+    The git ``commit`` checked out at ``path`` (default: this checkout) and
+    whether the work tree is ``dirty``, or None outside a git repository.
+    """
+    path = path or os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=path,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=path,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return {"commit": commit, "dirty": bool(status.strip())}
+
+
+def report_meta(**extra) -> dict:
+    """The ``meta`` of a new report: time, versions, machine and git revision."""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "pymarketstore": pymarketstore.__version__,
+        "machine": machine_info(),
+        "git": git_revision(),
+        **extra,
+    }
+
+
+def benchmarks(report: dict) -> Dict[str, dict]:
+    """The benchmarks of a report (sweep results and hot paths) by name."""
+    return {
+        result["name"]: result
+        for result in report.get("results", []) + report.get("hot_paths", [])
+    }
+
+
+def without_samples(report: dict) -> dict:
+    """A copy of ``report`` without the per-call ``samples_ms``."""
+    report = dict(report)
+    for section in ("results", "hot_paths"):
+        if section in report:
+            report[section] = [
+                {k: v for k, v in result.items() if k != "samples_ms"}
+                for result in report[section]
+            ]
+    return report
+
+
+class History:
+    """Benchmark reports, one JSON object per line of a file."""
+
+    def __init__(self, path: str):
+        self.path = os.fspath(path)
+
+    def record(self, report: dict):
+        """Append a report (it should include ``samples_ms``)."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(json.dumps(report, separators=(",", ":")) + "\n")
+
+    def runs(self) -> List[dict]:
+        """All recorded reports, oldest first."""
+        try:
+            with open(self.path) as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def baseline(
+        self,
+        report: dict,
+        runs: int = 5,
+        revision: Optional[str] = None,
+    ) -> List[dict]:
+        """
+        The runs to compare ``report`` with: the last ``runs`` runs on the
+        same machine, optionally only those of git ``revision`` (a commit or
+        a prefix of one).
+        """
+        fingerprint = report["meta"]["machine"]["fingerprint"]
+        matching = []
+        for run in self.runs():
+            meta = run.get("meta", {})
+            if meta.get("machine", {}).get("fingerprint") != fingerprint:
+                continue
+            if revision is not None:
+                commit = (meta.get("git") or {}).get("commit", "")
+                if not commit.startswith(revision):
+                    continue
+            matching.append(run)
+        return matching[-runs:] if runs else matching
+
+    def __repr__(self):
+        return "History({!r})".format(self.path)
+
+
+def mann_whitney_u(a: Sequence[float], b: Sequence[float]) -> Tuple[float, float]:
+    """
+    Mann-Whitney U test of whether values of ``a`` tend to be larger than
+    those of ``b``.
+
+    Uses the normal approximation with tie and continuity corrections, which
+    is accurate from about ten samples per side.
+
+    Returns:
+        The U statistic of ``a`` and the one-sided p-value
+    """
+    n1, n2 = len(a), len(b)
+    if not n1 or not n2:
+        return 0.0, 1.0
+    values = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    n = n1 + n2
+
+    # average ranks of tied values
+    rank_a, ties, i = 0.0, 0.0, 0
+    while i < n:
+        j = i
+        while j + 1 < n and values[j + 1][0] == values[i][0]:
+            j += 1
+        rank = (i + j) / 2 + 1
+        rank_a += rank * sum(1 for k in range(i, j + 1) if values[k][1] == 0)
+        t = j - i + 1
+        ties += t**3 - t
+        i = j + 1
+
+    u = rank_a - n1 * (n1 + 1) / 2
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1))))
+    if sigma == 0:
+        return u, 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / sigma
+    return u, 0.5 * math.erfc(z / math.sqrt(2))
+
+
+@dataclass
+class Comparison:
+    """How one benchmark of a run compares with its baseline runs."""
+
+    name: str
+    baseline_ms: float
+    current_ms: float
+    change: float
+    p_value: float
+    regressed: bool
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "baseline_ms": round(self.baseline_ms, 4),
+            "current_ms": round(self.current_ms, 4),
+            "change": round(self.change, 4),
+            "p_value": round(self.p_value, 6),
+            "regressed": self.regressed,
+        }
+
+
+def compare(
+    baseline: Sequence[dict],
+    report: dict,
+    threshold: float = 0.10,
+    alpha: float = 0.01,
+    gate: Optional[Sequence[str]] = None,
+) -> List[Comparison]:
+    """
+    Compare the benchmarks of ``report`` with the same benchmarks of the
+    ``baseline`` runs.
+
+    Args:
+        baseline: Earlier reports (see ``History.baseline()``)
+        report: The report to check
+        threshold: Slowdown of the median that counts as a regression
+            (0.10 is 10% slower)
+        alpha: Significance level of the Mann-Whitney U test
+        gate: Names (or fnmatch patterns, eg ``"results.*"``) of the
+            benchmarks that can regress; default: all
+
+    Returns:
+        One ``Comparison`` per benchmark that has samples in both the report
+        and the baseline, in the order of the report
+    """
+    pooled: Dict[str, List[float]] = {}
+    for run in baseline:
+        for name, result in benchmarks(run).items():
+            pooled.setdefault(name, []).extend(result.get("samples_ms", []))
+
+    comparisons = []
+    for name, result in benchmarks(report).items():
+        if gate is not None and not any(fnmatch.fnmatchcase(name, g) for g in gate):
+            continue
+        current, before = result.get("samples_ms"), pooled.get(name)
+        if not current or not before:
+            continue
+        baseline_ms, current_ms = median(before), median(current)
+        change = current_ms / baseline_ms - 1 if baseline_ms else 0.0
+        _, p_value = mann_whitney_u(current, before)
+        comparisons.append(
+            Comparison(
+                name=name,
+                baseline_ms=baseline_ms,
+                current_ms=current_ms,
+                change=change,
+                p_value=p_value,
+                regressed=p_value < alpha and change > threshold,
+            )
+        )
+    return comparisons
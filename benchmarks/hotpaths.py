@@ -0,0 +1,141 @@
+"""
+Micro-benchmarks of the client's hot paths.
+
+Each entry of ``HOT_PATHS`` times one function that every query or write goes
+through (decoding the wire format, building DataFrames, packing writes) on
+``rows`` rows of 1Min OHLCV data, with no network involved.  They are the
+finest-grained signal for regression checks (see ``benchmarks.history``): a
+slower ``results.decode`` shows up here long before it is visible in
+end-to-end latencies.
+
+Usage:
+    from benchmarks.hotpaths import run_hot_paths
+
+    results = run_hot_paths(rows=100_000, names=["results.decode"])
+"""
+
+import gc
+import time
+
+from typing import Callable, Dict, List, Optional, Sequence
+
+import msgpack
+
+from pymarketstore.results import DataSet, QueryReply, decode, decode_responses
+from pymarketstore.utils import batch_to_write_requests
+
+from .utils import generate_ohlcv_data, latency_summary, percentile
+
+
+TBK = "BENCH0/1Min/OHLCV"
+
+
+def _packed(rows: int) -> dict:
+    # a query result as sent by the server
+    dataset, start_index, lengths = batch_to_write_requests(
+        {TBK: generate_ohlcv_data(rows)}
+    )[0]
+    return dict(
+        names=dataset["column_names"],
+        types=dataset["column_types"],
+        data=dataset["column_data"],
+        length=dataset["length"],
+        startindex=start_index,
+        lengths=lengths,
+    )
+
+
+def _decode(rows: int) -> Callable[[], object]:
+    p = _packed(rows)
+    return lambda: decode(p["names"], p["types"], p["data"], p["length"])
+
+
+def _decode_responses(rows: int) -> Callable[[], object]:
+    responses = [{"result": _packed(rows)}]
+    return lambda: decode_responses(responses)
+
+
+def _from_response(rows: int) -> Callable[[], object]:
+    reply = {"responses": [{"result": _packed(rows)}], "timezone": "UTC"}
+    return lambda: QueryReply.from_response(reply)
+
+
+def _unpack(rows: int) -> Callable[[], object]:
+    body = msgpack.dumps(
+        {
+            "jsonrpc": "2.0",
+            "id": "1",
+            "result": {"responses": [{"result": _packed(rows)}]},
+        }
+    )
+    return lambda: msgpack.loads(body)
+
+
+def _df(rows: int) -> Callable[[], object]:
+    ds = DataSet(generate_ohlcv_data(rows), TBK, "UTC")
+    return ds.df
+
+
+def _write_requests(rows: int) -> Callable[[], object]:
+    batch = {TBK: generate_ohlcv_data(rows)}
+    return lambda: batch_to_write_requests(batch)
+
+
+# name -> setup(rows) returning the function to time
+HOT_PATHS: Dict[str, Callable[[int], Callable[[], object]]] = {
+    "jsonrpc.unpack": _unpack,
+    "results.decode": _decode,
+    "results.decode_responses": _decode_responses,
+    "QueryReply.from_response": _from_response,
+    "DataSet.df": _df,
+    "utils.batch_to_write_requests": _write_requests,
+}
+
+
+def run_hot_paths(
+    rows: int = 100_000,
+    iterations: int = 30,
+    warmup: int = 3,
+    names: Optional[Sequence[str]] = None,
+    samples: bool = False,
+) -> List[dict]:
+    """
+    Time each hot path ``iterations`` times.
+
+    Args:
+        rows: Rows of OHLCV data each call processes
+        iterations: Timed calls per hot path
+        warmup: Untimed calls before timing
+        names: The hot paths to run (default: all of ``HOT_PATHS``)
+        samples: Include every call's time (``samples_ms``) in the results
+
+    Returns:
+        One dict per hot path: ``name``, ``rows``, ``iterations``,
+        latency percentiles and ``rows_per_s``
+    """
+    names = list(HOT_PATHS) if names is None else list(names)
+    unknown = [name for name in names if name not in HOT_PATHS]
+    if unknown:
+        raise ValueError(
+            "unknown hot path(s) {}, expected {}".format(unknown, list(HOT_PATHS))
+        )
+
+    results = []
+    for name in names:
+        func = HOT_PATHS[name](rows)
+        for _ in range(warmup):
+            func()
+        times = []
+        gc.collect()
+        for _ in range(iterations):
+            started = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - started)
+
+        result = {"name": name, "rows": rows, "iterations": iterations}
+        result.update(latency_summary(times))
+        result["rows_per_s"] = round(rows / percentile(times, 50))
+        if samples:
+            result["samples_ms"] = [round(t * 1000, 5) for t in times]
+        results.append(result)
+    return results
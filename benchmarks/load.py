@@ -0,0 +1,705 @@
+"""
+Load tests of the query clients under concurrency.
+
+``run_load()`` drives queries from many threads, processes or asyncio tasks
+at once, in one of two modes:
+
+- closed loop: every worker sends its next query as soon as the previous one
+  returns, which measures the throughput the clients sustain;
+- open loop: queries arrive at a fixed rate whatever the response times, as
+  production traffic does.  Latencies are measured from the time each query
+  was *due*, so a saturated client shows up as growing latencies instead of
+  a silently lower request rate (no coordinated omission).
+
+Latencies are counted in a ``Histogram`` with bounded relative error
+(HdrHistogram-style), which merges across workers and processes.
+``saturation_curve()`` repeats a load at increasing rates (or concurrency)
+to find where throughput stops following the offered load.
+
+Usage:
+    from benchmarks.load import run_load, saturation_curve
+
+    result = run_load("grpc", endpoint, params, mode="asyncio", concurrency=64,
+                      rate=2_000, duration=10)
+    curve = saturation_curve("jsonrpc", endpoint, params, rates=[100, 200, 400])
+
+    # or from the command line
+    python -m benchmarks.load -m asyncio -t grpc -c 64 --rate 500,1000,2000
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import sys
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+import grpc
+
+from tabulate import tabulate
+
+from pymarketstore import GRPCClient, JsonRpcClient, Params
+from pymarketstore.proto import marketstore_pb2 as proto
+from pymarketstore.proto import marketstore_pb2_grpc as gp
+from pymarketstore.results import QueryReply
+
+from .history import report_meta
+from .sweep import bench_data, bench_symbols
+from .utils import int_list
+
+
+MODES = ("thread", "process", "asyncio")
+
+
+class Histogram:
+    """
+    Latency histogram with bounded relative error, in the manner of
+    HdrHistogram.
+
+    Values are counted in log-linear buckets: every power of two is split
+    into enough linear sub-buckets to keep ``significant_digits`` digits of
+    every value (eg 2 digits: 1% error), so the histogram stays small
+    (a few thousand buckets at most) whatever the number or range of values.
+
+    Args:
+        significant_digits: Precision kept of every value
+        unit: Smallest distinguishable value, in seconds (default 1 us)
+    """
+
+    def __init__(self, significant_digits: int = 2, unit: float = 1e-6):
+        self.significant_digits = significant_digits
+        self.unit = unit
+        self._sub_bits = math.ceil(math.log2(2 * 10**significant_digits))
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def _bucket(self, units: int) -> int:
+        # the lowest value of the bucket of ``units``
+        shift = max(0, units.bit_length() - self._sub_bits)
+        return (units >> shift) << shift
+
+    def _highest(self, bucket: int) -> int:
+        shift = max(0, bucket.bit_length() - self._sub_bits)
+        return (((bucket >> shift) + 1) << shift) - 1
+
+    def record(self, value: float):
+        """Count a value in seconds."""
+        bucket = self._bucket(max(0, int(value / self.unit)))
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "Histogram") -> "Histogram":
+        """Add the counts of ``other`` (of the same precision) to this one."""
+        if (other.significant_digits, other.unit) != (self.significant_digits, self.unit):
+            raise ValueError("cannot merge histograms of different precision")
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def percentile(self, q: float) -> float:
+        """The value (seconds) at or below which ``q`` percent of values are."""
+        if not self.count:
+            return 0.0
+        target = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= target:
+                return min(self._highest(bucket) * self.unit, self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def distribution(
+        self, percentiles: Sequence[float] = (50, 75, 90, 95, 99, 99.9, 99.99, 100)
+    ) -> List[dict]:
+        """The value (ms) at each of ``percentiles``."""
+        return [
+            {"percentile": q, "value_ms": round(self.percentile(q) * 1000, 4)}
+            for q in percentiles
+        ]
+
+    def to_dict(self) -> dict:
+        """Summary, percentile distribution and non-empty buckets (in ms)."""
+        return {
+            "count": self.count,
+            "min_ms": round(self.min * 1000, 4) if self.count else 0.0,
+            "mean_ms": round(self.mean * 1000, 4),
+            "p50_ms": round(self.percentile(50) * 1000, 4),
+            "p90_ms": round(self.percentile(90) * 1000, 4),
+            "p99_ms": round(self.percentile(99) * 1000, 4),
+            "p999_ms": round(self.percentile(99.9) * 1000, 4),
+            "max_ms": round(self.max * 1000, 4),
+            "distribution": self.distribution(),
+            "buckets": [
+                [round(bucket * self.unit * 1000, 4), self.counts[bucket]]
+                for bucket in sorted(self.counts)
+            ],
+        }
+
+    def __repr__(self):
+        return "Histogram(count={}, p50={:.3f}ms, p99={:.3f}ms)".format(
+            self.count, self.percentile(50) * 1000, self.percentile(99) * 1000
+        )
+
+
+class AsyncGRPCClient:
+    """Queries over a ``grpc.aio`` channel, decoded like ``GRPCClient``."""
+
+    def __init__(self, endpoint: str):
+        options = [
+            ("grpc.max_send_message_length", 1 * 1024**3),
+            ("grpc.max_receive_message_length", 1 * 1024**3),
+        ]
+        self.endpoint = endpoint
+        self.channel = grpc.aio.insecure_channel(endpoint, options)
+        self.stub = gp.MarketstoreStub(self.channel)
+
+    async def query(self, params: Union[Params, List[Params]]) -> QueryReply:
+        if not isinstance(params, list):
+            params = [params]
+        request = proto.MultiQueryRequest(requests=[p.to_query_request() for p in params])
+        return QueryReply.from_grpc_response(await self.stub.Query(request), params)
+
+    async def close(self):
+        await self.channel.close()
+
+    def __repr__(self):
+        return 'AsyncGRPCClient("{}")'.format(self.endpoint)
+
+
+class AsyncThreadClient:
+    """
+    An asyncio face for a blocking client: queries run on a thread pool, one
+    client per thread.
+    """
+
+    def __init__(self, make_client: Callable[[], object], threads: int):
+        self._make_client = make_client
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(max_workers=threads)
+
+    def _query(self, params):
+        if not hasattr(self._local, "client"):
+            self._local.client = self._make_client()
+        return self._local.client.query(params)
+
+    async def query(self, params):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, self._query, params)
+
+    async def close(self):
+        self._pool.shutdown(wait=False)
+
+
+SYNC_CLIENTS = {"jsonrpc": JsonRpcClient, "grpc": GRPCClient}
+
+
+def _sync_factory(client: Union[str, Callable[[], object]], endpoint: Optional[str]):
+    if callable(client):
+        return client
+    if client not in SYNC_CLIENTS:
+        raise ValueError(
+            "unknown transport {!r}, expected one of {}".format(
+                client, list(SYNC_CLIENTS)
+            )
+        )
+    return lambda: SYNC_CLIENTS[client](endpoint)
+
+
+def _async_client(client, endpoint: Optional[str], concurrency: int):
+    if client == "grpc":
+        return AsyncGRPCClient(endpoint)
+    if isinstance(client, str):
+        return AsyncThreadClient(_sync_factory(client, endpoint), concurrency)
+    return client()
+
+
+@dataclass
+class LoadResult:
+    """Outcome of one load run."""
+
+    mode: str
+    workers: int
+    duration: float
+    rate: Optional[float] = None
+    completed: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+    histogram: Histogram = field(default_factory=Histogram)
+
+    @property
+    def loop(self) -> str:
+        return "closed" if self.rate is None else "open"
+
+    @property
+    def throughput(self) -> float:
+        """Completed queries per second."""
+        return self.completed / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self, buckets: bool = True) -> dict:
+        latency = self.histogram.to_dict()
+        if not buckets:
+            latency.pop("buckets")
+        return {
+            "mode": self.mode,
+            "loop": self.loop,
+            "workers": self.workers,
+            "offered_rate": self.rate,
+            "duration_s": self.duration,
+            "completed": self.completed,
+            "errors": self.errors,
+            "throughput_qps": round(self.throughput, 2),
+            "latency": latency,
+        }
+
+
+class _Schedule:
+    """Due times of open-loop arrivals, shared by the workers of a run."""
+
+    def __init__(self, start: float, rate: float, deadline: float):
+        self.start = start
+        self.interval = 1.0 / rate
+        self.deadline = deadline
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def next(self) -> Optional[float]:
+        with self._lock:
+            due = self.start + self._next * self.interval
+            self._next += 1
+        return due if due < self.deadline else None
+
+
+def _thread_load(
+    make_client: Callable[[], object],
+    params: Params,
+    workers: int,
+    duration: float,
+    rate: Optional[float],
+) -> LoadResult:
+    result = LoadResult("thread", workers, duration, rate)
+    clients = [make_client() for _ in range(workers)]
+    lock = threading.Lock()
+    barrier = threading.Barrier(workers + 1)
+    timing = {}
+
+    def worker(client):
+        histogram, completed, errors = Histogram(), 0, 0
+        barrier.wait()
+        deadline = timing["deadline"]
+        schedule = timing.get("schedule")
+        while True:
+            if schedule is None:
+                due = time.perf_counter()
+                if due >= deadline:
+                    break
+            else:
+                due = schedule.next()
+                if due is None:
+                    break
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            try:
+                client.query(params)
+            except Exception:
+                errors += 1
+                continue
+            histogram.record(time.perf_counter() - due)
+            completed += 1
+        with lock:
+            result.histogram.merge(histogram)
+            result.completed += completed
+            result.errors += errors
+
+    threads = [threading.Thread(target=worker, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    timing["start"] = start = time.perf_counter()
+    timing["deadline"] = start + duration
+    if rate is not None:
+        timing["schedule"] = _Schedule(start, rate, start + duration)
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def _process_worker(args) -> LoadResult:
+    transport, endpoint, params, workers, duration, rate, start = args
+    # line the processes up on a common start time
+    delay = start - time.time()
+    if delay > 0:
+        time.sleep(delay)
+    return _thread_load(
+        _sync_factory(transport, endpoint), params, workers, duration, rate
+    )
+
+
+def _process_load(
+    transport: str,
+    endpoint: str,
+    params: Params,
+    processes: int,
+    duration: float,
+    rate: Optional[float],
+    threads: int = 1,
+) -> LoadResult:
+    if not isinstance(transport, str):
+        raise ValueError("process mode needs a transport name, not a client factory")
+    # spawn: forked gRPC and HTTP connection state is not safe to reuse
+    context = multiprocessing.get_context("spawn")
+    share = None if rate is None else rate / processes
+    start = time.time() + 1.0 + 0.25 * processes
+    with context.Pool(processes) as pool:
+        parts = pool.map(
+            _process_worker,
+            [(transport, endpoint, params, threads, duration, share, start)] * processes,
+        )
+
+    result = LoadResult("process", processes * threads, duration, rate)
+    for part in parts:
+        result.histogram.merge(part.histogram)
+        result.completed += part.completed
+        result.errors += part.errors
+        result.elapsed = max(result.elapsed, part.elapsed)
+    return result
+
+
+async def _asyncio_load(
+    client,
+    params: Params,
+    concurrency: int,
+    duration: float,
+    rate: Optional[float],
+) -> LoadResult:
+    result = LoadResult("asyncio", concurrency, duration, rate)
+    histogram = result.histogram
+
+    async def one(due: float, slots: Optional[asyncio.Semaphore] = None):
+        try:
+            await client.query(params)
+        except Exception:
+            result.errors += 1
+        else:
+            histogram.record(time.perf_counter() - due)
+            result.completed += 1
+        finally:
+            if slots is not None:
+                slots.release()
+
+    start = time.perf_counter()
+    deadline = start + duration
+    if rate is None:
+
+        async def worker():
+            while True:
+                due = time.perf_counter()
+                if due >= deadline:
+                    return
+                await one(due)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    else:
+        # a task per arrival, at most ``concurrency`` in flight; arrivals
+        # waiting for a slot are late, which counts in their latency
+        slots = asyncio.Semaphore(concurrency)
+        tasks = []
+        i = 0
+        while True:
+            due = start + i / rate
+            if due >= deadline:
+                break
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await slots.acquire()
+            tasks.append(asyncio.ensure_future(one(due, slots)))
+            i += 1
+        await asyncio.gather(*tasks)
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+async def _run_asyncio(client, endpoint, params, concurrency, duration, rate):
+    instance = _async_client(client, endpoint, concurrency)
+    try:
+        return await _asyncio_load(instance, params, concurrency, duration, rate)
+    finally:
+        close = getattr(instance, "close", None)
+        if close is not None:
+            await close()
+
+
+def run_load(
+    client: Union[str, Callable[[], object]],
+    endpoint: Optional[str],
+    params: Params,
+    mode: str = "thread",
+    concurrency: int = 4,
+    duration: float = 5.0,
+    rate: Optional[float] = None,
+) -> LoadResult:
+    """
+    Send ``params`` queries for ``duration`` seconds.
+
+    Args:
+        client: "jsonrpc" or "grpc" (with ``endpoint``), or a zero-argument
+            factory of clients: blocking ones for "thread" mode, ones with an
+            ``async def query()`` for "asyncio" mode
+        endpoint: The server endpoint of ``client`` transports
+        params: The query to send
+        mode: "thread", "process" (one single-threaded worker per process)
+            or "asyncio" (tasks on one event loop; "grpc" uses ``grpc.aio``,
+            "jsonrpc" a thread pool)
+        concurrency: Threads, processes or tasks in flight
+        duration: Seconds of load
+        rate: Queries per second in total (open loop); None for closed loop
+
+    Returns:
+        ``LoadResult`` with the latency ``Histogram``
+    """
+    if mode not in MODES:
+        raise ValueError("unknown mode {!r}, expected one of {}".format(mode, MODES))
+    if rate is not None and rate <= 0:
+        raise ValueError("rate must be positive")
+
+    if mode == "thread":
+        return _thread_load(
+            _sync_factory(client, endpoint), params, concurrency, duration, rate
+        )
+    if mode == "process":
+        return _process_load(client, endpoint, params, concurrency, duration, rate)
+    return asyncio.run(
+        _run_asyncio(client, endpoint, params, concurrency, duration, rate)
+    )
+
+
+def saturation_curve(
+    client: Union[str, Callable[[], object]],
+    endpoint: Optional[str],
+    params: Params,
+    mode: str = "thread",
+    rates: Optional[Sequence[float]] = None,
+    concurrency: Sequence[int] = (4,),
+    duration: float = 5.0,
+    keep_up: float = 0.95,
+    progress: Optional[Callable[[LoadResult], None]] = None,
+) -> dict:
+    """
+    Run a load at each of ``rates`` (open loop, with the largest
+    ``concurrency``), or else at each ``concurrency`` (closed loop).
+
+    Args:
+        rates: Offered rates (queries/s), in increasing order
+        concurrency: Workers per run
+        keep_up: Fraction of the offered rate the clients must complete for
+            that rate to count as sustained
+        progress: Called with each ``LoadResult`` as it completes
+        (others as for ``run_load()``)
+
+    Returns:
+        ``points`` (``LoadResult.to_dict()`` of each run, without buckets)
+        and, for open loop, ``max_sustained_rate``: the highest offered rate
+        the clients kept up with (None if none)
+    """
+    points, max_sustained = [], None
+    if rates:
+        runs = [(max(concurrency), rate) for rate in rates]
+    else:
+        runs = [(workers, None) for workers in concurrency]
+
+    for workers, rate in runs:
+        result = run_load(client, endpoint, params, mode, workers, duration, rate)
+        points.append(result.to_dict(buckets=False))
+        if progress is not None:
+            progress(result)
+        if rate is not None and result.throughput >= keep_up * rate:
+            max_sustained = rate
+
+    curve = {"points": points}
+    if rates:
+        curve["max_sustained_rate"] = max_sustained
+    return curve
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Load-test a client with concurrent queries and report its "
+        "saturation curve",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Closed loop (default): each of --concurrency workers queries back to back,
+once per concurrency level.  Open loop (--rate): queries arrive at each fixed
+rate, with latency measured from when each was due, and the highest rate the
+client kept up with is reported.
+
+Examples:
+  python -m benchmarks.load -c 1,4,16,64
+  python -m benchmarks.load -m asyncio -t grpc -c 64 --rate 500,1000,2000,4000
+  python -m benchmarks.load -m process -c 8 --live -f json -o load.json
+        """,
+    )
+    parser.add_argument(
+        "--mode",
+        "-m",
+        choices=MODES,
+        default="thread",
+        help="Drive the load from threads, processes or asyncio tasks",
+    )
+    parser.add_argument(
+        "--transport",
+        "-t",
+        choices=list(SYNC_CLIENTS),
+        default="jsonrpc",
+        help="Transport to load (asyncio mode uses grpc.aio for gRPC)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        "-c",
+        type=int_list,
+        default=[1, 2, 4, 8],
+        help="Workers (comma-separated); with --rate, the largest caps queries "
+        "in flight (default: 1,2,4,8)",
+    )
+    parser.add_argument(
+        "--rate",
+        "-r",
+        type=int_list,
+        default=None,
+        help="Offered queries/s (comma-separated) for an open-loop load "
+        "(default: closed loop)",
+    )
+    parser.add_argument(
+        "--duration",
+        "-d",
+        type=float,
+        default=5.0,
+        help="Seconds per load level (default: 5)",
+    )
+    parser.add_argument(
+        "--rows", type=int, default=1000, help="Rows per symbol per query"
+    )
+    parser.add_argument("--symbols", type=int, default=1, help="Symbols per query")
+    parser.add_argument(
+        "--format",
+        "-f",
+        dest="output_format",
+        choices=["table", "json"],
+        default="table",
+        help="Output format",
+    )
+    parser.add_argument("--output", "-o", help="Also write the JSON report to this file")
+    parser.add_argument(
+        "--live",
+        action="store_true",
+        help="Load the server at --host instead of an in-process stand-in",
+    )
+    parser.add_argument(
+        "--host", default="localhost", help="MarketStore server host (with --live)"
+    )
+    parser.add_argument(
+        "--port", type=int, default=5993, help="MarketStore JSON-RPC port (with --live)"
+    )
+    parser.add_argument(
+        "--grpc-port", type=int, default=5995, help="MarketStore gRPC port (with --live)"
+    )
+    args = parser.parse_args(argv)
+
+    endpoints = None
+    if args.live:
+        endpoints = {
+            "jsonrpc": f"http://{args.host}:{args.port}/rpc",
+            "grpc": f"{args.host}:{args.grpc_port}",
+        }
+
+    def progress(result):
+        print(
+            "{} workers{}: {:.0f} queries/s, p99 {:.2f} ms".format(
+                result.workers,
+                "" if result.rate is None else f", {result.rate}/s offered",
+                result.throughput,
+                result.histogram.percentile(99) * 1000,
+            ),
+            file=sys.stderr,
+        )
+
+    try:
+        with bench_data(endpoints, args.symbols, args.rows) as targets:
+            params = Params(
+                bench_symbols(args.symbols),
+                "1Min",
+                "OHLCV",
+                limit=args.rows,
+                limit_from_start=True,
+            )
+            curve = saturation_curve(
+                args.transport,
+                targets[args.transport],
+                params,
+                mode=args.mode,
+                rates=args.rate,
+                concurrency=args.concurrency,
+                duration=args.duration,
+                progress=progress,
+            )
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    report = {
+        "meta": report_meta(
+            target="inproc" if endpoints is None else endpoints,
+            transport=args.transport,
+            mode=args.mode,
+            rows=args.rows,
+            symbols=args.symbols,
+        ),
+        **curve,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.output_format == "json":
+        print(json.dumps(report, indent=2))
+        return
+
+    columns = ["p50_ms", "p90_ms", "p99_ms", "p999_ms", "max_ms"]
+    print(
+        tabulate(
+            [
+                [p["workers"], p["offered_rate"], p["throughput_qps"], p["errors"]]
+                + [p["latency"][c] for c in columns]
+                for p in report["points"]
+            ],
+            headers=["workers", "offered_rate", "throughput_qps", "errors"] + columns,
+            tablefmt="simple",
+        )
+    )
+    if "max_sustained_rate" in report:
+        print(f"\nMax sustained rate: {report['max_sustained_rate']} queries/s")
+
+
+if __name__ == "__main__":
+    main()
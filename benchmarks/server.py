@@ -0,0 +1,317 @@
+"""
+In-process stand-in for a MarketStore server.
+
+``FakeServer`` keeps buckets in memory and answers the JSON-RPC (msgpack over
+HTTP) and gRPC query, write, list and destroy calls of the real server, so the
+clients can be benchmarked end to end (request encoding, transport, response
+decoding) without a MarketStore deployment.  Query latencies measured against
+it are a lower bound for a live server: no disk is read and no server-side
+functions are applied.
+
+Usage:
+    with FakeServer() as server:
+        client = JsonRpcClient(server.jsonrpc_endpoint)
+        client.write(generate_ohlcv_data(1000), "TEST/1Min/OHLCV")
+        client.query(Params("TEST", "1Min", "OHLCV"))
+"""
+
+import threading
+
+from concurrent import futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import grpc
+import msgpack
+import numpy as np
+
+from pymarketstore.proto import marketstore_pb2 as proto
+from pymarketstore.proto import marketstore_pb2_grpc as gp
+from pymarketstore.results import decode
+from pymarketstore.utils import batch_to_write_requests
+
+
+VERSION = "fake"
+NO_RESULTS = "no results returned from query"
+
+
+class FakeServer:
+    """MarketStore stand-in serving buckets from memory over JSON-RPC and gRPC."""
+
+    def __init__(self, timezone: str = "UTC", grpc_workers: int = 16):
+        self.timezone = timezone
+        self.grpc_workers = grpc_workers
+        self._buckets: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self._http: Optional[ThreadingHTTPServer] = None
+        self._grpc: Optional[grpc.Server] = None
+        self._grpc_port: Optional[int] = None
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def add(self, tbk: str, array: np.ndarray):
+        """Append rows to a bucket, keeping it sorted by time."""
+        with self._lock:
+            if tbk in self._buckets:
+                array = np.concatenate([self._buckets[tbk], array])
+            order = np.argsort(array["Epoch"], kind="stable")
+            self._buckets[tbk] = array[order]
+
+    def destroy(self, tbk: str):
+        with self._lock:
+            self._buckets.pop(tbk, None)
+
+    def tbks(self) -> List[str]:
+        with self._lock:
+            return sorted(self._buckets)
+
+    def _select(self, request: dict) -> Dict[str, np.ndarray]:
+        symbols, timeframe, attrgroup = request["destination"].split("/")
+        start = request.get("epoch_start")
+        end = request.get("epoch_end")
+        limit = request.get("limit_record_count")
+
+        selected = {}
+        for symbol in symbols.split(","):
+            tbk = f"{symbol}/{timeframe}/{attrgroup}"
+            array = self._buckets.get(tbk)
+            if array is None:
+                continue
+            epochs = array["Epoch"]
+            lo = 0 if start is None else np.searchsorted(epochs, start, "left")
+            hi = len(array) if end is None else np.searchsorted(epochs, end, "right")
+            rows = array[lo:hi]
+            if limit:
+                rows = rows[:limit] if request.get("limit_from_start") else rows[-limit:]
+            if len(rows):
+                selected[tbk] = rows
+        return selected
+
+    def query(self, requests: List[dict]) -> List[dict]:
+        """
+        Answer query requests (as built by ``Params.to_query_request()``).
+
+        Returns:
+            One packed dataset per request: ``names``, ``types``, ``data``,
+            ``length``, ``startindex`` and ``lengths``
+        """
+        packed = []
+        for request in requests:
+            if request.get("is_sqlstatement") or request.get("is_sql_statement"):
+                raise ValueError("SQL statements are not supported")
+            selected = self._select(request)
+            if not selected:
+                packed.append(
+                    dict(names=[], types=[], data=[], length=0, startindex={}, lengths={})
+                )
+                continue
+            datasets = batch_to_write_requests(selected)
+            if len(datasets) > 1:
+                raise ValueError(f"{request['destination']}: buckets of mixed shapes")
+            dataset, start_index, lengths = datasets[0]
+            packed.append(
+                dict(
+                    names=dataset["column_names"],
+                    types=dataset["column_types"],
+                    data=dataset["column_data"],
+                    length=dataset["length"],
+                    startindex=start_index,
+                    lengths=lengths,
+                )
+            )
+        if not any(p["length"] for p in packed):
+            raise LookupError(NO_RESULTS)
+        return packed
+
+    def write(self, names, types, data, length, start_index, lengths):
+        array = decode(list(names), list(types), list(data), length)
+        for tbk, start in start_index.items():
+            self.add(tbk, array[start : start + lengths[tbk]].copy())
+
+    def list_symbols(self, tbk_format: bool = False) -> List[str]:
+        tbks = self.tbks()
+        if tbk_format:
+            return tbks
+        return sorted({tbk.split("/")[0] for tbk in tbks})
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self) -> "FakeServer":
+        """Listen on free localhost ports for JSON-RPC and gRPC."""
+        self._http = ThreadingHTTPServer(("127.0.0.1", 0), _handler(self))
+        self._http.daemon_threads = True
+        threading.Thread(target=self._http.serve_forever, daemon=True).start()
+
+        options = [
+            ("grpc.max_send_message_length", 1 * 1024**3),
+            ("grpc.max_receive_message_length", 1 * 1024**3),
+        ]
+        self._grpc = grpc.server(
+            futures.ThreadPoolExecutor(max_workers=self.grpc_workers), options=options
+        )
+        gp.add_MarketstoreServicer_to_server(_Servicer(self), self._grpc)
+        self._grpc_port = self._grpc.add_insecure_port("127.0.0.1:0")
+        self._grpc.start()
+        return self
+
+    def stop(self):
+        if self._http is not None:
+            self._http.shutdown()
+            self._http.server_close()
+            self._http = None
+        if self._grpc is not None:
+            self._grpc.stop(None)
+            self._grpc = None
+
+    @property
+    def jsonrpc_endpoint(self) -> str:
+        host, port = self._http.server_address[:2]
+        return f"http://{host}:{port}/rpc"
+
+    @property
+    def grpc_endpoint(self) -> str:
+        return f"127.0.0.1:{self._grpc_port}"
+
+    def __enter__(self) -> "FakeServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def __repr__(self):
+        return "FakeServer(buckets={})".format(len(self._buckets))
+
+
+def _handler(server: FakeServer):
+    class Handler(BaseHTTPRequestHandler):
+        # keep-alive, as with the real server; headers and body are sent
+        # separately, so Nagle's algorithm would add delayed-ACK stalls
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header("Marketstore-Version", VERSION)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            request = msgpack.loads(body)
+            try:
+                reply = {"result": self._call(request["method"], request["params"])}
+            except Exception as e:
+                reply = {"error": {"message": str(e), "data": ""}}
+            reply.update(jsonrpc="2.0", id=request.get("id"))
+
+            content = msgpack.dumps(reply)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-msgpack")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def _call(self, method: str, params: dict):
+            if method == "DataService.Query":
+                return dict(
+                    responses=[
+                        {"result": packed} for packed in server.query(params["requests"])
+                    ],
+                    timezone=server.timezone,
+                    version=VERSION,
+                )
+            if method == "DataService.Write":
+                for request in params["requests"]:
+                    ds = request["dataset"]
+                    server.write(
+                        ds["names"],
+                        ds["types"],
+                        ds["data"],
+                        sum(ds["lengths"].values()),
+                        ds["startindex"],
+                        ds["lengths"],
+                    )
+                return {"responses": None}
+            if method == "DataService.ListSymbols":
+                return {"Results": server.list_symbols(params.get("format") == "tbk")}
+            if method == "DataService.Destroy":
+                for request in params["requests"]:
+                    server.destroy(request["key"])
+                return {"responses": None}
+            raise ValueError(f"unsupported method {method}")
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class _Servicer(gp.MarketstoreServicer):
+    def __init__(self, server: FakeServer):
+        self.server = server
+
+    def Query(self, request, context):
+        requests = []
+        for r in request.requests:
+            # proto3 scalars have no presence: zero means unset
+            query = {"destination": r.destination, "is_sql_statement": r.is_sql_statement}
+            if r.epoch_start:
+                query["epoch_start"] = r.epoch_start
+            if r.epoch_end:
+                query["epoch_end"] = r.epoch_end
+            if r.limit_record_count:
+                query["limit_record_count"] = r.limit_record_count
+                query["limit_from_start"] = r.limit_from_start
+            requests.append(query)
+        try:
+            packed = self.server.query(requests)
+        except Exception as e:
+            context.abort(grpc.StatusCode.UNKNOWN, str(e))
+
+        return proto.MultiQueryResponse(
+            responses=[
+                proto.QueryResponse(
+                    result=proto.NumpyMultiDataset(
+                        data=proto.NumpyDataset(
+                            column_names=p["names"],
+                            column_types=p["types"],
+                            column_data=p["data"],
+                            length=p["length"],
+                        ),
+                        start_index=p["startindex"],
+                        lengths=p["lengths"],
+                    )
+                )
+                for p in packed
+            ],
+            version=VERSION,
+            timezone=self.server.timezone,
+        )
+
+    def Write(self, request, context):
+        for r in request.requests:
+            self.server.write(
+                r.data.data.column_names,
+                r.data.data.column_types,
+                r.data.data.column_data,
+                r.data.data.length,
+                dict(r.data.start_index),
+                dict(r.data.lengths),
+            )
+        return proto.MultiServerResponse()
+
+    def ListSymbols(self, request, context):
+        tbk_format = request.format == proto.ListSymbolsRequest.Format.TIME_BUCKET_KEY
+        return proto.ListSymbolsResponse(results=self.server.list_symbols(tbk_format))
+
+    def Destroy(self, request, context):
+        for r in request.requests:
+            self.server.destroy(r.key)
+        return proto.MultiServerResponse()
+
+    def ServerVersion(self, request, context):
+        return proto.ServerVersionResponse(version=VERSION)
@@ -0,0 +1,620 @@
+"""
+Streaming throughput benchmarks of ``StreamConn`` and ``AsyncStreamConn``.
+
+A ``StreamPublisher`` runs a local WebSocket server in a separate process
+(so that it does not compete with the client for the GIL) that publishes
+MarketStore-format msgpack bars, ``{"key": "SYM0/1Min/OHLCV", "data":
+{"Epoch": ..., "Open": ..., ...}}``, at a fixed rate over a number of distinct
+keys.  ``run_stream()`` subscribes with one of the stream clients, registers
+a number of handlers, and measures:
+
+- end-to-end latency, from the moment the publisher sent a bar until the
+  last handler saw it (both processes read the same monotonic clock);
+- client CPU time per message (the thread receiving, decoding and
+  dispatching);
+- whether the rate was sustained: every bar delivered, the publisher not
+  held back by the client, and p99 latency within an SLO.
+
+``stream_curve()`` raises the rate until the client falls behind, giving the
+maximum sustainable message rate.
+
+Usage:
+    with StreamPublisher() as publisher:
+        result = run_stream(publisher, "async", rate=10_000, keys=100, handlers=2)
+        curve = stream_curve(publisher, "sync", rates=[1_000, 5_000, 20_000])
+
+    # or from the command line
+    python -m benchmarks.stream --client async -k 10,1000 --handlers 1,8
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import re
+import sys
+import threading
+import time
+
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import msgpack
+import numpy as np
+import websocket
+
+from tabulate import tabulate
+
+from pymarketstore import AsyncStreamConn, StreamConn
+from pymarketstore.decoder import StreamDecoder
+
+from .history import report_meta
+from .load import Histogram
+from .utils import int_list
+
+
+CLIENTS = ("sync", "async")
+BASE_EPOCH = 1704067200  # 2024-01-01 00:00:00 UTC
+STREAMS = ["*/1Min/OHLCV"]
+
+
+def stream_key(index: int) -> str:
+    return f"SYM{index}/1Min/OHLCV"
+
+
+def _sequence(rate: float, keys: int, duration: float) -> int:
+    return max(1, int(rate * duration))
+
+
+async def _publish(ws, rate: float, keys: int, duration: float) -> np.ndarray:
+    """Send bars at ``rate`` per second, returning the time each was sent."""
+    names = [stream_key(k) for k in range(keys)]
+    sent = np.empty(_sequence(rate, keys, duration))
+    start = time.perf_counter()
+    for i in range(len(sent)):
+        delay = start + i / rate - time.perf_counter()
+        # the event loop cannot sleep for less than about a millisecond:
+        # bars due sooner go out back to back
+        if delay > 0.001:
+            await asyncio.sleep(delay)
+        price = 100.0 + (i % 100) * 0.01
+        payload = msgpack.packb(
+            {
+                "key": names[i % keys],
+                "data": {
+                    "Epoch": BASE_EPOCH + (i // keys) * 60,
+                    "Open": price,
+                    "High": price + 0.05,
+                    "Low": price - 0.05,
+                    "Close": price + 0.01,
+                    "Volume": 100 + i % 1000,
+                },
+            }
+        )
+        sent[i] = time.perf_counter()
+        # blocks while the client's socket buffer is full: backpressure
+        await ws.send(payload)
+    return sent
+
+
+async def _serve(pipe):
+    from websockets.asyncio.server import serve
+
+    loop = asyncio.get_running_loop()
+    closing = {}
+    stop = asyncio.Event()
+
+    def closing_event(run: str) -> asyncio.Event:
+        return closing.setdefault(run, asyncio.Event())
+
+    async def handler(ws):
+        query = parse_qs(urlsplit(ws.request.path).query)
+        run = query["run"][0]
+        rate, duration = float(query["rate"][0]), float(query["duration"][0])
+        keys = int(query["keys"][0])
+
+        subscription = msgpack.unpackb(await ws.recv())
+        await ws.send(msgpack.packb({"streams": subscription.get("streams", [])}))
+        started = time.perf_counter()
+        sent = await _publish(ws, rate, keys, duration)
+        pipe.send(("published", run, sent.tobytes(), time.perf_counter() - started))
+        # keep the connection open until the client is done measuring
+        await closing_event(run).wait()
+        # drop it rather than closing it cleanly: StreamConn only stops on
+        # a connection error
+        ws.transport.abort()
+
+    def commands():
+        while True:
+            command, *args = pipe.recv()
+            if command == "close":
+                loop.call_soon_threadsafe(closing_event(args[0]).set)
+            elif command == "stop":
+                loop.call_soon_threadsafe(stop.set)
+                return
+
+    async with serve(handler, "127.0.0.1", 0, max_size=None) as server:
+        port = next(iter(server.sockets)).getsockname()[1]
+        pipe.send(("port", port))
+        threading.Thread(target=commands, daemon=True).start()
+        await stop.wait()
+
+
+def _publisher_main(pipe):
+    asyncio.run(_serve(pipe))
+
+
+class StreamPublisher:
+    """
+    A local MarketStore stream stand-in, run in its own process.
+
+    Each connection publishes one run, whose rate, keys and duration are
+    taken from the query string of the endpoint (see ``endpoint()``).
+    """
+
+    def __init__(self):
+        self._pipe = None
+        self._process = None
+        self._runs = 0
+        self.port: Optional[int] = None
+
+    def start(self) -> "StreamPublisher":
+        # spawn: the parent's threads and sockets are not safe to fork
+        context = multiprocessing.get_context("spawn")
+        self._pipe, child = context.Pipe()
+        self._process = context.Process(
+            target=_publisher_main, args=(child,), daemon=True
+        )
+        self._process.start()
+        if not self._pipe.poll(60):
+            self.stop()
+            raise RuntimeError("stream publisher did not start")
+        _, self.port = self._pipe.recv()
+        return self
+
+    def endpoint(self, rate: float, keys: int, duration: float) -> Tuple[str, str]:
+        """A new run's id and the endpoint to subscribe to for it."""
+        self._runs += 1
+        run = str(self._runs)
+        return run, "ws://127.0.0.1:{}/ws?run={}&rate={}&keys={}&duration={}".format(
+            self.port, run, rate, keys, duration
+        )
+
+    def published(self, run: str, timeout: float) -> Optional[Tuple[np.ndarray, float]]:
+        """The send times of run ``run``'s bars and the seconds it took to send them."""
+        deadline = time.monotonic() + timeout
+        while self._pipe.poll(max(0.0, deadline - time.monotonic())):
+            _, published, sent, seconds = self._pipe.recv()
+            if published == run:
+                return np.frombuffer(sent), seconds
+        return None
+
+    def close(self, run: str):
+        """Close run ``run``'s connection."""
+        self._pipe.send(("close", run))
+
+    def stop(self):
+        if self._process is not None:
+            if self._process.is_alive():
+                self._pipe.send(("stop",))
+                self._process.join(5)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None
+
+    def __enter__(self) -> "StreamPublisher":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def __repr__(self):
+        return "StreamPublisher(port={})".format(self.port)
+
+
+@dataclass
+class StreamResult:
+    """Outcome of one stream run."""
+
+    client: str
+    rate: float
+    keys: int
+    handlers: int
+    duration: float
+    slo_ms: float
+    published: int = 0
+    received: int = 0
+    publish_seconds: float = 0.0
+    cpu_time: float = 0.0
+    histogram: Histogram = field(default_factory=Histogram)
+
+    @property
+    def publish_rate(self) -> float:
+        """Bars per second the publisher managed to send."""
+        return self.published / self.publish_seconds if self.publish_seconds else 0.0
+
+    @property
+    def cpu_us_per_message(self) -> float:
+        return self.cpu_time / self.received * 1e6 if self.received else 0.0
+
+    @property
+    def sustained(self) -> bool:
+        """Every bar delivered, at the offered rate, within the latency SLO."""
+        return (
+            self.published > 0
+            and self.received == self.published
+            and self.publish_rate >= 0.95 * self.rate
+            and self.histogram.percentile(99) * 1000 <= self.slo_ms
+        )
+
+    def to_dict(self, buckets: bool = False) -> dict:
+        latency = self.histogram.to_dict()
+        if not buckets:
+            latency.pop("buckets")
+        return {
+            "client": self.client,
+            "rate": self.rate,
+            "keys": self.keys,
+            "handlers": self.handlers,
+            "published": self.published,
+            "received": self.received,
+            "publish_rate": round(self.publish_rate, 2),
+            "cpu_us_per_message": round(self.cpu_us_per_message, 3),
+            "sustained": self.sustained,
+            "latency": latency,
+        }
+
+
+class _Receiver:
+    """Handlers recording when each bar reached the last of them."""
+
+    def __init__(self, keys: int, count: int, handlers: int):
+        self.keys = keys
+        self.received = np.full(count, np.nan)
+        self.count = 0
+        self.complete = threading.Event()
+        self._index = {stream_key(k): k for k in range(keys)}
+        self.handlers = [self._work] * (handlers - 1) + [self._record]
+
+    @staticmethod
+    def _work(key, data):
+        return data["Close"]
+
+    def _record(self, key, data):
+        now = time.perf_counter()
+        i = (data["Epoch"] - BASE_EPOCH) // 60 * self.keys + self._index[key]
+        self.received[i] = now
+        self.count += 1
+        if self.count == len(self.received):
+            self.complete.set()
+
+    def register(self, conn, sync: bool):
+        for i, handler in enumerate(self.handlers):
+            if sync:
+                # StreamConn handlers get (conn, {"key": ..., "data": ...})
+                handler = _sync_handler(handler)
+            # distinct patterns, all matching every key
+            conn.register(re.compile(f".*(?#handler {i})"), handler)
+
+
+def _sync_handler(handler: Callable) -> Callable:
+    return lambda conn, msg: handler(msg["key"], msg["data"])
+
+
+def run_stream(
+    publisher: StreamPublisher,
+    client: str = "async",
+    rate: float = 1_000,
+    keys: int = 10,
+    handlers: int = 1,
+    duration: float = 2.0,
+    bars: bool = False,
+    slo_ms: float = 100.0,
+    drain: float = 5.0,
+) -> StreamResult:
+    """
+    Stream ``rate * duration`` bars to a client and measure it.
+
+    Args:
+        publisher: A started ``StreamPublisher``
+        client: "sync" (``StreamConn``) or "async" (``AsyncStreamConn``)
+        rate: Bars per second
+        keys: Distinct stream keys the bars are spread over
+        handlers: Handlers called for every bar
+        duration: Seconds of publishing
+        bars: Decode payloads into ``Bar`` objects (``StreamDecoder(bars=True)``)
+        slo_ms: p99 latency (ms) up to which the rate counts as sustained
+        drain: Seconds to wait for the client to catch up after publishing
+
+    Returns:
+        ``StreamResult``
+    """
+    if client not in CLIENTS:
+        raise ValueError(
+            "unknown client {!r}, expected one of {}".format(client, CLIENTS)
+        )
+
+    result = StreamResult(client, rate, keys, handlers, duration, slo_ms)
+    receiver = _Receiver(keys, _sequence(rate, keys, duration), handlers)
+    run, endpoint = publisher.endpoint(rate, keys, duration)
+    decoder = StreamDecoder(bars=bars)
+    finish = threading.Event()
+    errors = []
+
+    def sync_client():
+        conn = StreamConn(endpoint, decoder=decoder)
+        receiver.register(conn, sync=True)
+        cpu = time.thread_time()
+        try:
+            conn.run(STREAMS)
+        except (websocket.WebSocketException, OSError):
+            pass  # the publisher closed the connection
+        except Exception as e:
+            errors.append(e)
+        result.cpu_time = time.thread_time() - cpu
+
+    async def async_main():
+        conn = AsyncStreamConn(endpoint, decoder=decoder)
+        receiver.register(conn, sync=False)
+        task = asyncio.ensure_future(conn.run(STREAMS))
+        await asyncio.to_thread(finish.wait)
+        await conn.stop()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def async_client():
+        cpu = time.thread_time()
+        try:
+            asyncio.run(async_main())
+        except Exception as e:
+            errors.append(e)
+        result.cpu_time = time.thread_time() - cpu
+
+    thread = threading.Thread(target=sync_client if client == "sync" else async_client)
+    thread.start()
+    try:
+        published = publisher.published(run, timeout=duration * 10 + 30)
+        if published is not None:
+            sent, result.publish_seconds = published
+            result.published = len(sent)
+            receiver.complete.wait(drain)
+    finally:
+        # stop the async client first, or it would reconnect to the closed run
+        finish.set()
+        if client == "async":
+            thread.join(drain)
+        publisher.close(run)
+        thread.join(drain)
+    if errors:
+        raise errors[0]
+
+    if published is not None:
+        delivered = ~np.isnan(receiver.received)
+        result.received = int(delivered.sum())
+        for latency in (receiver.received[delivered] - sent[delivered]).tolist():
+            result.histogram.record(max(0.0, latency))
+    return result
+
+
+def stream_curve(
+    publisher: StreamPublisher,
+    client: str,
+    rates: Sequence[float],
+    stop_early: bool = True,
+    progress: Optional[Callable[[StreamResult], None]] = None,
+    **kwargs,
+) -> dict:
+    """
+    Run ``run_stream()`` at each of ``rates`` (increasing).
+
+    Args:
+        stop_early: Stop after the first rate that is not sustained
+        progress: Called with each ``StreamResult`` as it completes
+        kwargs: Passed on to ``run_stream()``
+
+    Returns:
+        ``points`` (``StreamResult.to_dict()`` of each rate) and
+        ``max_sustained_rate`` (None if no rate was sustained)
+    """
+    points: List[dict] = []
+    max_sustained = None
+    for rate in rates:
+        result = run_stream(publisher, client, rate=rate, **kwargs)
+        points.append(result.to_dict())
+        if progress is not None:
+            progress(result)
+        if result.sustained:
+            max_sustained = rate
+        elif stop_early:
+            break
+    return {"points": points, "max_sustained_rate": max_sustained}
+
+
+def stream_benchmark(
+    clients: Sequence[str] = CLIENTS,
+    rates: Sequence[float] = (1_000, 5_000, 10_000, 20_000, 50_000),
+    keys: Sequence[int] = (10,),
+    handlers: Sequence[int] = (1,),
+    progress: Optional[Callable[[StreamResult], None]] = None,
+    **kwargs,
+) -> List[dict]:
+    """
+    ``stream_curve()`` of each client, key count and handler count, against
+    one ``StreamPublisher``.
+
+    Args:
+        kwargs: Passed on to ``stream_curve()`` and ``run_stream()``
+
+    Returns:
+        One dict per combination: ``client``, ``keys``, ``handlers``,
+        ``points`` and ``max_sustained_rate``
+    """
+    curves = []
+    with StreamPublisher() as publisher:
+        for client in clients:
+            for k in keys:
+                for h in handlers:
+                    curve = stream_curve(
+                        publisher,
+                        client,
+                        rates,
+                        keys=k,
+                        handlers=h,
+                        progress=progress,
+                        **kwargs,
+                    )
+                    curves.append({"client": client, "keys": k, "handlers": h, **curve})
+    return curves
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the stream clients against a local publisher of "
+        "msgpack bars",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+For each client, key count and handler count, bars are published at each
+--rate until the client falls behind.  Reports end-to-end latency, client CPU
+per message and the max sustainable rate: every bar delivered, at the offered
+rate, with p99 latency within --slo-ms.
+
+Examples:
+  python -m benchmarks.stream
+  python -m benchmarks.stream --client async -k 10,1000 --handlers 1,8
+  python -m benchmarks.stream -r 5000,10000 --bars -f json -o stream.json
+        """,
+    )
+    parser.add_argument(
+        "--client",
+        dest="clients",
+        choices=CLIENTS,
+        action="append",
+        help="Stream client(s) to benchmark: StreamConn or AsyncStreamConn "
+        "(default: both)",
+    )
+    parser.add_argument(
+        "--rate",
+        "-r",
+        type=int_list,
+        default=[1_000, 5_000, 10_000, 20_000, 50_000],
+        help="Bars/s to publish (comma-separated, increasing; "
+        "default: 1000,5000,10000,20000,50000)",
+    )
+    parser.add_argument(
+        "--keys",
+        "-k",
+        type=int_list,
+        default=[10],
+        help="Distinct stream keys (comma-separated; default: 10)",
+    )
+    parser.add_argument(
+        "--handlers",
+        type=int_list,
+        default=[1],
+        help="Handlers per bar (comma-separated; default: 1)",
+    )
+    parser.add_argument(
+        "--duration", "-d", type=float, default=2.0, help="Seconds per rate (default: 2)"
+    )
+    parser.add_argument(
+        "--bars", action="store_true", help="Decode payloads into Bar objects"
+    )
+    parser.add_argument(
+        "--slo-ms",
+        type=float,
+        default=100.0,
+        help="p99 latency (ms) up to which a rate counts as sustained (default: 100)",
+    )
+    parser.add_argument(
+        "--all-rates",
+        action="store_true",
+        help="Run every rate instead of stopping at the first one not sustained",
+    )
+    parser.add_argument(
+        "--format",
+        "-f",
+        dest="output_format",
+        choices=["table", "json"],
+        default="table",
+        help="Output format",
+    )
+    parser.add_argument("--output", "-o", help="Also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    def progress(result):
+        print(
+            "{}, {} keys, {} handlers, {}/s: {:.0f} bars/s, p99 {:.2f} ms, "
+            "{:.1f} us/bar{}".format(
+                result.client,
+                result.keys,
+                result.handlers,
+                result.rate,
+                result.publish_rate,
+                result.histogram.percentile(99) * 1000,
+                result.cpu_us_per_message,
+                "" if result.sustained else " (not sustained)",
+            ),
+            file=sys.stderr,
+        )
+
+    try:
+        curves = stream_benchmark(
+            clients=args.clients or CLIENTS,
+            rates=args.rate,
+            keys=args.keys,
+            handlers=args.handlers,
+            progress=progress,
+            stop_early=not args.all_rates,
+            duration=args.duration,
+            bars=args.bars,
+            slo_ms=args.slo_ms,
+        )
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    report = {
+        "meta": report_meta(duration=args.duration, bars=args.bars, slo_ms=args.slo_ms),
+        "curves": curves,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.output_format == "json":
+        print(json.dumps(report, indent=2))
+        return
+
+    columns = ["p50_ms", "p99_ms", "max_ms"]
+    print(
+        tabulate(
+            [
+                [c["client"], c["keys"], c["handlers"], p["rate"], p["publish_rate"]]
+                + [p["received"], p["cpu_us_per_message"]]
+                + [p["latency"][col] for col in columns]
+                + [p["sustained"]]
+                for c in curves
+                for p in c["points"]
+            ],
+            headers=["client", "keys", "handlers", "rate", "publish_rate"]
+            + ["received", "cpu_us/bar"]
+            + columns
+            + ["sustained"],
+            tablefmt="simple",
+        )
+    )
+    print("")
+    for c in curves:
+        print(
+            "Max sustained rate ({}, {} keys, {} handlers): {} bars/s".format(
+                c["client"], c["keys"], c["handlers"], c["max_sustained_rate"]
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
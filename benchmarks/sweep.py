@@ -0,0 +1,574 @@
+"""
+Parameter sweeps of client query performance.
+
+``run_sweep()`` times queries for every combination of transport, query size
+(rows per symbol), symbol count and concurrency, against a live MarketStore
+server or an in-process ``FakeServer``, and reports latency percentiles,
+throughput, client CPU time and peak memory per combination.  The report is plain
+JSON so that runs can be tracked over time.  The command line also runs the
+hot-path micro-benchmarks and compares runs with a history file.
+
+Usage:
+    from benchmarks.sweep import run_sweep
+
+    report = run_sweep(rows=[1_000, 100_000], symbols=[1, 10], concurrency=[1, 4])
+
+    # or from the command line
+    python -m benchmarks.sweep --rows 100,10000 --symbols 1 -c 1,4
+"""
+
+import argparse
+import gc
+import json
+import sys
+import threading
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from itertools import product
+from typing import Callable, Dict, List, Optional, Sequence
+
+from tabulate import tabulate
+
+from pymarketstore import GRPCClient, JsonRpcClient, Params
+
+from .history import History, compare, report_meta, without_samples
+from .hotpaths import run_hot_paths
+from .server import FakeServer
+from .utils import generate_ohlcv_data, int_list, latency_summary
+
+
+TRANSPORTS = {"jsonrpc": JsonRpcClient, "grpc": GRPCClient}
+SYMBOL_PREFIX = "BENCH"
+
+
+def peak_alloc_mb(fn: Callable[[], object]) -> float:
+    """
+    Peak memory in MB allocated (and traced by ``tracemalloc``) while ``fn()``
+    runs, above what was allocated when it started.
+    """
+    gc.collect()
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = tracemalloc.get_traced_memory()[0]
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    return (peak - start) / (1024 * 1024)
+
+
+def bench_symbols(count: int) -> List[str]:
+    """The symbols holding the benchmark data."""
+    return [f"{SYMBOL_PREFIX}{i}" for i in range(count)]
+
+
+@dataclass
+class SweepResult:
+    """Measurements of one combination of sweep parameters."""
+
+    transport: str
+    rows: int
+    symbols: int
+    concurrency: int
+    latencies: List[float] = field(default_factory=list)
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    peak_alloc_mb: Optional[float] = None
+    errors: int = 0
+
+    @property
+    def name(self) -> str:
+        return "{}/rows={}/symbols={}/concurrency={}".format(
+            self.transport, self.rows, self.symbols, self.concurrency
+        )
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def throughput(self) -> float:
+        """Queries per second over the whole run."""
+        return self.requests / self.wall_time if self.wall_time else 0.0
+
+    def to_dict(self, samples: bool = False) -> dict:
+        """
+        Convert to dictionary for reporting (times in milliseconds), with
+        every query's latency as ``samples_ms`` if ``samples``.
+        """
+        result = {
+            "name": self.name,
+            "transport": self.transport,
+            "rows": self.rows,
+            "symbols": self.symbols,
+            "concurrency": self.concurrency,
+            "requests": self.requests,
+            "errors": self.errors,
+            **latency_summary(self.latencies),
+            "throughput_qps": round(self.throughput, 2),
+            "throughput_rows_per_s": round(self.throughput * self.rows * self.symbols, 2),
+            "cpu_s": round(self.cpu_time, 4),
+            "cpu_ms_per_query": round(
+                self.cpu_time / self.requests * 1000 if self.requests else 0.0, 3
+            ),
+            "peak_alloc_mb": (
+                None if self.peak_alloc_mb is None else round(self.peak_alloc_mb, 2)
+            ),
+        }
+        if samples:
+            result["samples_ms"] = [round(t * 1000, 5) for t in self.latencies]
+        return result
+
+
+def seed(client, symbols: int, rows: int):
+    """Write ``rows`` 1Min bars for each of ``symbols`` benchmark symbols."""
+    data = generate_ohlcv_data(rows)
+    client.write_batch(
+        {f"{symbol}/1Min/OHLCV": data for symbol in bench_symbols(symbols)}
+    )
+
+
+def cleanup(client, symbols: int):
+    """Destroy the buckets written by ``seed()``."""
+    for symbol in bench_symbols(symbols):
+        try:
+            client.destroy(f"{symbol}/1Min/OHLCV")
+        except Exception:
+            pass  # Ignore errors during cleanup
+
+
+@contextmanager
+def bench_data(endpoints: Optional[Dict[str, str]], symbols: int, rows: int):
+    """
+    Seed benchmark data for the duration of the block, yielding the
+    ``{transport: endpoint}`` to query.
+
+    Args:
+        endpoints: ``{transport: endpoint}`` of a live server, whose benchmark
+            buckets are destroyed on exit; None to start an in-process
+            ``FakeServer``
+        symbols: Number of benchmark symbols
+        rows: Rows per symbol
+    """
+    if endpoints is None:
+        with FakeServer() as server:
+            endpoints = {"jsonrpc": server.jsonrpc_endpoint, "grpc": server.grpc_endpoint}
+            seed(JsonRpcClient(endpoints["jsonrpc"]), symbols, rows)
+            yield endpoints
+        return
+
+    transport = next(t for t in ("jsonrpc", "grpc") if t in endpoints)
+    seeder = TRANSPORTS[transport](endpoints[transport])
+    try:
+        seed(seeder, symbols, rows)
+        yield endpoints
+    finally:
+        cleanup(seeder, symbols)
+
+
+def run_point(
+    make_client: Callable[[], object],
+    transport: str,
+    rows: int,
+    symbols: int,
+    concurrency: int,
+    iterations: int = 20,
+    warmup: int = 2,
+) -> SweepResult:
+    """
+    Time ``iterations`` queries of ``rows`` bars of ``symbols`` symbols on
+    each of ``concurrency`` threads, every thread with its own client.
+
+    CPU time is that of the querying threads only (encoding, decoding and
+    the Python side of the transport), so an in-process server does not
+    count against the client.  Peak memory is measured afterwards, in an
+    untimed round of one query per client (``tracemalloc`` would slow the
+    timed ones down); it includes an in-process server's allocations.
+    """
+    result = SweepResult(transport, rows, symbols, concurrency)
+    params = Params(
+        bench_symbols(symbols), "1Min", "OHLCV", limit=rows, limit_from_start=True
+    )
+    clients = [make_client() for _ in range(concurrency)]
+    for client in clients:
+        for _ in range(warmup):
+            client.query(params)
+
+    lock = threading.Lock()
+    barrier = threading.Barrier(concurrency + 1)
+
+    def worker(client):
+        latencies, errors = [], 0
+        barrier.wait()
+        cpu = time.thread_time()
+        for _ in range(iterations):
+            started = time.perf_counter()
+            try:
+                client.query(params)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+        cpu = time.thread_time() - cpu
+        with lock:
+            result.latencies.extend(latencies)
+            result.cpu_time += cpu
+            result.errors += errors
+
+    threads = [threading.Thread(target=worker, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    result.wall_time = time.perf_counter() - started
+
+    def query_all():
+        threads = [
+            threading.Thread(target=client.query, args=(params,)) for client in clients
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    result.peak_alloc_mb = peak_alloc_mb(query_all)
+    return result
+
+
+def run_sweep(
+    rows: Sequence[int] = (1_000, 100_000),
+    symbols: Sequence[int] = (1, 10),
+    concurrency: Sequence[int] = (1, 4),
+    transports: Sequence[str] = ("jsonrpc", "grpc"),
+    iterations: int = 20,
+    warmup: int = 2,
+    endpoints: Optional[Dict[str, str]] = None,
+    progress: Optional[Callable[[SweepResult], None]] = None,
+    samples: bool = False,
+) -> dict:
+    """
+    Run every combination of the sweep parameters.
+
+    Args:
+        rows: Rows per symbol per query
+        symbols: Symbols per query
+        concurrency: Threads querying at the same time
+        transports: Any of "jsonrpc" and "grpc"
+        iterations: Timed queries per thread and combination
+        warmup: Untimed queries per client before timing
+        endpoints: ``{transport: endpoint}`` of a live server (the benchmark
+            data is written to it, then destroyed); None for an in-process
+            ``FakeServer``
+        progress: Called with each ``SweepResult`` as it completes
+        samples: Include every query's latency (``samples_ms``) in the results
+
+    Returns:
+        ``{"meta": {...}, "results": [SweepResult.to_dict(), ...]}``
+    """
+    unknown = set(transports) - set(TRANSPORTS)
+    if unknown:
+        raise ValueError(
+            "unknown transport(s) {}, expected {}".format(
+                sorted(unknown), list(TRANSPORTS)
+            )
+        )
+
+    target = "inproc" if endpoints is None else endpoints
+    results = []
+    with bench_data(endpoints, max(symbols), max(rows)) as endpoints:
+        for name, n_rows, n_symbols, n_threads in product(
+            transports, rows, symbols, concurrency
+        ):
+            endpoint = endpoints[name]
+            result = run_point(
+                lambda: TRANSPORTS[name](endpoint),
+                name,
+                n_rows,
+                n_symbols,
+                n_threads,
+                iterations=iterations,
+                warmup=warmup,
+            )
+            results.append(result)
+            if progress is not None:
+                progress(result)
+
+    return {
+        "meta": report_meta(
+            target=target,
+            iterations=iterations,
+            warmup=warmup,
+        ),
+        "results": [result.to_dict(samples) for result in results],
+    }
+
+
+def print_report(report: Dict):
+    """Print the tables of a sweep report (results, hot paths, comparisons)."""
+    tables = [
+        (
+            report.get("results"),
+            [
+                "transport",
+                "rows",
+                "symbols",
+                "concurrency",
+                "p50_ms",
+                "p95_ms",
+                "p99_ms",
+                "throughput_qps",
+                "cpu_ms_per_query",
+                "peak_alloc_mb",
+            ],
+        ),
+        (
+            report.get("hot_paths"),
+            ["name", "rows", "p50_ms", "p95_ms", "p99_ms", "rows_per_s"],
+        ),
+        (
+            report.get("comparisons"),
+            ["name", "baseline_ms", "current_ms", "change", "p_value", "regressed"],
+        ),
+    ]
+    first = True
+    for results, columns in tables:
+        if not results:
+            continue
+        if not first:
+            print()
+        first = False
+        print(
+            tabulate(
+                [[r[c] for c in columns] for r in results],
+                headers=columns,
+                tablefmt="simple",
+            )
+        )
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark client queries across sizes, symbols, threads "
+        "and transports",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Every combination of --rows, --symbols, --concurrency and --transport is
+timed.  By default queries go to an in-process stand-in server; with --live,
+benchmark data (BENCH* symbols) is written to the server and destroyed
+afterwards.  --suite hot-paths times decoding and encoding functions on the
+largest --rows instead.
+
+With --history, runs are recorded, and --check compares the run with the
+previous ones on the same machine: a benchmark regresses if it is slower by
+more than --threshold with Mann-Whitney U significance --alpha.
+
+Examples:
+  python -m benchmarks.sweep
+  python -m benchmarks.sweep --rows 100,10000,1000000 --symbols 1 -c 1,2,4,8
+  python -m benchmarks.sweep --live -t grpc -f json -o bench.json
+  python -m benchmarks.sweep --suite hot-paths --history bench.jsonl --check \\
+      --gate 'results.*'
+        """,
+    )
+    parser.add_argument(
+        "--live",
+        action="store_true",
+        help="Benchmark the server at --host instead of an in-process stand-in",
+    )
+    parser.add_argument(
+        "--transport",
+        "-t",
+        dest="transports",
+        choices=list(TRANSPORTS),
+        action="append",
+        help="Transport to benchmark (repeatable; default: all)",
+    )
+    parser.add_argument(
+        "--rows",
+        type=int_list,
+        default=[1_000, 100_000],
+        help="Rows per symbol per query (comma-separated; default: 1000,100000)",
+    )
+    parser.add_argument(
+        "--symbols",
+        type=int_list,
+        default=[1, 10],
+        help="Symbols per query (comma-separated; default: 1,10)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        "-c",
+        type=int_list,
+        default=[1, 4],
+        help="Concurrent querying threads (comma-separated; default: 1,4)",
+    )
+    parser.add_argument(
+        "--iterations",
+        "-n",
+        type=int,
+        default=20,
+        help="Timed queries per thread and combination (default: 20)",
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=2, help="Untimed queries per client (default: 2)"
+    )
+    parser.add_argument(
+        "--format",
+        "-f",
+        dest="output_format",
+        choices=["table", "json"],
+        default="table",
+        help="Output format",
+    )
+    parser.add_argument("--output", "-o", help="Also write the JSON report to this file")
+    parser.add_argument(
+        "--suite",
+        choices=["sweep", "hot-paths", "all"],
+        default="sweep",
+        help="Query sweep, hot-path micro-benchmarks (eg results.decode) or both",
+    )
+    parser.add_argument(
+        "--history",
+        help="Append the run (with machine info and git revision) to this "
+        "JSON-lines file",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Exit with status 1 if the run is slower than the baseline runs in "
+        "--history",
+    )
+    parser.add_argument(
+        "--baseline", help="Compare only with runs of this git revision (default: any)"
+    )
+    parser.add_argument(
+        "--baseline-runs",
+        type=int,
+        default=5,
+        help="Number of most recent runs (on this machine) in the baseline",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Slowdown of the median counted as a regression (default: 0.10)",
+    )
+    parser.add_argument(
+        "--alpha",
+        type=float,
+        default=0.01,
+        help="Significance level of the Mann-Whitney U test (default: 0.01)",
+    )
+    parser.add_argument(
+        "--gate",
+        action="append",
+        help="Benchmarks (names or patterns, eg 'results.*') that fail --check "
+        "(repeatable; default: all)",
+    )
+    parser.add_argument(
+        "--host", default="localhost", help="MarketStore server host (with --live)"
+    )
+    parser.add_argument(
+        "--port", type=int, default=5993, help="MarketStore JSON-RPC port (with --live)"
+    )
+    parser.add_argument(
+        "--grpc-port", type=int, default=5995, help="MarketStore gRPC port (with --live)"
+    )
+    args = parser.parse_args(argv)
+    if args.check and not args.history:
+        parser.error("--check needs --history")
+
+    endpoints = None
+    if args.live:
+        endpoints = {
+            "jsonrpc": f"http://{args.host}:{args.port}/rpc",
+            "grpc": f"{args.host}:{args.grpc_port}",
+        }
+
+    def progress(result):
+        print(
+            "{}: p50 {:.2f} ms".format(result.name, result.to_dict()["p50_ms"]),
+            file=sys.stderr,
+        )
+
+    # per-call samples are only needed to compare runs
+    samples = args.history is not None
+    try:
+        if args.suite == "hot-paths":
+            report = {
+                "meta": report_meta(iterations=args.iterations, warmup=args.warmup),
+                "results": [],
+            }
+        else:
+            report = run_sweep(
+                rows=args.rows,
+                symbols=args.symbols,
+                concurrency=args.concurrency,
+                transports=args.transports or list(TRANSPORTS),
+                iterations=args.iterations,
+                warmup=args.warmup,
+                endpoints=endpoints,
+                progress=progress,
+                samples=samples,
+            )
+        if args.suite != "sweep":
+            report["hot_paths"] = run_hot_paths(
+                rows=max(args.rows),
+                iterations=args.iterations,
+                warmup=args.warmup,
+                samples=samples,
+            )
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    comparisons = []
+    if args.history:
+        store = History(args.history)
+        if args.check:
+            comparisons = compare(
+                store.baseline(report, runs=args.baseline_runs, revision=args.baseline),
+                report,
+                threshold=args.threshold,
+                alpha=args.alpha,
+                gate=args.gate,
+            )
+            report["comparisons"] = [c.to_dict() for c in comparisons]
+        store.record(report)
+        report = without_samples(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.output_format == "json":
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    if args.check:
+        regressed = [c for c in comparisons if c.regressed]
+        if not comparisons:
+            print("No baseline runs to compare with", file=sys.stderr)
+        for c in regressed:
+            print(
+                "Regression: {} {:.3f} ms -> {:.3f} ms ({:+.1%}, p={:.2g})".format(
+                    c.name, c.baseline_ms, c.current_ms, c.change, c.p_value
+                ),
+                file=sys.stderr,
+            )
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,16 @@
 Utility functions for benchmarking pymarketstore clients.
 """
 
+import argparse
 import gc
+import math
 import statistics
 import time
 import tracemalloc
 
 from contextlib import contextmanager
 from dataclasses import dataclass, field
-from typing import Callable, List, Optional
+from typing import Callable, List, Optional, Sequence
 
 import numpy as np
 import pandas as pd
@@ -287,6 +289,36 @@ def run_benchmark(
     return result
 
 
+def int_list(value: str) -> List[int]:
+    """argparse type of comma-separated integers, eg ``"1,2,4,8"``."""
+    try:
+        return [int(v) for v in value.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"expected comma-separated integers, got {value!r}"
+        )
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """The ``q``-th percentile (0-100) of ``values``, linearly interpolated."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    lo, hi = math.floor(rank), math.ceil(rank)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (rank - lo)
+
+
+def latency_summary(samples: Sequence[float]) -> dict:
+    """p50/p95/p99 and mean of ``samples`` (seconds), in milliseconds."""
+    return {
+        "p50_ms": round(percentile(samples, 50) * 1000, 4),
+        "p95_ms": round(percentile(samples, 95) * 1000, 4),
+        "p99_ms": round(percentile(samples, 99) * 1000, 4),
+        "mean_ms": round(sum(samples) / len(samples) * 1000 if samples else 0.0, 4),
+    }
+
+
 def print_results_table(results: List[BenchmarkResult], title: str = "Benchmark Results"):
     """Print benchmark results in a formatted table."""
     print(f"\n{'=' * 80}")
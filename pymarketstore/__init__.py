@@ -1,11 +1,21 @@
+from .aggregator import BarAggregator
 from .async_stream import AsyncStreamConn
+from .cache import ResultCache
+from .catalog import Catalog
 from .client import Client
+from .decoder import Bar, StreamDecoder
 from .enums import Freq
 from .grpc_client import GRPCClient
+from .hub import StreamHub, Subscription
+from .instrumentation import LoggingSink, MetricsSink, OpenTelemetrySink, QueryProfile
 from .jsonrpc_client import JsonRpcClient
+from .local_store import LocalClient, LocalStore
 from .params import DataShape, DataType, ListSymbolsFormat, Params
+from .reconnect import ReconnectPolicy
+from .relay import RingReader, StreamRelay
 from .store import Store
 from .stream import StreamConn
+from .tiered import TieredClient
 
 
 __version__ = "0.18"
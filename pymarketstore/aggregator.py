@@ -0,0 +1,253 @@
+"""
+Live aggregation of streamed bars into coarser timeframes.
+
+A ``BarAggregator`` consumes fine bars (eg from a ``*/1Min/OHLCV``
+subscription) and incrementally rolls them up into any number of coarser
+``Freq`` timeframes, emitting each higher-timeframe bar to registered handlers
+as soon as it is complete.  One stream subscription can thereby feed every
+timeframe a process needs.
+
+The running state of all symbols and target timeframes is kept in NumPy arrays
+of shape ``(n_freqs, n_symbols)``, so each incoming bar updates every target
+timeframe of its symbol with a handful of vectorized operations.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+
+from collections.abc import Callable, Iterable
+from typing import Any
+
+import numpy as np
+
+from .enums import Freq
+
+
+logger = logging.getLogger(__name__)
+
+_NO_BUCKET = np.iinfo("i8").min
+
+
+class BarAggregator:
+    """
+    Roll streamed bars up into coarser timeframes.
+
+    Parameters
+    ----------
+    freqs : iterable of Freq, default (5Min, 15Min, 1H, 1D)
+        Target timeframes.  Must have a fixed duration (``Freq.seconds``), be
+        a multiple of ``source`` and be coarser than it.
+    source : Freq, default Freq.min_1
+        Timeframe of the incoming bars.  Bars are expected to be labelled with
+        the epoch at which they start, as MarketStore does.
+    attrgroup : str, default "OHLCV"
+        Attribute group of the incoming (and emitted) stream keys.
+
+    Handlers are registered with ``register()`` / ``on()`` exactly like on the
+    stream connections, and are called as ``handler(key, data)`` with a key
+    such as ``"AAPL/5Min/OHLCV"`` and a dict with ``Epoch``, ``Open``,
+    ``High``, ``Low``, ``Close`` and ``Volume``.
+    """
+
+    def __init__(
+        self,
+        freqs: Iterable[Freq] = (Freq.min_5, Freq.min_15, Freq.hour, Freq.day),
+        source: Freq = Freq.min_1,
+        attrgroup: str = "OHLCV",
+    ) -> None:
+        self.source = Freq[source]
+        self.freqs = sorted({Freq[freq] for freq in freqs})
+        self.attrgroup = attrgroup
+        if self.source.seconds is None:
+            raise ValueError(f"unsupported source timeframe {self.source.value}")
+        for freq in self.freqs:
+            if (
+                freq.seconds is None
+                or freq <= self.source
+                or freq.seconds % self.source.seconds
+            ):
+                raise ValueError(
+                    f"cannot aggregate {self.source.value} bars into {freq.value} bars"
+                )
+
+        self._source_seconds = self.source.seconds
+        self._seconds = np.array([freq.seconds for freq in self.freqs], dtype="i8")
+        self._emit_keys: list[list[str]] = []
+        self._slots: dict[str, int] = {}
+        self._symbols: list[str] = []
+
+        self._handlers: dict[re.Pattern, Callable] = {}
+        self._handlers_by_key: dict[str, list[Callable]] = {}
+
+        self._allocate(64)
+
+    def _allocate(self, capacity: int) -> None:
+        shape = (len(self.freqs), capacity)
+        old = getattr(self, "_bucket", None)
+        n = 0 if old is None else old.shape[1]
+
+        # start epoch of the latest bucket seen, and whether it is still pending
+        bucket = np.full(shape, _NO_BUCKET, dtype="i8")
+        active = np.zeros(shape, dtype=bool)
+        prices = np.zeros((4,) + shape, dtype="f8")  # open, high, low, close
+        volume = np.zeros(shape, dtype="f8")
+        if old is not None:
+            bucket[:, :n] = self._bucket
+            active[:, :n] = self._active
+            prices[:, :, :n] = self._prices
+            volume[:, :n] = self._volume
+        self._bucket, self._active = bucket, active
+        self._prices, self._volume = prices, volume
+
+    def _slot(self, symbol: str) -> int:
+        try:
+            return self._slots[symbol]
+        except KeyError:
+            slot = self._slots[symbol] = len(self._symbols)
+            self._symbols.append(symbol)
+            self._emit_keys.append(
+                [f"{symbol}/{freq.value}/{self.attrgroup}" for freq in self.freqs]
+            )
+            if slot >= self._bucket.shape[1]:
+                self._allocate(2 * self._bucket.shape[1])
+            return slot
+
+    @property
+    def symbols(self) -> list[str]:
+        return list(self._symbols)
+
+    def on(self, stream_pat: str) -> Callable:
+        """Decorator to register a handler for aggregated bars matching a regex."""
+
+        def decorator(func: Callable) -> Callable:
+            self.register(stream_pat, func)
+            return func
+
+        return decorator
+
+    def register(self, stream_pat: str | re.Pattern, func: Callable) -> None:
+        """Register ``func(key, data)`` for aggregated bars whose key matches."""
+        if isinstance(stream_pat, str):
+            stream_pat = re.compile(stream_pat)
+        self._handlers[stream_pat] = func
+        self._handlers_by_key.clear()
+
+    def deregister(self, stream_pat: str | re.Pattern) -> None:
+        """Remove a previously registered handler."""
+        if isinstance(stream_pat, str):
+            stream_pat = re.compile(stream_pat)
+        self._handlers.pop(stream_pat, None)
+        self._handlers_by_key.clear()
+
+    def attach(self, conn: Any) -> None:
+        """
+        Feed the aggregator from a ``StreamConn``, ``AsyncStreamConn`` or
+        ``StreamHub`` subscription's connection.
+        """
+        from .stream import StreamConn
+
+        pattern = r"^[^/]+/{}/{}$".format(
+            re.escape(self.source.value),
+            re.escape(self.attrgroup),
+        )
+        if isinstance(conn, StreamConn):
+            conn.register(pattern, lambda _, msg: self.update(msg["key"], msg["data"]))
+        else:
+            conn.register(pattern, self.update)
+
+    def update(self, key: str, data: Any) -> None:
+        """Add one source bar; ``key`` is eg ``"AAPL/1Min/OHLCV"``."""
+        symbol = key.split("/", 1)[0]
+        epoch = int(data["Epoch"])
+        open_, high, low, close = (
+            data["Open"],
+            data["High"],
+            data["Low"],
+            data["Close"],
+        )
+        volume = data.get("Volume", 0.0)
+
+        j = self._slot(symbol)
+        seconds = self._seconds
+        bucket = self._bucket[:, j]
+        active = self._active[:, j]
+        prices = self._prices[:, :, j]
+        volumes = self._volume[:, j]
+        buckets = epoch - epoch % seconds
+
+        started = buckets > bucket
+        current = (buckets == bucket) & active
+        if not (started.any() or current.any()):
+            logger.debug("Ignoring late or duplicate bar for %s at %d", key, epoch)
+            return
+
+        # a bar for a later bucket arrived before the current one was complete
+        # (eg the symbol did not trade in its last minute): emit it as it is
+        if (started & active).any():
+            self._emit(j, started & active)
+
+        bucket[started] = buckets[started]
+        active |= started
+        prices[0, started] = open_
+        prices[1, started] = high
+        prices[2, started] = low
+        prices[3, started] = close
+        volumes[started] = volume
+
+        np.maximum(prices[1], high, out=prices[1], where=current)
+        np.minimum(prices[2], low, out=prices[2], where=current)
+        prices[3, current] = close
+        volumes[current] += volume
+
+        # the last source bar of a bucket completes it
+        complete = active & (epoch + self._source_seconds >= bucket + seconds)
+        if complete.any():
+            self._emit(j, complete)
+
+    def flush(self, until: int | None = None) -> None:
+        """
+        Emit pending bars whose period has ended by epoch ``until`` (or all
+        pending bars), eg on a timer or when the stream closes.
+        """
+        pending = self._active[:, : len(self._symbols)].copy()
+        if until is not None:
+            ends = self._bucket[:, : len(self._symbols)] + self._seconds[:, None]
+            pending &= ends <= until
+        for j in np.flatnonzero(pending.any(axis=0)):
+            self._emit(j, pending[:, j])
+
+    def _emit(self, j: int, mask: np.ndarray) -> None:
+        for i in np.flatnonzero(mask):
+            prices = self._prices[:, i, j]
+            data = {
+                "Epoch": int(self._bucket[i, j]),
+                "Open": float(prices[0]),
+                "High": float(prices[1]),
+                "Low": float(prices[2]),
+                "Close": float(prices[3]),
+                "Volume": float(self._volume[i, j]),
+            }
+            self._active[i, j] = False
+            self._dispatch(self._emit_keys[j][i], data)
+
+    def _dispatch(self, key: str, data: dict) -> None:
+        try:
+            handlers = self._handlers_by_key[key]
+        except KeyError:
+            handlers = self._handlers_by_key[key] = [
+                handler for pat, handler in self._handlers.items() if pat.match(key)
+            ]
+        for handler in handlers:
+            try:
+                handler(key, data)
+            except Exception:
+                logger.exception("Error in aggregated bar handler for key '%s'", key)
+
+    def __repr__(self) -> str:
+        return "BarAggregator(source={}, freqs=[{}], symbols={})".format(
+            self.source.value,
+            ", ".join(freq.value for freq in self.freqs),
+            len(self._symbols),
+        )
@@ -16,6 +16,9 @@ from typing import Any
 
 import msgpack
 
+from .decoder import StreamDecoder
+from .reconnect import ReconnectPolicy
+
 
 try:
     import websockets
@@ -42,12 +45,20 @@ class AsyncStreamConn:
     endpoint : str
         The WebSocket endpoint URL (e.g., ``"ws://localhost:5993/ws"``).
     reconnect_delay : float, default 3.0
-        Seconds to wait before attempting reconnection after a disconnect.
+        Base backoff delay (in seconds) of the default reconnect policy.
+        Ignored if ``reconnect_policy`` is given.
     max_subscription_retries : int, default 3
         Maximum number of consecutive subscription rejections (server-side
         ``"error"`` responses) before the error is re-raised and ``run()``
         exits.  Network-level disconnects are not counted against this limit
         and will always trigger a reconnect attempt.
+    reconnect_policy : ReconnectPolicy, optional
+        Backoff policy used between reconnection attempts.  Defaults to
+        exponential backoff with jitter starting at ``reconnect_delay``, with
+        an immediate first retry.
+    decoder : StreamDecoder, optional
+        Decoder for incoming messages; pass ``StreamDecoder(bars=True)`` to
+        receive OHLCV payloads as ``Bar`` objects instead of dicts.
 
     """
 
@@ -56,11 +67,19 @@ class AsyncStreamConn:
         endpoint: str,
         reconnect_delay: float = 3.0,
         max_subscription_retries: int = 3,
+        reconnect_policy: ReconnectPolicy | None = None,
+        decoder: StreamDecoder | None = None,
     ) -> None:
         self.endpoint = endpoint
         self.reconnect_delay = reconnect_delay
         self.max_subscription_retries = max_subscription_retries
+        self.reconnect_policy = reconnect_policy or ReconnectPolicy(
+            base_delay=reconnect_delay,
+            max_delay=max(60.0, reconnect_delay),
+        )
+        self.decoder = decoder or StreamDecoder()
         self._handlers: dict[re.Pattern, Callable] = {}
+        self._handlers_by_key: dict[str, list[Callable]] = {}
         self._ws: Any | None = None
         self._running = False
         self._streams: list[str] = []
@@ -100,19 +119,22 @@ class AsyncStreamConn:
         if isinstance(stream_pat, str):
             stream_pat = re.compile(stream_pat)
         self._handlers[stream_pat] = func
+        self._handlers_by_key.clear()
 
     def deregister(self, stream_pat: str | re.Pattern) -> None:
         """Remove a previously registered handler."""
         if isinstance(stream_pat, str):
             stream_pat = re.compile(stream_pat)
         self._handlers.pop(stream_pat, None)
+        self._handlers_by_key.clear()
 
     async def run(self, streams: list[str]) -> None:
         """
         Connect, subscribe, and receive messages in a loop.
 
         This coroutine runs until ``stop()`` is called or the task is cancelled.
-        It will automatically reconnect on connection loss.
+        It will automatically reconnect on connection loss, waiting between
+        attempts as dictated by ``reconnect_policy``.
 
         Parameters
         ----------
@@ -124,6 +146,7 @@ class AsyncStreamConn:
         self._streams = streams
         self._running = True
         self._subscription_failures = 0
+        self.reconnect_policy.reset()
 
         while self._running:
             try:
@@ -142,24 +165,33 @@ class AsyncStreamConn:
                         self._subscription_failures,
                     )
                     raise
+                delay = self.reconnect_policy.next_delay()
                 logger.warning(
                     "MarketStore subscription rejected (attempt %d/%d). "
                     "Retrying in %.1f seconds...",
                     self._subscription_failures,
                     self.max_subscription_retries,
-                    self.reconnect_delay,
+                    delay,
                 )
-                await asyncio.sleep(self.reconnect_delay)
+                await asyncio.sleep(delay)
             except Exception as e:
                 if not self._running:
                     break
+                delay = self.reconnect_policy.next_delay()
+                if self.reconnect_policy.exhausted:
+                    logger.error(
+                        "MarketStore WebSocket disconnected %d consecutive time(s). "
+                        "Giving up.",
+                        self.reconnect_policy.failures,
+                    )
+                    raise
                 logger.warning(
                     "MarketStore WebSocket disconnected: %s. "
                     "Reconnecting in %.1f seconds...",
                     e,
-                    self.reconnect_delay,
+                    delay,
                 )
-                await asyncio.sleep(self.reconnect_delay)
+                await asyncio.sleep(delay)
 
     async def _connect_and_listen(self) -> None:
         """Establish connection, subscribe, and enter receive loop."""
@@ -179,27 +211,64 @@ class AsyncStreamConn:
                     f"MarketStore subscription error: {confirm['error']}"
                 )
             self._subscription_failures = 0
+            self.reconnect_policy.reset()
             logger.info(
                 "Subscribed to MarketStore streams: %s",
                 confirm.get("streams", self._streams),
             )
 
             # Receive loop
+            decode = self.decoder.decode
             async for raw_msg in ws:
-                msg = msgpack.unpackb(raw_msg, raw=False)
+                msg = decode(raw_msg)
                 key = msg.get("key")
                 if key is not None:
                     data = msg.get("data", {})
                     self._dispatch(key, data)
+                elif "error" in msg:
+                    # rejection of a subscription change sent by update_streams()
+                    logger.error("MarketStore subscription error: %s", msg["error"])
+                elif "streams" in msg:
+                    logger.info("Subscribed to MarketStore streams: %s", msg["streams"])
+
+    async def update_streams(self, streams: list[str]) -> None:
+        """
+        Change the subscribed stream patterns without reconnecting.
+
+        If connected, the new subscription is sent over the open WebSocket
+        (MarketStore replaces the previous subscription); otherwise it is used
+        on the next (re)connect.
+
+        Parameters
+        ----------
+        streams : list[str]
+            The complete list of stream patterns to subscribe to.
+
+        """
+        self._streams = list(streams)
+        ws = self._ws
+        if ws is None:
+            return
+        try:
+            await ws.send(msgpack.packb({"streams": self._streams}))
+        except Exception as e:
+            # the receive loop will notice the broken connection and the
+            # reconnect will subscribe with the updated streams
+            logger.warning("Could not update MarketStore subscription: %s", e)
 
     def _dispatch(self, key: str, data: dict) -> None:
         """Dispatch a received message to all matching handlers."""
-        for pat, handler in self._handlers.items():
-            if pat.match(key):
-                try:
-                    handler(key, data)
-                except Exception:
-                    logger.exception("Error in stream handler for key '%s'", key)
+        try:
+            handlers = self._handlers_by_key[key]
+        except KeyError:
+            handlers = self._handlers_by_key[key] = [
+                handler for pat, handler in self._handlers.items() if pat.match(key)
+            ]
+        for handler in handlers:
+            try:
+                handler(key, data)
+            except Exception:
+                logger.exception("Error in stream handler for key '%s'", key)
 
     async def stop(self) -> None:
         """Stop the streaming connection."""
@@ -0,0 +1,164 @@
+"""
+In-process caching of query results.
+
+``ResultCache`` is a memory-bounded LRU cache of decoded query results, keyed
+on ``Params.cache_key()`` (the normalized query request plus filter).  Entry
+sizes are accounted with the ``nbytes`` of their decoded arrays.  Results of
+windows that are still open (no end, or an end in the future) can change as
+new data is written, so they expire after a TTL; closed windows are kept until
+they are evicted.
+
+Pass one to ``Client(cache=...)``::
+
+    client = pymkts.Client(cache=ResultCache(max_bytes=512 * 2**20, ttl=30))
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+import pandas as pd
+
+from .filters import pushdown_window
+from .params import Params
+from .results import QueryResult
+
+
+def touches_now(params: Params, now: pd.Timestamp | None = None) -> bool:
+    """
+    Whether the window of ``params`` (including ``Epoch`` bounds of its
+    filter) is still open at ``now``.
+    """
+    end = None if params.end is None else params.end.value
+    if params.filter is not None:
+        _, end = pushdown_window(params.filter, None, end)
+    if end is None:
+        return True
+    now = time.time_ns() if now is None else pd.Timestamp(now).value
+    return end >= now
+
+
+class _Entry:
+    __slots__ = ("result", "timezone", "nbytes", "expires")
+
+    def __init__(self, result, timezone, nbytes, expires):
+        self.result = result
+        self.timezone = timezone
+        self.nbytes = nbytes
+        self.expires = expires
+
+
+class ResultCache:
+    """
+    A thread-safe LRU cache of query results bounded by their size in bytes.
+
+    Parameters
+    ----------
+    max_bytes : int, default 256 MiB
+        Upper bound of the summed ``nbytes`` of all cached arrays.  Results
+        larger than this are not cached.
+    ttl : float, default 60.0
+        Seconds after which results of open windows (see ``touches_now()``)
+        expire.  ``0`` disables caching them.
+    clock : callable, default time.monotonic
+        Time source for the TTL.
+
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 256 * 2**20,
+        ttl: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Any, _Entry] = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, params: Params) -> tuple[QueryResult, str] | None:
+        """Return the cached ``(result, timezone)`` for ``params``, or ``None``."""
+        key = params.cache_key()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires is not None:
+                if self.clock() >= entry.expires:
+                    self._remove(key)
+                    self.expirations += 1
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.result, entry.timezone
+
+    def put(self, params: Params, result: QueryResult, timezone: str) -> bool:
+        """
+        Cache the ``result`` of ``params``; its arrays should not be mutated
+        afterwards (``QueryReply.readonly()``).  Returns whether it was cached.
+        """
+        expires = None
+        if touches_now(params):
+            if not self.ttl:
+                return False
+            expires = self.clock() + self.ttl
+
+        nbytes = sum(ds.array.nbytes for ds in result.all().values())
+        if nbytes > self.max_bytes:
+            return False
+
+        key = params.cache_key()
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(result, timezone, nbytes, expires)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def _remove(self, key: Any) -> None:
+        self.nbytes -= self._entries.pop(key).nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        """Hit/miss counters and the current size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "entries": len(self._entries),
+            "nbytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return "ResultCache(entries={}, nbytes={}, hits={}, misses={})".format(
+            len(self._entries),
+            self.nbytes,
+            self.hits,
+            self.misses,
+        )
@@ -0,0 +1,511 @@
+"""
+Discovery of what a MarketStore server holds.
+
+``discover_ranges()`` finds the first and last epoch of many bucket keys at
+once.  Keys of the same timeframe and attribute group are queried in batches:
+each batch is one request carrying two multi-symbol ``limit=1`` queries, one
+from each end, and batches run concurrently on a bounded thread pool.  Listing
+thousands of buckets therefore takes a few dozen round trips instead of two per
+bucket.
+
+``Catalog`` keeps the result, together with each bucket's columns, in a JSON
+file and refreshes it incrementally: new buckets are discovered, vanished ones
+dropped, and known ones only have their last epoch re-read once it is older
+than a TTL.  Coverage questions ("which symbols have 1Min bars", "since
+when") are then answered without reading any data.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any
+
+import pandas as pd
+
+from .enums import Freq
+from .params import ListSymbolsFormat, Params
+from .utils import get_timestamp
+
+
+# seconds per timeframe unit; months and years are averages
+_UNIT_SECONDS = {
+    "Sec": 1,
+    "Min": 60,
+    "H": 3600,
+    "D": 86400,
+    "W": 7 * 86400,
+    "M": 2629746,
+    "Y": 31556952,
+}
+_TIMEFRAME = re.compile(r"^(\d*)(Sec|Min|H|D|W|M|Y)$")
+
+
+def _timeframe_seconds(timeframe: str) -> int | None:
+    m = _TIMEFRAME.match(timeframe)
+    if m is None:
+        return None
+    return int(m.group(1) or 1) * _UNIT_SECONDS[m.group(2)]
+
+
+class TbkInfo:
+    """
+    What the catalog knows about one bucket key.
+
+    ``first`` and ``last`` are epoch seconds of the first and last rows (both
+    ``None`` when the bucket is empty), ``columns`` is its data shape as
+    ``[(name, numpy type), ...]`` and ``checked`` the time (epoch seconds) it
+    was last read from the server.
+    """
+
+    __slots__ = ("tbk", "first", "last", "columns", "checked")
+
+    def __init__(
+        self,
+        tbk: str,
+        first: int | None = None,
+        last: int | None = None,
+        columns: list[tuple[str, str]] | None = None,
+        checked: float = 0.0,
+    ) -> None:
+        self.tbk = tbk
+        self.first = first
+        self.last = last
+        self.columns = columns or []
+        self.checked = checked
+
+    @property
+    def symbol(self) -> str:
+        return self.tbk.split("/")[0]
+
+    @property
+    def timeframe(self) -> str:
+        return self.tbk.split("/")[1]
+
+    @property
+    def attribute_group(self) -> str:
+        return self.tbk.split("/")[2]
+
+    @property
+    def max_rows(self) -> int | None:
+        """
+        Number of bars between ``first`` and ``last`` (inclusive).
+
+        This is an upper bound on the row count, not an estimate: the catalog
+        only reads both ends of a bucket, and market closures and other gaps
+        can make the actual count far lower.
+        """
+        seconds = _timeframe_seconds(self.timeframe)
+        if self.first is None or seconds is None:
+            return None
+        return (self.last - self.first) // seconds + 1
+
+    def covers(self, start: int | None = None, end: int | None = None) -> bool:
+        """Whether the bucket's range overlaps ``[start, end]`` (epoch seconds)."""
+        if self.first is None:
+            return False
+        return (start is None or self.last >= start) and (
+            end is None or self.first <= end
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "first": self.first,
+            "last": self.last,
+            "columns": [list(c) for c in self.columns],
+            "checked": self.checked,
+        }
+
+    @classmethod
+    def from_dict(cls, tbk: str, d: dict) -> TbkInfo:
+        return cls(
+            tbk,
+            d.get("first"),
+            d.get("last"),
+            [tuple(c) for c in d.get("columns", [])],
+            d.get("checked", 0.0),
+        )
+
+    def __repr__(self) -> str:
+        return "TbkInfo(tbk={}, first={}, last={}, columns={})".format(
+            self.tbk,
+            self.first,
+            self.last,
+            len(self.columns),
+        )
+
+
+def _batches(tbks: Iterable[str], batch_size: int) -> list[list[str]]:
+    groups: dict[tuple[str, str], list[str]] = {}
+    for tbk in tbks:
+        _, timeframe, attrgroup = tbk.split("/")
+        groups.setdefault((timeframe, attrgroup), []).append(tbk)
+    return [
+        keys[i : i + batch_size]
+        for keys in groups.values()
+        for i in range(0, len(keys), batch_size)
+    ]
+
+
+def _query_range(client: Any, tbks: list[str], first: bool) -> dict[str, tuple]:
+    _, timeframe, attrgroup = tbks[0].split("/")
+    symbols = [tbk.split("/")[0] for tbk in tbks]
+    params = [Params(symbols, timeframe, attrgroup, limit=1, limit_from_start=False)]
+    if first:
+        params.insert(
+            0, Params(symbols, timeframe, attrgroup, limit=1, limit_from_start=True)
+        )
+    try:
+        reply = client.query(params)
+    except Exception as e:
+        if "no results returned from query" in str(e):
+            return {}
+        raise
+
+    firsts, lasts = reply.results[0].all(), reply.results[-1].all()
+    ranges = {}
+    for key, ds in lasts.items():
+        if not len(ds.array):
+            continue
+        if first and (key not in firsts or not len(firsts[key].array)):
+            continue
+        columns = [(name, ds.array.dtype[name].str) for name in ds.array.dtype.names]
+        ranges[key] = (
+            int(firsts[key].array["Epoch"][0]) if first else None,
+            int(ds.array["Epoch"][-1]),
+            columns,
+            reply.timezone,
+        )
+    return ranges
+
+
+def _discover_batch(client: Any, tbks: list[str], first: bool) -> dict[str, tuple]:
+    try:
+        return _query_range(client, tbks, first)
+    except Exception:
+        if len(tbks) == 1:
+            return {}
+        # one broken bucket fails the whole request: retry the keys one by one
+        ranges = {}
+        for tbk in tbks:
+            ranges.update(_discover_batch(client, [tbk], first))
+        return ranges
+
+
+def _discover(
+    client: Any,
+    tbks: list[str],
+    batch_size: int,
+    workers: int,
+    progress: Callable[[int], None] | None,
+    first: bool = True,
+) -> dict[str, tuple | None]:
+    found: dict[str, tuple | None] = dict.fromkeys(tbks)
+    batches = _batches(tbks, batch_size)
+    if not batches:
+        return found
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(batches)))) as pool:
+        futures = {
+            pool.submit(_discover_batch, client, batch, first): batch for batch in batches
+        }
+        for future in as_completed(futures):
+            for key, value in future.result().items():
+                if key in found:
+                    found[key] = value
+            if progress is not None:
+                progress(len(futures[future]))
+    return found
+
+
+def discover_ranges(
+    client: Any,
+    tbks: Iterable[str],
+    batch_size: int = 200,
+    workers: int = 8,
+    progress: Callable[[int], None] | None = None,
+) -> dict[str, tuple[int, int] | None]:
+    """
+    Find the first and last epoch (in seconds) of each bucket key.
+
+    Parameters
+    ----------
+    client : Client
+        Any client with ``query()``, eg ``Client`` or ``JsonRpcClient``.
+    tbks : iterable of str
+        Bucket keys, eg from ``client.list_symbols(ListSymbolsFormat.TBK)``.
+    batch_size : int, default 200
+        Maximum number of symbols per request.
+    workers : int, default 8
+        Number of requests run concurrently.
+    progress : callable, optional
+        Called with the number of keys of each finished batch.
+
+    Returns
+    -------
+    dict
+        ``{tbk: (first_epoch, last_epoch)}``, with ``None`` for keys without
+        data (or whose query failed).
+
+    """
+    found = _discover(client, list(tbks), batch_size, workers, progress)
+    return {
+        key: None if value is None else (value[0], value[1])
+        for key, value in found.items()
+    }
+
+
+def default_catalog_path(endpoint: str) -> str:
+    """The per-server catalog file in the user's cache directory."""
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    name = re.sub(r"[^A-Za-z0-9.-]+", "_", endpoint.split("://")[-1]).strip("_")
+    return os.path.join(cache_dir, "pymarketstore", f"catalog-{name}.json")
+
+
+class Catalog:
+    """
+    A cached, incrementally refreshed index of the server's bucket keys.
+
+    Parameters
+    ----------
+    client : Client
+        Any client with ``query()`` and ``list_symbols()``.
+    path : str or os.PathLike, optional
+        JSON file to load the catalog from and save it to.  Without one, the
+        catalog lives in memory only.
+    ttl : float, default 3600.0
+        Seconds after which the catalog is refreshed on use (see
+        ``ensure_fresh()``), and after which the last epoch of a known key is
+        re-read by ``refresh()``.
+    batch_size, workers : int
+        Passed on to the discovery queries (see ``discover_ranges()``).
+    clock : callable, default time.time
+        Time source for the TTL.
+
+    Attributes
+    ----------
+    timezone : str or None
+        The server's timezone, as reported by its query replies (None until
+        a key with data has been read).
+
+    """
+
+    VERSION = 2
+
+    def __init__(
+        self,
+        client: Any,
+        path: str | os.PathLike | None = None,
+        ttl: float = 3600.0,
+        batch_size: int = 200,
+        workers: int = 8,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.client = client
+        self.path = None if path is None else os.fspath(path)
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.workers = workers
+        self.clock = clock
+        self.refreshed = 0.0
+        self.timezone: str | None = None
+        self._infos: dict[str, TbkInfo] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if self.path is None:
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        if data.get("version") != self.VERSION:
+            return
+        self.refreshed = data.get("refreshed", 0.0)
+        self.timezone = data.get("timezone")
+        self._infos = {
+            tbk: TbkInfo.from_dict(tbk, d) for tbk, d in data.get("tbks", {}).items()
+        }
+
+    def save(self) -> None:
+        """Write the catalog to ``path`` (atomically)."""
+        if self.path is None:
+            return
+        data = {
+            "version": self.VERSION,
+            "refreshed": self.refreshed,
+            "timezone": self.timezone,
+            "tbks": {tbk: info.to_dict() for tbk, info in sorted(self._infos.items())},
+        }
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+    @property
+    def stale(self) -> bool:
+        return not self.refreshed or self.clock() - self.refreshed >= self.ttl
+
+    def _plan(
+        self, tbks: list[str], full: bool, now: float
+    ) -> tuple[list[str], list[str]]:
+        # keys to read from both ends, and known keys to re-read the end of
+        new, due = [], []
+        for tbk in tbks:
+            info = self._infos.get(tbk)
+            if full or info is None or not info.checked:
+                new.append(tbk)
+            elif now - info.checked >= self.ttl:
+                (due if info.first is not None else new).append(tbk)
+        return new, due
+
+    def pending(self, tbks: list[str] | None = None, full: bool = False) -> int:
+        """Number of keys that ``refresh()`` would read from the server."""
+        if tbks is None:
+            tbks = self.client.list_symbols(fmt=ListSymbolsFormat.TBK)
+        new, due = self._plan(tbks, full, self.clock())
+        return len(new) + len(due)
+
+    def refresh(
+        self,
+        full: bool = False,
+        progress: Callable[[int], None] | None = None,
+        tbks: list[str] | None = None,
+        only: Iterable[str] | None = None,
+    ) -> Catalog:
+        """
+        Bring the catalog up to date with the server.
+
+        New keys get their first and last epochs, keys that are no longer
+        listed are dropped, and known keys checked more than ``ttl`` ago only
+        get their last epoch re-read.  ``full=True`` re-reads everything.
+        ``progress`` is called with the number of keys of each finished
+        batch.  ``tbks`` may pass the result of a ``list_symbols()`` call
+        the caller already made.  ``only`` limits the reads to those of the
+        listed keys (eg the ones about to be shown); the others keep what the
+        catalog knows, and the catalog as a whole stays as stale as it was.
+        """
+        with self._lock:
+            now = self.clock()
+            if tbks is None:
+                tbks = self.client.list_symbols(fmt=ListSymbolsFormat.TBK)
+            infos = {tbk: self._infos.get(tbk) or TbkInfo(tbk) for tbk in tbks}
+            if only is not None:
+                only = set(only)
+                tbks = [tbk for tbk in tbks if tbk in only]
+            new, due = self._plan(tbks, full, now)
+
+            for keys, first in ((new, True), (due, False)):
+                found = _discover(
+                    self.client,
+                    keys,
+                    self.batch_size,
+                    self.workers,
+                    progress,
+                    first=first,
+                )
+                for tbk, value in found.items():
+                    if value is None:
+                        infos[tbk] = TbkInfo(tbk, checked=now)
+                    else:
+                        start = value[0] if first else infos[tbk].first
+                        infos[tbk] = TbkInfo(tbk, start, value[1], value[2], now)
+                        self.timezone = value[3]
+
+            self._infos = infos
+            if only is None:
+                self.refreshed = now
+            self.save()
+        return self
+
+    def invalidate(self, tbk: str | None = None) -> None:
+        """
+        Make the next ``ensure_fresh()`` refresh, re-reading ``tbk`` (eg after
+        writing to it) from both ends.
+        """
+        with self._lock:
+            info = self._infos.get(tbk)
+            if info is not None:
+                self._infos[tbk] = TbkInfo(tbk, info.first, info.last, info.columns)
+            self.refreshed = 0.0
+            self.save()
+
+    def ensure_fresh(self) -> Catalog:
+        """Refresh if the catalog is older than ``ttl``."""
+        if self.stale:
+            self.refresh()
+        return self
+
+    def get(self, tbk: str) -> TbkInfo | None:
+        return self._infos.get(tbk)
+
+    def infos(
+        self,
+        timeframe: Freq | str | None = None,
+        attrgroup: str | None = "OHLCV",
+    ) -> list[TbkInfo]:
+        """The known keys (with data) of a timeframe and attribute group."""
+        if isinstance(timeframe, Freq):
+            timeframe = timeframe.value
+        return [
+            info
+            for tbk, info in sorted(self._infos.items())
+            if info.first is not None
+            and (timeframe is None or info.timeframe == timeframe)
+            and (attrgroup is None or info.attribute_group == attrgroup)
+        ]
+
+    def symbols(
+        self,
+        timeframe: Freq | str | None = None,
+        attrgroup: str | None = "OHLCV",
+        start: Any = None,
+        end: Any = None,
+    ) -> list[str]:
+        """
+        Symbols with data in ``timeframe`` whose range overlaps
+        ``[start, end]`` (the same time values as ``Params``).
+        """
+        start, end = _to_epoch(start), _to_epoch(end)
+        return sorted(
+            {
+                info.symbol
+                for info in self.infos(timeframe, attrgroup)
+                if info.covers(start, end)
+            }
+        )
+
+    def has(self, symbol: str, timeframe: Freq | str, attrgroup: str = "OHLCV") -> bool:
+        if isinstance(timeframe, Freq):
+            timeframe = timeframe.value
+        info = self.get(f"{symbol}/{timeframe}/{attrgroup}")
+        return info is not None and info.first is not None
+
+    def __len__(self) -> int:
+        return len(self._infos)
+
+    def __contains__(self, tbk: str) -> bool:
+        return tbk in self._infos
+
+    def __repr__(self) -> str:
+        return "Catalog(path={}, tbks={}, refreshed={})".format(
+            self.path,
+            len(self._infos),
+            pd.Timestamp(self.refreshed, unit="s") if self.refreshed else None,
+        )
+
+
+def _to_epoch(value: Any) -> int | None:
+    ts = get_timestamp(value)
+    return None if ts is None else ts.value // 10**9
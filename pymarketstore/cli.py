@@ -5,12 +5,16 @@ Command-line interface for pymarketstore.
 import sys
 
 import click
+import pandas as pd
 
 from tabulate import tabulate
 
 import pymarketstore as pymkts
 
+from .catalog import Catalog, default_catalog_path
 from .enums import Freq
+from .export import export
+from .importer import collect_files, import_files, parse_shape, tbk_for_path
 
 
 @click.group()
@@ -115,13 +119,31 @@ def query(symbols, freq, start, end, limit, output_format):
     default=False,
     help="Use gRPC instead of JSON-RPC",
 )
-def list_symbols(host, port, freq, tbk, grpc):
+@click.option(
+    "--workers",
+    "-w",
+    type=int,
+    default=8,
+    help="Number of concurrent date range queries",
+)
+@click.option(
+    "--refresh",
+    "-r",
+    is_flag=True,
+    default=False,
+    help="Re-read the date ranges of all symbols instead of using the cached catalog",
+)
+def list_symbols(host, port, freq, tbk, grpc, workers, refresh):
     """List all symbols stored in MarketStore with their available timeframes.
 
+    Date ranges are kept in a catalog file in the user's cache directory and
+    only new (or, after an hour, updated) symbols are scanned again.
+
     Examples:
         pymkts list
         pymkts list --freq 1D
         pymkts list --freq 1Min --host 192.168.1.100
+        pymkts list --refresh
     """
     endpoint = f"http://{host}:{port}/rpc"
 
@@ -136,7 +158,10 @@ def list_symbols(host, port, freq, tbk, grpc):
                     click.echo(key)
         else:
             # Show symbols with timeframes and date ranges in a table
-            symbol_data = _get_symbol_data(client, tbks, freq)
+            shown = _shown_tbks(tbks, freq)
+            catalog = Catalog(client, default_catalog_path(endpoint), workers=workers)
+            _refresh_catalog(catalog, tbks, shown, full=refresh)
+            symbol_data = _get_symbol_data(catalog, shown)
 
             if not symbol_data:
                 if freq:
@@ -161,76 +186,55 @@ def list_symbols(host, port, freq, tbk, grpc):
         sys.exit(1)
 
 
-def _get_symbol_data(client, tbks, freq_filter=None):
+def _shown_tbks(tbks, freq_filter=None):
+    """The OHLCV time bucket keys of ``tbks`` (of timeframe ``freq_filter``)."""
+    shown = []
+    for tbk in tbks:
+        parts = tbk.split("/")
+        if len(parts) >= 3 and parts[2] == "OHLCV" and freq_filter in (None, parts[1]):
+            shown.append(tbk)
+    return shown
+
+
+def _refresh_catalog(catalog, tbks, shown, full=False):
+    """Refresh the catalog entries of ``shown``, with a progress bar on a terminal."""
+    if sys.stderr.isatty():
+        with click.progressbar(
+            length=catalog.pending(shown, full=full),
+            label="Scanning date ranges",
+            file=sys.stderr,
+        ) as bar:
+            catalog.refresh(full=full, progress=bar.update, tbks=tbks, only=shown)
+    else:
+        catalog.refresh(full=full, tbks=tbks, only=shown)
+
+
+def _get_symbol_data(catalog, tbks):
     """
-    Get symbol data with date ranges.
+    Get symbol data with date ranges from the catalog.
 
     Returns dict: {symbol: {timeframe: (start_date, end_date), ...}, ...}
     """
-    # Parse TBKs into symbol -> timeframes mapping
-    symbol_timeframes = {}
-    for tbk in tbks:
-        parts = tbk.split("/")
-        if len(parts) >= 3:
-            symbol, timeframe, attrgroup = parts[0], parts[1], parts[2]
-            # Only include OHLCV attrgroup and apply frequency filter
-            if attrgroup == "OHLCV":
-                if freq_filter is None or timeframe == freq_filter:
-                    if symbol not in symbol_timeframes:
-                        symbol_timeframes[symbol] = set()
-                    symbol_timeframes[symbol].add(timeframe)
-
-    # Query date ranges for each symbol/timeframe combination
+    # dates are those of the server's timezone, like the index of its replies
+    tz = catalog.timezone or "UTC"
     symbol_data = {}
-    for symbol, timeframes in symbol_timeframes.items():
-        symbol_data[symbol] = {}
-        for tf in timeframes:
-            start_date, end_date = _get_date_range(client, symbol, tf)
-            symbol_data[symbol][tf] = (start_date, end_date)
+    for tbk in tbks:
+        symbol, timeframe = tbk.split("/")[:2]
+        info = catalog.get(tbk)
+        if info is None or info.first is None:
+            dates = ("N/A", "N/A")
+        else:
+            dates = tuple(
+                _format_timestamp(
+                    pd.Timestamp(epoch, unit="s", tz="UTC").tz_convert(tz), timeframe
+                )
+                for epoch in (info.first, info.last)
+            )
+        symbol_data.setdefault(symbol, {})[timeframe] = dates
 
     return symbol_data
 
 
-def _get_date_range(client, symbol, timeframe):
-    """Query the first and last record dates for a symbol/timeframe."""
-    try:
-        # Get first record
-        params_start = pymkts.Params(
-            symbols=symbol,
-            timeframe=timeframe,
-            attrgroup="OHLCV",
-            limit=1,
-            limit_from_start=True,
-        )
-        reply_start = client.query(params_start)
-        df_start = reply_start.first().df()
-
-        # Get last record
-        params_end = pymkts.Params(
-            symbols=symbol,
-            timeframe=timeframe,
-            attrgroup="OHLCV",
-            limit=1,
-            limit_from_start=False,
-        )
-        reply_end = client.query(params_end)
-        df_end = reply_end.first().df()
-
-        if df_start.empty or df_end.empty:
-            return ("N/A", "N/A")
-
-        start_ts = df_start.index[0]
-        end_ts = df_end.index[0]
-
-        # Format based on timeframe
-        start_str = _format_timestamp(start_ts, timeframe)
-        end_str = _format_timestamp(end_ts, timeframe)
-        return (start_str, end_str)
-
-    except Exception:
-        return ("N/A", "N/A")
-
-
 def _is_daily_or_higher(timeframe):
     """Check if timeframe is daily or higher (D, W, M, Y)."""
     daily_units = {"D", "W", "M", "Y"}
@@ -421,6 +425,265 @@ def version(host, port, grpc):
         sys.exit(1)
 
 
+@cli.command("export")
+@click.argument("symbols")
+@click.argument("freq", type=str)
+@click.argument("output", type=click.Path(file_okay=False))
+@click.option(
+    "--format",
+    "-f",
+    "output_format",
+    type=click.Choice(["parquet", "feather", "csv"]),
+    default="parquet",
+    help="File format ('feather' writes Arrow IPC files)",
+)
+@click.option(
+    "--attrgroup",
+    "-a",
+    type=str,
+    default="OHLCV",
+    help="Attribute group of the time bucket keys",
+)
+@click.option("--start", "-s", type=str, default=None, help="Start date/time")
+@click.option("--end", "-e", type=str, default=None, help="End date/time")
+@click.option(
+    "--chunk-rows",
+    type=int,
+    default=500_000,
+    help="Rows per query (and per Parquet row group / Arrow batch)",
+)
+@click.option(
+    "--workers",
+    "-w",
+    type=int,
+    default=4,
+    help="Number of symbols exported concurrently",
+)
+@click.option(
+    "--host",
+    "-h",
+    type=str,
+    default="localhost",
+    help="MarketStore server host",
+)
+@click.option(
+    "--port",
+    "-p",
+    type=int,
+    default=5993,
+    help="MarketStore server port",
+)
+@click.option(
+    "--grpc",
+    "-g",
+    is_flag=True,
+    default=False,
+    help="Use gRPC instead of JSON-RPC",
+)
+def export_data(
+    symbols,
+    freq,
+    output,
+    output_format,
+    attrgroup,
+    start,
+    end,
+    chunk_rows,
+    workers,
+    host,
+    port,
+    grpc,
+):
+    """Export SYMBOLS (comma-separated, or 'all') at FREQ to files in OUTPUT.
+
+    Data is streamed in chunks and written to one file per symbol,
+    OUTPUT/{symbol}/{freq}/{attrgroup}.{parquet,arrow,csv}, so memory use
+    stays bounded however much is exported.
+
+    \b
+    Examples:
+        pymkts export AAPL,TSLA 1Min ./export
+        pymkts export all 1D ./daily --format csv --start 2020-01-01
+        pymkts export all 1Min ./bars --workers 8 --chunk-rows 1000000
+    """
+    endpoint = f"http://{host}:{port}/rpc"
+
+    try:
+        client = pymkts.Client(endpoint=endpoint, grpc=grpc)
+        if symbols.lower() == "all":
+            tbks = sorted(
+                tbk
+                for tbk in client.list_symbols(fmt=pymkts.ListSymbolsFormat.TBK)
+                if tbk.split("/")[1:] == [freq, attrgroup]
+            )
+        else:
+            tbks = [f"{s.strip()}/{freq}/{attrgroup}" for s in symbols.split(",")]
+
+        stats = export(
+            client,
+            tbks,
+            output,
+            fmt=output_format,
+            start=start,
+            end=end,
+            chunk_rows=chunk_rows,
+            workers=workers,
+        )
+
+        if not stats["rows"]:
+            click.echo(f"No data found for {symbols}/{freq}/{attrgroup}", err=True)
+            sys.exit(1)
+
+        click.echo(
+            "Exported {:,} rows of {} symbol(s) to {} in {:.1f}s ({:,.0f} rows/s, "
+            "{:.1f} MiB)".format(
+                stats["rows"],
+                stats["tbks"],
+                output,
+                stats["seconds"],
+                stats["rows_per_sec"],
+                stats["bytes"] / 2**20,
+            )
+        )
+
+    except Exception as e:
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+
+
+@cli.command("import")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option(
+    "--freq",
+    "-f",
+    type=str,
+    default=None,
+    help="Timeframe of files named {symbol}.{ext} (default: take the bucket key "
+    "from the {symbol}/{timeframe}/{attrgroup}.{ext} layout of `pymkts export`)",
+)
+@click.option(
+    "--attrgroup",
+    "-a",
+    type=str,
+    default="OHLCV",
+    help="Attribute group of files named {symbol}.{ext}",
+)
+@click.option(
+    "--shape",
+    type=str,
+    default=None,
+    help="Data shape of new buckets, eg 'Epoch/int64:Open/float32:Close/float32' "
+    "(default: inferred from the files)",
+)
+@click.option(
+    "--time-column",
+    type=str,
+    default="Epoch",
+    help="Column with the time of each row (epoch seconds or datetimes)",
+)
+@click.option(
+    "--no-create",
+    is_flag=True,
+    default=False,
+    help="Fail instead of creating missing buckets",
+)
+@click.option("--chunk-rows", type=int, default=100_000, help="Rows read at a time")
+@click.option("--batch-rows", type=int, default=500_000, help="Rows per write request")
+@click.option(
+    "--workers",
+    "-w",
+    type=int,
+    default=4,
+    help="Number of parallel writers",
+)
+@click.option(
+    "--host",
+    "-h",
+    type=str,
+    default="localhost",
+    help="MarketStore server host",
+)
+@click.option(
+    "--port",
+    "-p",
+    type=int,
+    default=5993,
+    help="MarketStore server port",
+)
+@click.option(
+    "--grpc",
+    "-g",
+    is_flag=True,
+    default=False,
+    help="Use gRPC instead of JSON-RPC",
+)
+def import_data(
+    paths,
+    freq,
+    attrgroup,
+    shape,
+    time_column,
+    no_create,
+    chunk_rows,
+    batch_rows,
+    workers,
+    host,
+    port,
+    grpc,
+):
+    """Import Parquet, Arrow (Feather) or CSV files from PATHS into MarketStore.
+
+    Directories are searched recursively.  Missing buckets are created with
+    the shape of the files (or --shape); the columns of files written into
+    existing buckets are validated and cast to the bucket's shape.
+
+    \b
+    Examples:
+        pymkts import ./export
+        pymkts import AAPL.parquet TSLA.parquet --freq 1Min
+        pymkts import ./vendor/*.csv --freq 1D --time-column date --workers 8
+    """
+    endpoint = f"http://{host}:{port}/rpc"
+
+    try:
+        files = [
+            (path, tbk_for_path(path, freq, attrgroup)) for path in collect_files(paths)
+        ]
+        if not files:
+            click.echo("No files to import", err=True)
+            sys.exit(1)
+
+        client = pymkts.Client(endpoint=endpoint, grpc=grpc)
+        stats = import_files(
+            client,
+            files,
+            shape=parse_shape(shape) if shape else None,
+            create=not no_create,
+            time_column=time_column,
+            chunk_rows=chunk_rows,
+            batch_rows=batch_rows,
+            workers=workers,
+        )
+
+        for tbk in stats["created"]:
+            click.echo(f"Created: {tbk}")
+        click.echo(
+            "Imported {:,} rows of {} file(s) into {} bucket(s) in {:.1f}s "
+            "({:,.0f} rows/s, {} requests)".format(
+                stats["rows"],
+                stats["files"],
+                stats["tbks"],
+                stats["seconds"],
+                stats["rows_per_sec"],
+                stats["requests"],
+            )
+        )
+
+    except Exception as e:
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+
+
 def _output_dataframe(df, output_format):
     """Output a DataFrame in the specified format."""
     if output_format == "csv":
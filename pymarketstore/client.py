@@ -1,3 +1,4 @@
+import copy
 import logging
 import re
 
@@ -7,11 +8,15 @@ from typing import *
 import numpy as np
 import pandas as pd
 
+from .cache import ResultCache
 from .grpc_client import GRPCClient
+from .instrumentation import QueryProfile
 from .jsonrpc_client import JsonRpcClient
 from .params import DataShape, DataType, ListSymbolsFormat, Params
+from .planner import QueryPlan
 from .results import QueryReply
-from .utils import parse_date_to_string
+from .singleflight import SingleFlight
+from .utils import is_iterable, parse_date_to_string
 
 
 logger = logging.getLogger(__name__)
@@ -20,8 +25,30 @@ http_regex = re.compile(r"^https?://(.+):\d+/rpc")  # http:// or https://
 
 
 class Client:
-    def __init__(self, endpoint: str = "http://localhost:5993/rpc", grpc: bool = False):
+    def __init__(
+        self,
+        endpoint: str = "http://localhost:5993/rpc",
+        grpc: bool = False,
+        coalesce: bool = False,
+        cache: Optional[ResultCache] = None,
+        profile: bool = False,
+    ):
+        """
+        :param endpoint: the MarketStore server endpoint
+        :param grpc: use the gRPC transport instead of JSON-RPC
+        :param coalesce: let concurrent identical queries (eg from several
+            threads) share one server request.  Query results are then
+            returned as read-only arrays, since they may be shared.
+        :param cache: a ResultCache to answer repeated queries from memory.
+            Cached results are returned as read-only arrays as well.
+        :param profile: attach a QueryProfile (encode, wire and decode time,
+            bytes, rows per tbk) to every reply of query() and sql() as
+            ``reply.profile``
+        """
         self.endpoint = endpoint
+        self.cache = cache
+        self.profile = profile
+        self._flight = SingleFlight() if coalesce else None
         if not grpc:
             self.client = JsonRpcClient(self.endpoint)
             return
@@ -43,7 +70,94 @@ class Client:
         :param params: Params object used to query
         :return: QueryReply object
         """
-        return self.client.query(params)
+        if self.profile:
+            return self._profiled(self._query, params)
+        return self._query(params)
+
+    def _query(self, params: Union[Params, List[Params]]) -> QueryReply:
+        if self.cache is None and self._flight is None:
+            return self.client.query(params)
+
+        if not is_iterable(params):
+            params = [params]
+        if self.cache is None or not params:
+            return self._fetch(params)
+
+        # answer what we can from the cache, and fetch the rest in one request
+        results = [self.cache.get(p) for p in params]
+        missing = [i for i, cached in enumerate(results) if cached is None]
+        if missing:
+            reply = self._fetch([params[i] for i in missing])
+            for i, result in zip(missing, reply.results):
+                self.cache.put(params[i], result, reply.timezone)
+                results[i] = (result, reply.timezone)
+        return QueryReply(
+            results=[result for result, _ in results],
+            timezone=results[0][1],
+        )
+
+    def _fetch(self, params: List[Params]) -> QueryReply:
+        if self._flight is None:
+            return self.client.query(params).readonly()
+        key = tuple(p.cache_key() for p in params)
+        return self._flight.do(key, lambda: self.client.query(params)).readonly()
+
+    def query_many(self, params: List[Params]) -> List[QueryReply]:
+        """
+        run many queries with as few server scans as possible
+
+        Queries of the same time bucket key whose time windows overlap or are
+        adjacent are merged into one request; each query's rows are then
+        sliced back out of the merged result without copying.
+
+        With ``profile=True`` every reply gets a copy of the merged request's
+        QueryProfile (its times and bytes are those of the whole request),
+        with ``rows`` counting that reply's own rows.
+
+        :param params: list of Params objects
+        :return: one QueryReply per Params, in the same order
+        """
+        if not params:
+            return []
+        plan = QueryPlan(params)
+        reply = self.query(plan.requests)
+        replies = plan.execute(reply)
+        if reply.profile is not None:
+            for split in replies:
+                split.profile = copy.copy(reply.profile)
+                split.profile.rows = split.rows_by_key()
+        return replies
+
+    def sql(self, statements: Union[str, List[str]]) -> QueryReply:
+        """
+        run one or more SQL statements on the MarketStore server
+
+        The statements are evaluated by the server (so that predicates are
+        applied where the data lives), and the rows are returned in the same
+        columnar ``QueryReply`` as ``query()``.
+
+        :param statements: a SQL statement, or a list of statements
+            (eg 'SELECT * FROM `AAPL/1Min/OHLCV` WHERE Close > 100')
+        :return: QueryReply object
+        """
+        if isinstance(statements, str):
+            statements = [statements]
+        if not statements or not all(
+            isinstance(statement, str) and statement.strip() for statement in statements
+        ):
+            raise ValueError("`statements` must be one or more non-empty SQL strings")
+        if self.profile:
+            return self._profiled(self.client.sql, statements)
+        return self.client.sql(statements)
+
+    @staticmethod
+    def _profiled(query, *args) -> QueryReply:
+        profile = QueryProfile()
+        with profile.measure():
+            reply = query(*args)
+        profile.rows = reply.rows_by_key()
+        reply.profile = profile
+        return reply
 
     def write(
         self,
@@ -60,7 +174,35 @@ class Client:
         :param is_variable_length: should be set true if the record content is variable-length array
         :return:
         """
-        return self.client.write(data, tbk, is_variable_length=is_variable_length)
+        try:
+            return self.client.write(data, tbk, is_variable_length=is_variable_length)
+        finally:
+            self._invalidate()
+
+    def write_batch(
+        self,
+        batch: Dict[str, Union[pd.DataFrame, pd.Series, np.ndarray, np.recarray]],
+        is_variable_length: bool = False,
+    ) -> dict:
+        """
+        write data of several time bucket keys in one request
+
+        Data with the same columns and types is sent as a single dataset, so
+        a batch of many symbols costs one round trip instead of one per tbk.
+
+        :param batch: {tbk: data} where data is what ``write()`` accepts
+        :param is_variable_length: should be set true if the record content is variable-length array
+        :return:
+        """
+        try:
+            return self.client.write_batch(batch, is_variable_length=is_variable_length)
+        finally:
+            self._invalidate()
+
+    def _invalidate(self) -> None:
+        # written rows may fall inside cached windows (eg a backfill)
+        if self.cache is not None:
+            self.cache.clear()
 
     def list_symbols(
         self,
@@ -122,7 +264,10 @@ class Client:
 
         :param tbk: The time bucket key to delete (eg 'TSLA/1D/OHLCV')
         """
-        return self.client.destroy(tbk)
+        try:
+            return self.client.destroy(tbk)
+        finally:
+            self._invalidate()
 
     def server_version(self) -> str:
         return self.client.server_version()
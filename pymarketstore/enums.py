@@ -104,3 +104,24 @@ class Freq(OrderedEnum):
     month = "1M"
     quarter = "3M"
     year = "1Y"
+
+    @property
+    def seconds(self) -> int | None:
+        """
+        The duration of one bar in seconds, or None for calendar-based
+        frequencies (week and longer) whose bars differ in length.
+        """
+        return _FREQ_SECONDS.get(self)
+
+
+_FREQ_SECONDS = {
+    Freq.second: 1,
+    Freq.min_1: 60,
+    Freq.min_2: 2 * 60,
+    Freq.min_5: 5 * 60,
+    Freq.min_10: 10 * 60,
+    Freq.min_15: 15 * 60,
+    Freq.min_30: 30 * 60,
+    Freq.hour: 60 * 60,
+    Freq.day: 24 * 60 * 60,
+}
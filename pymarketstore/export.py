@@ -0,0 +1,266 @@
+"""
+Bulk export of MarketStore buckets to files.
+
+``export()`` pages through each bucket key with ``limit``-ed queries from the
+start, so at most one chunk of rows per worker is in memory at a time, and
+appends every chunk to the bucket's file as soon as it arrives: one Parquet
+row group, Arrow IPC (Feather v2) record batch or block of CSV lines per
+chunk.  Buckets are exported concurrently on a bounded thread pool, one file
+each, laid out like the server's buckets::
+
+    {out_dir}/{symbol}/{timeframe}/{attrgroup}.{parquet,arrow,csv}
+
+Columns are written as stored (``Epoch`` in epoch seconds, plus
+``Nanoseconds`` for tick data), so files can be read back with ``pymkts
+import`` without loss.  Parquet and Arrow need the optional ``pyarrow``
+package.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from .params import Params
+from .results import epoch_ns
+from .utils import get_timestamp
+
+
+FORMATS = {"parquet": "parquet", "feather": "arrow", "csv": "csv"}
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(
+            "The 'pyarrow' package is required for Parquet and Arrow files. "
+            "Install it with: pip install pyarrow"
+        )
+    return pyarrow
+
+
+def _arrow_table(array: np.ndarray):
+    pa = _require_pyarrow()
+    return pa.table({name: array[name] for name in array.dtype.names})
+
+
+class _ParquetWriter:
+    def __init__(self, path: str) -> None:
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+
+        self._pq = pq
+        self.path = path
+        self._writer = None
+
+    def write(self, array: np.ndarray) -> None:
+        table = _arrow_table(array)
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+class _ArrowWriter:
+    def __init__(self, path: str) -> None:
+        self._pa = _require_pyarrow()
+        self.path = path
+        self._sink = None
+        self._writer = None
+
+    def write(self, array: np.ndarray) -> None:
+        table = _arrow_table(array)
+        if self._writer is None:
+            self._sink = self._pa.OSFile(self.path, "wb")
+            self._writer = self._pa.ipc.new_file(self._sink, table.schema)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+
+
+class _CsvWriter:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = None
+
+    def write(self, array: np.ndarray) -> None:
+        header = self._file is None
+        if header:
+            self._file = open(self.path, "w", newline="")
+        pd.DataFrame(array).to_csv(self._file, header=header, index=False)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+_WRITERS = {"parquet": _ParquetWriter, "feather": _ArrowWriter, "csv": _CsvWriter}
+
+
+def export_path(out_dir: str | os.PathLike, tbk: str, fmt: str) -> str:
+    """The file ``export()`` writes bucket key ``tbk`` to."""
+    symbol, timeframe, attrgroup = tbk.split("/")
+    return os.path.join(
+        os.fspath(out_dir), symbol, timeframe, f"{attrgroup}.{FORMATS[fmt]}"
+    )
+
+
+def iter_chunks(
+    client: Any,
+    tbk: str,
+    start: Any = None,
+    end: Any = None,
+    chunk_rows: int = 500_000,
+) -> Iterable[np.ndarray]:
+    """
+    Yield the rows of ``tbk`` between ``start`` and ``end`` in chunks of at
+    most ``chunk_rows``, oldest first.
+    """
+    symbol, timeframe, attrgroup = tbk.split("/")
+    cursor = get_timestamp(start)
+    while True:
+        p = Params(
+            symbol,
+            timeframe,
+            attrgroup,
+            start=cursor,
+            end=end,
+            limit=chunk_rows,
+            limit_from_start=True,
+        )
+        try:
+            reply = client.query(p)
+        except Exception as e:
+            if "no results returned from query" in str(e):
+                return
+            raise
+        datasets = list(reply.results[0].all().values())
+        if not datasets or not len(datasets[0].array):
+            return
+        array = datasets[0].array
+        yield array
+        if len(array) < chunk_rows:
+            return
+        # continue right after the last row (to the nanosecond for ticks)
+        cursor = pd.Timestamp(int(epoch_ns(array[-1:])[0]) + 1)
+
+
+def _export_tbk(
+    client: Any,
+    tbk: str,
+    out_dir: str | os.PathLike,
+    fmt: str,
+    start: Any,
+    end: Any,
+    chunk_rows: int,
+    progress: Callable[[int], None] | None,
+) -> tuple[int, int]:
+    path = export_path(out_dir, tbk, fmt)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    writer = _WRITERS[fmt](tmp)
+    rows = 0
+    try:
+        try:
+            for chunk in iter_chunks(client, tbk, start, end, chunk_rows):
+                writer.write(chunk)
+                rows += len(chunk)
+                if progress is not None:
+                    progress(len(chunk))
+        finally:
+            writer.close()
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    if not rows:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return 0, 0
+    os.replace(tmp, path)
+    return rows, os.path.getsize(path)
+
+
+def export(
+    client: Any,
+    tbks: Iterable[str],
+    out_dir: str | os.PathLike,
+    fmt: str = "parquet",
+    start: Any = None,
+    end: Any = None,
+    chunk_rows: int = 500_000,
+    workers: int = 4,
+    progress: Callable[[int], None] | None = None,
+) -> dict:
+    """
+    Export bucket keys to one file each under ``out_dir``.
+
+    Parameters
+    ----------
+    client : Client
+        Any client with ``query()``.
+    tbks : iterable of str
+        The bucket keys to export.
+    out_dir : str or os.PathLike
+        The directory to write to (see ``export_path()``).
+    fmt : {"parquet", "feather", "csv"}, default "parquet"
+        The file format; "feather" writes Arrow IPC files.
+    start, end : optional
+        The time range to export (the same values as ``Params``).
+    chunk_rows : int, default 500_000
+        Rows per query, and per Parquet row group / Arrow record batch.
+    workers : int, default 4
+        Number of buckets exported concurrently.
+    progress : callable, optional
+        Called with the number of rows of each written chunk.
+
+    Returns
+    -------
+    dict
+        ``tbks`` (files written), ``rows``, ``bytes``, ``seconds`` and
+        ``rows_per_sec``.
+
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(
+            "unsupported format {!r}, expected one of {}".format(fmt, list(_WRITERS))
+        )
+    if fmt != "csv":
+        _require_pyarrow()
+
+    tbks = list(tbks)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tbks) or 1))) as pool:
+        results = list(
+            pool.map(
+                lambda tbk: _export_tbk(
+                    client, tbk, out_dir, fmt, start, end, chunk_rows, progress
+                ),
+                tbks,
+            )
+        )
+    seconds = time.perf_counter() - started
+
+    rows = sum(r for r, _ in results)
+    return {
+        "tbks": sum(1 for r, _ in results if r),
+        "rows": rows,
+        "bytes": sum(b for _, b in results),
+        "seconds": seconds,
+        "rows_per_sec": rows / seconds if seconds else 0.0,
+    }
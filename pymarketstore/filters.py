@@ -0,0 +1,263 @@
+"""
+Row filter expressions for queries.
+
+Build predicates from columns with the usual comparison and boolean
+operators, and attach them to a query with ``Params.where()``::
+
+    from pymarketstore.filters import Close, Epoch, Volume
+
+    params = pymkts.Params("AAPL", "1Min", "OHLCV").where(
+        (Volume > 1e6) & (Close >= 100) & (Epoch >= "2024-01-02")
+    )
+
+Conditions on ``Epoch`` that hold for every row (ie that are not inside an
+``|`` or ``~``) are pushed down to the server as the query's time window, since
+that is the only row selection the query protocol supports.  The complete
+predicate is evaluated on the decoded NumPy arrays, as one vectorized mask per
+result, before any DataFrame is built.
+"""
+
+from __future__ import annotations
+
+import math
+import operator
+
+from collections.abc import Callable, Iterable
+from typing import Any
+
+import numpy as np
+
+from .utils import get_timestamp
+
+
+_OPS: dict[str, Callable] = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+def _value(column: str, value: Any) -> Any:
+    # Epoch accepts anything Params(start=...) does
+    if column == "Epoch" and not isinstance(value, (float, np.floating)):
+        return get_timestamp(value).value / 10**9
+    return value
+
+
+class Expr:
+    """Base class of filter expressions."""
+
+    def mask(self, array: np.ndarray) -> np.ndarray:
+        """Evaluate the expression into a boolean mask over ``array``."""
+        raise NotImplementedError
+
+    def epoch_bounds(self) -> tuple[float | None, float | None]:
+        """
+        The inclusive ``(start, end)`` epoch window (in seconds) that every
+        matching row must fall into; ``None`` where unbounded.
+        """
+        return None, None
+
+    def __and__(self, other: Expr) -> Expr:
+        return And(self, other)
+
+    def __or__(self, other: Expr) -> Expr:
+        return Or(self, other)
+
+    def __invert__(self) -> Expr:
+        return Not(self)
+
+    def __bool__(self) -> bool:
+        raise TypeError(
+            "filter expressions cannot be used as booleans; "
+            "combine them with &, | and ~ instead of and, or and not"
+        )
+
+
+class Column:
+    """
+    A column reference; comparing it with a value builds a ``Comparison``.
+
+    Parameters
+    ----------
+    name : str
+        The column name (eg ``"Volume"``).
+
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __lt__(self, value: Any) -> Comparison:
+        return Comparison(self.name, "<", value)
+
+    def __le__(self, value: Any) -> Comparison:
+        return Comparison(self.name, "<=", value)
+
+    def __gt__(self, value: Any) -> Comparison:
+        return Comparison(self.name, ">", value)
+
+    def __ge__(self, value: Any) -> Comparison:
+        return Comparison(self.name, ">=", value)
+
+    def __eq__(self, value: Any) -> Comparison:  # type: ignore[override]
+        return Comparison(self.name, "==", value)
+
+    def __ne__(self, value: Any) -> Comparison:  # type: ignore[override]
+        return Comparison(self.name, "!=", value)
+
+    def __hash__(self) -> int:
+        return hash(self.name)
+
+    def between(self, low: Any, high: Any) -> Expr:
+        """``low <= column <= high``"""
+        return (self >= low) & (self <= high)
+
+    def isin(self, values: Iterable[Any]) -> IsIn:
+        return IsIn(self.name, values)
+
+    def __repr__(self) -> str:
+        return "col({!r})".format(self.name)
+
+
+def col(name: str) -> Column:
+    """Reference the column ``name`` in a filter expression."""
+    return Column(name)
+
+
+Epoch = col("Epoch")
+Open = col("Open")
+High = col("High")
+Low = col("Low")
+Close = col("Close")
+Volume = col("Volume")
+
+
+class Comparison(Expr):
+    def __init__(self, column: str, op: str, value: Any) -> None:
+        if op not in _OPS:
+            raise ValueError(f"unsupported operator {op!r}")
+        self.column = column
+        self.op = op
+        self.value = _value(column, value)
+
+    def mask(self, array: np.ndarray) -> np.ndarray:
+        try:
+            values = array[self.column]
+        except (KeyError, ValueError):
+            raise ValueError(f"cannot filter on unknown column {self.column!r}")
+        return _OPS[self.op](values, self.value)
+
+    def epoch_bounds(self) -> tuple[float | None, float | None]:
+        if self.column != "Epoch":
+            return None, None
+        if self.op in (">", ">="):
+            return self.value, None
+        if self.op in ("<", "<="):
+            return None, self.value
+        if self.op == "==":
+            return self.value, self.value
+        return None, None
+
+    def __repr__(self) -> str:
+        return "({} {} {!r})".format(self.column, self.op, self.value)
+
+
+class IsIn(Expr):
+    def __init__(self, column: str, values: Iterable[Any]) -> None:
+        self.column = column
+        self.values = [_value(column, value) for value in values]
+
+    def mask(self, array: np.ndarray) -> np.ndarray:
+        try:
+            values = array[self.column]
+        except (KeyError, ValueError):
+            raise ValueError(f"cannot filter on unknown column {self.column!r}")
+        return np.isin(values, self.values)
+
+    def epoch_bounds(self) -> tuple[float | None, float | None]:
+        if self.column != "Epoch" or not self.values:
+            return None, None
+        return min(self.values), max(self.values)
+
+    def __repr__(self) -> str:
+        return "({} in {!r})".format(self.column, self.values)
+
+
+class And(Expr):
+    def __init__(self, left: Expr, right: Expr) -> None:
+        self.left = left
+        self.right = right
+
+    def mask(self, array: np.ndarray) -> np.ndarray:
+        return self.left.mask(array) & self.right.mask(array)
+
+    def epoch_bounds(self) -> tuple[float | None, float | None]:
+        # both sides hold for every matching row: intersect their windows
+        (start1, end1), (start2, end2) = (
+            self.left.epoch_bounds(),
+            self.right.epoch_bounds(),
+        )
+        starts = [start for start in (start1, start2) if start is not None]
+        ends = [end for end in (end1, end2) if end is not None]
+        return (max(starts) if starts else None), (min(ends) if ends else None)
+
+    def __repr__(self) -> str:
+        return "({!r} & {!r})".format(self.left, self.right)
+
+
+class Or(Expr):
+    def __init__(self, left: Expr, right: Expr) -> None:
+        self.left = left
+        self.right = right
+
+    def mask(self, array: np.ndarray) -> np.ndarray:
+        return self.left.mask(array) | self.right.mask(array)
+
+    def epoch_bounds(self) -> tuple[float | None, float | None]:
+        # a row matches either side: the union of both windows
+        (start1, end1), (start2, end2) = (
+            self.left.epoch_bounds(),
+            self.right.epoch_bounds(),
+        )
+        start = None if start1 is None or start2 is None else min(start1, start2)
+        end = None if end1 is None or end2 is None else max(end1, end2)
+        return start, end
+
+    def __repr__(self) -> str:
+        return "({!r} | {!r})".format(self.left, self.right)
+
+
+class Not(Expr):
+    def __init__(self, expr: Expr) -> None:
+        self.expr = expr
+
+    def mask(self, array: np.ndarray) -> np.ndarray:
+        return ~self.expr.mask(array)
+
+    def __repr__(self) -> str:
+        return "~{!r}".format(self.expr)
+
+
+def pushdown_window(
+    expr: Expr,
+    start: int | None,
+    end: int | None,
+) -> tuple[int | None, int | None]:
+    """
+    Narrow the query window ``[start, end]`` (epoch nanoseconds) to the
+    ``Epoch`` bounds implied by ``expr``.  The result is never narrower than
+    the rows the expression can match, since the server treats both ends as
+    inclusive and only has whole-second resolution for them here.
+    """
+    lower, upper = expr.epoch_bounds()
+    if lower is not None:
+        lower = math.floor(lower) * 10**9
+        start = lower if start is None else max(start, lower)
+    if upper is not None:
+        upper = math.ceil(upper) * 10**9
+        end = upper if end is None else min(end, upper)
+    return start, end
@@ -0,0 +1,192 @@
+"""
+Builders for MarketStore's server-side aggregate functions.
+
+A query can ask the server to run aggregate functions over the selected rows
+before returning them (``Params.functions``), so that eg 1Min bars are rolled
+up into 1H bars where the data lives and only the result crosses the wire.
+The server expects each function as a call string such as
+``"candlecandler('1H',Open,High,Low,Close,Sum::Volume)"``: single-quoted
+literal parameters followed by the input columns, each a column name or an
+``Arg::Column`` pair naming how the function uses the column (eg
+``Sum::Volume``).  The classes here build (and validate) those strings::
+
+    params = pymkts.Params("AAPL", "1Min", "OHLCV").apply(CandleCandler("1H"))
+"""
+
+from __future__ import annotations
+
+import re
+
+from collections.abc import Iterable
+
+from .enums import Freq
+
+
+_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_COLUMN = re.compile(r"^(?:[A-Za-z_][A-Za-z0-9_]*::)?[A-Za-z_][A-Za-z0-9_]*$")
+_TIMEFRAME = re.compile(r"^[0-9]+(Sec|Min|H|D|W|M|Y)$")
+_CALL = re.compile(r"^\s*([A-Za-z_][A-Za-z0-9_]*)\s*\((.*)\)\s*$")
+_LITERAL = re.compile(r"^'([^',()]*)'$")
+
+
+def _timeframe(timeframe: Freq | str) -> str:
+    if isinstance(timeframe, Freq):
+        return timeframe.value
+    if not _TIMEFRAME.match(str(timeframe)):
+        raise ValueError(f"invalid timeframe {timeframe!r} (eg '5Min', '1H', '1D')")
+    return timeframe
+
+
+class Function:
+    """
+    A call of a server-side aggregate function.
+
+    Parameters
+    ----------
+    name : str
+        The function name as registered on the server (eg ``"candlecandler"``).
+    literals : iterable of str
+        Literal parameters (eg a timeframe), passed single-quoted.
+    columns : iterable of str
+        The input columns: names, or ``Arg::Column`` pairs (eg
+        ``"Sum::Volume"``).
+
+    Raises
+    ------
+    ValueError
+        If the name, a literal or a column name cannot be expressed in the
+        server's call syntax.
+
+    """
+
+    def __init__(
+        self,
+        name: str,
+        literals: Iterable[str] = (),
+        columns: Iterable[str] = (),
+    ) -> None:
+        if not _NAME.match(name):
+            raise ValueError(f"invalid function name {name!r}")
+        self.name = name.lower()
+        self.literals = [str(literal) for literal in literals]
+        self.columns = list(columns)
+        for literal in self.literals:
+            if not _LITERAL.match(f"'{literal}'"):
+                raise ValueError(f"invalid literal parameter {literal!r}")
+        for column in self.columns:
+            if not _COLUMN.match(column):
+                raise ValueError(f"invalid column name {column!r}")
+
+    @classmethod
+    def parse(cls, call: str | Function) -> Function:
+        """Parse (and thereby validate) a call string such as ``"max(Close)"``."""
+        if isinstance(call, Function):
+            return call
+        match = _CALL.match(call)
+        if not match:
+            raise ValueError(f"invalid function call {call!r}")
+        name, args = match.groups()
+        literals, columns = [], []
+        for arg in filter(None, (arg.strip() for arg in args.split(","))):
+            literal = _LITERAL.match(arg)
+            if literal:
+                if columns:
+                    raise ValueError(
+                        f"literal parameters must precede column names in {call!r}"
+                    )
+                literals.append(literal.group(1))
+            else:
+                columns.append(arg)
+        return Function(name, literals, columns)
+
+    def __str__(self) -> str:
+        args = [f"'{literal}'" for literal in self.literals] + self.columns
+        return "{}({})".format(self.name, ",".join(args))
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (Function, str)):
+            return str(self) == str(other)
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(str(self))
+
+    def __repr__(self) -> str:
+        return 'Function("{}")'.format(self)
+
+
+class CandleCandler(Function):
+    """
+    Aggregate OHLC(V) bars into coarser bars of ``timeframe``.
+
+    Parameters
+    ----------
+    timeframe : Freq or str
+        The output timeframe (eg ``Freq.hour`` or ``"1H"``).
+    open, high, low, close : str
+        Names of the input price columns.
+    sums : iterable of str, default ("Volume",)
+        Columns to sum over each output bar (passed as ``Sum::<column>``).
+
+    """
+
+    def __init__(
+        self,
+        timeframe: Freq | str,
+        open: str = "Open",
+        high: str = "High",
+        low: str = "Low",
+        close: str = "Close",
+        sums: Iterable[str] = ("Volume",),
+    ) -> None:
+        super().__init__(
+            "candlecandler",
+            [_timeframe(timeframe)],
+            [open, high, low, close, *(f"Sum::{column}" for column in sums)],
+        )
+
+
+class TickCandler(Function):
+    """
+    Build OHLC bars of ``timeframe`` from tick data.
+
+    Parameters
+    ----------
+    timeframe : Freq or str
+        The output timeframe (eg ``Freq.min_1`` or ``"1Min"``).
+    price : str, default "Price"
+        Name of the tick price column.
+    sums : iterable of str, optional
+        Columns to sum over each output bar (eg ``("Size",)``, passed as
+        ``Sum::Size``).
+
+    """
+
+    def __init__(
+        self,
+        timeframe: Freq | str,
+        price: str = "Price",
+        sums: Iterable[str] = (),
+    ) -> None:
+        super().__init__(
+            "tickcandler",
+            [_timeframe(timeframe)],
+            [price, *(f"Sum::{column}" for column in sums)],
+        )
+
+
+class Gap(Function):
+    """
+    Find the gaps in a series: returns one row per gap longer than
+    ``threshold`` (or per irregular interval if no threshold is given).
+
+    Parameters
+    ----------
+    threshold : Freq or str, optional
+        Minimum gap length to report (eg ``"5Min"``).
+
+    """
+
+    def __init__(self, threshold: Freq | str | None = None) -> None:
+        literals = [] if threshold is None else [_timeframe(threshold)]
+        super().__init__("gap", literals, ["Epoch"])
@@ -7,11 +7,16 @@ import grpc
 import numpy as np
 import pandas as pd
 
+from .instrumentation import span
 from .params import DataShape, ListSymbolsFormat, Params
 from .proto import marketstore_pb2 as proto
 from .proto import marketstore_pb2_grpc as gp
 from .results import QueryReply
-from .utils import is_iterable, timeseries_data_to_write_request
+from .utils import (
+    batch_to_write_requests,
+    is_iterable,
+    timeseries_data_to_write_request,
+)
 
 
 logger = logging.getLogger(__name__)
@@ -29,8 +34,30 @@ class GRPCClient:
         self.stub = MarketstoreStub(self.endpoint, options)
 
     def query(self, params: Union[Params, List[Params]]) -> QueryReply:
-        reply = self.stub.Query(self._build_query(params))
-        return QueryReply.from_grpc_response(reply)
+        if not is_iterable(params):
+            params = [params]
+        with span("query", transport="grpc", queries=len(params)) as s:
+            with span("grpc.encode") as encode:
+                request = self._build_query(params)
+                if encode.recording:
+                    encode.set(bytes=request.ByteSize())
+            reply = self.stub.Query(request)
+            reply = QueryReply.from_grpc_response(reply, params)
+            if s.recording:
+                s.set(rows=reply.rows())
+            return reply
+
+    def sql(self, statements: Union[str, List[str]]) -> QueryReply:
+        if isinstance(statements, str):
+            statements = [statements]
+
+        req = proto.MultiQueryRequest(
+            requests=[
+                proto.QueryRequest(is_sql_statement=True, sql_statement=statement)
+                for statement in statements
+            ]
+        )
+        return QueryReply.from_grpc_response(self.stub.Query(req))
 
     def write(
         self,
@@ -52,6 +79,24 @@ class GRPCClient:
         )
         return self.stub.Write(req)
 
+    def write_batch(
+        self, batch: dict, is_variable_length: bool = False
+    ) -> proto.MultiServerResponse:
+        req = proto.MultiWriteRequest(
+            requests=[
+                dict(
+                    data=dict(
+                        data=dataset,
+                        start_index=start_index,
+                        lengths=lengths,
+                    ),
+                    is_variable_length=is_variable_length,
+                )
+                for dataset, start_index, lengths in batch_to_write_requests(batch)
+            ]
+        )
+        return self.stub.Write(req)
+
     def list_symbols(
         self,
         fmt: ListSymbolsFormat = ListSymbolsFormat.SYMBOL,
@@ -129,17 +174,26 @@ class MarketstoreStub(gp.MarketstoreStub):
         self.endpoint = endpoint
         super().__init__(grpc.insecure_channel(self.endpoint, options))
 
-        def error_wrapper(wrapped_grpc_endpoint):
+        def error_wrapper(method, wrapped_grpc_endpoint):
             @functools.wraps(wrapped_grpc_endpoint)
             def decorator(*args, **kwargs):
-                try:
-                    return wrapped_grpc_endpoint(*args, **kwargs)
-                except grpc.RpcError as e:
-                    if e.__class__.__name__ != "_InactiveRpcError":
-                        raise
-                raise Exception(
-                    "Could not connect to marketstore at {}".format(self.endpoint)
-                )
+                with span("grpc.call", method=method) as s:
+                    try:
+                        resp = wrapped_grpc_endpoint(*args, **kwargs)
+                    except grpc.RpcError as e:
+                        if e.__class__.__name__ != "_InactiveRpcError":
+                            raise
+                    else:
+                        if s.recording:
+                            # ByteSize() walks the message: only when traced
+                            s.set(
+                                request_bytes=args[0].ByteSize(),
+                                response_bytes=resp.ByteSize(),
+                            )
+                        return resp
+                    raise Exception(
+                        "Could not connect to marketstore at {}".format(self.endpoint)
+                    )
 
             return decorator
 
@@ -147,4 +201,4 @@ class MarketstoreStub(gp.MarketstoreStub):
             if attr.startswith("__"):
                 continue
             elif isinstance(value, grpc.UnaryUnaryMultiCallable):
-                setattr(self, attr, error_wrapper(value))
+                setattr(self, attr, error_wrapper(attr, value))
@@ -0,0 +1,217 @@
+"""
+Process-wide multiplexing of MarketStore stream subscriptions.
+
+A ``StreamHub`` owns a single ``AsyncStreamConn`` per endpoint.  Any number of
+consumers can subscribe to (possibly overlapping) stream patterns through it:
+the hub subscribes to the merged set of patterns over the one WebSocket,
+updates that subscription in place as consumers come and go, and fans every
+received message out to the consumers whose patterns match its key.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from collections.abc import Callable, Iterable
+from fnmatch import fnmatchcase
+from typing import Any
+
+from .async_stream import AsyncStreamConn
+
+
+logger = logging.getLogger(__name__)
+
+
+def stream_matches(pattern: str, key: str) -> bool:
+    """
+    Whether the MarketStore stream ``pattern`` (eg ``"*/1Min/OHLCV"``)
+    matches the time bucket ``key`` (eg ``"AAPL/1Min/OHLCV"``).
+    """
+    pattern_parts = pattern.split("/")
+    key_parts = key.split("/")
+    if len(pattern_parts) != len(key_parts):
+        return False
+    return all(fnmatchcase(k, p) for p, k in zip(pattern_parts, key_parts))
+
+
+def merge_streams(streams: Iterable[str]) -> list[str]:
+    """
+    Merge stream patterns, dropping duplicates and patterns that are already
+    covered by a more general one (eg ``"AAPL/1Min/OHLCV"`` by ``"*/1Min/*"``).
+    """
+    unique = sorted(set(streams))
+    return [
+        pattern
+        for pattern in unique
+        if not any(
+            other != pattern and stream_matches(other, pattern) for other in unique
+        )
+    ]
+
+
+class Subscription:
+    """
+    A single consumer's subscription to a ``StreamHub``.
+
+    Parameters
+    ----------
+    hub : StreamHub
+        The hub this subscription belongs to.
+    streams : list[str]
+        MarketStore stream patterns this consumer is interested in.
+    handler : Callable
+        Called as ``handler(key: str, data: dict)`` for every matching message.
+
+    """
+
+    def __init__(self, hub: StreamHub, streams: list[str], handler: Callable) -> None:
+        self.hub = hub
+        self.streams = list(streams)
+        self.handler = handler
+        self._matches: dict[str, bool] = {}
+
+    def matches(self, key: str) -> bool:
+        """Whether messages for ``key`` should be delivered to this consumer."""
+        try:
+            return self._matches[key]
+        except KeyError:
+            match = any(stream_matches(pattern, key) for pattern in self.streams)
+            self._matches[key] = match
+            return match
+
+    async def update(self, streams: list[str]) -> None:
+        """Change the patterns of this subscription without reconnecting."""
+        self.streams = list(streams)
+        self._matches.clear()
+        await self.hub._resubscribe()
+
+    async def unsubscribe(self) -> None:
+        """Remove this subscription from its hub."""
+        await self.hub.unsubscribe(self)
+
+    def __repr__(self) -> str:
+        return "Subscription(streams={})".format(self.streams)
+
+
+class StreamHub:
+    """
+    Shares one MarketStore WebSocket connection between many consumers.
+
+    Use ``StreamHub.for_endpoint()`` to get the process-wide hub of an
+    endpoint.  The connection is opened when the first consumer subscribes and
+    closed again when the last one unsubscribes.
+
+    Parameters
+    ----------
+    endpoint : str
+        The WebSocket endpoint URL (e.g., ``"ws://localhost:5993/ws"``).
+    **conn_kwargs
+        Passed through to ``AsyncStreamConn`` (eg ``reconnect_policy``).
+
+    """
+
+    _hubs: dict[str, StreamHub] = {}
+
+    def __init__(self, endpoint: str, **conn_kwargs: Any) -> None:
+        self.endpoint = endpoint
+        self.conn = AsyncStreamConn(endpoint, **conn_kwargs)
+        self.conn.register(r".*", self._fanout)
+        self._subscriptions: list[Subscription] = []
+        self._task: asyncio.Task | None = None
+
+    @classmethod
+    def for_endpoint(cls, endpoint: str, **conn_kwargs: Any) -> StreamHub:
+        """
+        Return the process-wide hub for ``endpoint``, creating it if needed.
+
+        ``conn_kwargs`` are only used when the hub is created.
+        """
+        try:
+            return cls._hubs[endpoint]
+        except KeyError:
+            hub = cls._hubs[endpoint] = cls(endpoint, **conn_kwargs)
+            return hub
+
+    @property
+    def streams(self) -> list[str]:
+        """The merged stream patterns of all current subscriptions."""
+        return merge_streams(
+            pattern for sub in self._subscriptions for pattern in sub.streams
+        )
+
+    @property
+    def subscriptions(self) -> list[Subscription]:
+        return list(self._subscriptions)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def subscribe(self, streams: list[str], handler: Callable) -> Subscription:
+        """
+        Subscribe ``handler`` to the given stream patterns.
+
+        The handler is called as ``handler(key: str, data: dict)`` and must not
+        block, since all consumers share the hub's receive loop.
+        """
+        subscription = Subscription(self, streams, handler)
+        self._subscriptions.append(subscription)
+        await self._resubscribe()
+        return subscription
+
+    async def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a subscription; closes the connection if it was the last."""
+        try:
+            self._subscriptions.remove(subscription)
+        except ValueError:
+            return
+        await self._resubscribe()
+
+    async def close(self) -> None:
+        """Drop all subscriptions and close the connection."""
+        self._subscriptions.clear()
+        await self._resubscribe()
+
+    async def _resubscribe(self) -> None:
+        streams = self.streams
+        if not streams:
+            await self._stop()
+        elif not self.running:
+            self._task = asyncio.create_task(self._run())
+        elif streams != self.conn._streams:
+            await self.conn.update_streams(streams)
+
+    async def _run(self) -> None:
+        # read the streams when the task actually starts, so that subscription
+        # changes made before then are not lost
+        try:
+            await self.conn.run(self.streams)
+        except Exception:
+            logger.exception("StreamHub connection to %s failed", self.endpoint)
+
+    async def _stop(self) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        await self.conn.stop()
+        if not task.done():
+            task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def _fanout(self, key: str, data: dict) -> None:
+        for subscription in self._subscriptions:
+            if subscription.matches(key):
+                try:
+                    subscription.handler(key, data)
+                except Exception:
+                    logger.exception("Error in stream handler for key '%s'", key)
+
+    def __repr__(self) -> str:
+        return 'StreamHub("{}", subscriptions={})'.format(
+            self.endpoint,
+            len(self._subscriptions),
+        )
@@ -0,0 +1,403 @@
+"""
+Bulk import of Parquet, Arrow and CSV files into MarketStore.
+
+``import_files()`` reads each file in chunks (Parquet batches, memory-mapped
+Arrow IPC record batches, CSV in ``chunksize`` blocks), so memory stays bounded
+by a few chunks however large the files are.  Each chunk is matched to the
+shape of its bucket: the shape of an existing bucket is read from the server,
+otherwise a given ``DataShape`` or the one inferred from the file is used and
+the bucket is created.  Chunks of many buckets are packed into multi-tbk write
+requests (``write_batch()``), which a pool of writers sends while the next
+batch is being read.  Batches holding the same bucket are written one after
+the other, in file order, so that concurrent writers never interleave rows
+of one bucket.
+
+Files written by ``pymkts export`` can be imported as they are: their bucket
+key is taken from the ``{symbol}/{timeframe}/{attrgroup}.{ext}`` layout.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from .export import _require_pyarrow
+from .params import DataShape, DataType, ListSymbolsFormat, Params
+
+
+EXTENSIONS = {
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "feather",
+    ".feather": "feather",
+    ".ipc": "feather",
+    ".csv": "csv",
+}
+
+_NUMPY_TYPES = {
+    DataType.float32: "f4",
+    DataType.float64: "f8",
+    DataType.int16: "i2",
+    DataType.int32: "i4",
+    DataType.int64: "i8",
+    DataType.uint8: "u1",
+    DataType.uint16: "u2",
+    DataType.uint32: "u4",
+    DataType.uint64: "u8",
+    DataType.epoch: "i8",
+    DataType.byte: "i1",
+    DataType.bool: "?",
+}
+
+
+def parse_shape(text: str) -> DataShape:
+    """Parse a shape like ``"Epoch/int64:Open/float32:Close/float32"``."""
+    columns = []
+    for column in text.split(":"):
+        name, _, data_type = column.partition("/")
+        if not name or not data_type:
+            raise ValueError(f"invalid column {column!r} in shape {text!r}")
+        columns.append((name, data_type))
+    return DataShape(columns)
+
+
+def shape_dtype(shape: DataShape) -> np.dtype:
+    """The numpy record type of ``shape``."""
+    fields = []
+    for name, data_type in shape:
+        if data_type not in _NUMPY_TYPES:
+            raise ValueError(f"unsupported column type {data_type.value} of `{name}`")
+        fields.append((name, _NUMPY_TYPES[data_type]))
+    return np.dtype(fields)
+
+
+def infer_shape(dtype: np.dtype) -> DataShape:
+    """The ``DataShape`` of a numpy record type."""
+    columns = []
+    for name in dtype.names:
+        try:
+            columns.append((name, DataType[dtype[name].name]))
+        except KeyError:
+            raise ValueError(
+                f"column `{name}` has unsupported type {dtype[name].name}"
+            ) from None
+    return DataShape(columns)
+
+
+def tbk_for_path(
+    path: str | os.PathLike,
+    timeframe: str | None = None,
+    attrgroup: str = "OHLCV",
+) -> str:
+    """
+    The bucket key of a file: ``{symbol}/{timeframe}/{attrgroup}.{ext}`` (as
+    written by ``pymkts export``), or ``{symbol}.{ext}`` with the given
+    ``timeframe`` and ``attrgroup``.
+    """
+    path = os.path.abspath(os.fspath(path))
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if timeframe is not None:
+        return f"{stem}/{timeframe}/{attrgroup}"
+    parent = os.path.dirname(path)
+    symbol = os.path.basename(os.path.dirname(parent))
+    if not symbol:
+        raise ValueError(f"cannot tell the bucket key of {path}: pass a timeframe")
+    return f"{symbol}/{os.path.basename(parent)}/{stem}"
+
+
+def collect_files(paths: Iterable[str | os.PathLike]) -> list[str]:
+    """The supported files among ``paths``, searching directories recursively."""
+    files = []
+    for path in map(os.fspath, paths):
+        if os.path.isdir(path):
+            for root, _, names in sorted(os.walk(path)):
+                files.extend(
+                    os.path.join(root, name)
+                    for name in sorted(names)
+                    if os.path.splitext(name)[1].lower() in EXTENSIONS
+                )
+        else:
+            files.append(path)
+    return files
+
+
+def _epochs(values: np.ndarray) -> tuple[np.ndarray, np.ndarray | None]:
+    # -> (epoch seconds, nanoseconds or None)
+    if values.dtype.kind in "iu":
+        return values.astype("i8"), None
+    if values.dtype.kind == "M":
+        ns = values.astype("M8[ns]").astype("i8")
+    else:
+        ns = pd.to_datetime(values, utc=True).as_unit("ns").asi8
+    seconds, nanos = np.divmod(ns, 10**9)
+    return seconds, nanos if nanos.any() else None
+
+
+def _records(columns: dict[str, np.ndarray], time_column: str) -> np.ndarray:
+    if time_column not in columns:
+        raise ValueError(f"no `{time_column}` column")
+    epochs, nanos = _epochs(np.asarray(columns.pop(time_column)))
+    columns = {"Epoch": epochs, **columns}
+    if nanos is not None and "Nanoseconds" not in columns:
+        columns["Nanoseconds"] = nanos.astype("i4")
+
+    array = np.empty(len(epochs), dtype=[(name, v.dtype) for name, v in columns.items()])
+    for name, values in columns.items():
+        array[name] = values
+    return array
+
+
+def iter_file_chunks(
+    path: str | os.PathLike,
+    chunk_rows: int = 100_000,
+    time_column: str = "Epoch",
+) -> Iterator[np.ndarray]:
+    """
+    Yield the rows of a Parquet, Arrow IPC (Feather) or CSV file as record
+    arrays of at most ``chunk_rows`` rows, with ``Epoch`` (seconds) first.
+    ``time_column`` may hold epoch seconds or datetimes; sub-second times add a
+    ``Nanoseconds`` column.
+    """
+    path = os.fspath(path)
+    kind = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if kind is None:
+        raise ValueError(f"unsupported file type: {path}")
+    if kind == "csv":
+        with pd.read_csv(path, chunksize=chunk_rows) as reader:
+            for df in reader:
+                yield _records({c: df[c].to_numpy() for c in df.columns}, time_column)
+        return
+
+    pa = _require_pyarrow()
+    if kind == "parquet":
+        import pyarrow.parquet as pq
+
+        with pq.ParquetFile(path, memory_map=True) as f:
+            for batch in f.iter_batches(chunk_rows):
+                yield _arrow_records(batch, time_column)
+        return
+
+    # record batches are read straight from the mapping; _records copies
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            for offset in range(0, batch.num_rows, chunk_rows):
+                yield _arrow_records(batch.slice(offset, chunk_rows), time_column)
+
+
+def _arrow_records(batch: Any, time_column: str) -> np.ndarray:
+    return _records(
+        {
+            name: batch.column(i).to_numpy(zero_copy_only=False)
+            for i, name in enumerate(batch.schema.names)
+        },
+        time_column,
+    )
+
+
+def conform(array: np.ndarray, dtype: np.dtype, tbk: str = "") -> np.ndarray:
+    """
+    Reorder and cast the columns of ``array`` to ``dtype``, refusing missing
+    or extra columns and unsafe casts (eg float to int).
+    """
+    if array.dtype == dtype:
+        return array
+    missing = [n for n in dtype.names if n not in array.dtype.names]
+    extra = [n for n in array.dtype.names if n not in dtype.names]
+    if missing or extra:
+        raise ValueError(
+            "{}columns do not match the bucket: missing {}, unexpected {}".format(
+                f"{tbk}: " if tbk else "", missing, extra
+            )
+        )
+    out = np.empty(len(array), dtype=dtype)
+    for name in dtype.names:
+        if not np.can_cast(array.dtype[name], dtype[name], "same_kind"):
+            raise ValueError(
+                "{}cannot store `{}` of type {} as {}".format(
+                    f"{tbk}: " if tbk else "",
+                    name,
+                    array.dtype[name],
+                    dtype[name],
+                )
+            )
+        out[name] = array[name]
+    return out
+
+
+def _bucket_dtype(client: Any, tbk: str) -> np.dtype | None:
+    try:
+        reply = client.query(Params(*tbk.split("/"), limit=1))
+    except Exception as e:
+        if "no results returned from query" in str(e):
+            return None
+        raise
+    for ds in reply.results[0].all().values():
+        return ds.array.dtype
+    return None
+
+
+def _write_errors(reply: Any) -> list[str]:
+    # a write reply lists per-request errors: a dict from JSON-RPC, a
+    # MultiServerResponse from gRPC
+    responses = (
+        reply.get("responses")
+        if isinstance(reply, dict)
+        else getattr(reply, "responses", None)
+    )
+    errors = []
+    for response in responses or ():
+        error = response.get("error") if isinstance(response, dict) else response.error
+        if error:
+            errors.append(str(error))
+    return errors
+
+
+def import_files(
+    client: Any,
+    files: Iterable[tuple[str | os.PathLike, str]],
+    shape: DataShape | None = None,
+    create: bool = True,
+    time_column: str = "Epoch",
+    chunk_rows: int = 100_000,
+    batch_rows: int = 500_000,
+    workers: int = 4,
+    progress: Callable[[int], None] | None = None,
+) -> dict:
+    """
+    Write files into their buckets.
+
+    Parameters
+    ----------
+    client : Client
+        Any client with ``query()``, ``list_symbols()``, ``create()`` and
+        ``write_batch()``.
+    files : iterable of (path, tbk)
+        The files and the bucket key each is written to (see
+        ``tbk_for_path()``).
+    shape : DataShape, optional
+        The shape of new buckets (default: inferred from the file).  Existing
+        buckets keep theirs; the file's columns are cast to it.
+    create : bool, default True
+        Whether to create missing buckets (else it is an error).
+    time_column : str, default "Epoch"
+        The column holding the time of each row.
+    chunk_rows : int, default 100_000
+        Rows read from a file at a time.
+    batch_rows : int, default 500_000
+        Rows per write request (chunks of several buckets are combined).
+    workers : int, default 4
+        Number of write requests in flight; reading continues meanwhile.
+        Requests that share a bucket wait for each other.
+    progress : callable, optional
+        Called with the number of rows of each written batch.
+
+    Returns
+    -------
+    dict
+        ``files``, ``tbks``, ``created`` (list of tbks), ``rows`` (written
+        by requests the server accepted), ``requests``, ``seconds`` and
+        ``rows_per_sec``.
+
+    """
+    started = time.perf_counter()
+    existing = set(client.list_symbols(fmt=ListSymbolsFormat.TBK))
+    dtypes: dict[str, np.dtype] = {}
+    created: list[str] = []
+    stats = {"files": 0, "rows": 0, "requests": 0}
+    lock = threading.Lock()
+    # bounds the batches read ahead of the writers
+    slots = threading.BoundedSemaphore(2 * workers)
+    futures: list[Future] = []
+    # the last write of each bucket, which its next write waits for
+    last_write: dict[str, Future] = {}
+
+    def target_dtype(tbk: str, chunk: np.ndarray) -> np.dtype:
+        if tbk not in dtypes:
+            dtype = _bucket_dtype(client, tbk) if tbk in existing else None
+            if dtype is None:
+                dtype = shape_dtype(shape) if shape is not None else chunk.dtype
+                if tbk not in existing:
+                    if not create:
+                        raise ValueError(f"{tbk} does not exist")
+                    client.create(tbk, shape or infer_shape(chunk.dtype))
+                    created.append(tbk)
+            dtypes[tbk] = dtype
+        return dtypes[tbk]
+
+    def write(batch: dict[str, list[np.ndarray]], after: list[Future]) -> None:
+        try:
+            # futures run in submission order, so what this write waits for
+            # has started already and cannot be queued behind it
+            wait(after)
+            for future in after:
+                if future.exception() is not None:
+                    raise RuntimeError("an earlier write of the same bucket failed")
+            data = {
+                tbk: arrays[0] if len(arrays) == 1 else np.concatenate(arrays)
+                for tbk, arrays in batch.items()
+            }
+            errors = _write_errors(client.write_batch(data))
+            if errors:
+                raise RuntimeError("write failed: {}".format("; ".join(errors)))
+            rows = sum(len(array) for array in data.values())
+            with lock:
+                stats["rows"] += rows
+                stats["requests"] += 1
+            if progress is not None:
+                progress(rows)
+        finally:
+            slots.release()
+
+    def submit(pool: ThreadPoolExecutor, batch: dict) -> None:
+        slots.acquire()
+        after = [last_write[tbk] for tbk in batch if tbk in last_write]
+        future = pool.submit(write, batch, after)
+        futures.append(future)
+        for tbk in batch:
+            last_write[tbk] = future
+        # fail fast instead of reading on after a write failed
+        for future in futures:
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        batch: dict[str, list[np.ndarray]] = {}
+        rows = 0
+        for path, tbk in files:
+            for chunk in iter_file_chunks(path, chunk_rows, time_column):
+                if not len(chunk):
+                    continue
+                batch.setdefault(tbk, []).append(
+                    conform(chunk, target_dtype(tbk, chunk), tbk)
+                )
+                rows += len(chunk)
+                if rows >= batch_rows:
+                    submit(pool, batch)
+                    batch, rows = {}, 0
+            stats["files"] += 1
+        if batch:
+            submit(pool, batch)
+
+    for future in futures:
+        future.result()
+
+    seconds = time.perf_counter() - started
+    return {
+        "files": stats["files"],
+        "tbks": len(dtypes),
+        "created": created,
+        "rows": stats["rows"],
+        "requests": stats["requests"],
+        "seconds": seconds,
+        "rows_per_sec": stats["rows"] / seconds if seconds else 0.0,
+    }
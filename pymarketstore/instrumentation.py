@@ -0,0 +1,578 @@
+"""
+Metrics and tracing hooks.
+
+The clients time their work in nested *spans*:
+
+- ``query``: ``JsonRpcClient.query()`` / ``GRPCClient.query()``, with the
+  ``transport``, number of ``queries`` and decoded ``rows``
+- ``jsonrpc.call``: one JSON-RPC request, with its ``method``; inside it
+  ``jsonrpc.encode`` (msgpack packing, with the request's ``bytes``),
+  ``jsonrpc.http`` (network and server time) and ``jsonrpc.unpack``
+  (msgpack unpacking, with the response's ``bytes``)
+- ``grpc.encode``: building the protobuf request of a query, with its
+  ``bytes``
+- ``grpc.call``: one gRPC call (network, server time and protobuf decoding),
+  with the ``method`` and the ``request_bytes`` and ``response_bytes`` of
+  its messages
+- ``results.decode``: turning a packed result into a numpy array, with its
+  ``rows`` and ``bytes``
+- ``DataSet.df``: building a DataFrame, with its ``rows``
+
+Every finished span, with its duration and the exception that ended it (if
+any), is handed to the registered sinks: ``LoggingSink``, ``MetricsSink``
+(Prometheus-style counters), ``OpenTelemetrySink``, or any ``Sink``
+subclass.  With no sinks registered, which is the default, ``span()``
+returns a shared no-op span, so instrumentation costs a function call.
+
+``recording()`` sends sinks the spans of the current thread or task only;
+``QueryProfile`` uses it to profile single queries (``Client(profile=True)``).
+
+Usage::
+
+    from pymarketstore import instrumentation
+
+    metrics = instrumentation.MetricsSink()
+    instrumentation.add_sink(metrics)
+    client.query(params).first().df()
+    print(metrics.expose())
+"""
+
+from __future__ import annotations
+
+import bisect
+import contextvars
+import logging
+import threading
+import time
+
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from typing import Any
+
+
+logger = logging.getLogger(__name__)
+
+# registered sinks; a tuple so that spans can read it without a lock
+_sinks: tuple[Sink, ...] = ()
+_sinks_lock = threading.Lock()
+_current: contextvars.ContextVar[Span | None] = contextvars.ContextVar(
+    "pymarketstore_span", default=None
+)
+# sinks of the current thread or task only (``recording()``)
+_local_sinks: contextvars.ContextVar[tuple[Sink, ...]] = contextvars.ContextVar(
+    "pymarketstore_sinks", default=()
+)
+
+
+class Sink:
+    """
+    Receives the spans of the clients.  Subclasses override ``end()`` and,
+    to act when a span starts (eg to open a tracing span), ``start()``.
+    """
+
+    def start(self, span: Span) -> Any:
+        """Called when ``span`` starts; the return value is passed to ``end()``."""
+        return None
+
+    def end(self, span: Span, state: Any) -> None:
+        """Called when ``span`` has ended."""
+
+
+class Span:
+    """
+    A timed operation.
+
+    Attributes
+    ----------
+    name : str
+        What was timed, eg ``"jsonrpc.call"``.
+    attributes : dict
+        Details of the operation, eg ``method``, ``rows`` or ``response_bytes``.
+    parent : Span or None
+        The span this one started in (on the same thread or task).
+    error : BaseException or None
+        The exception that ended the span.
+    """
+
+    __slots__ = (
+        "name",
+        "attributes",
+        "parent",
+        "error",
+        "start",
+        "end",
+        "_sinks",
+        "_states",
+        "_token",
+    )
+
+    recording = True
+
+    def __init__(self, name: str, attributes: dict, sinks: Sequence[Sink]) -> None:
+        self.name = name
+        self.attributes = attributes
+        self.parent = None
+        self.error = None
+        self.start = self.end = None
+        self._sinks = sinks
+        self._states = ()
+        self._token = None
+
+    def set(self, **attributes: Any) -> None:
+        """Add or update attributes."""
+        self.attributes.update(attributes)
+
+    @property
+    def duration(self) -> float | None:
+        """Seconds from start to end, once ended."""
+        if self.end is None:
+            return None
+        return self.end - self.start
+
+    def __enter__(self) -> Span:
+        self.parent = _current.get()
+        self._token = _current.set(self)
+        self._states = [_call(sink.start, self) for sink in self._sinks]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.end = time.perf_counter()
+        self.error = exc
+        _current.reset(self._token)
+        for sink, state in zip(self._sinks, self._states):
+            _call(sink.end, self, state)
+        return False
+
+    def __repr__(self):
+        return "Span({!r}, duration={}, attributes={})".format(
+            self.name, self.duration, self.attributes
+        )
+
+
+class _NoopSpan:
+    """What ``span()`` returns while no sink is registered."""
+
+    __slots__ = ()
+
+    recording = False
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def __enter__(self) -> _NoopSpan:
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def _call(method, *args):
+    # a broken sink must not break queries
+    try:
+        return method(*args)
+    except Exception:
+        logger.exception("instrumentation sink %r failed", method.__self__)
+        return None
+
+
+def span(name: str, **attributes: Any) -> Span | _NoopSpan:
+    """
+    A context manager timing the block it wraps as a span named ``name``.
+
+    Check ``recording`` before computing attributes that are expensive to
+    get: it is False while no sink is registered.
+    """
+    sinks = _sinks
+    local = _local_sinks.get()
+    if local:
+        sinks = sinks + local
+    if not sinks:
+        return _NOOP
+    return Span(name, attributes, sinks)
+
+
+def current_span() -> Span | None:
+    """The innermost span open on this thread or task."""
+    return _current.get()
+
+
+def enabled() -> bool:
+    """Whether any sink is registered, globally or by ``recording()``."""
+    return bool(_sinks or _local_sinks.get())
+
+
+def add_sink(sink: Sink) -> Sink:
+    """Register ``sink`` to receive all spans from now on, and return it."""
+    global _sinks
+    with _sinks_lock:
+        if sink not in _sinks:
+            _sinks = _sinks + (sink,)
+    return sink
+
+
+def remove_sink(sink: Sink) -> None:
+    """Stop sending spans to ``sink``."""
+    global _sinks
+    with _sinks_lock:
+        _sinks = tuple(s for s in _sinks if s is not sink)
+
+
+def sinks() -> tuple[Sink, ...]:
+    """The registered sinks."""
+    return _sinks
+
+
+@contextmanager
+def instrumented(*sinks: Sink) -> Iterator[tuple[Sink, ...]]:
+    """Register ``sinks`` for the duration of a ``with`` block."""
+    for sink in sinks:
+        add_sink(sink)
+    try:
+        yield sinks
+    finally:
+        for sink in sinks:
+            remove_sink(sink)
+
+
+@contextmanager
+def recording(*sinks: Sink) -> Iterator[tuple[Sink, ...]]:
+    """
+    Send ``sinks`` the spans of a ``with`` block: only those of the current
+    thread or asyncio task, unlike ``instrumented()``.
+    """
+    token = _local_sinks.set(_local_sinks.get() + sinks)
+    try:
+        yield sinks
+    finally:
+        _local_sinks.reset(token)
+
+
+class LoggingSink(Sink):
+    """
+    Logs every span: at ``level`` when it succeeded, and at WARNING when it
+    ended with an exception.
+
+    Parameters
+    ----------
+    logger : logging.Logger, optional
+        Default: this module's logger, ``pymarketstore.instrumentation``.
+    level : int, default logging.DEBUG
+    names : sequence of str, optional
+        Only log the spans of these names.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger | None = None,
+        level: int = logging.DEBUG,
+        names: Sequence[str] | None = None,
+    ) -> None:
+        self.logger = logger or logging.getLogger(__name__)
+        self.level = level
+        self.names = None if names is None else frozenset(names)
+
+    def end(self, span: Span, state: Any) -> None:
+        if self.names is not None and span.name not in self.names:
+            return
+        attributes = " ".join("{}={}".format(k, v) for k, v in span.attributes.items())
+        if span.error is None:
+            self.logger.log(
+                self.level, "%s %.3f ms %s", span.name, span.duration * 1000, attributes
+            )
+        else:
+            self.logger.warning(
+                "%s %.3f ms %s failed: %r",
+                span.name,
+                span.duration * 1000,
+                attributes,
+                span.error,
+            )
+
+    def __repr__(self):
+        return "LoggingSink({!r}, level={})".format(
+            self.logger.name, logging.getLevelName(self.level)
+        )
+
+
+class _Series:
+    __slots__ = ("count", "errors", "seconds", "buckets", "totals")
+
+    def __init__(self, bounds: int) -> None:
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.buckets = [0] * (bounds + 1)
+        self.totals: dict[str, float] = {}
+
+
+class MetricsSink(Sink):
+    """
+    Prometheus-style metrics of the spans, per span name: a count, an error
+    count, a histogram of durations, and the totals of numeric attributes
+    (``rows``, ``request_bytes``, ...).
+
+    ``snapshot()`` returns them as a dict and ``expose()`` in the Prometheus
+    text format, for a ``/metrics`` endpoint or a push gateway.
+
+    Parameters
+    ----------
+    buckets : sequence of float
+        Upper bounds (seconds) of the duration histogram buckets.
+    prefix : str, default "pymarketstore"
+        Prefix of the exposed metric names.
+    """
+
+    DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+    def __init__(
+        self,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        prefix: str = "pymarketstore",
+    ) -> None:
+        self.bounds = tuple(sorted(buckets))
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._series: dict[str, _Series] = {}
+
+    def end(self, span: Span, state: Any) -> None:
+        duration = span.duration
+        bucket = bisect.bisect_left(self.bounds, duration)
+        with self._lock:
+            series = self._series.get(span.name)
+            if series is None:
+                series = self._series[span.name] = _Series(len(self.bounds))
+            series.count += 1
+            series.seconds += duration
+            series.buckets[bucket] += 1
+            if span.error is not None:
+                series.errors += 1
+            for key, value in span.attributes.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    series.totals[key] = series.totals.get(key, 0) + value
+
+    def snapshot(self) -> dict[str, dict]:
+        """``{span name: {"count", "errors", "seconds", attribute totals...}}``."""
+        with self._lock:
+            return {
+                name: {
+                    "count": s.count,
+                    "errors": s.errors,
+                    "seconds": s.seconds,
+                    **s.totals,
+                }
+                for name, s in self._series.items()
+            }
+
+    def reset(self) -> None:
+        """Forget all counts."""
+        with self._lock:
+            self._series.clear()
+
+    def expose(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        p = self.prefix
+        lines = [
+            f"# TYPE {p}_span_seconds histogram",
+            f"# TYPE {p}_span_errors_total counter",
+        ]
+        totals = []
+        with self._lock:
+            for name, s in sorted(self._series.items()):
+                label = 'span="{}"'.format(name)
+                cumulative = 0
+                for bound, count in zip(self.bounds + (float("inf"),), s.buckets):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(
+                        f'{p}_span_seconds_bucket{{{label},le="{le}"}} {cumulative}'
+                    )
+                lines.append(f"{p}_span_seconds_sum{{{label}}} {s.seconds!r}")
+                lines.append(f"{p}_span_seconds_count{{{label}}} {s.count}")
+                lines.append(f"{p}_span_errors_total{{{label}}} {s.errors}")
+                totals += [(key, label, value) for key, value in s.totals.items()]
+        for key in sorted({key for key, _, _ in totals}):
+            lines.append(f"# TYPE {p}_{key}_total counter")
+            lines += [
+                f"{p}_{key}_total{{{label}}} {value!r}"
+                for k, label, value in totals
+                if k == key
+            ]
+        return "\n".join(lines) + "\n"
+
+    def __repr__(self):
+        return "MetricsSink(spans={})".format(sorted(self._series))
+
+
+class OpenTelemetrySink(Sink):
+    """
+    Mirrors the spans as OpenTelemetry spans, nested like them and carrying
+    their attributes (prefixed ``pymarketstore.``), with the exception and an
+    error status when one ended them.
+
+    Needs the optional ``opentelemetry-api`` package (and an SDK configured
+    to export the spans) unless a ``tracer`` is given.
+
+    Parameters
+    ----------
+    tracer : opentelemetry.trace.Tracer, optional
+        Default: ``opentelemetry.trace.get_tracer("pymarketstore")``.
+    """
+
+    def __init__(self, tracer: Any = None) -> None:
+        if tracer is None:
+            try:
+                from opentelemetry import trace
+            except ImportError:
+                raise ImportError(
+                    "The 'opentelemetry-api' package is required for OpenTelemetrySink. "
+                    "Install it with: pip install opentelemetry-api"
+                )
+            from . import __version__
+
+            tracer = trace.get_tracer("pymarketstore", __version__)
+        self.tracer = tracer
+
+    def start(self, span: Span) -> Any:
+        manager = self.tracer.start_as_current_span(span.name)
+        otel_span = manager.__enter__()
+        return manager, otel_span
+
+    def end(self, span: Span, state: Any) -> None:
+        manager, otel_span = state
+        for key, value in span.attributes.items():
+            otel_span.set_attribute("pymarketstore." + key, value)
+        error = span.error
+        if error is None:
+            manager.__exit__(None, None, None)
+        else:
+            manager.__exit__(type(error), error, error.__traceback__)
+
+    def __repr__(self):
+        return "OpenTelemetrySink({!r})".format(self.tracer)
+
+
+class QueryProfile(Sink):
+    """
+    Where one query spent its time, collected from its spans while
+    ``Client(profile=True)`` runs it (see ``QueryReply.profile``).
+
+    Attributes
+    ----------
+    transport : str or None
+        ``"jsonrpc"`` or ``"grpc"``; None if no request reached the server
+        (eg every result came from the ``ResultCache``).
+    total_seconds : float
+        The whole ``Client.query()`` call.
+    encode_seconds : float
+        Building the request: msgpack packing, or protobuf messages.
+    wire_seconds : float
+        Network and server time (for gRPC, including protobuf decoding).
+    unpack_seconds : float
+        msgpack unpacking of the response (JSON-RPC only).
+    decode_seconds : float
+        Turning the packed columns into numpy arrays.
+    request_bytes, response_bytes : int
+        Sizes of the request and of the response received.
+    allocated_bytes : int
+        Bytes of the numpy arrays allocated by decoding, the bulk of the
+        memory a query allocates.
+    rows : dict
+        Rows of each time bucket key of the reply.
+    requests : int
+        Server round trips (0 when the ``ResultCache`` answered).
+    """
+
+    def __init__(self) -> None:
+        self.transport = None
+        self.total_seconds = 0.0
+        self.encode_seconds = 0.0
+        self.wire_seconds = 0.0
+        self.unpack_seconds = 0.0
+        self.decode_seconds = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.allocated_bytes = 0
+        self.rows: dict[str, int] = {}
+        self.requests = 0
+
+    def end(self, span: Span, state: Any) -> None:
+        name, attributes = span.name, span.attributes
+        if name == "query":
+            self.transport = attributes.get("transport")
+        elif name == "jsonrpc.encode":
+            self.encode_seconds += span.duration
+            self.request_bytes += attributes.get("bytes", 0)
+        elif name == "grpc.encode":
+            self.encode_seconds += span.duration
+        elif name == "jsonrpc.http":
+            self.wire_seconds += span.duration
+            self.requests += 1
+        elif name == "jsonrpc.unpack":
+            self.unpack_seconds += span.duration
+            self.response_bytes += attributes.get("bytes", 0)
+        elif name == "grpc.call":
+            self.wire_seconds += span.duration
+            self.requests += 1
+            self.request_bytes += attributes.get("request_bytes", 0)
+            self.response_bytes += attributes.get("response_bytes", 0)
+        elif name == "results.decode":
+            self.decode_seconds += span.duration
+            self.allocated_bytes += attributes.get("bytes", 0)
+
+    @contextmanager
+    def measure(self) -> Iterator[QueryProfile]:
+        """Collect the spans of a ``with`` block (on this thread or task)."""
+        started = time.perf_counter()
+        try:
+            with recording(self):
+                yield self
+        finally:
+            self.total_seconds += time.perf_counter() - started
+
+    @property
+    def other_seconds(self) -> float:
+        """Time outside the measured phases: filters, building results, ..."""
+        phases = (
+            self.encode_seconds
+            + self.wire_seconds
+            + self.unpack_seconds
+            + self.decode_seconds
+        )
+        return max(0.0, self.total_seconds - phases)
+
+    def to_dict(self) -> dict:
+        return {
+            "transport": self.transport,
+            "total_seconds": self.total_seconds,
+            "encode_seconds": self.encode_seconds,
+            "wire_seconds": self.wire_seconds,
+            "unpack_seconds": self.unpack_seconds,
+            "decode_seconds": self.decode_seconds,
+            "other_seconds": self.other_seconds,
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "allocated_bytes": self.allocated_bytes,
+            "rows": dict(self.rows),
+            "requests": self.requests,
+        }
+
+    def __repr__(self):
+        return (
+            "QueryProfile(transport={}, total={:.3f} ms, encode={:.3f} ms, "
+            "wire={:.3f} ms, unpack={:.3f} ms, decode={:.3f} ms, "
+            "response_bytes={}, allocated_bytes={}, rows={})".format(
+                self.transport,
+                self.total_seconds * 1000,
+                self.encode_seconds * 1000,
+                self.wire_seconds * 1000,
+                self.unpack_seconds * 1000,
+                self.decode_seconds * 1000,
+                self.response_bytes,
+                self.allocated_bytes,
+                self.rows,
+            )
+        )
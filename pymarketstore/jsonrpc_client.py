@@ -11,10 +11,16 @@ import pandas as pd
 import requests
 
 from .enums import Freq
+from .instrumentation import span
 from .params import DataShape, ListSymbolsFormat, Params
 from .results import QueryReply
 from .stream import StreamConn
-from .utils import is_iterable, parse_date_to_string, timeseries_data_to_write_request
+from .utils import (
+    batch_to_write_requests,
+    is_iterable,
+    parse_date_to_string,
+    timeseries_data_to_write_request,
+)
 
 
 logger = logging.getLogger(__name__)
@@ -29,8 +35,25 @@ class JsonRpcClient:
         if not is_iterable(params):
             params = [params]
 
+        with span("query", transport="jsonrpc", queries=len(params)) as s:
+            reply = self._request(
+                "DataService.Query", requests=[p.to_query_request() for p in params]
+            )
+            reply = QueryReply.from_response(reply, params)
+            if s.recording:
+                s.set(rows=reply.rows())
+            return reply
+
+    def sql(self, statements: Union[str, List[str]]) -> QueryReply:
+        if isinstance(statements, str):
+            statements = [statements]
+
         reply = self._request(
-            "DataService.Query", requests=[p.to_query_request() for p in params]
+            "DataService.Query",
+            requests=[
+                dict(is_sqlstatement=True, sql_statement=statement)
+                for statement in statements
+            ],
         )
         return QueryReply.from_response(reply)
 
@@ -57,6 +80,25 @@ class JsonRpcClient:
             ],
         )
 
+    def write_batch(
+        self, batch: Dict[str, Any], is_variable_length: bool = False
+    ) -> dict:
+        requests = []
+        for dataset, start_index, lengths in batch_to_write_requests(batch):
+            requests.append(
+                dict(
+                    dataset=dict(
+                        types=dataset["column_types"],
+                        names=dataset["column_names"],
+                        data=dataset["column_data"],
+                        startindex=start_index,
+                        lengths=lengths,
+                    ),
+                    is_variable_length=is_variable_length,
+                )
+            )
+        return self._request("DataService.Write", requests=requests)
+
     def list_symbols(
         self,
         fmt: ListSymbolsFormat = ListSymbolsFormat.SYMBOL,
@@ -139,22 +181,27 @@ class MsgpackRpcClient:
         self._session = requests.Session()
 
     def call(self, rpc_method: str, **query):
-        reply = self._rpc_request(rpc_method, **query)
-        return self._rpc_response(reply)
+        with span("jsonrpc.call", method=rpc_method):
+            reply = self._rpc_request(rpc_method, **query)
+            return self._rpc_response(reply)
 
     def _rpc_request(self, method: str, **query) -> Union[Dict, requests.Response]:
-        http_resp = self._session.post(
-            self._endpoint,
-            data=self.codec.dumps(
+        with span("jsonrpc.encode") as s:
+            body = self.codec.dumps(
                 dict(
                     method=method,
                     id=str(self._id),
                     jsonrpc="2.0",
                     params=query,
                 )
-            ),
-            headers={"Content-Type": self.mimetype},
-        )
+            )
+            s.set(bytes=len(body))
+        with span("jsonrpc.http"):
+            http_resp = self._session.post(
+                self._endpoint,
+                data=body,
+                headers={"Content-Type": self.mimetype},
+            )
 
         # compat with unittest.mock
         if not isinstance(requests.Response, type) or not isinstance(
@@ -163,7 +210,8 @@ class MsgpackRpcClient:
             return http_resp
 
         http_resp.raise_for_status()
-        return self.codec.loads(http_resp.content)
+        with span("jsonrpc.unpack", bytes=len(http_resp.content)):
+            return self.codec.loads(http_resp.content)
 
     @staticmethod
     def _rpc_response(reply: Dict) -> dict:
@@ -0,0 +1,353 @@
+"""
+A local, serverless store of MarketStore data.
+
+``LocalClient`` keeps bars on local disk in the server's bucket layout, one
+NumPy record file per year::
+
+    {root}/{symbol}/{timeframe}/{attrgroup}/{year}.npy
+
+Files are memory-mapped read-only, a query's time range is found with a
+binary search on the ``Epoch`` column, and the result is a slice of the
+mapping, so reading years of bars does not copy them (unless the range spans
+several year files).  A ``limit``-ed query reads only the year files it needs,
+newest first.  Writes to a year file are serialized by a lock per file, and
+by an advisory lock of the bucket directory (``fcntl.flock``, where
+available) against other processes writing to it.  It implements the
+query/write/list_symbols part of the client API, so it can back a ``Store``
+(see ``LocalStore``) or be used in place of a ``Client`` for offline research.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+
+from contextlib import contextmanager
+from datetime import date as date_aliased
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .enums import Freq
+from .filters import pushdown_window
+from .params import DataShape, ListSymbolsFormat, Params
+from .results import QueryReply, QueryResult, decode, window_slice
+from .store import Store
+from .utils import (
+    get_timestamp,
+    is_iterable,
+    parse_date_to_string,
+    timeseries_data_to_write_request,
+)
+
+
+try:
+    import fcntl
+except ImportError:  # Windows: only writers of this process are serialized
+    fcntl = None
+
+# one lock per year file, shared by all clients of this process
+_path_locks: dict[str, threading.Lock] = {}
+_path_locks_lock = threading.Lock()
+
+
+@contextmanager
+def _locked(path: str):
+    """Hold the write lock of the year file ``path``."""
+    key = os.path.abspath(path)
+    with _path_locks_lock:
+        lock = _path_locks.setdefault(key, threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        # lock the bucket's directory: the file itself is replaced on write,
+        # and lock files would clutter the bucket layout
+        fd = os.open(os.path.dirname(key), os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+
+def _years(epochs: np.ndarray) -> np.ndarray:
+    return epochs.astype("M8[s]").astype("M8[Y]").astype("i8") + 1970
+
+
+def _time_keys(array: np.ndarray) -> np.ndarray:
+    # the row identity used to replace rows on write
+    if "Nanoseconds" in array.dtype.names:
+        return array["Epoch"].astype("i8") * 10**9 + array["Nanoseconds"]
+    return array["Epoch"]
+
+
+class LocalClient:
+    """
+    Query and write MarketStore-style buckets in a local directory.
+
+    Parameters
+    ----------
+    root : str or os.PathLike
+        The directory holding the data (created on first write).
+    timezone : str, default "UTC"
+        Timezone reported in query replies.
+
+    """
+
+    def __init__(self, root: str | os.PathLike, timezone: str = "UTC") -> None:
+        self.root = os.fspath(root)
+        self.timezone = timezone
+        self._lock = threading.Lock()
+        self._maps: dict[str, tuple[int, np.memmap]] = {}
+
+    def _dir(self, symbol: str, timeframe: str, attrgroup: str) -> str:
+        return os.path.join(self.root, symbol, timeframe, attrgroup)
+
+    def _years_on_disk(self, directory: str) -> list[int]:
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            int(name[:-4])
+            for name in names
+            if name.endswith(".npy") and name[:-4].isdigit()
+        )
+
+    def _open(self, path: str) -> np.ndarray:
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._maps.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            array = np.load(path, mmap_mode="r")
+            self._maps[path] = (mtime, array)
+            return array
+
+    def _read(
+        self,
+        directory: str,
+        start: int | None,
+        end: int | None,
+        limit: int | None = None,
+        from_start: bool = False,
+    ) -> np.ndarray | None:
+        """
+        The rows of ``directory`` inside ``[start, end]``; with ``limit``, only
+        the last (or with ``from_start``, the first) ``limit`` of them, read
+        from as few year files as possible.
+        """
+        first = None if start is None else int(_years(np.array([start // 10**9]))[0])
+        last = None if end is None else int(_years(np.array([end // 10**9]))[0])
+        years = [
+            year
+            for year in self._years_on_disk(directory)
+            if (first is None or year >= first) and (last is None or year <= last)
+        ]
+        newest_first = limit is not None and not from_start
+        if newest_first:
+            years.reverse()
+
+        parts = []
+        rows = 0
+        for year in years:
+            array = self._open(os.path.join(directory, f"{year}.npy"))
+            part = array[window_slice(array, start, end)]
+            if len(part):
+                parts.append(part)
+                rows += len(part)
+                if limit is not None and rows >= limit:
+                    break
+        if not parts:
+            return None
+        if newest_first:
+            parts.reverse()
+        if limit is not None and rows > limit:
+            # trim the part farthest from the limit's end before concatenating
+            excess = rows - limit
+            if from_start:
+                parts[-1] = parts[-1][: len(parts[-1]) - excess]
+            else:
+                parts[0] = parts[0][excess:]
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def query(self, params: Params | list[Params]) -> QueryReply:
+        if not is_iterable(params):
+            params = [params]
+
+        results = []
+        for p in params:
+            if p.functions:
+                raise ValueError("server-side functions are not supported locally")
+            symbols, timeframe, attrgroup = p.tbk.split("/")
+            start = None if p.start is None else p.start.value
+            end = None if p.end is None else p.end.value
+            if p.filter is not None:
+                start, end = pushdown_window(p.filter, start, end)
+
+            arrays = {}
+            for symbol in symbols.split(","):
+                array = self._read(
+                    self._dir(symbol, timeframe, attrgroup),
+                    start,
+                    end,
+                    limit=p.limit,
+                    from_start=p.limit_from_start,
+                )
+                if array is None:
+                    continue
+                if p.filter is not None:
+                    array = array[p.filter.mask(array)]
+                arrays[f"{symbol}/{timeframe}/{attrgroup}"] = array
+            results.append(QueryResult(arrays, self.timezone))
+
+        if not any(result.result for result in results):
+            raise Exception("no results returned from query")
+        return QueryReply(results, self.timezone)
+
+    def write(
+        self,
+        data: pd.DataFrame | pd.Series | np.ndarray | np.recarray,
+        tbk: str,
+        is_variable_length: bool = False,
+    ) -> dict:
+        """
+        Write rows to ``tbk``.  Rows with the same timestamp as existing rows
+        replace them; each year file is rewritten atomically.
+        """
+        dataset = timeseries_data_to_write_request(data, tbk)
+        array = decode(
+            dataset["column_names"],
+            dataset["column_types"],
+            dataset["column_data"],
+            dataset["length"],
+        )
+        if not len(array):
+            return {"responses": None}
+        if array.dtype.names[0] != "Epoch":
+            raise ValueError("the first column must be `Epoch`")
+
+        directory = self._dir(*tbk.split("/"))
+        os.makedirs(directory, exist_ok=True)
+        years = _years(array["Epoch"])
+        for year in np.unique(years):
+            self._merge(os.path.join(directory, f"{year}.npy"), array[years == year])
+        return {"responses": None}
+
+    def write_batch(self, batch: dict, is_variable_length: bool = False) -> dict:
+        """Write rows of several tbks (``{tbk: data}``)."""
+        for tbk, data in batch.items():
+            self.write(data, tbk)
+        return {"responses": None}
+
+    def create(self, tbk: str, data_shape: DataShape, row_type: str = "fixed") -> dict:
+        """Create an empty bucket; its shape is set by the first write."""
+        os.makedirs(self._dir(*tbk.split("/")), exist_ok=True)
+        return {"responses": None}
+
+    def _merge(self, path: str, new: np.ndarray) -> None:
+        # read-modify-write: concurrent writers of the same file must not
+        # interleave, or one of them loses the other's rows
+        with _locked(path):
+            self._merge_locked(path, new)
+
+    def _merge_locked(self, path: str, new: np.ndarray) -> None:
+        if os.path.exists(path):
+            existing = np.load(path)
+            if existing.dtype != new.dtype:
+                raise ValueError(
+                    "data shape {} does not match existing {} in {}".format(
+                        new.dtype, existing.dtype, path
+                    )
+                )
+            combined = np.concatenate([existing, new])
+        else:
+            combined = new
+
+        # sort by time; on duplicate timestamps the newest row wins
+        combined = combined[np.argsort(_time_keys(combined), kind="stable")]
+        keys = _time_keys(combined)
+        combined = combined[np.append(keys[1:] != keys[:-1], True)]
+
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(combined))
+        os.replace(tmp, path)
+        with self._lock:
+            self._maps.pop(path, None)
+
+    def list_symbols(
+        self,
+        fmt: ListSymbolsFormat = ListSymbolsFormat.SYMBOL,
+        timeframe: Freq | str | None = None,
+        date: pd.Timestamp | datetime | date_aliased | str | int | None = None,
+    ) -> list[str]:
+        if timeframe is not None:
+            timeframe = Freq[timeframe].value
+        day = None
+        if date is not None:
+            day = get_timestamp(parse_date_to_string(date)).value
+
+        found = set()
+        for symbol in self._listdir(self.root):
+            for tf in self._listdir(os.path.join(self.root, symbol)):
+                if timeframe is not None and tf != timeframe:
+                    continue
+                for attrgroup in self._listdir(os.path.join(self.root, symbol, tf)):
+                    directory = self._dir(symbol, tf, attrgroup)
+                    if day is None:
+                        has_data = bool(self._years_on_disk(directory))
+                    else:
+                        has_data = (
+                            self._read(directory, day, day + 86400 * 10**9 - 1)
+                            is not None
+                        )
+                    if has_data:
+                        found.add(
+                            symbol
+                            if fmt == ListSymbolsFormat.SYMBOL
+                            else f"{symbol}/{tf}/{attrgroup}"
+                        )
+        return sorted(found)
+
+    @staticmethod
+    def _listdir(path: str) -> list[str]:
+        try:
+            return sorted(
+                name
+                for name in os.listdir(path)
+                if os.path.isdir(os.path.join(path, name))
+            )
+        except FileNotFoundError:
+            return []
+
+    def destroy(self, tbk: str) -> dict:
+        """Delete all files of a bucket."""
+        directory = self._dir(*tbk.split("/"))
+        for year in self._years_on_disk(directory):
+            path = os.path.join(directory, f"{year}.npy")
+            with self._lock:
+                self._maps.pop(path, None)
+            os.remove(path)
+        return {"responses": None}
+
+    def __repr__(self) -> str:
+        return 'LocalClient("{}")'.format(self.root)
+
+
+class LocalStore(Store):
+    """
+    The ``Store`` API backed by a ``LocalClient`` instead of a server.
+
+    Parameters
+    ----------
+    root : str or os.PathLike
+        The directory holding the data.
+
+    """
+
+    def __init__(self, root: str | os.PathLike):
+        self.client = LocalClient(root)
+        self.catalog = None
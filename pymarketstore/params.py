@@ -1,6 +1,8 @@
 from enum import Enum
 from typing import *
 
+from .filters import Expr, pushdown_window
+from .functions import Function
 from .utils import get_timestamp, is_iterable
 
 
@@ -69,6 +71,7 @@ class Params:
         limit: int = None,
         limit_from_start: bool = None,
         columns: List[str] = None,
+        functions: List[Union[Function, str]] = None,
     ):
         if not is_iterable(symbols):
             symbols = [symbols]
@@ -80,6 +83,9 @@ class Params:
         self.limit_from_start = limit_from_start
         self.columns = columns
         self.functions = None
+        self.filter = None
+        if functions:
+            self.apply(*functions)
 
     def set(self, key: str, val: Any):
         if not hasattr(self, key):
@@ -90,26 +96,68 @@ class Params:
             setattr(self, key, val)
         return self
 
+    def apply(self, *functions: Union[Function, str]):
+        """
+        Add server-side aggregate functions to run on the query result, eg
+        ``params.apply(CandleCandler("1H"))``.  Call strings are validated.
+        """
+        self.functions = (self.functions or []) + [
+            str(Function.parse(function)) for function in functions
+        ]
+        return self
+
+    def where(self, expr: Expr):
+        """
+        Only return rows matching the filter expression ``expr`` (eg
+        ``Volume > 1e6``, see ``pymarketstore.filters``).  Calling it again
+        adds another condition.  Conditions on ``Epoch`` narrow the query
+        window on the server; the rest are applied to the decoded arrays, so
+        ``limit`` counts rows before those conditions are applied.
+        """
+        if not isinstance(expr, Expr):
+            raise TypeError(f"expected a filter expression, got {expr!r}")
+        self.filter = expr if self.filter is None else self.filter & expr
+        return self
+
     def to_query_request(self) -> dict:
         query = {"destination": self.tbk}
         if self.key_category is not None:
             query["key_category"] = self.key_category
-        if self.start is not None:
-            query["epoch_start"], start_nanos = divmod(self.start.value, 10**9)
+        start = None if self.start is None else self.start.value
+        end = None if self.end is None else self.end.value
+        if self.filter is not None:
+            start, end = pushdown_window(self.filter, start, end)
+        if start is not None:
+            query["epoch_start"], start_nanos = divmod(start, 10**9)
             if start_nanos != 0:
                 query["epoch_start_nanos"] = start_nanos
-        if self.end is not None:
-            query["epoch_end"], end_nanos = divmod(self.end.value, 10**9)
+        if end is not None:
+            query["epoch_end"], end_nanos = divmod(end, 10**9)
             if end_nanos != 0:
                 query["epoch_end_nanos"] = end_nanos
         if self.limit is not None:
             query["limit_record_count"] = self.limit
         if self.limit_from_start is not None:
             query["limit_from_start"] = bool(self.limit_from_start)
-        if self.functions is not None:
-            query["functions"] = self.functions
+        if self.functions:
+            functions = self.functions
+            if isinstance(functions, (str, Function)):
+                functions = [functions]
+            query["functions"] = [str(function) for function in functions]
         return query
 
+    def cache_key(self) -> tuple:
+        """
+        A hashable key identifying the rows this query returns: the normalized
+        query request plus the client-side filter.
+        """
+        request = self.to_query_request()
+        if "functions" in request:
+            request["functions"] = tuple(request["functions"])
+        return tuple(sorted(request.items())) + (
+            ("filter", repr(self.filter) if self.filter is not None else None),
+        )
+
     def __repr__(self) -> str:
         content = (
             "tbk={}, start={}, end={}, ".format(
@@ -120,5 +168,7 @@ class Params:
             + "limit={}, ".format(self.limit)
             + "limit_from_start={}".format(self.limit_from_start)
             + "columns={}".format(self.columns)
+            + (", functions={}".format(self.functions) if self.functions else "")
+            + (", filter={!r}".format(self.filter) if self.filter is not None else "")
         )
         return "Params({})".format(content)
@@ -0,0 +1,128 @@
+"""
+Planning of many queries into few server requests.
+
+``QueryPlan`` coalesces ``Params`` that read overlapping or adjacent time
+windows of the same bucket key into a single request per merged window.  After
+the merged requests have been run, it slices each original query's rows back
+out of the decoded arrays (as views, not copies) and applies its filter, so
+callers get one ``QueryReply`` per original ``Params`` as if each had been
+sent on its own.
+"""
+
+from __future__ import annotations
+
+import copy
+
+from collections.abc import Iterable
+
+import numpy as np
+import pandas as pd
+
+from .filters import pushdown_window
+from .params import Params
+from .results import QueryReply, QueryResult, window_slice
+
+
+# windows closer than this (the server's epoch resolution) are merged
+_ADJACENT_NS = 10**9
+
+
+def query_window(p: Params) -> tuple[int | None, int | None]:
+    start = None if p.start is None else p.start.value
+    end = None if p.end is None else p.end.value
+    if p.filter is not None:
+        start, end = pushdown_window(p.filter, start, end)
+    return start, end
+
+
+def _mergeable(p: Params) -> bool:
+    # a limit or server-side functions make the rows depend on the window
+    return p.limit is None and not p.functions
+
+
+class QueryPlan:
+    """
+    Coalesce a list of ``Params`` into the minimal set of server requests.
+
+    Parameters
+    ----------
+    params : iterable of Params
+        The queries to plan.  Queries of the same bucket key (and key
+        category) whose windows overlap or touch are merged; queries with a
+        ``limit`` or server-side ``functions`` are sent unchanged.
+
+    """
+
+    def __init__(self, params: Iterable[Params]) -> None:
+        self.params = list(params)
+        self.requests: list[Params] = []
+        # per original query: (request index, window to slice or None)
+        self._targets: list[tuple[int, tuple | None]] = [None] * len(self.params)
+
+        groups: dict[tuple, list[int]] = {}
+        for i, p in enumerate(self.params):
+            if _mergeable(p):
+                groups.setdefault((p.tbk, p.key_category), []).append(i)
+            else:
+                self._targets[i] = (len(self.requests), None)
+                self.requests.append(p)
+
+        for indexes in groups.values():
+            windows = {i: query_window(self.params[i]) for i in indexes}
+            ordered = sorted(
+                indexes,
+                key=lambda i: -np.inf if windows[i][0] is None else windows[i][0],
+            )
+            merged_start, merged_end = windows[ordered[0]]
+            members = []
+            for i in ordered:
+                start, end = windows[i]
+                if members and not (
+                    merged_end is None
+                    or start is None
+                    or start <= merged_end + _ADJACENT_NS
+                ):
+                    self._add_request(members, windows, merged_start, merged_end)
+                    merged_start, merged_end, members = start, end, []
+                if end is None or (merged_end is not None and end > merged_end):
+                    merged_end = end
+                members.append(i)
+            self._add_request(members, windows, merged_start, merged_end)
+
+    def _add_request(self, members: list[int], windows: dict, start, end) -> None:
+        request = copy.copy(self.params[members[0]])
+        request.start = None if start is None else pd.Timestamp(start)
+        request.end = None if end is None else pd.Timestamp(end)
+        request.filter = None
+        for i in members:
+            self._targets[i] = (len(self.requests), windows[i])
+        self.requests.append(request)
+
+    def execute(self, reply: QueryReply) -> list[QueryReply]:
+        """
+        Split the reply to ``self.requests`` into one reply per original
+        ``Params``.  Unfiltered results are views into ``reply``'s arrays.
+        """
+        replies = []
+        for p, (index, window) in zip(self.params, self._targets):
+            result = reply.results[index]
+            if window is None:
+                # sent unchanged: the reply already is the query's own
+                arrays = {key: ds.array for key, ds in result.all().items()}
+            else:
+                arrays = {}
+                for key, ds in result.all().items():
+                    array = ds.array[window_slice(ds.array, *window)]
+                    if p.filter is not None:
+                        array = array[p.filter.mask(array)]
+                    arrays[key] = array
+            replies.append(
+                QueryReply([QueryResult(arrays, reply.timezone)], reply.timezone)
+            )
+        return replies
+
+    def __repr__(self) -> str:
+        return "QueryPlan(params={}, requests={})".format(
+            len(self.params),
+            len(self.requests),
+        )
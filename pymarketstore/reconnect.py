@@ -0,0 +1,163 @@
+"""
+Reconnect policy shared by the streaming clients.
+
+Implements exponential backoff with jitter, an immediate first retry and a
+simple circuit breaker, so that many consumers of the same server spread their
+reconnect attempts out instead of hammering it in lockstep after a restart.
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+import time
+
+from enum import Enum
+
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(Enum):
+    """State of the reconnect circuit breaker."""
+
+    # connected, or retrying with normal backoff
+    CLOSED = "closed"
+    # too many consecutive failures; waiting out ``reset_timeout``
+    OPEN = "open"
+    # cool-down elapsed; the next attempt is a single probe
+    HALF_OPEN = "half_open"
+
+
+class ReconnectPolicy:
+    """
+    Exponential backoff with jitter, fast first retry and a circuit breaker.
+
+    Call ``next_delay()`` after every failed connection attempt to get the
+    number of seconds to wait before the next one, and ``reset()`` once a
+    connection has been established (and subscribed) successfully.
+
+    Parameters
+    ----------
+    base_delay : float, default 1.0
+        Delay before the second retry.  Each further retry multiplies it by
+        ``multiplier`` up to ``max_delay``.
+    max_delay : float, default 60.0
+        Upper bound for the backoff delay (before jitter).
+    multiplier : float, default 2.0
+        Growth factor of the delay between consecutive attempts.
+    jitter : float, default 0.5
+        Fraction of each delay that is randomized.  ``0`` disables jitter,
+        ``1`` gives "full jitter" (uniform between zero and the delay).
+    immediate_first_retry : bool, default True
+        Retry the first failure without waiting; most disconnects are
+        transient and a reconnect usually succeeds straight away.
+    failure_threshold : int or None, default None
+        Number of consecutive failures after which the circuit opens.
+        ``None`` disables the circuit breaker.
+    reset_timeout : float, default 60.0
+        Seconds to wait while the circuit is open before a probe attempt.
+    max_attempts : int or None, default None
+        Give up after this many consecutive failures.  ``None`` retries forever.
+
+    """
+
+    def __init__(
+        self,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        multiplier: float = 2.0,
+        jitter: float = 0.5,
+        immediate_first_retry: bool = True,
+        failure_threshold: int | None = None,
+        reset_timeout: float = 60.0,
+        max_attempts: int | None = None,
+    ) -> None:
+        if base_delay < 0 or max_delay < 0:
+            raise ValueError("`base_delay` and `max_delay` must not be negative")
+        if multiplier < 1:
+            raise ValueError("`multiplier` must be >= 1")
+        if not 0 <= jitter <= 1:
+            raise ValueError("`jitter` must be between 0 and 1")
+
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.immediate_first_retry = immediate_first_retry
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_attempts = max_attempts
+
+        self.failures = 0
+        self._state = CircuitState.CLOSED
+        self._opened_at: float | None = None
+        self._random = random.Random()
+
+    @property
+    def state(self) -> CircuitState:
+        """The current circuit breaker state."""
+        self._update_state()
+        return self._state
+
+    def _update_state(self) -> None:
+        # the cool-down is measured lazily, by whichever method runs first
+        if (
+            self._state is CircuitState.OPEN
+            and time.monotonic() - self._opened_at >= self.reset_timeout
+        ):
+            self._state = CircuitState.HALF_OPEN
+
+    @property
+    def exhausted(self) -> bool:
+        """Whether ``max_attempts`` consecutive failures have been reached."""
+        return self.max_attempts is not None and self.failures >= self.max_attempts
+
+    def next_delay(self) -> float:
+        """
+        Record a failed attempt and return the seconds to wait before retrying.
+        """
+        self.failures += 1
+        self._update_state()
+
+        if self._state is CircuitState.HALF_OPEN or (
+            self.failure_threshold is not None and self.failures >= self.failure_threshold
+        ):
+            if self._state is CircuitState.HALF_OPEN:
+                logger.warning("Reconnect probe failed, circuit re-opened")
+            elif self._state is CircuitState.CLOSED:
+                logger.warning(
+                    "Reconnect circuit opened after %d consecutive failure(s)",
+                    self.failures,
+                )
+            self._state = CircuitState.OPEN
+            self._opened_at = time.monotonic()
+            return self._jittered(self.reset_timeout)
+
+        return self._jittered(self.backoff(self.failures))
+
+    def backoff(self, attempt: int) -> float:
+        """The un-jittered delay before retry number ``attempt`` (1-based)."""
+        if self.immediate_first_retry:
+            if attempt <= 1:
+                return 0.0
+            attempt -= 1
+        return min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+
+    def reset(self) -> None:
+        """Record a successful connection and close the circuit."""
+        self.failures = 0
+        self._state = CircuitState.CLOSED
+        self._opened_at = None
+
+    def _jittered(self, delay: float) -> float:
+        if not self.jitter or not delay:
+            return delay
+        return delay - self._random.uniform(0, delay * self.jitter)
+
+    def __repr__(self) -> str:
+        return "ReconnectPolicy(base_delay={}, max_delay={}, state={})".format(
+            self.base_delay,
+            self.max_delay,
+            self.state.value,
+        )
@@ -0,0 +1,330 @@
+"""
+Shared-memory fan-out of stream data to worker processes.
+
+A ``StreamRelay`` receives bars once through an ``AsyncStreamConn`` and
+publishes them into one shared-memory ring buffer per stream key.  Worker
+processes attach to those buffers with ``RingReader`` and read new bars as
+NumPy views, without opening their own connection to the server.
+
+Each ring buffer is a single writer / many readers structure: the relay writes
+a record into the next slot and only then advances the sequence number, so a
+reader never sees a partially written record unless it falls more than
+``capacity`` records behind (which ``RingReader`` detects and reports).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import sys
+
+from collections.abc import Callable
+from multiprocessing import shared_memory
+from typing import Any
+
+import numpy as np
+
+from .async_stream import AsyncStreamConn
+
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = 0x4D4B5452  # "MKTR"
+_VERSION = 1
+
+# header layout (int64 words), followed by the JSON encoded dtype
+_H_MAGIC, _H_VERSION, _H_CAPACITY, _H_ITEMSIZE, _H_SEQ, _H_DESCR_LEN = range(6)
+_HEADER_WORDS = 8
+_DESCR_SIZE = 1024
+_DATA_OFFSET = _HEADER_WORDS * 8 + _DESCR_SIZE
+
+# integer columns of MarketStore bars; everything else is stored as float64
+_INT_COLUMNS = {"Epoch", "Nanoseconds"}
+
+
+def segment_name(key: str, prefix: str = "pymkts") -> str:
+    """The shared-memory segment name used for the stream ``key``."""
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return f"{prefix}_{digest}"
+
+
+def bar_dtype(data: dict) -> np.dtype:
+    """Infer the record dtype of a stream payload (``Epoch`` first)."""
+    names = [name for name in data if name == "Epoch"]
+    names += [name for name in data if name != "Epoch"]
+    return np.dtype(
+        [(name, "i8" if name in _INT_COLUMNS else "f8") for name in names],
+    )
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # readers must not unlink the segment when they exit, which the resource
+    # tracker does by default on Python < 3.13
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+
+    from multiprocessing import resource_tracker
+
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:  # pragma: no cover
+        pass
+    return shm
+
+
+class RingBuffer:
+    """
+    A fixed-size ring of records in a shared-memory segment.
+
+    Use ``RingBuffer.create()`` in the writing process and
+    ``RingBuffer.attach()`` in readers.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool = False) -> None:
+        self.shm = shm
+        self.owner = owner
+        self._header = np.ndarray((_HEADER_WORDS,), dtype="i8", buffer=shm.buf)
+        if self._header[_H_MAGIC] != _MAGIC or self._header[_H_VERSION] != _VERSION:
+            raise ValueError(f"{shm.name} is not a pymarketstore ring buffer")
+
+        descr_len = int(self._header[_H_DESCR_LEN])
+        descr = bytes(shm.buf[_HEADER_WORDS * 8 : _HEADER_WORDS * 8 + descr_len])
+        self.dtype = np.dtype([tuple(field) for field in json.loads(descr)])
+        self.capacity = int(self._header[_H_CAPACITY])
+        self.records = np.ndarray(
+            (self.capacity,),
+            dtype=self.dtype,
+            buffer=shm.buf,
+            offset=_DATA_OFFSET,
+        )
+
+    @classmethod
+    def create(cls, name: str, dtype: np.dtype, capacity: int) -> RingBuffer:
+        descr = json.dumps(dtype.descr).encode("utf-8")
+        if len(descr) > _DESCR_SIZE:
+            raise ValueError("too many columns for a ring buffer")
+        try:
+            shm = shared_memory.SharedMemory(
+                name=name,
+                create=True,
+                size=_DATA_OFFSET + capacity * dtype.itemsize,
+            )
+        except FileExistsError:
+            # left over from a relay that did not shut down cleanly
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(
+                name=name,
+                create=True,
+                size=_DATA_OFFSET + capacity * dtype.itemsize,
+            )
+
+        header = np.ndarray((_HEADER_WORDS,), dtype="i8", buffer=shm.buf)
+        header[:] = 0
+        header[_H_CAPACITY] = capacity
+        header[_H_ITEMSIZE] = dtype.itemsize
+        header[_H_DESCR_LEN] = len(descr)
+        shm.buf[_HEADER_WORDS * 8 : _HEADER_WORDS * 8 + len(descr)] = descr
+        header[_H_VERSION] = _VERSION
+        header[_H_MAGIC] = _MAGIC
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> RingBuffer:
+        return cls(_attach(name))
+
+    @property
+    def seq(self) -> int:
+        """Total number of records written so far."""
+        return int(self._header[_H_SEQ])
+
+    def append(self, values: tuple) -> None:
+        """Write one record (a tuple in dtype field order)."""
+        seq = int(self._header[_H_SEQ])
+        self.records[seq % self.capacity] = values
+        self._header[_H_SEQ] = seq + 1
+
+    def close(self) -> None:
+        """Detach from the segment, and remove it if this is the writer."""
+        # numpy views must be released before the mmap can be closed
+        self._header = self.records = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class RingReader:
+    """
+    Reads new bars for one stream key published by a ``StreamRelay``.
+
+    Parameters
+    ----------
+    key : str
+        The stream key (eg ``"AAPL/1Min/OHLCV"``).
+    prefix : str, default "pymkts"
+        Segment name prefix; must match the relay's.
+    from_start : bool, default False
+        Also return the records already in the buffer on the first ``read()``
+        instead of only those published after attaching.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the relay has not published anything for ``key`` yet.
+
+    """
+
+    def __init__(self, key: str, prefix: str = "pymkts", from_start: bool = False):
+        self.key = key
+        self.ring = RingBuffer.attach(segment_name(key, prefix))
+        self.dtype = self.ring.dtype
+        seq = self.ring.seq
+        self.position = max(0, seq - self.ring.capacity) if from_start else seq
+        self.dropped = 0
+
+    def read(self, copy: bool = False) -> np.ndarray:
+        """
+        Return the records published since the previous call.
+
+        Without ``copy`` the result is a view into shared memory whenever the
+        records are contiguous in the ring; consume it before the relay wraps
+        around (``capacity`` more records) or pass ``copy=True``.
+        """
+        ring = self.ring
+        seq = ring.seq
+        start = self.position
+        if seq - start > ring.capacity:
+            # fell behind: the oldest records have already been overwritten
+            self.dropped += seq - ring.capacity - start
+            start = seq - ring.capacity
+        self.position = seq
+        if start == seq:
+            return ring.records[:0]
+
+        first, last = start % ring.capacity, seq % ring.capacity
+        if first < last:
+            out = ring.records[first:last]
+            return out.copy() if copy else out
+        return np.concatenate((ring.records[first:], ring.records[:last]))
+
+    def latest(self) -> np.void | None:
+        """The most recently published record, or ``None``."""
+        seq = self.ring.seq
+        if not seq:
+            return None
+        return self.ring.records[(seq - 1) % self.ring.capacity].copy()
+
+    def close(self) -> None:
+        self.ring.close()
+
+    def __enter__(self) -> RingReader:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return 'RingReader("{}", position={}, dropped={})'.format(
+            self.key,
+            self.position,
+            self.dropped,
+        )
+
+
+class StreamRelay:
+    """
+    Receive stream data once and publish it to shared-memory ring buffers.
+
+    Parameters
+    ----------
+    endpoint : str
+        The WebSocket endpoint URL (e.g., ``"ws://localhost:5993/ws"``).
+    capacity : int, default 4096
+        Number of records kept per stream key.
+    prefix : str, default "pymkts"
+        Prefix of the shared-memory segment names.
+    conn : AsyncStreamConn, optional
+        An existing connection to relay from (eg a ``StreamHub``'s).
+    **conn_kwargs
+        Passed through to ``AsyncStreamConn`` if ``conn`` is not given.
+
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        capacity: int = 4096,
+        prefix: str = "pymkts",
+        conn: AsyncStreamConn | None = None,
+        **conn_kwargs: Any,
+    ) -> None:
+        self.endpoint = endpoint
+        self.capacity = capacity
+        self.prefix = prefix
+        self.conn = conn or AsyncStreamConn(endpoint, **conn_kwargs)
+        self.conn.register(r".*", self.publish)
+        self._rings: dict[str, tuple[RingBuffer, Callable[[dict], tuple | None]]] = {}
+        self.rejected = 0
+
+    @property
+    def keys(self) -> list[str]:
+        """The stream keys published so far."""
+        return list(self._rings)
+
+    def publish(self, key: str, data: dict) -> None:
+        """
+        Append a bar to the ring buffer of ``key`` (created on first use).
+
+        The first payload of a key fixes the ring's columns.  Later payloads
+        with other keys are logged and counted in ``rejected`` rather than
+        written, since the ring has no way to mark a column as missing.
+        """
+        try:
+            ring, to_record = self._rings[key]
+        except KeyError:
+            dtype = bar_dtype(data)
+            ring = RingBuffer.create(segment_name(key, self.prefix), dtype, self.capacity)
+            names = dtype.names
+            columns = set(names)
+
+            def to_record(data: dict) -> tuple | None:
+                if data.keys() != columns:
+                    return None
+                return tuple(data[name] for name in names)
+
+            self._rings[key] = ring, to_record
+            logger.info("Relaying %s via shared memory %s", key, ring.shm.name)
+        record = to_record(data)
+        if record is None:
+            self.rejected += 1
+            logger.warning(
+                "Rejected %s payload with columns %s (the ring has %s)",
+                key,
+                sorted(data),
+                sorted(ring.dtype.names),
+            )
+            return
+        ring.append(record)
+
+    async def run(self, streams: list[str]) -> None:
+        """Subscribe to ``streams`` and relay until stopped."""
+        try:
+            await self.conn.run(streams)
+        finally:
+            self.close()
+
+    async def stop(self) -> None:
+        await self.conn.stop()
+
+    def close(self) -> None:
+        """Remove all shared-memory segments."""
+        for ring, _ in self._rings.values():
+            ring.close()
+        self._rings.clear()
+
+    def __repr__(self) -> str:
+        return 'StreamRelay("{}", keys={})'.format(self.endpoint, len(self._rings))
@@ -0,0 +1,165 @@
+"""
+Vectorized client-side OHLCV resampling.
+
+Derives coarse bars from fine ones directly on the decoded structured arrays
+returned by the server, without building DataFrames.  Many symbols are
+resampled at once: their arrays are concatenated and every column is reduced
+over all (symbol, period) segments with a single ``ufunc.reduceat`` call.
+
+Periods of a day and longer start at midnight in the given timezone (the
+``timezone`` of the reply the bars came from), as the server's own daily bars
+do; shorter periods are aligned to the epoch.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from .enums import Freq
+
+
+# 1970-01-05 was the first Monday after the epoch
+_MONDAY = 4 * 24 * 60 * 60
+_DAY = 24 * 60 * 60
+_WEEK = 7 * _DAY
+
+# how each OHLCV column is reduced; other columns keep their last value
+_FIRST = {"Open"}
+_MAX = {"High"}
+_MIN = {"Low"}
+_SUM = {"Volume"}
+
+
+def bucket_starts(
+    epochs: np.ndarray,
+    freq: Freq | str,
+    timezone: str | None = None,
+) -> np.ndarray:
+    """
+    Return the start epoch (in seconds) of the ``freq`` period that each epoch
+    in ``epochs`` falls into.  Weeks start on Monday.  Days and longer periods
+    start at midnight in ``timezone`` (default UTC).
+    """
+    freq = Freq[freq]
+    epochs = np.asarray(epochs, dtype="i8")
+    if timezone in (None, "UTC") or (freq.seconds or _DAY) < _DAY:
+        return _utc_bucket_starts(epochs, freq)
+
+    # bucket the wall-clock times, then map the local midnights back to UTC
+    utc = pd.DatetimeIndex(epochs.astype("M8[s]"), tz="UTC")
+    wall = _seconds(utc.tz_convert(timezone).tz_localize(None))
+    starts, inverse = np.unique(_utc_bucket_starts(wall, freq), return_inverse=True)
+    local = pd.DatetimeIndex(starts.astype("M8[s]")).tz_localize(
+        timezone,
+        ambiguous=np.ones(len(starts), dtype=bool),
+        nonexistent="shift_forward",
+    )
+    return _seconds(local.tz_convert(None))[inverse.ravel()]
+
+
+def _seconds(index: pd.DatetimeIndex) -> np.ndarray:
+    # the index unit varies with the pandas version and input
+    return index.values.astype("M8[s]").astype("i8")
+
+
+def _utc_bucket_starts(epochs: np.ndarray, freq: Freq) -> np.ndarray:
+    if freq.seconds is not None:
+        return epochs - epochs % freq.seconds
+    if freq is Freq.week:
+        return epochs - (epochs - _MONDAY) % _WEEK
+
+    months = epochs.astype("M8[s]").astype("M8[M]")
+    if freq is Freq.quarter:
+        months = months - months.astype("i8") % 3
+    elif freq is Freq.year:
+        months = months.astype("M8[Y]")
+    return months.astype("M8[s]").astype("i8")
+
+
+def resample(
+    array: np.ndarray,
+    freq: Freq | str,
+    timezone: str | None = None,
+) -> np.ndarray:
+    """
+    Resample one structured array of bars (sorted by ``Epoch``) to ``freq``.
+
+    Bars are labelled with the start of their period, like MarketStore's.
+    ``Open`` takes the first value of each period, ``High`` the maximum,
+    ``Low`` the minimum, ``Volume`` the sum and every other column the last.
+    Daily and longer periods start at midnight in ``timezone``.
+    """
+    return _resample_segments(
+        array,
+        bucket_starts(array["Epoch"], freq, timezone),
+        [len(array)],
+    )
+
+
+def resample_many(
+    arrays: dict[str, np.ndarray],
+    freq: Freq | str,
+    timezone: str | None = None,
+) -> dict[str, np.ndarray]:
+    """
+    Resample the bars of many keys (eg the arrays of ``QueryReply.all()``) to
+    ``freq`` in one vectorized pass.  Arrays with different dtypes are handled
+    in separate passes.  Returns a dict with the same keys.
+    """
+    by_dtype = {}
+    for key, array in arrays.items():
+        by_dtype.setdefault(array.dtype, []).append(key)
+
+    resampled = {}
+    for keys in by_dtype.values():
+        combined = np.concatenate([arrays[key] for key in keys])
+        lengths = [len(arrays[key]) for key in keys]
+        result, counts = _resample_segments(
+            combined,
+            bucket_starts(combined["Epoch"], freq, timezone),
+            lengths,
+            return_counts=True,
+        )
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        for i, key in enumerate(keys):
+            resampled[key] = result[offsets[i] : offsets[i + 1]]
+    return {key: resampled[key] for key in arrays}
+
+
+def _resample_segments(array, buckets, lengths, return_counts=False):
+    # a segment starts wherever the period changes or a new key begins
+    n = len(array)
+    boundary = np.empty(n, dtype=bool)
+    if n:
+        boundary[0] = True
+        np.not_equal(buckets[1:], buckets[:-1], out=boundary[1:])
+    key_starts = np.cumsum(lengths)[:-1]
+    boundary[key_starts[key_starts < n]] = True
+    starts = np.flatnonzero(boundary)
+    ends = np.append(starts[1:], n) - 1
+
+    out = np.empty(len(starts), dtype=array.dtype)
+    if not n:
+        return (out, np.zeros(len(lengths), dtype="i8")) if return_counts else out
+
+    for name in array.dtype.names:
+        column = array[name]
+        if name == "Epoch":
+            out[name] = buckets[starts]
+        elif name in _FIRST:
+            out[name] = column[starts]
+        elif name in _MAX:
+            out[name] = np.maximum.reduceat(column, starts)
+        elif name in _MIN:
+            out[name] = np.minimum.reduceat(column, starts)
+        elif name in _SUM:
+            out[name] = np.add.reduceat(column, starts)
+        else:
+            out[name] = column[ends]
+
+    if not return_counts:
+        return out
+    # number of output bars per key
+    key_of_segment = np.searchsorted(key_starts, starts, side="right")
+    return out, np.bincount(key_of_segment, minlength=len(lengths))
@@ -1,10 +1,13 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import numpy as np
 import pandas as pd
 
 import pymarketstore.proto.marketstore_pb2 as proto
 
+from .instrumentation import span
+from .utils import get_timestamp
+
 
 def decode(
     column_names: List[str], column_types: List[str], column_data, data_length
@@ -19,9 +22,11 @@ def decode(
         ]
     )
 
-    array = np.empty((data_length,), dtype=dt)
-    for idx, name in enumerate(dt.names):
-        array[name] = np.frombuffer(column_data[idx], dtype=dt[idx])
+    with span("results.decode") as s:
+        array = np.empty((data_length,), dtype=dt)
+        for idx, name in enumerate(dt.names):
+            array[name] = np.frombuffer(column_data[idx], dtype=dt[idx])
+        s.set(rows=data_length, bytes=array.nbytes)
     return array
 
 
@@ -59,11 +64,75 @@ def decode_grpc_responses(responses) -> List[Dict[str, np.ndarray]]:
     return results
 
 
+def epoch_ns(array: np.ndarray) -> np.ndarray:
+    """The timestamps of ``array``'s rows in epoch nanoseconds."""
+    epochs = array["Epoch"].astype("i8") * 10**9
+    if "Nanoseconds" in array.dtype.names:
+        epochs += array["Nanoseconds"]
+    return epochs
+
+
+def window_slice(
+    array: np.ndarray,
+    start: Optional[int],
+    end: Optional[int],
+    epochs: Optional[np.ndarray] = None,
+) -> slice:
+    """
+    The slice of ``array`` (sorted by time) with rows inside the inclusive
+    window ``[start, end]`` given in epoch nanoseconds.  ``epochs`` may hold
+    the precomputed ``epoch_ns(array)`` of an array with a ``Nanoseconds``
+    column.
+    """
+    if "Nanoseconds" in array.dtype.names:
+        if epochs is None:
+            epochs = epoch_ns(array)
+        lo = 0 if start is None else np.searchsorted(epochs, start, side="left")
+        hi = len(array) if end is None else np.searchsorted(epochs, end, side="right")
+    else:
+        # whole seconds: a row at epoch e is inside iff start <= e * 1e9 <= end
+        epochs = array["Epoch"]
+        lo = 0 if start is None else np.searchsorted(epochs, -(-start // 10**9))
+        hi = (
+            len(array)
+            if end is None
+            else np.searchsorted(epochs, end // 10**9, side="right")
+        )
+    return slice(int(lo), int(hi))
+
+
+def _to_ns(value) -> Optional[int]:
+    # int: epoch seconds; naive times are taken as UTC
+    ts = get_timestamp(value)
+    return None if ts is None else ts.value
+
+
+def apply_filters(results: List[Dict[str, np.ndarray]], params: List) -> List:
+    """
+    Apply the filter expressions of ``params`` (``Params.where()``) to the
+    decoded arrays of the corresponding query results.
+    """
+    for array_dict, p in zip(results, params):
+        expr = getattr(p, "filter", None)
+        if expr is None:
+            continue
+        for key, array in array_dict.items():
+            array_dict[key] = array[expr.mask(array)]
+    return results
+
+
+def _readonly(array: np.ndarray) -> np.ndarray:
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
 class DataSet:
     def __init__(self, array: np.ndarray, key: str, timezone: str):
         self.array = array
         self.key = key
         self.timezone = timezone
+        self._epochs = None
 
     @property
     def symbol(self) -> str:
@@ -77,15 +146,54 @@ class DataSet:
     def attribute_group(self) -> str:
         return self.key.split("/")[2]
 
+    def _slice(self, start: Optional[int], end: Optional[int]) -> slice:
+        if "Nanoseconds" in self.array.dtype.names and self._epochs is None:
+            # built once, then every lookup is a binary search
+            self._epochs = epoch_ns(self.array)
+        return window_slice(self.array, start, end, self._epochs)
+
+    def between(self, start=None, end=None) -> "DataSet":
+        """
+        The rows with ``start <= time <= end``, as a view of this array.
+
+        ``start`` and ``end`` take the same values as ``Params`` (epoch
+        seconds, strings, datetimes or Timestamps; naive times are UTC), and
+        ``None`` leaves that side open.  Rows must be sorted by time, as
+        query results are.
+        """
+        array = self.array[self._slice(_to_ns(start), _to_ns(end))]
+        return DataSet(array, self.key, self.timezone)
+
+    def asof(self, ts) -> Optional[np.void]:
+        """
+        The last row at or before ``ts`` (a view into this array), or
+        ``None`` if every row is later.
+        """
+        hi = self._slice(None, _to_ns(ts)).stop
+        return self.array[hi - 1] if hi else None
+
+    def at(self, ts) -> np.void:
+        """
+        The row at exactly ``ts`` (a view into this array).
+
+        :raises KeyError: if there is no row at ``ts``
+        """
+        ns = _to_ns(ts)
+        rows = self._slice(ns, ns)
+        if rows.start == rows.stop:
+            raise KeyError(ts)
+        return self.array[rows.stop - 1]
+
     def df(self) -> pd.DataFrame:
-        idxname = self.array.dtype.names[0]
-        df = pd.DataFrame(self.array).set_index(idxname)
-        index = pd.to_datetime(df.index, unit="s", utc=True)
-        tz = self.timezone
-        if tz.lower() != "utc":
-            index = index.tz_convert(tz)
-        df.index = index
-        return df
+        with span("DataSet.df", key=self.key, rows=len(self.array)):
+            idxname = self.array.dtype.names[0]
+            df = pd.DataFrame(self.array).set_index(idxname)
+            index = pd.to_datetime(df.index, unit="s", utc=True)
+            tz = self.timezone
+            if tz.lower() != "utc":
+                index = index.tz_convert(tz)
+            df.index = index
+            return df
 
     def __repr__(self):
         a = self.array
@@ -121,18 +229,26 @@ class QueryReply:
     def __init__(self, results, timezone):
         self.results = results
         self.timezone = timezone
+        # QueryProfile of the query, with Client(profile=True)
+        self.profile = None
 
     @classmethod
-    def from_response(cls, resp: Dict):
+    def from_response(cls, resp: Dict, params: List = None):
         results = decode_responses(resp["responses"])
+        if params:
+            results = apply_filters(results, params)
         return cls(
             results=[QueryResult(result, resp["timezone"]) for result in results],
             timezone=resp["timezone"],
         )
 
     @classmethod
-    def from_grpc_response(cls, resp: proto.MultiQueryResponse):  # ->QueryReply:
+    def from_grpc_response(
+        cls, resp: proto.MultiQueryResponse, params: List = None
+    ):  # ->QueryReply:
         results = decode_grpc_responses(resp.responses)
+        if params:
+            results = apply_filters(results, params)
         return cls(
             results=[QueryResult(result, resp.timezone) for result in results],
             timezone=resp.timezone,
@@ -147,6 +263,32 @@ class QueryReply:
             datasets.update(result.all())
         return datasets
 
+    def readonly(self) -> "QueryReply":
+        """
+        A reply with the same results whose arrays are read-only views, for
+        handing one decoded result to several callers.
+        """
+        return QueryReply(
+            results=[
+                QueryResult(
+                    {key: _readonly(ds.array) for key, ds in result.all().items()},
+                    result.timezone,
+                )
+                for result in self.results
+            ],
+            timezone=self.timezone,
+        )
+
+    def rows(self) -> int:
+        """The number of rows of all results."""
+        return sum(
+            len(ds.array) for result in self.results for ds in result.all().values()
+        )
+
+    def rows_by_key(self) -> Dict[str, int]:
+        """The number of rows of each time bucket key."""
+        return {key: len(ds.array) for key, ds in self.all().items()}
+
     def keys(self) -> List[str]:
         keys = []
         for result in self.results:
@@ -0,0 +1,83 @@
+"""
+Deduplication of concurrent identical calls.
+
+``SingleFlight`` lets many threads ask for the same thing at the same moment
+while only one of them does the work: the first caller for a key runs the
+function, and every caller that arrives with the same key before it finishes
+waits for, and shares, that one result (or exception).
+"""
+
+from __future__ import annotations
+
+import threading
+
+from collections.abc import Callable, Hashable
+from typing import Any
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time and share its outcome.
+
+    Unlike a cache, nothing is kept once a call has finished: the next caller
+    for the same key runs the function again.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Return ``fn()``, or the result of the in-flight call for ``key`` if
+        another thread is already running it.  Exceptions are shared too.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    @property
+    def in_flight(self) -> int:
+        """Number of calls currently running."""
+        return len(self._calls)
+
+    def __repr__(self) -> str:
+        return "SingleFlight(in_flight={}, calls={}, shared={})".format(
+            self.in_flight,
+            self.calls,
+            self.shared,
+        )
@@ -1,16 +1,50 @@
+import os
+
 from datetime import date, datetime
 from typing import Union, overload
 
+import numpy as np
 import pandas as pd
 
+from .catalog import Catalog, default_catalog_path
 from .enums import Freq
 from .jsonrpc_client import JsonRpcClient
 from .params import Params
+from .resample import resample_many
+from .results import DataSet
+from .utils import get_timestamp
 
 
 class Store:
-    def __init__(self, endpoint: str = "http://localhost:5993/rpc"):
+    def __init__(
+        self,
+        endpoint: str = "http://localhost:5993/rpc",
+        tiers: list | None = None,
+        catalog: Catalog | str | os.PathLike | bool | None = None,
+    ):
+        """
+        :param endpoint: the MarketStore server endpoint
+        :param tiers: faster tiers to read through before the server: a
+            ``ResultCache`` and/or a ``LocalClient`` (or a directory for one),
+            eg ``[ResultCache(), "/data/marketstore"]``
+        :param catalog: answer ``has()`` and ``get_symbols()`` from a symbol
+            ``Catalog`` (or the path of its cache file; ``True`` for the
+            default path of ``endpoint``) instead of querying the data
+        """
         self.client = JsonRpcClient(endpoint)
+        if catalog is True:
+            catalog = default_catalog_path(endpoint)
+        if (
+            catalog is not None
+            and catalog is not False
+            and not isinstance(catalog, Catalog)
+        ):
+            catalog = Catalog(self.client, catalog)
+        self.catalog = catalog if isinstance(catalog, Catalog) else None
+        if tiers:
+            from .tiered import TieredClient
+
+            self.client = TieredClient.from_tiers(self.client, tiers)
 
     @overload
     def get(
@@ -20,6 +54,7 @@ class Store:
         start_dt: pd.Timestamp | datetime | date | str | int | None = None,
         end_dt: pd.Timestamp | datetime | date | str | int | None = None,
         limit: int | None = None,
+        resample_from: Freq | None = None,
     ) -> dict[str, pd.DataFrame]: ...
 
     @overload
@@ -30,6 +65,7 @@ class Store:
         start_dt: pd.Timestamp | datetime | date | str | int | None = None,
         end_dt: pd.Timestamp | datetime | date | str | int | None = None,
         limit: int | None = None,
+        resample_from: Freq | None = None,
     ) -> pd.DataFrame | None: ...
 
     def get(
@@ -39,7 +75,18 @@ class Store:
         start_dt: pd.Timestamp | datetime | date | str | int | None = None,
         end_dt: pd.Timestamp | datetime | date | str | int | None = None,
         limit: int | None = None,
+        resample_from: Freq | None = None,
     ) -> Union[dict[str, pd.DataFrame], pd.DataFrame | None]:
+        """
+        Get OHLCV bars for one or more symbols.
+
+        If ``resample_from`` is given (eg ``Freq.min_1``), symbols that have no
+        ``freq`` bars in the store are answered by fetching their finer
+        ``resample_from`` bars and resampling them client-side.  Symbols whose
+        ``freq`` bars end before their ``resample_from`` bars (eg daily bars
+        not yet rebuilt for today) get the missing bars resampled and
+        appended, which takes one more query.
+        """
         many = True
         if isinstance(symbols, str):
             many = False
@@ -47,6 +94,22 @@ class Store:
 
         symbols = [symbol.upper() for symbol in symbols]
 
+        datasets = self._query(symbols, freq, start_dt, end_dt, limit)
+
+        if resample_from is not None:
+            datasets.update(self._extend(datasets, freq, resample_from, end_dt, limit))
+            missing = [symbol for symbol in symbols if symbol not in datasets]
+            if missing:
+                datasets.update(
+                    self._resample(missing, freq, resample_from, start_dt, end_dt, limit)
+                )
+
+        d = {symbol: ds.df() for symbol, ds in datasets.items()}
+        if many:
+            return d
+        return d.get(symbols[0])
+
+    def _query(self, symbols, freq, start_dt, end_dt, limit) -> dict[str, DataSet]:
         p = Params(
             symbols=symbols,
             timeframe=freq.value,
@@ -57,13 +120,71 @@ class Store:
         )
 
         try:
-            d = {ds.symbol: ds.df() for symbol, ds in self.client.query(p).all().items()}
+            return {ds.symbol: ds for ds in self.client.query(p).all().values()}
         except Exception as e:
             if "no results returned from query" in str(e):
-                return {} if many else None
+                return {}
             raise e
 
-        return d if many else d[symbols[0]]
+    def _resample(
+        self, symbols, freq, source, start_dt, end_dt, limit
+    ) -> dict[str, DataSet]:
+        source = Freq[source]
+        if source >= freq:
+            raise ValueError(
+                f"cannot resample {source.value} bars into {freq.value} bars"
+            )
+
+        # enough fine bars for ``limit`` coarse ones (plus a partial period)
+        source_limit = None
+        if limit is not None and freq.seconds and source.seconds:
+            source_limit = (limit + 1) * (freq.seconds // source.seconds)
+        datasets = self._query(symbols, source, start_dt, end_dt, source_limit)
+        if not datasets:
+            return {}
+
+        timezone = next(iter(datasets.values())).timezone
+        arrays = resample_many(
+            {symbol: ds.array for symbol, ds in datasets.items()},
+            freq,
+            timezone,
+        )
+        return {
+            symbol: DataSet(
+                array if limit is None else array[-limit:],
+                f"{symbol}/{freq.value}/OHLCV",
+                timezone,
+            )
+            for symbol, array in arrays.items()
+        }
+
+    def _extend(self, datasets, freq, source, end_dt, limit) -> dict[str, DataSet]:
+        # symbols sharing their last coarse bar are checked with one query
+        by_last = {}
+        for symbol, ds in datasets.items():
+            if len(ds.array):
+                by_last.setdefault(int(ds.array["Epoch"][-1]), []).append(symbol)
+
+        end = get_timestamp(end_dt)
+        extended = {}
+        for last, symbols in by_last.items():
+            if end is not None and end.value < last * 10**9:
+                continue
+            # the last coarse bar is kept: its fine bars may have been pruned
+            for symbol, tail in self._resample(
+                symbols, freq, source, last, end_dt, None
+            ).items():
+                coarse = datasets[symbol]
+                new = tail.array[tail.array["Epoch"] > last]
+                if not len(new) or new.dtype.names != coarse.array.dtype.names:
+                    continue
+                array = np.concatenate((coarse.array, new.astype(coarse.array.dtype)))
+                extended[symbol] = DataSet(
+                    array if limit is None else array[-limit:],
+                    coarse.key,
+                    coarse.timezone,
+                )
+        return extended
 
     def get_latest_dt(self, symbol: str, freq: Freq) -> pd.Timestamp | None:
         df = self.get(symbol, freq, limit=1)
@@ -75,6 +196,8 @@ class Store:
         """
         Returns true if the store has data for the given symbol and frequency.
         """
+        if self.catalog is not None:
+            return self.catalog.ensure_fresh().has(symbol, freq)
         return bool(self.get_latest_dt(symbol, freq))
 
     def get_symbols(
@@ -85,6 +208,8 @@ class Store:
         """
         Get a list of all ticker symbols in the store.
         """
+        if self.catalog is not None and dt is None:
+            return self.catalog.ensure_fresh().symbols(freq, attrgroup=None)
         return self.client.list_symbols(
             timeframe=freq.value,
             date=pd.Timestamp(dt) if dt is not None else None,
@@ -100,3 +225,5 @@ class Store:
         """
         tbk = f"{symbol.upper()}/{freq.value}/OHLCV"
         self.client.write(bars, tbk)
+        if self.catalog is not None:
+            self.catalog.invalidate(tbk)
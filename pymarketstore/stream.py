@@ -1,16 +1,39 @@
+import logging
 import re
+import time
 
 import msgpack
 import websocket
 
 from websocket import ABNF
 
+from .decoder import StreamDecoder
+from .reconnect import ReconnectPolicy
+
+
+logger = logging.getLogger(__name__)
+
 
 class StreamConn:
-    def __init__(self, endpoint):
+    def __init__(
+        self,
+        endpoint,
+        reconnect_policy: ReconnectPolicy = None,
+        decoder: StreamDecoder = None,
+    ):
+        """
+        :param endpoint: The WebSocket endpoint URL (eg "ws://localhost:5993/ws")
+        :param reconnect_policy: Optional ReconnectPolicy. When given, `run()`
+            reconnects after network errors instead of raising them.
+        :param decoder: Optional StreamDecoder, eg `StreamDecoder(bars=True)`
+            to receive OHLCV payloads as `Bar` objects instead of dicts.
+        """
         self.endpoint = endpoint
+        self.reconnect_policy = reconnect_policy
+        self.decoder = decoder or StreamDecoder()
 
         self._handlers = {}
+        self._handlers_by_key = {}
 
     def _connect(self):
         ws = websocket.WebSocket()
@@ -26,12 +49,39 @@ class StreamConn:
         ws.send(msg, opcode=ABNF.OPCODE_BINARY)
 
     def run(self, streams):
+        while True:
+            try:
+                return self._run(streams)
+            except (websocket.WebSocketException, OSError) as e:
+                policy = self.reconnect_policy
+                if policy is None:
+                    raise
+                delay = policy.next_delay()
+                if policy.exhausted:
+                    logger.error(
+                        "MarketStore WebSocket disconnected %d consecutive time(s). "
+                        "Giving up.",
+                        policy.failures,
+                    )
+                    raise
+                logger.warning(
+                    "MarketStore WebSocket disconnected: %s. "
+                    "Reconnecting in %.1f seconds...",
+                    e,
+                    delay,
+                )
+                time.sleep(delay)
+
+    def _run(self, streams):
         ws = self._connect()
         try:
             self._subscribe(ws, streams)
+            decode = self.decoder.decode
             while True:
                 r = ws.recv()
-                msg = msgpack.loads(r)
+                if self.reconnect_policy is not None and self.reconnect_policy.failures:
+                    self.reconnect_policy.reset()
+                msg = decode(r)
                 key = msg.get("key")
                 if key is not None:
                     self._dispatch(key, msg)
@@ -39,9 +89,14 @@ class StreamConn:
             ws.close()
 
     def _dispatch(self, stream, msg):
-        for pat, handler in self._handlers.items():
-            if pat.match(stream):
-                handler(self, msg)
+        try:
+            handlers = self._handlers_by_key[stream]
+        except KeyError:
+            handlers = self._handlers_by_key[stream] = [
+                handler for pat, handler in self._handlers.items() if pat.match(stream)
+            ]
+        for handler in handlers:
+            handler(self, msg)
 
     def on(self, stream_pat):
         def decorator(func):
@@ -54,8 +109,10 @@ class StreamConn:
         if isinstance(stream_pat, str):
             stream_pat = re.compile(stream_pat)
         self._handlers[stream_pat] = func
+        self._handlers_by_key.clear()
 
     def deregister(self, stream_pat):
         if isinstance(stream_pat, str):
             stream_pat = re.compile(stream_pat)
         del self._handlers[stream_pat]
+        self._handlers_by_key.clear()
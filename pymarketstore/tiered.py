@@ -0,0 +1,311 @@
+"""
+Read-through tiered querying: memory, then local disk, then the server.
+
+``TieredClient`` answers queries from the fastest tier that has the data and
+fills the faster tiers on the way back:
+
+1. an in-memory ``ResultCache`` (optional),
+2. a ``LocalClient`` memory-mapped store on local disk (optional), which
+   records the time ranges it holds for each bucket in a ``coverage.json``
+   sidecar so that it can tell "no data" apart from "not fetched yet" (and,
+   with them, the server's timezone, which local results are reported in),
+3. the remote client.
+
+Only the parts of a window that the local tier does not cover yet are
+fetched from the server, and concurrent fetches of the same range are
+deduplicated, so repeated queries for closed windows never touch the network.
+Bars are labelled by their start, so the bar still forming (today's 1D bar,
+the live 1Min bar) is never marked covered: it is fetched again by every
+query that reaches it.
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import os
+import threading
+import time
+
+from collections.abc import Iterable
+from typing import Any
+
+import pandas as pd
+
+from .cache import ResultCache
+from .catalog import _timeframe_seconds
+from .local_store import LocalClient
+from .params import Params
+from .planner import query_window
+from .results import QueryReply, QueryResult
+from .singleflight import SingleFlight
+from .utils import is_iterable
+
+
+# stand-in for an unbounded window start
+_MIN = -(2**62)
+_ADJACENT_NS = 10**9
+# calendar timeframes, whose bars are not aligned to multiples of their length
+_CALENDAR = ("W", "M", "Y")
+
+
+def settled_before(timeframe: str, now: int) -> int:
+    """
+    The epoch (ns) before which bars of ``timeframe`` are complete at
+    ``now``: the start of the bar still forming.
+    """
+    seconds = _timeframe_seconds(timeframe)
+    if seconds is None:
+        return now
+    length = seconds * 10**9
+    if timeframe.endswith(_CALENDAR):
+        # month and year lengths vary: stay two (average) bars clear of now
+        return now - 2 * length
+    return now - now % length
+
+
+class Coverage:
+    """
+    The epoch ranges (in nanoseconds, inclusive) fetched into a local store,
+    and the timezone of the server they were fetched from, per bucket
+    directory.
+    """
+
+    FILENAME = "coverage.json"
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+
+    def _path(self, directory: str) -> str:
+        return os.path.join(directory, self.FILENAME)
+
+    def _load(self, directory: str) -> dict:
+        try:
+            with open(self._path(directory)) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {"intervals": [], "timezone": None}
+        if isinstance(data, list):  # written before timezones were recorded
+            return {"intervals": data, "timezone": None}
+        return data
+
+    def intervals(self, directory: str) -> list[list[int]]:
+        return self._load(directory)["intervals"]
+
+    def timezone(self, directory: str) -> str | None:
+        """The timezone of the server the data of ``directory`` came from."""
+        return self._load(directory)["timezone"]
+
+    def gaps(self, directory: str, start: int, end: int) -> list[tuple[int, int]]:
+        """The parts of ``[start, end]`` that are not covered yet."""
+        gaps = []
+        for lo, hi in self.intervals(directory):
+            if hi < start or lo > end:
+                continue
+            if lo > start:
+                gaps.append((start, lo - 1))
+            start = max(start, hi + 1)
+            if start > end:
+                return gaps
+        gaps.append((start, end))
+        return gaps
+
+    def add(
+        self, directory: str, start: int, end: int, timezone: str | None = None
+    ) -> None:
+        with self._lock:
+            data = self._load(directory)
+            merged = []
+            for lo, hi in sorted(data["intervals"] + [[start, end]]):
+                if merged and lo <= merged[-1][1] + _ADJACENT_NS:
+                    merged[-1][1] = max(merged[-1][1], hi)
+                else:
+                    merged.append([lo, hi])
+            data["intervals"] = merged
+            self._save(directory, data, timezone)
+
+    def set_timezone(self, directory: str, timezone: str) -> None:
+        with self._lock:
+            self._save(directory, self._load(directory), timezone)
+
+    def _save(self, directory: str, data: dict, timezone: str | None) -> None:
+        if timezone is not None:
+            data["timezone"] = timezone
+        os.makedirs(directory, exist_ok=True)
+        tmp = "{}.{}.tmp".format(self._path(directory), threading.get_ident())
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, self._path(directory))
+
+    def clear(self, directory: str) -> None:
+        with self._lock:
+            try:
+                os.remove(self._path(directory))
+            except FileNotFoundError:
+                pass
+
+
+def _local_ok(p: Params) -> bool:
+    # the rows of these depend on the server (or on data we may not have yet)
+    return p.limit is None and not p.functions and p.key_category is None
+
+
+class TieredClient:
+    """
+    Query through a chain of tiers, filling the faster ones on the way back.
+
+    Parameters
+    ----------
+    remote : client
+        The client of the MarketStore server (eg ``JsonRpcClient``).
+    local : LocalClient, optional
+        Local memory-mapped store used as the second tier.
+    cache : ResultCache, optional
+        In-memory cache used as the first tier.
+
+    Queries with a ``limit`` or server-side ``functions`` skip the local tier,
+    since their rows cannot be derived from a partial local copy.
+    """
+
+    def __init__(
+        self,
+        remote: Any,
+        local: LocalClient | None = None,
+        cache: ResultCache | None = None,
+    ) -> None:
+        self.remote = remote
+        self.local = local
+        self.cache = cache
+        self.coverage = Coverage()
+        self._flight = SingleFlight()
+
+    @classmethod
+    def from_tiers(cls, remote: Any, tiers: Iterable[Any]) -> TieredClient:
+        """
+        Build from a list of tiers in front of ``remote``: a ``ResultCache``
+        and/or a ``LocalClient`` (or the root directory of one).
+        """
+        local = cache = None
+        for tier in tiers:
+            if isinstance(tier, ResultCache):
+                cache = tier
+            elif isinstance(tier, LocalClient):
+                local = tier
+            elif isinstance(tier, (str, os.PathLike)):
+                local = LocalClient(tier)
+            else:
+                raise TypeError(f"unsupported tier {tier!r}")
+        return cls(remote, local=local, cache=cache)
+
+    def query(self, params: Params | list[Params]) -> QueryReply:
+        if not is_iterable(params):
+            params = [params]
+
+        results = []
+        timezone = None
+        for p in params:
+            result, tz = self._query_one(p)
+            results.append(result)
+            timezone = timezone or tz
+        if not any(result.result for result in results):
+            raise Exception("no results returned from query")
+        return QueryReply(results, timezone)
+
+    def _query_one(self, p: Params) -> tuple[QueryResult, str]:
+        if self.cache is not None:
+            cached = self.cache.get(p)
+            if cached is not None:
+                return cached
+
+        if self.local is not None and _local_ok(p):
+            self._fill(p)
+            # report local rows in the timezone of the server they came from
+            symbol, timeframe, attrgroup = p.tbk.split("/")
+            directory = self.local._dir(symbol.split(",")[0], timeframe, attrgroup)
+            tz = self.coverage.timezone(directory) or self.local.timezone
+            try:
+                reply = self.local.query(p)
+                arrays = {key: ds.array for key, ds in reply.results[0].all().items()}
+                result, timezone = QueryResult(arrays, tz), tz
+            except Exception as e:
+                if "no results returned from query" not in str(e):
+                    raise
+                result, timezone = QueryResult({}, tz), None
+        else:
+            try:
+                reply = self._flight.do(
+                    ("query", p.cache_key()), lambda: self.remote.query(p)
+                ).readonly()
+                result, timezone = reply.results[0], reply.timezone
+            except Exception as e:
+                if "no results returned from query" not in str(e):
+                    raise
+                result, timezone = QueryResult({}, "UTC"), None
+
+        if self.cache is not None and timezone is not None:
+            self.cache.put(p, result, timezone)
+        return result, timezone or result.timezone
+
+    def _fill(self, p: Params) -> None:
+        """Fetch the parts of ``p``'s window that the local tier lacks."""
+        symbols, timeframe, attrgroup = p.tbk.split("/")
+        start, end = query_window(p)
+        start = _MIN if start is None else start
+        # data can still arrive for an open window: only fetch up to now, and
+        # only cover up to the bar still forming, so that it is refetched
+        now = time.time_ns()
+        end = now if end is None else min(end, now)
+        settled = settled_before(timeframe, now)
+
+        for symbol in symbols.split(","):
+            directory = self.local._dir(symbol, timeframe, attrgroup)
+            for gap_start, gap_end in self.coverage.gaps(directory, start, end):
+                fetch = copy.copy(p)
+                fetch.tbk = f"{symbol}/{timeframe}/{attrgroup}"
+                fetch.start = None if gap_start == _MIN else pd.Timestamp(gap_start)
+                fetch.end = pd.Timestamp(gap_end)
+                fetch.filter = None
+                self._flight.do(
+                    ("fill", fetch.cache_key()),
+                    lambda fetch=fetch, directory=directory: self._fetch_into_local(
+                        fetch, directory, settled
+                    ),
+                )
+
+    def _fetch_into_local(self, fetch: Params, directory: str, settled: int) -> None:
+        timezone = None
+        try:
+            reply = self.remote.query(fetch)
+        except Exception as e:
+            if "no results returned from query" not in str(e):
+                raise
+        else:
+            timezone = reply.timezone
+            for key, ds in reply.all().items():
+                if len(ds.array):
+                    self.local.write(ds.array, key)
+        start = _MIN if fetch.start is None else fetch.start.value
+        end = min(fetch.end.value, settled - 1)
+        if start <= end:
+            self.coverage.add(directory, start, end, timezone)
+        elif timezone is not None:
+            self.coverage.set_timezone(directory, timezone)
+
+    def write(self, data: Any, tbk: str, is_variable_length: bool = False) -> Any:
+        """Write to the server, and forget what the faster tiers know of ``tbk``."""
+        reply = self.remote.write(data, tbk, is_variable_length=is_variable_length)
+        if self.local is not None:
+            self.coverage.clear(self.local._dir(*tbk.split("/")))
+        if self.cache is not None:
+            self.cache.clear()
+        return reply
+
+    def list_symbols(self, *args: Any, **kwargs: Any) -> list[str]:
+        return self.remote.list_symbols(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        return "TieredClient(remote={!r}, local={!r}, cache={!r})".format(
+            self.remote,
+            self.local,
+            self.cache,
+        )
@@ -70,6 +70,40 @@ def timeseries_data_to_write_request(
     raise TypeError("data must be pd.DataFrame, pd.Series, np.ndarray, or np.recarray")
 
 
+def batch_to_write_requests(batch: dict) -> list:
+    """
+    Pack ``{tbk: data}`` into as few write datasets as possible: data of the
+    same columns and types share one dataset, with the rows of each tbk
+    located by ``start_index`` and ``lengths``.
+
+    :return: list of (dataset params, start_index, lengths)
+    """
+    groups = {}
+    for tbk, data in batch.items():
+        dataset = timeseries_data_to_write_request(data, tbk)
+        shape = (tuple(dataset["column_names"]), tuple(dataset["column_types"]))
+        groups.setdefault(shape, []).append((tbk, dataset))
+
+    requests = []
+    for (names, types), members in groups.items():
+        start_index, lengths, offset = {}, {}, 0
+        for tbk, dataset in members:
+            start_index[tbk] = offset
+            lengths[tbk] = dataset["length"]
+            offset += dataset["length"]
+        dataset = dict(
+            column_types=list(types),
+            column_names=list(names),
+            column_data=[
+                b"".join(d["column_data"][i] for _, d in members)
+                for i in range(len(names))
+            ],
+            length=offset,
+        )
+        requests.append((dataset, start_index, lengths))
+    return requests
+
+
 def _np_array_to_dataset_params(data: Union[np.ndarray, np.recarray]) -> dict:
     if not data.dtype.names:
         raise TypeError("numpy arrays must declare named column dtypes")
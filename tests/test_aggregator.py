@@ -0,0 +1,164 @@
+"""Tests for pymarketstore.aggregator.BarAggregator."""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from pymarketstore.aggregator import BarAggregator
+from pymarketstore.async_stream import AsyncStreamConn
+from pymarketstore.enums import Freq
+from pymarketstore.stream import StreamConn
+
+
+T0 = 1700000100  # 2023-11-14 22:15:00 UTC, aligned to 15 minutes
+
+
+def _bar(epoch, o, h, l, c, v=1.0):  # noqa: E741
+    return {"Epoch": epoch, "Open": o, "High": h, "Low": l, "Close": c, "Volume": v}
+
+
+def _feed(agg, symbol, closes, start=T0):
+    for i, close in enumerate(closes):
+        agg.update(
+            f"{symbol}/1Min/OHLCV",
+            _bar(start + i * 60, close, close + 1, close - 1, close),
+        )
+
+
+class TestInit:
+    def test_freqs_are_sorted(self):
+        agg = BarAggregator([Freq.hour, Freq.min_5])
+        assert agg.freqs == [Freq.min_5, Freq.hour]
+
+    @pytest.mark.parametrize("freq", [Freq.min_1, Freq.second, Freq.week])
+    def test_rejects_unsupported_targets(self, freq):
+        with pytest.raises(ValueError):
+            BarAggregator([freq])
+
+
+class TestUpdate:
+    def test_emits_completed_bar_on_last_minute(self):
+        agg = BarAggregator([Freq.min_5])
+        handler = MagicMock()
+        agg.register(r".*", handler)
+
+        _feed(agg, "AAPL", [10.0, 12.0, 9.0, 11.0])
+        handler.assert_not_called()
+
+        _feed(agg, "AAPL", [10.5], start=T0 + 4 * 60)
+
+        handler.assert_called_once_with(
+            "AAPL/5Min/OHLCV",
+            {
+                "Epoch": T0,
+                "Open": 10.0,
+                "High": 13.0,
+                "Low": 8.0,
+                "Close": 10.5,
+                "Volume": 5.0,
+            },
+        )
+
+    def test_multiple_timeframes_from_one_stream(self):
+        agg = BarAggregator([Freq.min_5, Freq.min_15])
+        keys = []
+        agg.register(r".*", lambda key, data: keys.append((key, data["Epoch"])))
+
+        _feed(agg, "AAPL", [float(i) for i in range(15)])
+
+        assert keys == [
+            ("AAPL/5Min/OHLCV", T0),
+            ("AAPL/5Min/OHLCV", T0 + 300),
+            ("AAPL/5Min/OHLCV", T0 + 600),
+            ("AAPL/15Min/OHLCV", T0),
+        ]
+
+    def test_gap_emits_incomplete_bar_when_next_bucket_starts(self):
+        agg = BarAggregator([Freq.min_5])
+        handler = MagicMock()
+        agg.register(r".*", handler)
+
+        _feed(agg, "AAPL", [10.0, 11.0])
+        _feed(agg, "AAPL", [20.0], start=T0 + 300)
+
+        handler.assert_called_once()
+        key, data = handler.call_args.args
+        assert data["Epoch"] == T0
+        assert data["Close"] == 11.0
+
+    def test_symbols_are_independent(self):
+        agg = BarAggregator([Freq.min_5])
+        closes = {}
+        agg.register(r".*", lambda key, data: closes.update({key: data["Close"]}))
+
+        for i in range(5):
+            _feed(agg, "AAPL", [100.0 + i], start=T0 + i * 60)
+            _feed(agg, "MSFT", [200.0 + i], start=T0 + i * 60)
+
+        assert closes == {"AAPL/5Min/OHLCV": 104.0, "MSFT/5Min/OHLCV": 204.0}
+
+    def test_late_bars_are_ignored(self):
+        agg = BarAggregator([Freq.min_5])
+        handler = MagicMock()
+        agg.register(r".*", handler)
+
+        _feed(agg, "AAPL", [1.0, 2.0, 3.0, 4.0, 5.0])
+        _feed(agg, "AAPL", [99.0], start=T0 + 60)
+
+        handler.assert_called_once()
+
+    def test_many_symbols_grow_state(self):
+        agg = BarAggregator([Freq.min_5])
+        for i in range(100):
+            _feed(agg, f"SYM{i}", [1.0])
+        assert len(agg.symbols) == 100
+
+
+class TestFlush:
+    def test_flush_until(self):
+        agg = BarAggregator([Freq.min_5, Freq.min_15])
+        handler = MagicMock()
+        agg.register(r".*", handler)
+        _feed(agg, "AAPL", [1.0, 2.0])
+
+        agg.flush(until=T0 + 300)
+
+        handler.assert_called_once()
+        assert handler.call_args.args[0] == "AAPL/5Min/OHLCV"
+
+    def test_flush_all(self):
+        agg = BarAggregator([Freq.min_5, Freq.min_15])
+        handler = MagicMock()
+        agg.register(r".*", handler)
+        _feed(agg, "AAPL", [1.0, 2.0])
+
+        agg.flush()
+
+        assert handler.call_count == 2
+
+
+class TestAttach:
+    def test_attach_async_stream_conn(self):
+        conn = AsyncStreamConn("ws://localhost:5993/ws")
+        agg = BarAggregator([Freq.min_5])
+        agg.attach(conn)
+        handler = MagicMock()
+        agg.register(r"^AAPL/", handler)
+
+        for i in range(5):
+            conn._dispatch("AAPL/1Min/OHLCV", _bar(T0 + i * 60, 1.0, 2.0, 0.5, 1.5))
+        conn._dispatch("AAPL/1D/OHLCV", _bar(T0, 1.0, 2.0, 0.5, 1.5))
+
+        handler.assert_called_once()
+
+    def test_attach_sync_stream_conn(self):
+        conn = StreamConn("ws://localhost:5993/ws")
+        agg = BarAggregator([Freq.min_5])
+        agg.attach(conn)
+
+        conn._dispatch(
+            "AAPL/1Min/OHLCV",
+            {"key": "AAPL/1Min/OHLCV", "data": _bar(T0, 1.0, 2.0, 0.5, 1.5)},
+        )
+
+        assert agg.symbols == ["AAPL"]
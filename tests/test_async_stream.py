@@ -18,6 +18,7 @@ import msgpack
 import pytest
 
 from pymarketstore.async_stream import AsyncStreamConn
+from pymarketstore.reconnect import ReconnectPolicy
 
 
 # ---------------------------------------------------------------------------
@@ -162,6 +163,20 @@ class TestDispatch:
         handler_a.assert_called_once_with("BTC/1Min/OHLCV", {"Open": 100.0})
         handler_b.assert_called_once_with("BTC/1Min/OHLCV", {"Open": 100.0})
 
+    def test_register_after_dispatch_invalidates_cache(self):
+        conn = AsyncStreamConn("ws://localhost:5993/ws")
+        handler_a = MagicMock()
+        handler_b = MagicMock()
+        conn.register(r"^BTC/", handler_a)
+        conn._dispatch("BTC/1Min/OHLCV", {})
+
+        conn.register(r"^BTC/1Min", handler_b)
+        conn.deregister(r"^BTC/")
+        conn._dispatch("BTC/1Min/OHLCV", {})
+
+        handler_a.assert_called_once()
+        handler_b.assert_called_once()
+
     def test_handler_exception_is_caught_and_logged(self, caplog):
         conn = AsyncStreamConn("ws://localhost:5993/ws")
 
@@ -270,7 +285,12 @@ class TestRunReconnection:
     @patch("pymarketstore.async_stream.asyncio.sleep", new_callable=AsyncMock)
     @patch("pymarketstore.async_stream.ws_connect")
     async def test_network_error_triggers_reconnect(self, mock_ws_connect, mock_sleep):
-        conn = AsyncStreamConn("ws://localhost:5993/ws", reconnect_delay=3.0)
+        conn = AsyncStreamConn(
+            "ws://localhost:5993/ws",
+            reconnect_policy=ReconnectPolicy(
+                base_delay=3.0, jitter=0, immediate_first_retry=False
+            ),
+        )
         connect_count = 0
 
         @asynccontextmanager
@@ -334,6 +354,50 @@ class TestRunReconnection:
 
         assert mock_ws_connect.call_count == 1
 
+    @patch("pymarketstore.async_stream.asyncio.sleep", new_callable=AsyncMock)
+    @patch("pymarketstore.async_stream.ws_connect")
+    async def test_default_policy_retries_immediately_then_backs_off(
+        self, mock_ws_connect, mock_sleep
+    ):
+        conn = AsyncStreamConn("ws://localhost:5993/ws", reconnect_delay=2.0)
+        conn.reconnect_policy.jitter = 0
+        attempt = 0
+
+        @asynccontextmanager
+        async def fake_ctx(endpoint):
+            nonlocal attempt
+            attempt += 1
+            if attempt == 4:
+                await conn.stop()
+            raise OSError("connection refused")
+            yield
+
+        mock_ws_connect.side_effect = fake_ctx
+
+        await conn.run(["BTC/*/*"])
+
+        assert [c.args[0] for c in mock_sleep.call_args_list] == [0.0, 2.0, 4.0]
+
+    @patch("pymarketstore.async_stream.asyncio.sleep", new_callable=AsyncMock)
+    @patch("pymarketstore.async_stream.ws_connect")
+    async def test_max_attempts_reraises_network_error(self, mock_ws_connect, mock_sleep):
+        conn = AsyncStreamConn(
+            "ws://localhost:5993/ws",
+            reconnect_policy=ReconnectPolicy(max_attempts=2),
+        )
+
+        @asynccontextmanager
+        async def fake_ctx(endpoint):
+            raise OSError("connection refused")
+            yield
+
+        mock_ws_connect.side_effect = fake_ctx
+
+        with pytest.raises(OSError, match="connection refused"):
+            await conn.run(["BTC/*/*"])
+
+        assert mock_ws_connect.call_count == 2
+
 
 # ---------------------------------------------------------------------------
 # run() — subscription error handling
@@ -348,8 +412,10 @@ class TestRunSubscriptionErrors:
     ):
         conn = AsyncStreamConn(
             "ws://localhost:5993/ws",
-            reconnect_delay=1.0,
             max_subscription_retries=3,
+            reconnect_policy=ReconnectPolicy(
+                base_delay=1.0, jitter=0, immediate_first_retry=False
+            ),
         )
         attempt = 0
 
@@ -509,3 +575,36 @@ class TestStop:
         await conn.stop()
 
         assert conn._running is False
+
+
+# ---------------------------------------------------------------------------
+# update_streams()
+# ---------------------------------------------------------------------------
+
+
+class TestUpdateStreams:
+    async def test_sends_new_subscription_when_connected(self):
+        conn = AsyncStreamConn("ws://localhost:5993/ws")
+        conn._ws = MagicMock()
+        conn._ws.send = AsyncMock()
+
+        await conn.update_streams(["ETH/*/*"])
+
+        conn._ws.send.assert_called_once_with(msgpack.packb({"streams": ["ETH/*/*"]}))
+        assert conn._streams == ["ETH/*/*"]
+
+    async def test_only_records_streams_when_disconnected(self):
+        conn = AsyncStreamConn("ws://localhost:5993/ws")
+
+        await conn.update_streams(["ETH/*/*"])
+
+        assert conn._streams == ["ETH/*/*"]
+
+    async def test_send_failure_is_logged(self, caplog):
+        conn = AsyncStreamConn("ws://localhost:5993/ws")
+        conn._ws = MagicMock()
+        conn._ws.send = AsyncMock(side_effect=OSError("closed"))
+
+        await conn.update_streams(["ETH/*/*"])
+
+        assert "closed" in caplog.text
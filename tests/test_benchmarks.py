@@ -0,0 +1,161 @@
+"""Tests for the benchmarks package and its command lines."""
+
+import json
+
+import numpy as np
+import pytest
+
+from benchmarks import load, stream, sweep
+
+
+class TestLoadMain:
+    def test_closed_loop(self, capsys):
+        load.main(["-c", "1,2", "-d", "0.3", "--rows", "10", "-f", "json"])
+
+        report = json.loads(capsys.readouterr().out)
+        assert "max_sustained_rate" not in report
+        assert [p["workers"] for p in report["points"]] == [1, 2]
+        for p in report["points"]:
+            assert p["loop"] == "closed"
+            assert p["completed"] == p["latency"]["count"] > 0
+            assert p["errors"] == 0
+            assert (
+                p["latency"]["p50_ms"] <= p["latency"]["p99_ms"] <= p["latency"]["max_ms"]
+            )
+
+    @pytest.mark.parametrize("mode", ["thread", "asyncio"])
+    @pytest.mark.parametrize("transport", ["jsonrpc", "grpc"])
+    def test_open_loop(self, capsys, mode, transport):
+        load.main(
+            ["-m", mode, "-t", transport, "-c", "4", "-r", "20,40"]
+            + ["-d", "0.5", "--rows", "10", "-f", "json"]
+        )
+
+        report = json.loads(capsys.readouterr().out)
+        assert [p["offered_rate"] for p in report["points"]] == [20, 40]
+        assert [p["completed"] for p in report["points"]] == [10, 20]
+        assert report["max_sustained_rate"] in (20, 40)
+        assert report["meta"]["mode"] == mode
+
+    def test_bad_list(self, capsys):
+        with pytest.raises(SystemExit) as exc:
+            load.main(["-c", "1,many"])
+
+        assert exc.value.code == 2
+        assert "comma-separated integers" in capsys.readouterr().err
+
+
+class TestStreamMain:
+    @pytest.mark.parametrize("client", ["sync", "async"])
+    def test_stream_benchmark(self, capsys, client):
+        stream.main(
+            ["--client", client, "-r", "200,400", "-k", "3"]
+            + ["--handlers", "1,2", "-d", "0.5", "--bars", "-f", "json"]
+        )
+
+        report = json.loads(capsys.readouterr().out)
+        assert report["meta"]["bars"] is True
+        curves = report["curves"]
+        assert [(c["client"], c["handlers"]) for c in curves] == [
+            (client, 1),
+            (client, 2),
+        ]
+        for curve in curves:
+            assert [p["rate"] for p in curve["points"]] == [200, 400]
+            for p in curve["points"]:
+                assert p["keys"] == 3
+                assert p["published"] == p["received"] == p["rate"] // 2
+                assert p["latency"]["count"] == p["received"]
+                assert p["cpu_us_per_message"] > 0
+            assert curve["max_sustained_rate"] in (200, 400)
+
+    def test_stops_at_first_rate_not_sustained(self, capsys):
+        stream.main(
+            ["--client", "async", "-r", "100,200", "-d", "0.3"]
+            + ["--slo-ms", "0", "-f", "json"]
+        )
+
+        (curve,) = json.loads(capsys.readouterr().out)["curves"]
+        assert [p["rate"] for p in curve["points"]] == [100]
+        assert curve["points"][0]["sustained"] is False
+        assert curve["max_sustained_rate"] is None
+
+    def test_table(self, capsys):
+        stream.main(["--client", "sync", "-r", "100", "-d", "0.3"])
+
+        assert "Max sustained rate (sync, 10 keys, 1 handlers): 100 bars/s" in (
+            capsys.readouterr().out
+        )
+
+
+class TestSweepMain:
+    def test_inproc_json(self, capsys, tmp_path):
+        output = tmp_path / "bench.json"
+        sweep.main(
+            ["--rows", "10,100", "--symbols", "2", "-c", "1,2", "-t", "jsonrpc"]
+            + ["-n", "3", "--warmup", "1", "-f", "json", "-o", str(output)]
+        )
+
+        report = json.loads(capsys.readouterr().out)
+        assert report == json.loads(output.read_text())
+        assert report["meta"]["target"] == "inproc"
+        assert [(r["rows"], r["concurrency"]) for r in report["results"]] == [
+            (10, 1),
+            (10, 2),
+            (100, 1),
+            (100, 2),
+        ]
+        for r in report["results"]:
+            assert r["requests"] == 3 * r["concurrency"]
+            assert r["errors"] == 0
+            assert 0 < r["p50_ms"] <= r["p95_ms"] <= r["p99_ms"]
+            assert r["throughput_qps"] > 0
+            assert r["peak_alloc_mb"] >= 0
+
+    def test_peak_alloc_is_measured_per_cell(self):
+        # a 10 MB allocation does not raise the peak of later measurements
+        assert 9.5 < sweep.peak_alloc_mb(lambda: np.ones(10 * 2**20 // 8)) < 11
+        assert sweep.peak_alloc_mb(lambda: None) < 1
+
+    def test_bad_list(self, capsys):
+        with pytest.raises(SystemExit) as exc:
+            sweep.main(["--rows", "10,many"])
+
+        assert exc.value.code == 2
+        assert "comma-separated integers" in capsys.readouterr().err
+
+    def test_history_check(self, capsys, tmp_path):
+        history = tmp_path / "bench.jsonl"
+        args = ["--suite", "hot-paths", "--rows", "1000", "-n", "12"]
+        args += ["--history", str(history), "--check", "--gate", "results.decode"]
+        sweep.main(args)
+        assert "No baseline runs" in capsys.readouterr().err
+
+        (run,) = [json.loads(line) for line in history.read_text().splitlines()]
+        assert run["meta"]["machine"]["fingerprint"]
+        assert "git" in run["meta"]
+        decode = next(r for r in run["hot_paths"] if r["name"] == "results.decode")
+        assert len(decode["samples_ms"]) == 12
+
+        # a baseline far faster than anything measurable
+        for r in run["hot_paths"]:
+            r["samples_ms"] = [1e-6] * len(r["samples_ms"])
+        history.write_text(json.dumps(run) + "\n")
+
+        with pytest.raises(SystemExit) as exc:
+            sweep.main(args + ["-f", "json"])
+        assert exc.value.code == 1
+        out, err = capsys.readouterr()
+        assert "Regression: results.decode" in err
+        report = json.loads(out)
+        assert [c["name"] for c in report["comparisons"]] == ["results.decode"]
+        assert report["comparisons"][0]["regressed"]
+        assert "samples_ms" not in report["hot_paths"][0]
+        assert len(history.read_text().splitlines()) == 2
+
+    def test_check_needs_history(self, capsys):
+        with pytest.raises(SystemExit) as exc:
+            sweep.main(["--check"])
+
+        assert exc.value.code == 2
+        assert "--check needs --history" in capsys.readouterr().err
@@ -0,0 +1,201 @@
+"""Tests for pymarketstore.cache and Client(cache=...)."""
+
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import pymarketstore as pymkts
+
+from pymarketstore.cache import ResultCache, touches_now
+from pymarketstore.filters import Epoch
+from pymarketstore.params import Params
+from pymarketstore.results import QueryReply, QueryResult
+
+
+T0 = 1700000000
+
+
+def _result(n=10, symbol="AAPL"):
+    arr = np.zeros(n, dtype=[("Epoch", "i8"), ("Close", "f8")])
+    arr["Epoch"] = T0 + 60 * np.arange(n)
+    return QueryResult({f"{symbol}/1Min/OHLCV": arr}, "UTC")
+
+
+def _closed(symbol="AAPL", start=T0):
+    return Params(symbol, "1Min", "OHLCV", start=start, end=start + 3600)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+# ---------------------------------------------------------------------------
+# touches_now()
+# ---------------------------------------------------------------------------
+
+
+class TestTouchesNow:
+    def test_open_and_closed_windows(self):
+        assert touches_now(Params("AAPL", "1Min", "OHLCV", start=T0))
+        assert not touches_now(_closed())
+        future = pd.Timestamp.now() + pd.Timedelta("1D")
+        assert touches_now(Params("AAPL", "1Min", "OHLCV", end=future))
+
+    def test_filter_bounds_close_the_window(self):
+        assert not touches_now(Params("AAPL", "1Min", "OHLCV").where(Epoch < T0))
+
+    def test_explicit_now(self):
+        assert touches_now(_closed(), now=T0 * 10**9)
+
+
+# ---------------------------------------------------------------------------
+# ResultCache
+# ---------------------------------------------------------------------------
+
+
+class TestResultCache:
+    def test_hit_and_miss(self):
+        cache = ResultCache()
+        p = _closed()
+        assert cache.get(p) is None
+        result = _result()
+        assert cache.put(p, result, "UTC")
+        assert cache.get(_closed()) == (result, "UTC")
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+        assert cache.stats()["hit_rate"] == 0.5
+
+    def test_byte_accounting_and_lru_eviction(self):
+        nbytes = 10 * 16
+        cache = ResultCache(max_bytes=2 * nbytes)
+        a, b, c = _closed("A"), _closed("B"), _closed("C")
+        cache.put(a, _result(), "UTC")
+        cache.put(b, _result(), "UTC")
+        assert cache.nbytes == 2 * nbytes
+        cache.get(a)  # b is now least recently used
+        cache.put(c, _result(), "UTC")
+
+        assert cache.get(b) is None
+        assert cache.get(a) is not None
+        assert cache.get(c) is not None
+        assert cache.evictions == 1
+        assert cache.nbytes == 2 * nbytes
+        assert len(cache) == 2
+
+    def test_replacing_entry_keeps_accounting(self):
+        cache = ResultCache()
+        cache.put(_closed(), _result(10), "UTC")
+        cache.put(_closed(), _result(5), "UTC")
+        assert cache.nbytes == 5 * 16
+        assert len(cache) == 1
+
+    def test_too_large_is_not_cached(self):
+        cache = ResultCache(max_bytes=100)
+        assert not cache.put(_closed(), _result(10), "UTC")
+        assert len(cache) == 0
+
+    def test_open_windows_expire(self):
+        clock = FakeClock()
+        cache = ResultCache(ttl=30, clock=clock)
+        live = Params("AAPL", "1Min", "OHLCV", start=T0)
+        cache.put(live, _result(), "UTC")
+        cache.put(_closed(), _result(), "UTC")
+
+        clock.now = 29
+        assert cache.get(live) is not None
+        clock.now = 30
+        assert cache.get(live) is None
+        assert cache.get(_closed()) is not None
+        assert cache.expirations == 1
+        assert cache.nbytes == 10 * 16
+
+    def test_zero_ttl_disables_open_windows(self):
+        cache = ResultCache(ttl=0)
+        assert not cache.put(Params("AAPL", "1Min", "OHLCV"), _result(), "UTC")
+        assert cache.put(_closed(), _result(), "UTC")
+
+    def test_clear_and_repr(self):
+        cache = ResultCache()
+        cache.put(_closed(), _result(), "UTC")
+        cache.clear()
+        assert len(cache) == 0
+        assert cache.nbytes == 0
+        assert repr(cache) == "ResultCache(entries=0, nbytes=0, hits=0, misses=0)"
+
+
+# ---------------------------------------------------------------------------
+# Client(cache=...)
+# ---------------------------------------------------------------------------
+
+
+class TestClientCache:
+    @patch("pymarketstore.jsonrpc_client.MsgpackRpcClient")
+    def test_repeated_query_is_served_from_cache(self, MockRpcClient):
+        client = pymkts.Client(cache=ResultCache())
+        reply = QueryReply([_result()], "America/New_York")
+
+        with patch.object(client.client, "query", return_value=reply) as query:
+            first = client.query(_closed())
+            second = client.query(_closed())
+
+        assert query.call_count == 1
+        assert second.timezone == "America/New_York"
+        arr = second.first().array
+        assert not arr.flags.writeable
+        assert np.shares_memory(arr, first.first().array)
+
+    @patch("pymarketstore.jsonrpc_client.MsgpackRpcClient")
+    def test_only_missing_params_are_fetched(self, MockRpcClient):
+        client = pymkts.Client(cache=ResultCache())
+        client.cache.put(_closed("A"), _result(symbol="A"), "UTC")
+
+        def query(params):
+            return QueryReply(
+                [_result(symbol=p.tbk.split("/")[0]) for p in params], "UTC"
+            )
+
+        with patch.object(client.client, "query", side_effect=query) as mock:
+            reply = client.query([_closed("A"), _closed("B"), _closed("C")])
+
+        assert [p.tbk for p in mock.call_args[0][0]] == [
+            "B/1Min/OHLCV",
+            "C/1Min/OHLCV",
+        ]
+        assert reply.keys() == ["A/1Min/OHLCV", "B/1Min/OHLCV", "C/1Min/OHLCV"]
+        assert len(client.cache) == 3
+
+    @patch("pymarketstore.jsonrpc_client.MsgpackRpcClient")
+    def test_empty_params_are_sent_uncached(self, MockRpcClient):
+        client = pymkts.Client(cache=ResultCache())
+        reply = QueryReply([], "UTC")
+
+        with patch.object(client.client, "query", return_value=reply) as query:
+            assert client.query([]).results == []
+
+        query.assert_called_once_with([])
+
+    @pytest.mark.parametrize("method", ["write", "write_batch", "destroy"])
+    @patch("pymarketstore.jsonrpc_client.MsgpackRpcClient")
+    def test_writes_invalidate(self, MockRpcClient, method):
+        client = pymkts.Client(cache=ResultCache())
+        reply = QueryReply([_result()], "UTC")
+        rows = np.zeros(1, dtype=[("Epoch", "i8"), ("Close", "f8")])
+        args = {
+            "write": (rows, "AAPL/1Min/OHLCV"),
+            "write_batch": ({"AAPL/1Min/OHLCV": rows},),
+            "destroy": ("AAPL/1Min/OHLCV",),
+        }[method]
+
+        with patch.object(client.client, "query", return_value=reply) as query:
+            client.query(_closed())
+            with patch.object(client.client, method, return_value={}):
+                getattr(client, method)(*args)
+            client.query(_closed())
+
+        assert query.call_count == 2
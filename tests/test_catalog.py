@@ -0,0 +1,270 @@
+"""Tests for pymarketstore.catalog."""
+
+import json
+import threading
+
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pymarketstore.catalog import Catalog, TbkInfo, default_catalog_path, discover_ranges
+from pymarketstore.enums import Freq
+from pymarketstore.local_store import LocalClient
+from pymarketstore.store import Store
+
+
+T0 = 1704067200  # 2024-01-01
+
+
+def _bars(start, n, step=60):
+    arr = np.zeros(n, dtype=[("Epoch", "i8"), ("Close", "f8")])
+    arr["Epoch"] = start + step * np.arange(n)
+    arr["Close"] = np.arange(n)
+    return arr
+
+
+class CountingClient:
+    """A LocalClient wrapper recording the symbols of each request."""
+
+    def __init__(self, root, broken=()):
+        self.local = LocalClient(root)
+        self.broken = set(broken)
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def query(self, params):
+        symbols = params[0].tbk.split("/")[0].split(",")
+        with self._lock:
+            self.requests.append(symbols)
+        if self.broken & set(symbols):
+            raise Exception("corrupted bucket")
+        return self.local.query(params)
+
+    def list_symbols(self, *args, **kwargs):
+        return self.local.list_symbols(*args, **kwargs)
+
+
+@pytest.fixture
+def client(tmp_path):
+    client = CountingClient(tmp_path)
+    for i in range(10):
+        client.local.write(_bars(T0 + 60 * i, 5 + i), f"S{i}/1Min/OHLCV")
+    client.local.write(_bars(T0, 3, step=86400), "S0/1D/OHLCV")
+    return client
+
+
+# ---------------------------------------------------------------------------
+# discover_ranges
+# ---------------------------------------------------------------------------
+
+
+class TestDiscoverRanges:
+    def test_ranges(self, client):
+        tbks = [f"S{i}/1Min/OHLCV" for i in range(10)] + ["S0/1D/OHLCV"]
+        ranges = discover_ranges(client, tbks)
+
+        assert ranges["S3/1Min/OHLCV"] == (T0 + 180, T0 + 180 + 60 * 7)
+        assert ranges["S0/1D/OHLCV"] == (T0, T0 + 2 * 86400)
+        # one request per timeframe
+        assert sorted(len(r) for r in client.requests) == [1, 10]
+
+    def test_batches_and_progress(self, client):
+        tbks = [f"S{i}/1Min/OHLCV" for i in range(10)]
+        done = []
+        ranges = discover_ranges(
+            client, tbks, batch_size=3, workers=2, progress=done.append
+        )
+
+        assert all(ranges[tbk] is not None for tbk in tbks)
+        assert sorted(len(r) for r in client.requests) == [1, 3, 3, 3]
+        assert sum(done) == 10
+
+    def test_missing_keys_are_none(self, client):
+        ranges = discover_ranges(client, ["S1/1Min/OHLCV", "NOPE/1Min/OHLCV"])
+        assert ranges["S1/1Min/OHLCV"] is not None
+        assert ranges["NOPE/1Min/OHLCV"] is None
+
+        assert discover_ranges(client, ["NOPE/1H/OHLCV"]) == {"NOPE/1H/OHLCV": None}
+        assert discover_ranges(client, []) == {}
+
+    def test_failing_batch_is_retried_per_key(self, client):
+        client.broken = {"S2"}
+        tbks = [f"S{i}/1Min/OHLCV" for i in range(4)]
+        ranges = discover_ranges(client, tbks)
+
+        assert ranges["S2/1Min/OHLCV"] is None
+        assert ranges["S3/1Min/OHLCV"] == (T0 + 180, T0 + 180 + 60 * 7)
+        assert len(client.requests) == 5
+
+
+# ---------------------------------------------------------------------------
+# Catalog
+# ---------------------------------------------------------------------------
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestCatalog:
+    def test_refresh(self, client, tmp_path):
+        catalog = Catalog(client, tmp_path / "catalog.json")
+        assert catalog.stale
+        catalog.refresh()
+
+        assert len(catalog) == 11
+        info = catalog.get("S3/1Min/OHLCV")
+        assert (info.first, info.last) == (T0 + 180, T0 + 180 + 60 * 7)
+        assert info.max_rows == 8
+        assert info.columns == [("Epoch", "<i8"), ("Close", "<f8")]
+        assert catalog.get("S0/1D/OHLCV").max_rows == 3
+        assert not catalog.stale
+
+    def test_queries(self, client):
+        catalog = Catalog(client).refresh()
+
+        assert catalog.symbols(Freq.day) == ["S0"]
+        assert len(catalog.symbols("1Min")) == 10
+        # S{n} covers T0 + 60 * n to T0 + 240 + 120 * n
+        assert catalog.symbols("1Min", start=T0 + 601) == [
+            "S4",
+            "S5",
+            "S6",
+            "S7",
+            "S8",
+            "S9",
+        ]
+        assert catalog.symbols("1Min", end=pd.Timestamp(T0 + 60, unit="s")) == [
+            "S0",
+            "S1",
+        ]
+        assert catalog.has("S0", Freq.day)
+        assert not catalog.has("S1", Freq.day)
+        assert [i.tbk for i in catalog.infos("1D")] == ["S0/1D/OHLCV"]
+
+    def test_persistence(self, client, tmp_path):
+        path = tmp_path / "cache" / "catalog.json"
+        Catalog(client, path).refresh()
+        assert json.loads(path.read_text())["tbks"]["S0/1D/OHLCV"]["first"] == T0
+        assert Catalog(client, path).timezone == "UTC"
+
+        client.requests.clear()
+        catalog = Catalog(client, path)
+        assert catalog.get("S0/1D/OHLCV").last == T0 + 2 * 86400
+        assert not catalog.stale
+        catalog.ensure_fresh()
+        assert client.requests == []
+
+    def test_incremental_refresh(self, client):
+        clock = Clock()
+        catalog = Catalog(client, ttl=60, clock=clock).refresh()
+        client.requests.clear()
+
+        # a new key is read from both ends, known keys are not re-read
+        client.local.write(_bars(T0, 2), "NEW/1Min/OHLCV")
+        clock.now += 10
+        assert catalog.pending() == 1
+        catalog.refresh()
+        assert catalog.get("NEW/1Min/OHLCV").last == T0 + 60
+        assert [len(r) for r in client.requests] == [1]
+
+        # after the TTL known keys only get their last epoch re-read
+        client.local.write(_bars(T0 + 3600, 1), "S0/1D/OHLCV")
+        client.local.destroy("S5/1Min/OHLCV")
+        clock.now += 60
+        client.requests.clear()
+        catalog.refresh()
+        assert (catalog.get("S0/1D/OHLCV").first, catalog.get("S0/1D/OHLCV").last) == (
+            T0,
+            T0 + 2 * 86400,
+        )
+        assert catalog.get("S5/1Min/OHLCV") is None
+        assert "S5" not in catalog.symbols("1Min")
+
+    def test_invalidate(self, client):
+        clock = Clock()
+        catalog = Catalog(client, clock=clock).refresh()
+        client.local.write(_bars(T0 - 60, 1), "S1/1Min/OHLCV")
+
+        catalog.invalidate("S1/1Min/OHLCV")
+        assert catalog.stale
+        assert catalog.pending() == 1
+        catalog.ensure_fresh()
+        assert catalog.get("S1/1Min/OHLCV").first == T0 - 60
+
+    def test_full_refresh_and_vanished_keys(self, client):
+        catalog = Catalog(client).refresh()
+        client.local.destroy("S0/1D/OHLCV")
+        client.requests.clear()
+        catalog.refresh(full=True, tbks=["S1/1Min/OHLCV"])
+        assert len(catalog) == 1
+        assert "S0/1D/OHLCV" not in catalog
+        assert len(client.requests) == 1
+
+    def test_refresh_only(self, client):
+        clock = Clock()
+        catalog = Catalog(client, clock=clock)
+        tbks = ["S0/1D/OHLCV", "S1/1Min/OHLCV"]
+        catalog.refresh(tbks=tbks, only=["S0/1D/OHLCV"])
+        assert catalog.get("S0/1D/OHLCV").first is not None
+        assert catalog.get("S1/1Min/OHLCV").checked == 0.0
+        assert catalog.stale
+        assert catalog.pending(tbks) == 1
+
+        catalog.refresh(tbks=tbks, only=["S1/1Min/OHLCV"])
+        assert catalog.pending(tbks) == 0
+        assert catalog.get("S0/1D/OHLCV").first is not None
+
+    def test_tbkinfo_round_trip(self):
+        info = TbkInfo("A/1H/OHLCV", 0, 7200, [("Epoch", "<i8")], 5.0)
+        copy = TbkInfo.from_dict(info.tbk, json.loads(json.dumps(info.to_dict())))
+        assert (copy.first, copy.last, copy.columns, copy.checked) == (
+            0,
+            7200,
+            [("Epoch", "<i8")],
+            5.0,
+        )
+        assert copy.max_rows == 3
+        assert TbkInfo("A/4Tick/X", 0, 1).max_rows is None
+        assert not TbkInfo("A/1D/OHLCV").covers()
+
+    def test_default_path(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+        assert default_catalog_path("http://localhost:5993/rpc") == str(
+            tmp_path / "pymarketstore" / "catalog-localhost_5993_rpc.json"
+        )
+
+
+# ---------------------------------------------------------------------------
+# Store(catalog=...)
+# ---------------------------------------------------------------------------
+
+
+class TestStoreCatalog:
+    def test_has_and_get_symbols(self, client, tmp_path):
+        with patch("pymarketstore.store.JsonRpcClient", return_value=client):
+            store = Store(catalog=tmp_path / "catalog.json")
+
+        assert store.has("S0", Freq.day)
+        assert not store.has("S1", Freq.day)
+        assert store.get_symbols(Freq.day) == ["S0"]
+        assert sorted(len(r) for r in client.requests) == [1, 10]
+
+    def test_write_invalidates(self, client, tmp_path):
+        client.write = client.local.write
+        with patch("pymarketstore.store.JsonRpcClient", return_value=client):
+            store = Store(catalog=Catalog(client))
+
+        assert not store.has("S1", Freq.day)
+        bars = pd.DataFrame(
+            {"Close": [1.0]},
+            index=pd.DatetimeIndex([pd.Timestamp(T0 * 10**9)], name="Epoch"),
+        )
+        store.write("S1", Freq.day, bars)
+        assert store.has("S1", Freq.day)
@@ -1,9 +1,11 @@
 """Tests for pymarketstore.cli — Click CLI commands and helper functions."""
 
+import json
+
 from unittest.mock import MagicMock, patch
 
+import numpy as np
 import pandas as pd
-import pytest
 
 from click.testing import CliRunner
 
@@ -14,6 +16,7 @@ from pymarketstore.cli import (
     _timeframe_sort_key,
     cli,
 )
+from pymarketstore.local_store import LocalClient
 
 
 # ---------------------------------------------------------------------------
@@ -222,6 +225,100 @@ class TestListCommand:
         assert "AAPL/1D/OHLCV" in result.output
         assert "TSLA/1Min/OHLCV" not in result.output
 
+    @patch("pymarketstore.cli.pymkts.Client")
+    def test_list_shows_date_ranges(self, MockClient, tmp_path, monkeypatch):
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        local = LocalClient(tmp_path / "data")
+        arr = np.zeros(3, dtype=[("Epoch", "i8"), ("Close", "f8")])
+        arr["Epoch"] = [1704067200, 1704153600, 1704240000]
+        local.write(arr, "AAPL/1D/OHLCV")
+        local.write(arr, "TSLA/1D/OHLCV")
+
+        mock_client = MockClient.return_value
+        mock_client.list_symbols.return_value = [
+            "AAPL/1D/OHLCV",
+            "TSLA/1D/OHLCV",
+            "GONE/1D/OHLCV",
+            "AAPL/1D/TRADES",
+        ]
+        mock_client.query.side_effect = local.query
+
+        runner = CliRunner()
+        result = runner.invoke(cli, ["list", "--workers", "2"])
+
+        assert result.exit_code == 0
+        lines = result.output.splitlines()
+        assert any(
+            line.split() == ["AAPL", "1D", "2024-01-01", "2024-01-03"] for line in lines
+        )
+        assert any(line.split() == ["GONE", "1D", "N/A", "N/A"] for line in lines)
+        # one batch for the shown (OHLCV) keys; TRADES is not scanned
+        assert mock_client.query.call_count == 1
+
+        # the second run is answered from the catalog file
+        result = runner.invoke(cli, ["list"])
+        assert result.exit_code == 0
+        assert "2024-01-03" in result.output
+        assert mock_client.query.call_count == 1
+
+        result = runner.invoke(cli, ["list", "--refresh"])
+        assert result.exit_code == 0
+        assert mock_client.query.call_count == 2
+
+    @patch("pymarketstore.cli.pymkts.Client")
+    def test_list_dates_in_server_timezone(self, MockClient, tmp_path, monkeypatch):
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        local = LocalClient(tmp_path / "data", timezone="Asia/Tokyo")
+        arr = np.zeros(2, dtype=[("Epoch", "i8"), ("Close", "f8")])
+        # midnight in Tokyo, 15:00 UTC the day before
+        arr["Epoch"] = [1704034800, 1704121200]
+        local.write(arr, "AAPL/1D/OHLCV")
+
+        mock_client = MockClient.return_value
+        mock_client.list_symbols.side_effect = local.list_symbols
+        mock_client.query.side_effect = local.query
+
+        runner = CliRunner()
+        for _ in range(2):  # scanned, then from the catalog file
+            result = runner.invoke(cli, ["list"])
+            assert result.exit_code == 0
+            assert any(
+                line.split() == ["AAPL", "1D", "2024-01-01", "2024-01-02"]
+                for line in result.output.splitlines()
+            )
+
+    @patch("pymarketstore.cli.pymkts.Client")
+    def test_list_scans_only_the_filtered_timeframe(
+        self, MockClient, tmp_path, monkeypatch
+    ):
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        local = LocalClient(tmp_path / "data")
+        arr = np.zeros(1, dtype=[("Epoch", "i8"), ("Close", "f8")])
+        arr["Epoch"] = [1704067200]
+        for tbk in ("AAPL/1D/OHLCV", "AAPL/1Min/OHLCV", "TSLA/1Min/OHLCV"):
+            local.write(arr, tbk)
+
+        mock_client = MockClient.return_value
+        mock_client.list_symbols.side_effect = local.list_symbols
+        mock_client.query.side_effect = local.query
+
+        runner = CliRunner()
+        result = runner.invoke(cli, ["list", "--freq", "1D"])
+
+        assert result.exit_code == 0
+        assert "AAPL" in result.output
+        assert "TSLA" not in result.output
+        assert mock_client.query.call_count == 1
+        (params,) = mock_client.query.call_args.args
+        assert {p.tbk for p in params} == {"AAPL/1D/OHLCV"}
+
+        # the 1Min keys are scanned when they are shown, the 1D one is cached
+        result = runner.invoke(cli, ["list"])
+        assert result.exit_code == 0
+        assert "TSLA" in result.output
+        (params,) = mock_client.query.call_args.args
+        assert {p.tbk for p in params} == {"AAPL,TSLA/1Min/OHLCV"}
+
     @patch("pymarketstore.cli.pymkts.Client")
     def test_list_error_shows_message(self, MockClient):
         MockClient.side_effect = Exception("connection refused")
@@ -231,3 +328,88 @@ class TestListCommand:
 
         assert result.exit_code == 1
         assert "Error" in result.output
+
+
+class TestExportCommand:
+    @patch("pymarketstore.cli.pymkts.Client")
+    def test_export_all_symbols(self, MockClient, tmp_path):
+        local = LocalClient(tmp_path / "data")
+        arr = np.zeros(3, dtype=[("Epoch", "i8"), ("Close", "f8")])
+        arr["Epoch"] = [1704067200, 1704153600, 1704240000]
+        local.write(arr, "AAPL/1D/OHLCV")
+        local.write(arr, "TSLA/1D/OHLCV")
+        local.write(arr, "TSLA/1Min/OHLCV")
+
+        mock_client = MockClient.return_value
+        mock_client.list_symbols.side_effect = local.list_symbols
+        mock_client.query.side_effect = local.query
+
+        out = tmp_path / "out"
+        runner = CliRunner()
+        result = runner.invoke(
+            cli, ["export", "all", "1D", str(out), "--format", "csv", "--chunk-rows", "2"]
+        )
+
+        assert result.exit_code == 0
+        assert "Exported 6 rows of 2 symbol(s)" in result.output
+        assert "rows/s" in result.output
+        assert (out / "AAPL" / "1D" / "OHLCV.csv").exists()
+        assert not (out / "TSLA" / "1Min").exists()
+
+    @patch("pymarketstore.cli.pymkts.Client")
+    def test_export_no_data(self, MockClient, tmp_path):
+        MockClient.return_value.query.side_effect = Exception(
+            "no results returned from query"
+        )
+
+        runner = CliRunner()
+        result = runner.invoke(cli, ["export", "AAPL", "1D", str(tmp_path), "-f", "csv"])
+
+        assert result.exit_code == 1
+        assert "No data found" in result.output
+
+
+class TestImportCommand:
+    @patch("pymarketstore.cli.pymkts.Client")
+    def test_export_then_import(self, MockClient, tmp_path):
+        source = LocalClient(tmp_path / "source")
+        arr = np.zeros(3, dtype=[("Epoch", "i8"), ("Close", "f8")])
+        arr["Epoch"] = [1704067200, 1704153600, 1704240000]
+        source.write(arr, "AAPL/1D/OHLCV")
+        source.write(arr, "TSLA/1D/OHLCV")
+
+        mock_client = MockClient.return_value
+        mock_client.list_symbols.side_effect = source.list_symbols
+        mock_client.query.side_effect = source.query
+        runner = CliRunner()
+        out = tmp_path / "out"
+        assert (
+            runner.invoke(cli, ["export", "all", "1D", str(out), "-f", "csv"]).exit_code
+            == 0
+        )
+
+        target = LocalClient(tmp_path / "target")
+        mock_client.list_symbols.side_effect = target.list_symbols
+        mock_client.query.side_effect = target.query
+        mock_client.create.side_effect = target.create
+        mock_client.write_batch.side_effect = target.write_batch
+        result = runner.invoke(cli, ["import", str(out), "--workers", "2"])
+
+        assert result.exit_code == 0, result.output
+        assert "Created: AAPL/1D/OHLCV" in result.output
+        assert "Imported 6 rows of 2 file(s) into 2 bucket(s)" in result.output
+        assert target.list_symbols() == ["AAPL", "TSLA"]
+
+    @patch("pymarketstore.cli.pymkts.Client")
+    def test_import_bad_shape(self, MockClient, tmp_path):
+        path = tmp_path / "AAPL.csv"
+        path.write_text("Epoch,Close\n1704067200,1.0\n")
+        MockClient.return_value.list_symbols.return_value = []
+
+        runner = CliRunner()
+        result = runner.invoke(
+            cli, ["import", str(path), "--freq", "1D", "--shape", "Epoch:Close"]
+        )
+
+        assert result.exit_code == 1
+        assert "invalid column" in result.output
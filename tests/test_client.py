@@ -2,6 +2,7 @@ from datetime import date, datetime
 from unittest.mock import MagicMock, patch
 
 import numpy as np
+import pytest
 
 import pymarketstore as pymkts
 
@@ -127,6 +128,29 @@ def test_write(MockRpcClient):
     assert result == {"responses": []}
 
 
+@patch("pymarketstore.jsonrpc_client.MsgpackRpcClient")
+def test_write_batch(MockRpcClient):
+    mock_rpc = MockRpcClient.return_value
+    mock_rpc.call.return_value = {"responses": []}
+
+    c = pymkts.Client()
+    a = np.array([(1, 1.0), (2, 2.0)], dtype=[("Epoch", "i8"), ("Ask", "f4")])
+    b = np.array([(3, 3.0)], dtype=[("Epoch", "i8"), ("Ask", "f4")])
+    t = np.array([(1, 5)], dtype=[("Epoch", "i8"), ("Size", "i4")])
+    c.write_batch({"A/1Min/TICK": a, "B/1Min/TICK": b, "C/1Min/TRADE": t})
+
+    mock_rpc.call.assert_called_once()
+    requests = mock_rpc.call.call_args[1]["requests"]
+    # one dataset per distinct column layout
+    assert len(requests) == 2
+    ds = requests[0]["dataset"]
+    assert ds["startindex"] == {"A/1Min/TICK": 0, "B/1Min/TICK": 2}
+    assert ds["lengths"] == {"A/1Min/TICK": 2, "B/1Min/TICK": 1}
+    assert np.frombuffer(ds["data"][0], dtype="i8").tolist() == [1, 2, 3]
+    assert np.frombuffer(ds["data"][1], dtype="f4").tolist() == [1.0, 2.0, 3.0]
+    assert requests[1]["dataset"]["names"] == ["Epoch", "Size"]
+
+
 @patch("pymarketstore.jsonrpc_client.MsgpackRpcClient")
 def test_list_symbols(MockRpcClient):
     mock_rpc = MockRpcClient.return_value
@@ -320,3 +344,57 @@ def test_write_with_variable_length(MockRpcClient):
     call_args = mock_rpc.call.call_args
     req = call_args[1]["requests"][0]
     assert req["is_variable_length"] is True
+
+
+@patch("pymarketstore.jsonrpc_client.MsgpackRpcClient")
+def test_sql(MockRpcClient):
+    mock_rpc = MockRpcClient.return_value
+    mock_rpc.call.return_value = {
+        "timezone": "UTC",
+        "responses": [
+            {
+                "result": {
+                    "data": [b"\xf4\xe8^Z\x00\x00\x00\x00", b"\x00\x00\x00\x00\x00 Y@"],
+                    "length": 1,
+                    "lengths": {"BTC/1Min/OHLCV:Symbol/Timeframe/AttributeGroup": 1},
+                    "names": ["Epoch", "Close"],
+                    "startindex": {"BTC/1Min/OHLCV:Symbol/Timeframe/AttributeGroup": 0},
+                    "types": ["i8", "f8"],
+                }
+            }
+        ],
+    }
+
+    c = pymkts.Client()
+    stmt = "SELECT Epoch, Close FROM `BTC/1Min/OHLCV` WHERE Close > 100"
+    result = c.sql(stmt)
+
+    mock_rpc.call.assert_called_once_with(
+        "DataService.Query",
+        requests=[{"is_sqlstatement": True, "sql_statement": stmt}],
+    )
+    assert isinstance(result, QueryReply)
+    assert result.first().array["Close"].tolist() == [100.5]
+
+
+@patch("pymarketstore.jsonrpc_client.MsgpackRpcClient")
+def test_sql_multiple_statements(MockRpcClient):
+    mock_rpc = MockRpcClient.return_value
+    mock_rpc.call.return_value = {"timezone": "UTC", "responses": []}
+
+    pymkts.Client().sql(["SELECT * FROM `A/1D/OHLCV`", "SELECT * FROM `B/1D/OHLCV`"])
+
+    requests = mock_rpc.call.call_args[1]["requests"]
+    assert [r["sql_statement"] for r in requests] == [
+        "SELECT * FROM `A/1D/OHLCV`",
+        "SELECT * FROM `B/1D/OHLCV`",
+    ]
+
+
+@patch("pymarketstore.jsonrpc_client.MsgpackRpcClient")
+def test_sql_rejects_empty_statement(MockRpcClient):
+    c = pymkts.Client()
+    for statements in ("", "  ", [], [None]):
+        with pytest.raises(ValueError):
+            c.sql(statements)
+    MockRpcClient.return_value.call.assert_not_called()
@@ -0,0 +1,99 @@
+"""Tests for pymarketstore.decoder — stream message decoding."""
+
+import msgpack
+import pytest
+
+from pymarketstore.decoder import Bar, StreamDecoder
+
+
+def _pack(key, data):
+    return msgpack.packb({"key": key, "data": data})
+
+
+BAR = {
+    "Epoch": 1700000000,
+    "Open": 1.0,
+    "High": 2.0,
+    "Low": 0.5,
+    "Close": 1.5,
+    "Volume": 10.0,
+}
+
+
+class TestStreamDecoder:
+    def test_decodes_like_unpackb(self):
+        decoder = StreamDecoder()
+        raw = _pack("AAPL/1Min/OHLCV", BAR)
+        assert decoder.decode(raw) == msgpack.unpackb(raw, raw=False)
+
+    def test_consecutive_messages(self):
+        decoder = StreamDecoder()
+        for i in range(3):
+            msg = decoder.decode(_pack("AAPL/1Min/OHLCV", {"Epoch": i}))
+            assert msg["data"] == {"Epoch": i}
+
+    def test_messages_without_key(self):
+        decoder = StreamDecoder()
+        assert decoder.decode(msgpack.packb({"streams": ["*/*/*"]})) == {
+            "streams": ["*/*/*"]
+        }
+
+    def test_keys_are_interned(self):
+        decoder = StreamDecoder()
+        a = decoder.decode(_pack("AAPL/1Min/OHLCV", BAR))["key"]
+        b = decoder.decode(_pack("AAPL/1Min/OHLCV", BAR))["key"]
+        assert a is b
+
+    def test_recovers_after_truncated_message(self):
+        decoder = StreamDecoder()
+        raw = _pack("AAPL/1Min/OHLCV", BAR)
+        with pytest.raises(ValueError):
+            decoder.decode(raw[:5])
+        assert decoder.decode(raw)["data"] == BAR
+
+    def test_rejects_trailing_data(self):
+        with pytest.raises(msgpack.ExtraData):
+            StreamDecoder().decode(_pack("AAPL/1Min/OHLCV", BAR) * 2)
+
+    def test_bars_mode_returns_bar_objects(self):
+        decoder = StreamDecoder(bars=True)
+        msg = decoder.decode(_pack("AAPL/1Min/OHLCV", BAR))
+        assert msg["key"] == "AAPL/1Min/OHLCV"
+        data = msg["data"]
+        assert isinstance(data, Bar)
+        assert data.Close == 1.5
+        assert data["Volume"] == 10.0
+
+    def test_bars_mode_leaves_other_payloads_as_dicts(self):
+        decoder = StreamDecoder(bars=True)
+        tick = {"Epoch": 1, "Bid": 1.0, "Ask": 1.1}
+        assert decoder.decode(_pack("AAPL/1Sec/TICK", tick))["data"] == tick
+
+    def test_bars_mode_leaves_partial_bars_as_dicts(self):
+        decoder = StreamDecoder(bars=True)
+        partial = {"Epoch": 1, "Close": 1.5}
+        data = decoder.decode(_pack("AAPL/1Min/OHLCV", partial))["data"]
+        assert type(data) is dict
+        assert data == partial
+
+
+class TestBar:
+    def test_mapping_protocol(self):
+        bar = Bar.from_dict(BAR)
+        assert bar["Open"] == 1.0
+        assert bar.get("Close") == 1.5
+        assert bar.get("Bid") is None
+        assert list(bar) == ["Epoch", "Open", "High", "Low", "Close", "Volume"]
+        assert dict(bar) == BAR
+        assert bar == BAR
+
+    def test_from_dict_rejects_missing_fields(self):
+        with pytest.raises(TypeError):
+            Bar.from_dict({"Epoch": 1, "Close": 1.5})
+
+    def test_unknown_field_raises_key_error(self):
+        with pytest.raises(KeyError):
+            Bar.from_dict(BAR)["Bid"]
+
+    def test_has_no_instance_dict(self):
+        assert not hasattr(Bar.from_dict(BAR), "__dict__")
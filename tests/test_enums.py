@@ -167,3 +167,13 @@ class TestFreq:
             assert members[i] < members[i + 1], (
                 f"Freq.{members[i].name} should be < Freq.{members[i + 1].name}"
             )
+
+    def test_seconds(self):
+        assert Freq.second.seconds == 1
+        assert Freq.min_5.seconds == 300
+        assert Freq.hour.seconds == 3600
+        assert Freq.day.seconds == 86400
+
+    def test_seconds_of_calendar_frequencies_is_none(self):
+        for freq in (Freq.week, Freq.month, Freq.quarter, Freq.year):
+            assert freq.seconds is None
@@ -0,0 +1,149 @@
+"""Tests for pymarketstore.export."""
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pymarketstore.export import export, export_path, iter_chunks
+from pymarketstore.local_store import LocalClient
+
+
+T0 = 1704067200  # 2024-01-01
+
+
+def _bars(start, n):
+    arr = np.zeros(n, dtype=[("Epoch", "i8"), ("Close", "f8"), ("Volume", "f8")])
+    arr["Epoch"] = start + 60 * np.arange(n)
+    arr["Close"] = np.arange(n)
+    arr["Volume"] = 10 * np.arange(n)
+    return arr
+
+
+class RecordingClient:
+    """A LocalClient wrapper recording the sizes of returned chunks."""
+
+    def __init__(self, local):
+        self.local = local
+        self.sizes = []
+        self._lock = threading.Lock()
+
+    def query(self, params):
+        reply = self.local.query(params)
+        with self._lock:
+            self.sizes.append(len(reply.first().array))
+        return reply
+
+
+@pytest.fixture
+def client(tmp_path):
+    local = LocalClient(tmp_path / "server")
+    local.write(_bars(T0, 1000), "AAPL/1Min/OHLCV")
+    local.write(_bars(T0, 10), "AMD/1Min/OHLCV")
+    return RecordingClient(local)
+
+
+# ---------------------------------------------------------------------------
+# iter_chunks
+# ---------------------------------------------------------------------------
+
+
+class TestIterChunks:
+    def test_pages_through_the_range(self, client):
+        chunks = list(iter_chunks(client, "AAPL/1Min/OHLCV", chunk_rows=300))
+        assert [len(c) for c in chunks] == [300, 300, 300, 100]
+        epochs = np.concatenate([c["Epoch"] for c in chunks])
+        assert (epochs == _bars(T0, 1000)["Epoch"]).all()
+
+    def test_start_and_end(self, client):
+        chunks = list(
+            iter_chunks(
+                client, "AAPL/1Min/OHLCV", T0 + 60 * 100, T0 + 60 * 349, chunk_rows=100
+            )
+        )
+        assert [len(c) for c in chunks] == [100, 100, 50]
+        assert chunks[0]["Epoch"][0] == T0 + 6000
+
+    def test_exact_multiple_and_missing(self, client):
+        chunks = list(iter_chunks(client, "AMD/1Min/OHLCV", chunk_rows=5))
+        assert [len(c) for c in chunks] == [5, 5]
+        assert list(iter_chunks(client, "NONE/1Min/OHLCV")) == []
+
+    def test_nanoseconds_cursor(self, tmp_path):
+        local = LocalClient(tmp_path)
+        arr = np.zeros(5, dtype=[("Epoch", "i8"), ("Price", "f8"), ("Nanoseconds", "i4")])
+        arr["Epoch"] = [100, 100, 100, 100, 101]
+        arr["Nanoseconds"] = [1, 2, 3, 4, 0]
+        arr["Price"] = np.arange(5)
+        local.write(arr, "BTC/1Sec/TICK")
+
+        chunks = list(iter_chunks(local, "BTC/1Sec/TICK", chunk_rows=2))
+        assert np.concatenate(chunks)["Price"].tolist() == [0, 1, 2, 3, 4]
+
+
+# ---------------------------------------------------------------------------
+# export
+# ---------------------------------------------------------------------------
+
+
+class TestExport:
+    def test_csv(self, client, tmp_path):
+        out = tmp_path / "out"
+        seen = []
+        stats = export(
+            client,
+            ["AAPL/1Min/OHLCV", "AMD/1Min/OHLCV", "NONE/1Min/OHLCV"],
+            out,
+            fmt="csv",
+            chunk_rows=128,
+            progress=seen.append,
+        )
+
+        assert stats["tbks"] == 2
+        assert stats["rows"] == sum(seen) == 1010
+        assert stats["rows_per_sec"] > 0
+        assert max(client.sizes) <= 128
+
+        df = pd.read_csv(export_path(out, "AAPL/1Min/OHLCV", "csv"))
+        assert list(df.columns) == ["Epoch", "Close", "Volume"]
+        assert (df["Epoch"].to_numpy() == _bars(T0, 1000)["Epoch"]).all()
+        assert not os.path.exists(export_path(out, "NONE/1Min/OHLCV", "csv"))
+        assert not [
+            f for _, _, files in os.walk(out) for f in files if f.endswith(".tmp")
+        ]
+
+    def test_parquet(self, client, tmp_path):
+        pq = pytest.importorskip("pyarrow.parquet")
+        stats = export(client, ["AAPL/1Min/OHLCV"], tmp_path, chunk_rows=400)
+        path = export_path(tmp_path, "AAPL/1Min/OHLCV", "parquet")
+
+        assert stats["bytes"] == os.path.getsize(path)
+        f = pq.ParquetFile(path)
+        assert f.metadata.num_row_groups == 3
+        table = f.read()
+        assert table.column("Close").to_pylist() == list(range(1000))
+
+    def test_feather(self, client, tmp_path):
+        pa = pytest.importorskip("pyarrow")
+        export(client, ["AMD/1Min/OHLCV"], tmp_path, fmt="feather", chunk_rows=4)
+        path = export_path(tmp_path, "AMD/1Min/OHLCV", "feather")
+
+        assert path.endswith("OHLCV.arrow")
+        with pa.ipc.open_file(path) as reader:
+            assert reader.num_record_batches == 3
+            assert reader.read_all().num_rows == 10
+
+    def test_errors_remove_partial_files(self, client, tmp_path):
+        def fail(params):
+            raise RuntimeError("boom")
+
+        client.query = fail
+        with pytest.raises(RuntimeError):
+            export(client, ["AAPL/1Min/OHLCV"], tmp_path / "out", fmt="csv")
+        assert not [f for _, _, files in os.walk(tmp_path / "out") for f in files]
+
+    def test_unknown_format(self, client, tmp_path):
+        with pytest.raises(ValueError):
+            export(client, ["AAPL/1Min/OHLCV"], tmp_path, fmt="xlsx")
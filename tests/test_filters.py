@@ -0,0 +1,146 @@
+"""Tests for pymarketstore.filters and Params.where()."""
+
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import pymarketstore as pymkts
+
+from pymarketstore.filters import Close, Epoch, High, Volume, col, pushdown_window
+from pymarketstore.params import Params
+from pymarketstore.results import QueryReply
+
+
+T0 = 1700000000
+
+ARRAY = np.array(
+    [(T0 + 60 * i, 100.0 + i, 1000.0 * i) for i in range(6)],
+    dtype=[("Epoch", "i8"), ("Close", "f8"), ("Volume", "f8")],
+)
+
+
+def _packed(array, key="AAPL/1Min/OHLCV:Symbol/Timeframe/AttributeGroup"):
+    return {
+        "result": {
+            "data": [array[name].tobytes() for name in array.dtype.names],
+            "length": len(array),
+            "lengths": {key: len(array)},
+            "names": list(array.dtype.names),
+            "startindex": {key: 0},
+            "types": [array.dtype[name].str[1:] for name in array.dtype.names],
+        }
+    }
+
+
+# ---------------------------------------------------------------------------
+# expressions
+# ---------------------------------------------------------------------------
+
+
+class TestMask:
+    def test_comparisons(self):
+        assert (Volume > 2000).mask(ARRAY).tolist() == [0, 0, 0, 1, 1, 1]
+        assert (Volume >= 2000).mask(ARRAY).sum() == 4
+        assert (Close < 101).mask(ARRAY).sum() == 1
+        assert (Close <= 101).mask(ARRAY).sum() == 2
+        assert (Close == 102).mask(ARRAY).tolist() == [0, 0, 1, 0, 0, 0]
+        assert (Close != 102).mask(ARRAY).sum() == 5
+
+    def test_boolean_operators(self):
+        expr = ((Volume > 1000) & (Close < 104)) | (Close == 100)
+        assert expr.mask(ARRAY).tolist() == [1, 0, 1, 1, 0, 0]
+        assert (~(Close > 101)).mask(ARRAY).tolist() == [1, 1, 0, 0, 0, 0]
+
+    def test_between_and_isin(self):
+        assert Close.between(101, 103).mask(ARRAY).sum() == 3
+        assert Close.isin([100, 105]).mask(ARRAY).tolist() == [1, 0, 0, 0, 0, 1]
+
+    def test_epoch_accepts_timestamps(self):
+        ts = pd.Timestamp(T0 + 120, unit="s")
+        assert (Epoch >= ts).mask(ARRAY).sum() == 4
+        assert (Epoch >= str(ts)).mask(ARRAY).sum() == 4
+        assert (Epoch >= T0 + 120).mask(ARRAY).sum() == 4
+
+    def test_unknown_column(self):
+        with pytest.raises(ValueError, match="Missing"):
+            (col("Missing") > 1).mask(ARRAY)
+
+    def test_cannot_be_used_as_bool(self):
+        with pytest.raises(TypeError):
+            (Close > 1) and (Close < 2)
+
+
+# ---------------------------------------------------------------------------
+# pushdown
+# ---------------------------------------------------------------------------
+
+
+class TestPushdown:
+    def test_conjunction_narrows_window(self):
+        expr = (Epoch >= T0) & (Volume > 5) & (Epoch < T0 + 60)
+        assert expr.epoch_bounds() == (T0, T0 + 60)
+
+    def test_disjunction_takes_union(self):
+        expr = Epoch.between(T0, T0 + 60) | Epoch.between(T0 + 600, T0 + 660)
+        assert expr.epoch_bounds() == (T0, T0 + 660)
+        assert ((Epoch >= T0) | (Volume > 1)).epoch_bounds() == (None, None)
+
+    def test_not_is_not_pushed(self):
+        assert (~(Epoch >= T0)).epoch_bounds() == (None, None)
+
+    def test_window_is_intersected_with_params(self):
+        start, end = pushdown_window(Epoch >= T0 + 0.5, T0 * 10**9, None)
+        assert (start, end) == (T0 * 10**9, None)
+        start, end = pushdown_window(Epoch <= T0 + 0.5, None, (T0 + 10) * 10**9)
+        assert (start, end) == (None, (T0 + 1) * 10**9)
+
+    def test_params_query_request(self):
+        p = Params("AAPL", "1Min", "OHLCV", start=T0).where(
+            (Epoch < T0 + 3600) & (Volume > 1e6)
+        )
+        req = p.to_query_request()
+        assert req["epoch_start"] == T0
+        assert req["epoch_end"] == T0 + 3600
+        # the user's window is left untouched
+        assert p.end is None
+
+    def test_where_combines_and_validates(self):
+        p = Params("AAPL", "1Min", "OHLCV").where(Volume > 1).where(Close > 2)
+        assert p.filter.mask(ARRAY).sum() == 5
+        with pytest.raises(TypeError):
+            p.where("Volume > 1")
+        assert "filter=" in repr(p)
+
+
+# ---------------------------------------------------------------------------
+# client-side evaluation
+# ---------------------------------------------------------------------------
+
+
+class TestQuery:
+    def test_from_response_applies_filters(self):
+        resp = {"timezone": "UTC", "responses": [_packed(ARRAY), _packed(ARRAY)]}
+        params = [
+            Params("AAPL", "1Min", "OHLCV").where(Volume >= 3000),
+            Params("AAPL", "1Min", "OHLCV"),
+        ]
+        reply = QueryReply.from_response(resp, params)
+        assert reply.results[0].first().array["Volume"].tolist() == [3000, 4000, 5000]
+        assert len(reply.results[1].first().array) == len(ARRAY)
+
+    @patch("pymarketstore.jsonrpc_client.MsgpackRpcClient")
+    def test_client_query(self, MockRpcClient):
+        MockRpcClient.return_value.call.return_value = {
+            "timezone": "UTC",
+            "responses": [_packed(ARRAY)],
+        }
+        p = Params("AAPL", "1Min", "OHLCV").where((Close > 101) & (High > 0))
+
+        with pytest.raises(ValueError, match="High"):
+            pymkts.Client().query(p)
+
+        p = Params("AAPL", "1Min", "OHLCV").where((Close > 101) & (Volume < 5000))
+        df = pymkts.Client().query(p).first().df()
+        assert df["Close"].tolist() == [102.0, 103.0, 104.0]
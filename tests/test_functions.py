@@ -0,0 +1,159 @@
+"""Tests for pymarketstore.functions."""
+
+import pytest
+
+from pymarketstore.enums import Freq
+from pymarketstore.functions import CandleCandler, Function, Gap, TickCandler
+from pymarketstore.params import Params
+from pymarketstore.proto import marketstore_pb2 as proto
+
+
+# ---------------------------------------------------------------------------
+# Function
+# ---------------------------------------------------------------------------
+
+
+class TestFunction:
+    def test_str(self):
+        fn = Function("CandleCandler", ["1Min"], ["Open", "Close"])
+        assert str(fn) == "candlecandler('1Min',Open,Close)"
+
+    def test_no_args(self):
+        assert str(Function("count")) == "count()"
+
+    @pytest.mark.parametrize(
+        "call",
+        [
+            "max(Close)",
+            "candlecandler('1H',Open,High,Low,Close,Sum::Volume)",
+            "gap('5Min',Epoch)",
+            "count()",
+        ],
+    )
+    def test_parse_round_trip(self, call):
+        assert str(Function.parse(call)) == call
+
+    def test_parse_arg_column(self):
+        fn = Function.parse("candlecandler('1Min', Sum::Volume)")
+        assert fn.literals == ["1Min"]
+        assert fn.columns == ["Sum::Volume"]
+        assert str(fn) == "candlecandler('1Min',Sum::Volume)"
+
+    def test_parse_normalizes_whitespace_and_case(self):
+        fn = Function.parse(" CandleCandler( '1H', Open , Close ) ")
+        assert str(fn) == "candlecandler('1H',Open,Close)"
+
+    def test_parse_returns_function_unchanged(self):
+        fn = Gap()
+        assert Function.parse(fn) is fn
+
+    @pytest.mark.parametrize(
+        "call",
+        [
+            "max",
+            "max(Close",
+            "1max(Close)",
+            "max(Close; drop)",
+            "candlecandler(Open,'1H')",
+            "max('it''s')",
+            "max(Sum::)",
+            "max(::Close)",
+            "max(Sum::Avg::Close)",
+        ],
+    )
+    def test_parse_invalid(self, call):
+        with pytest.raises(ValueError):
+            Function.parse(call)
+
+    def test_invalid_column(self):
+        with pytest.raises(ValueError, match="column"):
+            Function("max", columns=["Close)"])
+
+    def test_invalid_literal(self):
+        with pytest.raises(ValueError, match="literal"):
+            Function("gap", literals=["5Min'"])
+
+    def test_eq_and_hash(self):
+        assert Function.parse("max(Close)") == "max(Close)"
+        assert Function.parse("max(Close)") == Function("MAX", columns=["Close"])
+        assert (
+            len({Function.parse("max(Close)"), Function("max", columns=["Close"])}) == 1
+        )
+
+    def test_repr(self):
+        assert repr(Function.parse("max(Close)")) == 'Function("max(Close)")'
+
+
+# ---------------------------------------------------------------------------
+# typed builders
+# ---------------------------------------------------------------------------
+
+
+class TestBuilders:
+    def test_candle_candler_defaults(self):
+        assert str(CandleCandler(Freq.hour)) == (
+            "candlecandler('1H',Open,High,Low,Close,Sum::Volume)"
+        )
+
+    def test_candle_candler_custom_columns(self):
+        fn = CandleCandler("5Min", "O", "H", "L", "C", sums=())
+        assert str(fn) == "candlecandler('5Min',O,H,L,C)"
+
+    def test_tick_candler(self):
+        fn = TickCandler(Freq.min_1, price="Bid", sums=["Size"])
+        assert str(fn) == "tickcandler('1Min',Bid,Sum::Size)"
+
+    def test_gap(self):
+        assert str(Gap()) == "gap(Epoch)"
+        assert str(Gap("5Min")) == "gap('5Min',Epoch)"
+
+    def test_invalid_timeframe(self):
+        with pytest.raises(ValueError, match="timeframe"):
+            CandleCandler("hourly")
+
+
+# ---------------------------------------------------------------------------
+# Params.apply()
+# ---------------------------------------------------------------------------
+
+
+class TestParamsApply:
+    def test_apply_builds_query_functions(self):
+        p = Params("AAPL", "1Min", "OHLCV").apply(CandleCandler("1H"), "max(Close)")
+        assert p.to_query_request()["functions"] == [
+            "candlecandler('1H',Open,High,Low,Close,Sum::Volume)",
+            "max(Close)",
+        ]
+
+    def test_apply_appends(self):
+        p = Params("AAPL", "1Min", "OHLCV").apply("max(Close)")
+        p.apply("min(Close)")
+        assert p.functions == ["max(Close)", "min(Close)"]
+
+    def test_apply_validates(self):
+        with pytest.raises(ValueError):
+            Params("AAPL", "1Min", "OHLCV").apply("max(Close")
+
+    def test_constructor_argument(self):
+        p = Params("AAPL", "1Min", "OHLCV", functions=[Gap()])
+        assert p.functions == ["gap(Epoch)"]
+
+    def test_no_functions_not_sent(self):
+        assert "functions" not in Params("AAPL", "1Min", "OHLCV").to_query_request()
+
+    def test_set_functions_directly(self):
+        p = Params("AAPL", "1Min", "OHLCV").set("functions", CandleCandler("1D"))
+        assert p.to_query_request()["functions"] == [
+            "candlecandler('1D',Open,High,Low,Close,Sum::Volume)"
+        ]
+
+    def test_grpc_request(self):
+        p = Params("AAPL", "1Min", "OHLCV").apply(CandleCandler("1H"))
+        req = proto.QueryRequest(**p.to_query_request())
+        assert list(req.functions) == [
+            "candlecandler('1H',Open,High,Low,Close,Sum::Volume)"
+        ]
+
+    def test_repr(self):
+        p = Params("AAPL", "1Min", "OHLCV").apply("max(Close)")
+        assert "functions=['max(Close)']" in repr(p)
@@ -61,6 +61,26 @@ def test_query_with_multiple_params(stub):
     assert call_arg.requests[1].epoch_end == 2000000000
 
 
+@patch("pymarketstore.grpc_client.MarketstoreStub")
+def test_sql(stub):
+    c = pymkts.GRPCClient()
+    mock_response = MagicMock()
+    mock_response.timezone = "UTC"
+    mock_response.responses = []
+    c.stub.Query.return_value = mock_response
+
+    stmt = "SELECT * FROM `BTC/1Min/OHLCV` WHERE Close > 100"
+    result = c.sql(stmt)
+
+    call_arg = c.stub.Query.call_args[0][0]
+    assert isinstance(call_arg, MultiQueryRequest)
+    assert len(call_arg.requests) == 1
+    assert call_arg.requests[0].is_sql_statement
+    assert call_arg.requests[0].sql_statement == stmt
+    assert call_arg.requests[0].destination == ""
+    assert isinstance(result, pymkts.results.QueryReply)
+
+
 @patch("pymarketstore.grpc_client.MarketstoreStub")
 def test_create(stub):
     # --- given ---
@@ -239,3 +259,20 @@ def test_server_version(stub):
 def test_repr(stub):
     c = pymkts.GRPCClient("myhost:5995")
     assert repr(c) == 'GRPCClient("myhost:5995")'
+
+
+@patch("pymarketstore.grpc_client.MarketstoreStub")
+def test_write_batch(stub):
+    c = pymkts.GRPCClient()
+    a = np.array([(1, 1.0)], dtype=[("Epoch", "i8"), ("Ask", "f4")])
+    b = np.array([(2, 2.0), (3, 3.0)], dtype=[("Epoch", "i8"), ("Ask", "f4")])
+
+    c.write_batch({"A/1Min/TICK": a, "B/1Min/TICK": b})
+
+    call_arg = c.stub.Write.call_args[0][0]
+    assert len(call_arg.requests) == 1
+    req = call_arg.requests[0]
+    assert req.data.start_index == {"A/1Min/TICK": 0, "B/1Min/TICK": 1}
+    assert req.data.lengths == {"A/1Min/TICK": 1, "B/1Min/TICK": 2}
+    assert req.data.data.length == 3
+    assert np.frombuffer(req.data.data.column_data[0], dtype="i8").tolist() == [1, 2, 3]
@@ -0,0 +1,163 @@
+"""Tests for pymarketstore.hub — multiplexed stream subscriptions."""
+
+from __future__ import annotations
+
+import asyncio
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from pymarketstore.hub import StreamHub, Subscription, merge_streams, stream_matches
+
+
+def _make_hub():
+    """A hub whose connection is mocked out (run() blocks until stopped)."""
+    hub = StreamHub("ws://localhost:5993/ws")
+    stopped = asyncio.Event()
+
+    async def fake_run(streams):
+        hub.conn._streams = streams
+        await stopped.wait()
+
+    async def fake_stop():
+        stopped.set()
+
+    hub.conn.run = AsyncMock(side_effect=fake_run)
+    hub.conn.stop = AsyncMock(side_effect=fake_stop)
+    hub.conn.update_streams = AsyncMock()
+    return hub
+
+
+# ---------------------------------------------------------------------------
+# Pattern helpers
+# ---------------------------------------------------------------------------
+
+
+class TestStreamMatches:
+    @pytest.mark.parametrize(
+        "pattern, key, expected",
+        [
+            ("*/*/*", "AAPL/1Min/OHLCV", True),
+            ("AAPL/*/*", "AAPL/1Min/OHLCV", True),
+            ("*/1Min/OHLCV", "AAPL/1Min/OHLCV", True),
+            ("*/1D/OHLCV", "AAPL/1Min/OHLCV", False),
+            ("MSFT/*/*", "AAPL/1Min/OHLCV", False),
+            ("*/*", "AAPL/1Min/OHLCV", False),
+        ],
+    )
+    def test_matches(self, pattern, key, expected):
+        assert stream_matches(pattern, key) is expected
+
+
+class TestMergeStreams:
+    def test_removes_duplicates(self):
+        assert merge_streams(["AAPL/*/*", "AAPL/*/*"]) == ["AAPL/*/*"]
+
+    def test_drops_covered_patterns(self):
+        merged = merge_streams(["AAPL/1Min/OHLCV", "*/1Min/OHLCV", "MSFT/1D/OHLCV"])
+        assert merged == ["*/1Min/OHLCV", "MSFT/1D/OHLCV"]
+
+    def test_wildcard_covers_everything(self):
+        assert merge_streams(["*/*/*", "AAPL/1Min/OHLCV", "*/1D/*"]) == ["*/*/*"]
+
+
+# ---------------------------------------------------------------------------
+# StreamHub
+# ---------------------------------------------------------------------------
+
+
+class TestForEndpoint:
+    def test_returns_same_hub_per_endpoint(self, monkeypatch):
+        monkeypatch.setattr(StreamHub, "_hubs", {})
+        a = StreamHub.for_endpoint("ws://a:5993/ws")
+        assert StreamHub.for_endpoint("ws://a:5993/ws") is a
+        assert StreamHub.for_endpoint("ws://b:5993/ws") is not a
+
+
+class TestSubscribe:
+    async def test_first_subscription_starts_connection(self):
+        hub = _make_hub()
+
+        sub = await hub.subscribe(["AAPL/1Min/OHLCV"], MagicMock())
+        await asyncio.sleep(0)
+
+        assert isinstance(sub, Subscription)
+        assert hub.running
+        hub.conn.run.assert_called_once_with(["AAPL/1Min/OHLCV"])
+        await hub.close()
+
+    async def test_further_subscriptions_update_in_place(self):
+        hub = _make_hub()
+        await hub.subscribe(["AAPL/1Min/OHLCV"], MagicMock())
+        await asyncio.sleep(0)
+
+        await hub.subscribe(["*/1D/OHLCV"], MagicMock())
+
+        hub.conn.run.assert_called_once()
+        hub.conn.update_streams.assert_called_once_with(["*/1D/OHLCV", "AAPL/1Min/OHLCV"])
+        await hub.close()
+
+    async def test_covered_subscription_does_not_resubscribe(self):
+        hub = _make_hub()
+        await hub.subscribe(["*/1Min/OHLCV"], MagicMock())
+        await asyncio.sleep(0)
+
+        await hub.subscribe(["AAPL/1Min/OHLCV"], MagicMock())
+
+        hub.conn.update_streams.assert_not_called()
+        await hub.close()
+
+    async def test_last_unsubscribe_stops_connection(self):
+        hub = _make_hub()
+        sub_a = await hub.subscribe(["AAPL/*/*"], MagicMock())
+        sub_b = await hub.subscribe(["MSFT/*/*"], MagicMock())
+        await asyncio.sleep(0)
+
+        await sub_a.unsubscribe()
+        hub.conn.update_streams.assert_called_with(["MSFT/*/*"])
+        assert hub.running
+
+        await sub_b.unsubscribe()
+        hub.conn.stop.assert_called_once()
+        assert not hub.running
+
+    async def test_subscription_update(self):
+        hub = _make_hub()
+        sub = await hub.subscribe(["AAPL/*/*"], MagicMock())
+        await asyncio.sleep(0)
+
+        await sub.update(["MSFT/*/*"])
+
+        hub.conn.update_streams.assert_called_once_with(["MSFT/*/*"])
+        assert not sub.matches("AAPL/1Min/OHLCV")
+        assert sub.matches("MSFT/1Min/OHLCV")
+        await hub.close()
+
+
+class TestFanout:
+    async def test_messages_go_to_matching_consumers_only(self):
+        hub = _make_hub()
+        aapl, minute, daily = MagicMock(), MagicMock(), MagicMock()
+        await hub.subscribe(["AAPL/*/*"], aapl)
+        await hub.subscribe(["*/1Min/OHLCV"], minute)
+        await hub.subscribe(["*/1D/OHLCV"], daily)
+
+        hub.conn._dispatch("AAPL/1Min/OHLCV", {"Close": 1.0})
+
+        aapl.assert_called_once_with("AAPL/1Min/OHLCV", {"Close": 1.0})
+        minute.assert_called_once_with("AAPL/1Min/OHLCV", {"Close": 1.0})
+        daily.assert_not_called()
+        await hub.close()
+
+    async def test_handler_errors_do_not_affect_other_consumers(self, caplog):
+        hub = _make_hub()
+        good = MagicMock()
+        await hub.subscribe(["*/*/*"], MagicMock(side_effect=RuntimeError("boom")))
+        await hub.subscribe(["*/*/*"], good)
+
+        hub.conn._dispatch("AAPL/1Min/OHLCV", {})
+
+        good.assert_called_once()
+        assert "boom" in caplog.text
+        await hub.close()
@@ -0,0 +1,263 @@
+"""Tests for pymarketstore.importer."""
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pymarketstore.export import export
+from pymarketstore.importer import (
+    collect_files,
+    conform,
+    import_files,
+    infer_shape,
+    iter_file_chunks,
+    parse_shape,
+    shape_dtype,
+    tbk_for_path,
+)
+from pymarketstore.local_store import LocalClient
+from pymarketstore.params import DataType, Params
+
+
+T0 = 1704067200  # 2024-01-01
+
+
+def _bars(start, n):
+    arr = np.zeros(n, dtype=[("Epoch", "i8"), ("Close", "f8"), ("Volume", "f8")])
+    arr["Epoch"] = start + 60 * np.arange(n)
+    arr["Close"] = np.arange(n)
+    arr["Volume"] = 10 * np.arange(n)
+    return arr
+
+
+class RecordingClient:
+    """A LocalClient wrapper recording creates and write batches."""
+
+    def __init__(self, root):
+        self.local = LocalClient(root)
+        self.created = []
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def query(self, params):
+        return self.local.query(params)
+
+    def list_symbols(self, *args, **kwargs):
+        return self.local.list_symbols(*args, **kwargs)
+
+    def create(self, tbk, data_shape, row_type="fixed"):
+        self.created.append((tbk, list(data_shape)))
+        return self.local.create(tbk, data_shape)
+
+    def write_batch(self, batch, is_variable_length=False):
+        with self._lock:
+            self.batches.append({tbk: len(a) for tbk, a in batch.items()})
+        return self.local.write_batch(batch)
+
+
+@pytest.fixture
+def client(tmp_path):
+    return RecordingClient(tmp_path / "server")
+
+
+def _write_csv(path, df):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+# ---------------------------------------------------------------------------
+# Shapes and paths
+# ---------------------------------------------------------------------------
+
+
+class TestShapes:
+    def test_parse_and_dtype(self):
+        shape = parse_shape("Epoch/int64:Open/float32:Volume/uint64")
+        assert list(shape) == [
+            ("Epoch", DataType.int64),
+            ("Open", DataType.float32),
+            ("Volume", DataType.uint64),
+        ]
+        assert shape_dtype(shape) == np.dtype(
+            [("Epoch", "i8"), ("Open", "f4"), ("Volume", "u8")]
+        )
+        with pytest.raises(ValueError):
+            parse_shape("Epoch:Open/float32")
+
+    def test_infer(self):
+        shape = infer_shape(_bars(T0, 1).dtype)
+        assert list(shape) == [
+            ("Epoch", DataType.int64),
+            ("Close", DataType.float64),
+            ("Volume", DataType.float64),
+        ]
+        with pytest.raises(ValueError, match="Name"):
+            infer_shape(np.dtype([("Epoch", "i8"), ("Name", "U4")]))
+
+    def test_conform(self):
+        arr = np.zeros(2, dtype=[("Epoch", "i8"), ("Volume", "i4"), ("Close", "f8")])
+        target = np.dtype([("Epoch", "i8"), ("Close", "f4"), ("Volume", "i8")])
+        out = conform(arr, target)
+        assert out.dtype == target
+
+        with pytest.raises(ValueError, match="missing"):
+            conform(arr[["Epoch", "Close"]], target)
+        with pytest.raises(ValueError, match="cannot store"):
+            conform(arr, np.dtype([("Epoch", "i8"), ("Close", "f4"), ("Volume", "u1")]))
+
+    def test_tbk_for_path(self, tmp_path):
+        assert tbk_for_path(tmp_path / "AAPL" / "1Min" / "OHLCV.parquet") == (
+            "AAPL/1Min/OHLCV"
+        )
+        assert tbk_for_path("data/TSLA.csv", "1D") == "TSLA/1D/OHLCV"
+        assert tbk_for_path("BTC.csv", "1Sec", "TICK") == "BTC/1Sec/TICK"
+
+    def test_collect_files(self, tmp_path):
+        for name in ["a/A.csv", "a/b/B.parquet", "a/notes.txt"]:
+            path = tmp_path / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text("")
+        files = collect_files([tmp_path / "a"])
+        assert [os.path.basename(f) for f in files] == ["A.csv", "B.parquet"]
+
+
+# ---------------------------------------------------------------------------
+# Reading files
+# ---------------------------------------------------------------------------
+
+
+class TestIterFileChunks:
+    def test_csv_with_datetimes(self, tmp_path):
+        df = pd.DataFrame(
+            {
+                "date": [
+                    "2024-01-01 00:00:00.000",
+                    "2024-01-01 00:00:00.500",
+                    "2024-01-02 00:00:00.000",
+                ],
+                "Price": [1.0, 2.0, 3.0],
+            }
+        )
+        path = _write_csv(tmp_path / "BTC.csv", df)
+
+        chunks = list(iter_file_chunks(path, chunk_rows=2, time_column="date"))
+        assert [len(c) for c in chunks] == [2, 1]
+        assert chunks[0].dtype.names == ("Epoch", "Price", "Nanoseconds")
+        assert chunks[0]["Nanoseconds"].tolist() == [0, 500_000_000]
+        # no sub-second times in the second chunk
+        assert chunks[1].dtype.names == ("Epoch", "Price")
+        assert chunks[1]["Epoch"].tolist() == [T0 + 86400]
+
+    def test_arrow_and_parquet(self, client, tmp_path):
+        pytest.importorskip("pyarrow")
+        client.local.write(_bars(T0, 25), "AAPL/1Min/OHLCV")
+        for fmt in ("parquet", "feather"):
+            export(client, ["AAPL/1Min/OHLCV"], tmp_path / fmt, fmt=fmt, chunk_rows=10)
+            (path,) = collect_files([tmp_path / fmt])
+            chunks = list(iter_file_chunks(path, chunk_rows=4))
+            assert max(len(c) for c in chunks) == 4
+            assert (np.concatenate(chunks) == _bars(T0, 25)).all()
+
+    def test_missing_time_column(self, tmp_path):
+        path = _write_csv(tmp_path / "X.csv", pd.DataFrame({"Close": [1.0]}))
+        with pytest.raises(ValueError, match="Epoch"):
+            list(iter_file_chunks(path))
+
+
+# ---------------------------------------------------------------------------
+# import_files
+# ---------------------------------------------------------------------------
+
+
+class TestImportFiles:
+    def _files(self, tmp_path, symbols, n=100):
+        files = []
+        for symbol in symbols:
+            df = pd.DataFrame(_bars(T0, n))
+            files.append(
+                (_write_csv(tmp_path / f"{symbol}.csv", df), f"{symbol}/1Min/OHLCV")
+            )
+        return files
+
+    def test_creates_and_batches(self, client, tmp_path):
+        files = self._files(tmp_path / "in", ["A", "B", "C"])
+        seen = []
+        stats = import_files(
+            client, files, chunk_rows=30, batch_rows=120, workers=2, progress=seen.append
+        )
+
+        assert stats["rows"] == sum(seen) == 300
+        assert stats["files"] == stats["tbks"] == 3
+        assert stats["created"] == ["A/1Min/OHLCV", "B/1Min/OHLCV", "C/1Min/OHLCV"]
+        assert stats["requests"] == len(client.batches) == 3
+        # batches span buckets
+        assert any(len(batch) > 1 for batch in client.batches)
+        for symbol in "ABC":
+            arr = client.local.query(Params(symbol, "1Min", "OHLCV")).first().array
+            assert (arr == _bars(T0, 100)).all()
+
+    def test_existing_bucket_shape_wins(self, client, tmp_path):
+        existing = np.zeros(1, dtype=[("Epoch", "i8"), ("Close", "f4"), ("Volume", "f4")])
+        existing["Epoch"] = T0 - 60
+        client.local.write(existing, "A/1Min/OHLCV")
+
+        files = self._files(tmp_path / "in", ["A"], n=3)
+        stats = import_files(client, files)
+
+        assert stats["created"] == []
+        assert client.created == []
+        dtype = client.local._open(
+            os.path.join(client.local._dir("A", "1Min", "OHLCV"), "2023.npy")
+        ).dtype
+        assert dtype == existing.dtype
+
+    def test_given_shape(self, client, tmp_path):
+        files = self._files(tmp_path / "in", ["A"], n=3)
+        import_files(
+            client, files, shape=parse_shape("Epoch/int64:Close/float32:Volume/float32")
+        )
+        assert client.created[0][1][1] == ("Close", DataType.float32)
+
+    def test_no_create(self, client, tmp_path):
+        files = self._files(tmp_path / "in", ["A"], n=3)
+        with pytest.raises(ValueError, match="does not exist"):
+            import_files(client, files, create=False)
+
+    def test_write_errors_propagate(self, client, tmp_path):
+        def fail(batch, is_variable_length=False):
+            raise RuntimeError("disk full")
+
+        client.write_batch = fail
+        files = self._files(tmp_path / "in", ["A", "B"], n=50)
+        with pytest.raises(RuntimeError, match="disk full"):
+            import_files(client, files, chunk_rows=10, batch_rows=10)
+
+    def test_parallel_import_of_one_bucket(self, tmp_path):
+        n = 20_000
+        path = _write_csv(tmp_path / "in" / "A.csv", pd.DataFrame(_bars(T0, n)))
+        local = LocalClient(tmp_path / "server")
+        stats = import_files(
+            local,
+            [(path, "A/1Min/OHLCV")],
+            chunk_rows=500,
+            batch_rows=500,
+            workers=8,
+        )
+
+        assert stats["rows"] == n
+        assert stats["requests"] == n // 500
+        arr = local.query(Params("A", "1Min", "OHLCV")).first().array
+        assert len(arr) == n
+        assert (arr == _bars(T0, n)).all()
+
+    def test_server_reported_errors_fail_the_import(self, client, tmp_path):
+        client.write_batch = lambda batch, is_variable_length=False: {
+            "responses": [{"error": "bad shape", "version": "v"}]
+        }
+        files = self._files(tmp_path / "in", ["A"], n=10)
+        with pytest.raises(RuntimeError, match="bad shape"):
+            import_files(client, files)
@@ -0,0 +1,423 @@
+"""Tests for pymarketstore.instrumentation and the spans of the clients."""
+
+import logging
+import threading
+
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+import pymarketstore as pymkts
+
+from benchmarks.server import FakeServer
+from benchmarks.utils import generate_ohlcv_data
+from pymarketstore import instrumentation
+from pymarketstore.instrumentation import (
+    LoggingSink,
+    MetricsSink,
+    OpenTelemetrySink,
+    Sink,
+    instrumented,
+    span,
+)
+from pymarketstore.results import DataSet, QueryReply, QueryResult
+
+
+# after the last row of generate_ohlcv_data(): a closed, cacheable window
+T_END = "2100-01-01"
+
+
+class RecordingSink(Sink):
+    def __init__(self):
+        self.started = []
+        self.spans = []
+
+    def start(self, span):
+        self.started.append(span.name)
+
+    def end(self, span, state):
+        self.spans.append(span)
+
+    def named(self, name):
+        return [s for s in self.spans if s.name == name]
+
+
+@pytest.fixture(scope="module")
+def server():
+    with FakeServer() as fake:
+        fake.add("AAPL/1Min/OHLCV", generate_ohlcv_data(100))
+        fake.add("MSFT/1Min/OHLCV", generate_ohlcv_data(50))
+        yield fake
+
+
+# ---------------------------------------------------------------------------
+# span()
+# ---------------------------------------------------------------------------
+
+
+class TestSpan:
+    def test_noop_without_sinks(self):
+        assert not instrumentation.enabled()
+        with span("x", a=1) as s:
+            s.set(b=2)
+        assert s.recording is False
+        assert s is span("y")
+
+    def test_records_duration_attributes_and_nesting(self):
+        sink = RecordingSink()
+        with instrumented(sink):
+            with span("outer", a=1) as outer:
+                assert instrumentation.current_span() is outer
+                with span("inner") as inner:
+                    inner.set(rows=3)
+        assert instrumentation.current_span() is None
+        assert not instrumentation.enabled()
+
+        assert sink.started == ["outer", "inner"]
+        assert [s.name for s in sink.spans] == ["inner", "outer"]
+        assert inner.parent is outer and outer.parent is None
+        assert inner.attributes == {"rows": 3}
+        assert outer.attributes == {"a": 1}
+        assert 0 <= inner.duration <= outer.duration
+
+    def test_records_error(self):
+        sink = RecordingSink()
+        with instrumented(sink):
+            with pytest.raises(KeyError):
+                with span("fails"):
+                    raise KeyError("x")
+        (failed,) = sink.spans
+        assert isinstance(failed.error, KeyError)
+
+    def test_broken_sink_does_not_break_callers(self, caplog):
+        class Broken(Sink):
+            def end(self, span, state):
+                raise RuntimeError("boom")
+
+        sink = RecordingSink()
+        with instrumented(Broken(), sink), caplog.at_level(logging.ERROR):
+            with span("x"):
+                pass
+        assert [s.name for s in sink.spans] == ["x"]
+        assert "failed" in caplog.text
+
+    def test_add_sink_once(self):
+        sink = RecordingSink()
+        instrumentation.add_sink(sink)
+        instrumentation.add_sink(sink)
+        try:
+            assert instrumentation.sinks() == (sink,)
+        finally:
+            instrumentation.remove_sink(sink)
+        assert instrumentation.sinks() == ()
+
+
+# ---------------------------------------------------------------------------
+# sinks
+# ---------------------------------------------------------------------------
+
+
+class TestMetricsSink:
+    def test_snapshot_and_expose(self):
+        metrics = MetricsSink(buckets=(0.5, 60.0))
+        with instrumented(metrics):
+            for rows in (10, 20):
+                with span("results.decode", rows=rows, method="x"):
+                    pass
+            with pytest.raises(ValueError):
+                with span("results.decode"):
+                    raise ValueError()
+
+        snapshot = metrics.snapshot()["results.decode"]
+        assert snapshot["count"] == 3
+        assert snapshot["errors"] == 1
+        assert snapshot["rows"] == 30
+        assert "method" not in snapshot
+
+        text = metrics.expose()
+        assert (
+            'pymarketstore_span_seconds_bucket{span="results.decode",le="0.5"} 3' in text
+        )
+        assert (
+            'pymarketstore_span_seconds_bucket{span="results.decode",le="+Inf"} 3' in text
+        )
+        assert 'pymarketstore_span_seconds_count{span="results.decode"} 3' in text
+        assert 'pymarketstore_span_errors_total{span="results.decode"} 1' in text
+        assert 'pymarketstore_rows_total{span="results.decode"} 30' in text
+
+        metrics.reset()
+        assert metrics.snapshot() == {}
+
+
+class TestLoggingSink:
+    def test_logs_spans(self, caplog):
+        sink = LoggingSink(level=logging.INFO, names=["kept"])
+        with instrumented(sink), caplog.at_level(logging.INFO):
+            with span("kept", rows=5):
+                pass
+            with span("dropped"):
+                pass
+            with pytest.raises(ValueError):
+                with span("kept"):
+                    raise ValueError("bad")
+
+        info, warning = caplog.records
+        assert info.levelno == logging.INFO
+        assert info.getMessage().startswith("kept ") and "rows=5" in info.getMessage()
+        assert warning.levelno == logging.WARNING
+        assert "ValueError('bad')" in warning.getMessage()
+
+
+class FakeTracer:
+    def __init__(self):
+        self.spans = []
+
+    @contextmanager
+    def start_as_current_span(self, name):
+        otel_span = FakeOtelSpan(name)
+        self.spans.append(otel_span)
+        try:
+            yield otel_span
+        except Exception as e:
+            otel_span.exception = e
+            raise
+
+
+class FakeOtelSpan:
+    def __init__(self, name):
+        self.name = name
+        self.attributes = {}
+        self.exception = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+
+class TestOpenTelemetrySink:
+    def test_mirrors_spans(self):
+        tracer = FakeTracer()
+        with instrumented(OpenTelemetrySink(tracer)):
+            with span("query", rows=1):
+                pass
+            with pytest.raises(ValueError):
+                with span("grpc.call"):
+                    raise ValueError()
+
+        ok, failed = tracer.spans
+        assert (ok.name, ok.attributes, ok.exception) == (
+            "query",
+            {"pymarketstore.rows": 1},
+            None,
+        )
+        assert isinstance(failed.exception, ValueError)
+
+    def test_requires_opentelemetry(self):
+        try:
+            import opentelemetry  # noqa: F401
+        except ImportError:
+            with pytest.raises(ImportError, match="opentelemetry-api"):
+                OpenTelemetrySink()
+        else:
+            pytest.skip("opentelemetry is installed")
+
+
+# ---------------------------------------------------------------------------
+# instrumented clients
+# ---------------------------------------------------------------------------
+
+
+class TestClientSpans:
+    @pytest.mark.parametrize("grpc", [False, True])
+    def test_query(self, server, grpc):
+        endpoint = server.grpc_endpoint if grpc else server.jsonrpc_endpoint
+        client = pymkts.Client(endpoint, grpc=grpc)
+        params = pymkts.Params(["AAPL", "MSFT"], "1Min", "OHLCV")
+        sink = RecordingSink()
+        with instrumented(sink):
+            reply = client.query(params)
+            aapl = reply.all()["AAPL/1Min/OHLCV"]
+            aapl.df()
+
+        (query,) = sink.named("query")
+        assert query.attributes == {
+            "transport": "grpc" if grpc else "jsonrpc",
+            "queries": 1,
+            "rows": 150,
+        }
+        call_name = "grpc.call" if grpc else "jsonrpc.call"
+        (call,) = sink.named(call_name)
+        assert call.parent is query
+        assert call.attributes["method"] == ("Query" if grpc else "DataService.Query")
+        if grpc:
+            request_bytes = call.attributes["request_bytes"]
+            response_bytes = call.attributes["response_bytes"]
+        else:
+            (encode,) = sink.named("jsonrpc.encode")
+            (unpack,) = sink.named("jsonrpc.unpack")
+            request_bytes = encode.attributes["bytes"]
+            response_bytes = unpack.attributes["bytes"]
+        assert 0 < request_bytes < response_bytes
+
+        (decode,) = sink.named("results.decode")
+        assert decode.parent is query
+        assert decode.attributes["rows"] == 150
+        assert decode.attributes["bytes"] == 150 * aapl.array.itemsize
+
+        (df,) = sink.named("DataSet.df")
+        assert df.parent is None
+        assert df.attributes == {"key": "AAPL/1Min/OHLCV", "rows": 100}
+
+    def test_jsonrpc_phases(self, server):
+        client = pymkts.Client(server.jsonrpc_endpoint)
+        sink = RecordingSink()
+        with instrumented(sink):
+            client.query(pymkts.Params("AAPL", "1Min", "OHLCV"))
+
+        (call,) = sink.named("jsonrpc.call")
+        phases = [s for s in sink.spans if s.parent is call]
+        assert [s.name for s in phases] == [
+            "jsonrpc.encode",
+            "jsonrpc.http",
+            "jsonrpc.unpack",
+        ]
+        assert sum(s.duration for s in phases) <= call.duration
+
+    def test_errors(self, server):
+        client = pymkts.Client(server.jsonrpc_endpoint)
+        metrics = MetricsSink()
+        with instrumented(metrics):
+            with pytest.raises(Exception, match="no results"):
+                client.query(pymkts.Params("NOPE", "1Min", "OHLCV"))
+
+        snapshot = metrics.snapshot()
+        assert snapshot["query"]["errors"] == 1
+        assert snapshot["jsonrpc.call"]["errors"] == 1
+
+    def test_disabled(self, server):
+        client = pymkts.Client(server.jsonrpc_endpoint)
+        reply = client.query(pymkts.Params("AAPL", "1Min", "OHLCV"))
+        assert reply.rows() == 100
+        assert not instrumentation.enabled()
+
+
+def test_dataset_df_span_without_client():
+    metrics = MetricsSink()
+    ds = DataSet(np.zeros(3, dtype=[("Epoch", "i8"), ("Close", "f8")]), "A/1Min/X", "UTC")
+    with instrumented(metrics):
+        ds.df()
+    assert metrics.snapshot()["DataSet.df"]["rows"] == 3
+
+
+# ---------------------------------------------------------------------------
+# QueryProfile / Client(profile=True)
+# ---------------------------------------------------------------------------
+
+
+class TestRecording:
+    def test_only_current_thread(self):
+        sink = RecordingSink()
+        seen_elsewhere = []
+        with instrumentation.recording(sink):
+            assert instrumentation.enabled()
+            with span("here"):
+                pass
+            thread = threading.Thread(
+                target=lambda: seen_elsewhere.append(span("there").recording)
+            )
+            thread.start()
+            thread.join()
+        assert not instrumentation.enabled()
+        assert [s.name for s in sink.spans] == ["here"]
+        assert seen_elsewhere == [False]
+
+    def test_with_global_sinks(self):
+        local, shared = RecordingSink(), RecordingSink()
+        with instrumented(shared), instrumentation.recording(local):
+            with span("x"):
+                pass
+        assert len(local.spans) == len(shared.spans) == 1
+
+
+class TestQueryProfile:
+    def test_disabled_by_default(self, server):
+        client = pymkts.Client(server.jsonrpc_endpoint)
+        assert client.query(pymkts.Params("AAPL", "1Min", "OHLCV")).profile is None
+
+    @pytest.mark.parametrize("grpc", [False, True])
+    def test_query(self, server, grpc):
+        endpoint = server.grpc_endpoint if grpc else server.jsonrpc_endpoint
+        client = pymkts.Client(endpoint, grpc=grpc, profile=True)
+        reply = client.query(pymkts.Params(["AAPL", "MSFT"], "1Min", "OHLCV"))
+
+        profile = reply.profile
+        assert profile.transport == ("grpc" if grpc else "jsonrpc")
+        assert profile.rows == {"AAPL/1Min/OHLCV": 100, "MSFT/1Min/OHLCV": 50}
+        assert profile.requests == 1
+        assert 0 < profile.request_bytes < profile.response_bytes
+        assert profile.allocated_bytes == 150 * reply.first().array.itemsize
+        assert profile.encode_seconds > 0
+        assert profile.wire_seconds > 0
+        assert profile.decode_seconds > 0
+        assert (profile.unpack_seconds > 0) is not grpc
+        phases = (
+            profile.encode_seconds
+            + profile.wire_seconds
+            + profile.unpack_seconds
+            + profile.decode_seconds
+        )
+        assert phases <= profile.total_seconds
+        assert profile.to_dict()["other_seconds"] == pytest.approx(
+            profile.total_seconds - phases
+        )
+        assert repr(profile).startswith("QueryProfile(transport=")
+        assert not instrumentation.enabled()
+
+    def test_sql(self, server):
+        client = pymkts.Client(server.jsonrpc_endpoint, profile=True)
+        array = np.zeros(3, dtype=[("Epoch", "i8"), ("Close", "f8")])
+        result = QueryReply([QueryResult({"AAPL/1Min/OHLCV": array}, "UTC")], "UTC")
+        with patch.object(client.client, "sql", return_value=result):
+            reply = client.sql("SELECT * FROM `AAPL/1Min/OHLCV`")
+        assert reply.profile.rows == {"AAPL/1Min/OHLCV": 3}
+        assert reply.profile.total_seconds > 0
+
+    def test_query_many(self, server):
+        client = pymkts.Client(server.jsonrpc_endpoint, profile=True)
+        replies = client.query_many(
+            [
+                pymkts.Params("AAPL", "1Min", "OHLCV", end=T_END),
+                pymkts.Params("AAPL", "1Min", "OHLCV", limit=10),
+                pymkts.Params("MSFT", "1Min", "OHLCV"),
+            ]
+        )
+        profiles = [reply.profile for reply in replies]
+        assert [profile.rows for profile in profiles] == [
+            {"AAPL/1Min/OHLCV": reply.rows()} for reply in replies[:2]
+        ] + [{"MSFT/1Min/OHLCV": 50}]
+        assert len({id(profile) for profile in profiles}) == 3
+        for profile in profiles:
+            assert profile.requests == 1
+            assert profile.total_seconds == profiles[0].total_seconds
+
+    def test_cache_hit(self, server):
+        client = pymkts.Client(
+            server.jsonrpc_endpoint, profile=True, cache=pymkts.ResultCache()
+        )
+        params = pymkts.Params("AAPL", "1Min", "OHLCV", end=T_END)
+        assert client.query(params).profile.requests == 1
+
+        profile = client.query(params).profile
+        assert profile.requests == 0
+        assert profile.transport is None
+        assert profile.rows == {"AAPL/1Min/OHLCV": 100}
+
+    def test_not_sent_to_global_sinks(self, server):
+        client = pymkts.Client(server.jsonrpc_endpoint, profile=True)
+        sink = RecordingSink()
+        with instrumented(sink):
+            reply = client.query(pymkts.Params("AAPL", "1Min", "OHLCV"))
+        # global sinks see the same spans, the profile does not mute them
+        assert len(sink.named("query")) == 1
+        assert reply.profile.requests == 1
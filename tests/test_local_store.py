@@ -0,0 +1,228 @@
+"""Tests for pymarketstore.local_store."""
+
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pymarketstore.enums import Freq
+from pymarketstore.filters import Volume
+from pymarketstore.local_store import LocalClient, LocalStore
+from pymarketstore.params import ListSymbolsFormat, Params
+
+
+DTYPE = np.dtype(
+    [
+        ("Epoch", "i8"),
+        ("Open", "f8"),
+        ("High", "f8"),
+        ("Low", "f8"),
+        ("Close", "f8"),
+        ("Volume", "f8"),
+    ]
+)
+
+# 2023-12-31 23:00 UTC: a range crossing into 2024
+T0 = 1704063600
+
+
+def _bars(start, n, step=60, close=100.0):
+    arr = np.zeros(n, dtype=DTYPE)
+    arr["Epoch"] = start + step * np.arange(n)
+    arr["Close"] = close + np.arange(n)
+    arr["Volume"] = 1000 * np.arange(n)
+    return arr
+
+
+@pytest.fixture
+def client(tmp_path):
+    c = LocalClient(tmp_path)
+    c.write(_bars(T0, 120), "AAPL/1Min/OHLCV")
+    return c
+
+
+# ---------------------------------------------------------------------------
+# LocalClient.write()
+# ---------------------------------------------------------------------------
+
+
+class TestWrite:
+    def test_layout_one_file_per_year(self, client, tmp_path):
+        directory = tmp_path / "AAPL" / "1Min" / "OHLCV"
+        assert sorted(os.listdir(directory)) == ["2023.npy", "2024.npy"]
+        assert len(np.load(directory / "2023.npy")) == 60
+        assert len(np.load(directory / "2024.npy")) == 60
+
+    def test_merge_sorts_and_replaces_duplicates(self, client, tmp_path):
+        client.write(_bars(T0 + 30 * 60, 10, close=500.0), "AAPL/1Min/OHLCV")
+        client.write(_bars(T0 - 600, 2), "AAPL/1Min/OHLCV")
+
+        arr = np.load(tmp_path / "AAPL" / "1Min" / "OHLCV" / "2023.npy")
+        assert len(arr) == 62
+        assert (np.diff(arr["Epoch"]) > 0).all()
+        assert arr["Close"][32:42].tolist() == [500.0 + i for i in range(10)]
+
+    def test_concurrent_writes_to_one_file(self, tmp_path):
+        client = LocalClient(tmp_path)
+        chunks = [_bars(T0 + 3600 + 6000 * i, 100) for i in range(16)]
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda c: client.write(c, "AAPL/1Min/OHLCV"), chunks))
+        arr = client.query(Params("AAPL", "1Min", "OHLCV")).first().array
+        assert len(arr) == 1600
+        assert (np.diff(arr["Epoch"]) > 0).all()
+
+    def test_dataframe(self, tmp_path):
+        client = LocalClient(tmp_path)
+        df = pd.DataFrame(
+            {"Close": [1.0, 2.0]},
+            index=pd.to_datetime(np.array([T0, T0 + 60]) * 10**9),
+        )
+        client.write(df, "X/1Min/OHLCV")
+        arr = client.query(Params("X", "1Min", "OHLCV")).first().array
+        assert arr["Epoch"].tolist() == [T0, T0 + 60]
+        assert arr.dtype.names == ("Epoch", "Close")
+
+    def test_mismatched_shape_is_rejected(self, client):
+        arr = np.zeros(1, dtype=[("Epoch", "i8"), ("Close", "f8")])
+        arr["Epoch"] = T0
+        with pytest.raises(ValueError, match="does not match"):
+            client.write(arr, "AAPL/1Min/OHLCV")
+
+    def test_epoch_must_be_first(self, tmp_path):
+        arr = np.zeros(1, dtype=[("Close", "f8"), ("Epoch", "i8")])
+        with pytest.raises(ValueError, match="Epoch"):
+            LocalClient(tmp_path).write(arr, "X/1Min/OHLCV")
+
+
+# ---------------------------------------------------------------------------
+# LocalClient.query()
+# ---------------------------------------------------------------------------
+
+
+class TestQuery:
+    def test_range_within_one_year_is_a_view_of_the_mapping(self, client):
+        p = Params("AAPL", "1Min", "OHLCV", start=T0 + 3600, end=T0 + 3600 + 600)
+        arr = client.query(p).first().array
+        assert arr["Epoch"].tolist() == [T0 + 3600 + 60 * i for i in range(11)]
+        assert isinstance(arr.base, np.memmap) or isinstance(arr, np.memmap)
+        assert not arr.flags.writeable
+
+    def test_range_across_years(self, client):
+        p = Params("AAPL", "1Min", "OHLCV", start=T0 + 3000, end=T0 + 4200)
+        arr = client.query(p).first().array
+        assert arr["Epoch"][0] == T0 + 3000
+        assert arr["Epoch"][-1] == T0 + 4200
+        assert len(arr) == 21
+
+    def test_limit(self, client):
+        p = Params("AAPL", "1Min", "OHLCV", limit=3)
+        assert client.query(p).first().array["Epoch"][0] == T0 + 117 * 60
+        p = Params("AAPL", "1Min", "OHLCV", limit=3, limit_from_start=True)
+        assert client.query(p).first().array["Epoch"][0] == T0
+
+    def test_multiple_symbols_and_filter(self, client):
+        client.write(_bars(T0, 5), "AMD/1Min/OHLCV")
+        p = Params(["AAPL", "AMD", "NONE"], "1Min", "OHLCV").where(Volume >= 3000)
+        reply = client.query(p)
+        assert reply.keys() == ["AAPL/1Min/OHLCV", "AMD/1Min/OHLCV"]
+        assert len(reply.all()["AMD/1Min/OHLCV"].array) == 2
+
+    def test_no_results(self, client):
+        with pytest.raises(Exception, match="no results returned from query"):
+            client.query(Params("NONE", "1Min", "OHLCV"))
+        with pytest.raises(Exception, match="no results returned from query"):
+            client.query(Params("AAPL", "1Min", "OHLCV", start=T0 + 10**7))
+
+    def test_functions_are_rejected(self, client):
+        with pytest.raises(ValueError):
+            client.query(Params("AAPL", "1Min", "OHLCV").apply("max(Close)"))
+
+    def test_limit_reads_only_the_years_it_needs(self, client, tmp_path):
+        client.write(_bars(T0 - 2 * 366 * 86400, 5), "AAPL/1Min/OHLCV")
+        opened = []
+        open_ = client._open
+        client._open = lambda path: opened.append(os.path.basename(path)) or open_(path)
+
+        arr = client.query(Params("AAPL", "1Min", "OHLCV", limit=1)).first().array
+        assert arr["Epoch"].tolist() == [T0 + 119 * 60]
+        assert opened == ["2024.npy"]
+
+        opened.clear()
+        p = Params("AAPL", "1Min", "OHLCV", limit=62)
+        arr = client.query(p).first().array
+        assert arr["Epoch"].tolist() == [T0 + 58 * 60 + 60 * i for i in range(62)]
+        assert opened == ["2024.npy", "2023.npy"]
+
+        opened.clear()
+        p = Params("AAPL", "1Min", "OHLCV", limit=7, limit_from_start=True)
+        arr = client.query(p).first().array
+        assert len(arr) == 7 and arr["Epoch"][5] == T0
+        assert opened == ["2021.npy", "2023.npy"]
+
+    def test_rewrite_is_visible(self, client):
+        p = Params("AAPL", "1Min", "OHLCV", limit=1)
+        client.query(p)
+        client.write(_bars(T0 + 120 * 60, 1), "AAPL/1Min/OHLCV")
+        assert client.query(p).first().array["Epoch"][0] == T0 + 120 * 60
+
+
+# ---------------------------------------------------------------------------
+# list_symbols() / destroy()
+# ---------------------------------------------------------------------------
+
+
+class TestListSymbols:
+    def test_list_symbols(self, client):
+        client.write(_bars(T0, 2, step=86400), "AMD/1D/OHLCV")
+        assert client.list_symbols() == ["AAPL", "AMD"]
+        assert client.list_symbols(timeframe=Freq.day) == ["AMD"]
+        assert client.list_symbols(ListSymbolsFormat.TBK) == [
+            "AAPL/1Min/OHLCV",
+            "AMD/1D/OHLCV",
+        ]
+
+    def test_list_symbols_by_date(self, client):
+        client.write(_bars(T0 + 86400 * 10, 1), "AMD/1Min/OHLCV")
+        assert client.list_symbols(date="2024-01-01") == ["AAPL"]
+        assert client.list_symbols(date="2024-01-10") == ["AMD"]
+
+    def test_destroy(self, client):
+        client.destroy("AAPL/1Min/OHLCV")
+        assert client.list_symbols() == []
+
+    def test_empty_root(self, tmp_path):
+        assert LocalClient(tmp_path / "missing").list_symbols() == []
+
+
+# ---------------------------------------------------------------------------
+# LocalStore
+# ---------------------------------------------------------------------------
+
+
+class TestLocalStore:
+    def test_store_api(self, tmp_path):
+        store = LocalStore(tmp_path)
+        df = pd.DataFrame(
+            _bars(T0, 3, step=86400)[list(DTYPE.names[1:])],
+            index=pd.to_datetime((T0 + 86400 * np.arange(3)) * 10**9),
+        )
+        store.write("aapl", Freq.day, df)
+
+        assert store.get_symbols() == ["AAPL"]
+        assert store.has("AAPL")
+        assert not store.has("AMD")
+        assert store.get_latest_dt("AAPL", Freq.day) == pd.Timestamp(
+            T0 + 2 * 86400, unit="s", tz="UTC"
+        )
+        result = store.get("AAPL", Freq.day, start_dt=T0 + 86400)
+        assert result["Close"].tolist() == [101.0, 102.0]
+        assert store.get(["AMD"], Freq.day) == {}
+
+    def test_resample_from_local_minutes(self, client, tmp_path):
+        store = LocalStore(tmp_path)
+        df = store.get("AAPL", Freq.hour, resample_from=Freq.min_1)
+        assert len(df) == 2
+        assert df["Volume"].sum() == 1000 * sum(range(120))
@@ -0,0 +1,195 @@
+"""Tests for pymarketstore.planner and Client.query_many()."""
+
+from unittest.mock import patch
+
+import numpy as np
+
+import pymarketstore as pymkts
+
+from pymarketstore.filters import Volume
+from pymarketstore.params import Params
+from pymarketstore.planner import QueryPlan, window_slice
+from pymarketstore.results import QueryReply, QueryResult
+
+
+T0 = 1700000000
+NS = 10**9
+
+DTYPE = np.dtype([("Epoch", "i8"), ("Close", "f8"), ("Volume", "f8")])
+
+
+def _bars(start, n):
+    arr = np.empty(n, dtype=DTYPE)
+    arr["Epoch"] = start + 60 * np.arange(n)
+    arr["Close"] = 100 + np.arange(n)
+    arr["Volume"] = 1000 * np.arange(n)
+    return arr
+
+
+def _params(start, end, symbol="AAPL", **kwargs):
+    return Params(symbol, "1Min", "OHLCV", start=start, end=end, **kwargs)
+
+
+def _reply_for(plan, source):
+    """Answer the plan's requests from the in-memory ``source`` arrays."""
+    results = []
+    for request in plan.requests:
+        arrays = {}
+        for key, array in source.items():
+            if key.split("/")[0] not in request.tbk.split("/")[0].split(","):
+                continue
+            start = None if request.start is None else request.start.value
+            end = None if request.end is None else request.end.value
+            array = array[window_slice(array, start, end)]
+            if request.limit is not None:
+                array = array[-request.limit :]
+            arrays[key] = array
+        results.append(QueryResult(arrays, "UTC"))
+    return QueryReply(results, "UTC")
+
+
+# ---------------------------------------------------------------------------
+# window_slice()
+# ---------------------------------------------------------------------------
+
+
+class TestWindowSlice:
+    def test_inclusive_bounds(self):
+        arr = _bars(T0, 10)
+        s = window_slice(arr, (T0 + 60) * NS, (T0 + 180) * NS)
+        assert arr[s]["Epoch"].tolist() == [T0 + 60, T0 + 120, T0 + 180]
+
+    def test_sub_second_bounds(self):
+        arr = _bars(T0, 10)
+        s = window_slice(arr, (T0 + 59) * NS + 1, (T0 + 120) * NS + 5)
+        assert arr[s]["Epoch"].tolist() == [T0 + 60, T0 + 120]
+
+    def test_unbounded(self):
+        arr = _bars(T0, 10)
+        assert window_slice(arr, None, None) == slice(0, 10)
+
+    def test_nanoseconds_column(self):
+        arr = np.array(
+            [(T0, 0), (T0, 500), (T0 + 1, 0)],
+            dtype=[("Epoch", "i8"), ("Nanoseconds", "i4")],
+        )
+        assert window_slice(arr, T0 * NS + 1, T0 * NS + 500) == slice(1, 2)
+
+
+# ---------------------------------------------------------------------------
+# QueryPlan
+# ---------------------------------------------------------------------------
+
+
+class TestQueryPlan:
+    def test_overlapping_and_adjacent_windows_are_merged(self):
+        plan = QueryPlan(
+            [
+                _params(T0, T0 + 600),
+                _params(T0 + 300, T0 + 900),
+                _params(T0 + 901, T0 + 1200),
+            ]
+        )
+        assert len(plan.requests) == 1
+        assert plan.requests[0].start.value == T0 * NS
+        assert plan.requests[0].end.value == (T0 + 1200) * NS
+
+    def test_disjoint_windows_are_not_merged(self):
+        plan = QueryPlan([_params(T0 + 3600, T0 + 7200), _params(T0, T0 + 600)])
+        assert [r.start.value for r in plan.requests] == [T0 * NS, (T0 + 3600) * NS]
+
+    def test_unbounded_windows(self):
+        plan = QueryPlan([_params(None, T0), _params(T0 + 600, None), _params(T0, T0)])
+        assert len(plan.requests) == 2
+        plan = QueryPlan([_params(None, None), _params(T0, T0 + 60)])
+        assert len(plan.requests) == 1
+        assert plan.requests[0].start is None and plan.requests[0].end is None
+
+    def test_different_tbks_are_not_merged(self):
+        plan = QueryPlan([_params(T0, T0 + 600), _params(T0, T0 + 600, "AMD")])
+        assert len(plan.requests) == 2
+
+    def test_limit_and_functions_are_sent_unchanged(self):
+        limited = _params(T0, T0 + 600, limit=5)
+        aggregated = _params(T0, T0 + 600).apply("max(Close)")
+        plan = QueryPlan([limited, aggregated, _params(T0, T0 + 600)])
+        assert len(plan.requests) == 3
+        assert plan.requests[0] is limited
+        assert plan.requests[1] is aggregated
+
+    def test_filter_epoch_bounds_are_used_and_filter_is_not_sent(self):
+        p = _params(T0, None).where(pymkts.filters.Epoch <= T0 + 600)
+        plan = QueryPlan([p, _params(T0 + 500, T0 + 700)])
+        assert len(plan.requests) == 1
+        assert plan.requests[0].end.value == (T0 + 700) * NS
+        assert plan.requests[0].filter is None
+        assert p.filter is not None
+
+    def test_execute_slices_views(self):
+        source = {"AAPL/1Min/OHLCV": _bars(T0, 30)}
+        params = [
+            _params(T0, T0 + 600),
+            _params(T0 + 300, T0 + 900),
+            _params(T0 + 1200, T0 + 1500),
+        ]
+        plan = QueryPlan(params)
+        merged = _reply_for(plan, source)
+        replies = plan.execute(merged)
+
+        assert len(replies) == 3
+        for p, reply, index in zip(params, replies, [0, 0, 1]):
+            arr = reply.first().array
+            assert arr["Epoch"][0] == p.start.value // NS
+            assert arr["Epoch"][-1] == p.end.value // NS
+            assert np.shares_memory(arr, merged.results[index].first().array)
+
+    def test_execute_applies_filters(self):
+        source = {"AAPL/1Min/OHLCV": _bars(T0, 30)}
+        params = [_params(T0, T0 + 600).where(Volume >= 5000), _params(T0, T0 + 600)]
+        plan = QueryPlan(params)
+        replies = plan.execute(_reply_for(plan, source))
+        assert replies[0].first().array["Volume"].tolist() == [
+            1000.0 * i for i in range(5, 11)
+        ]
+        assert len(replies[1].first().array) == 11
+
+    def test_execute_passes_through_unmerged(self):
+        source = {"AAPL/1Min/OHLCV": _bars(T0, 30)}
+        params = [_params(T0, T0 + 600, limit=2), _params(T0, T0 + 600)]
+        plan = QueryPlan(params)
+        replies = plan.execute(_reply_for(plan, source))
+        assert len(replies[0].first().array) == 2
+        assert len(replies[1].first().array) == 11
+
+    def test_repr(self):
+        plan = QueryPlan([_params(T0, T0 + 60), _params(T0, T0 + 60)])
+        assert repr(plan) == "QueryPlan(params=2, requests=1)"
+
+
+# ---------------------------------------------------------------------------
+# Client.query_many()
+# ---------------------------------------------------------------------------
+
+
+class TestQueryMany:
+    @patch("pymarketstore.jsonrpc_client.MsgpackRpcClient")
+    def test_sends_merged_requests(self, MockRpcClient):
+        source = {"AAPL/1Min/OHLCV": _bars(T0, 30)}
+        client = pymkts.Client()
+        params = [_params(T0, T0 + 600), _params(T0 + 300, T0 + 900)]
+
+        with patch.object(
+            client.client,
+            "query",
+            side_effect=lambda reqs: _reply_for(QueryPlan(reqs), source),
+        ) as query:
+            replies = client.query_many(params)
+
+        assert query.call_count == 1
+        assert len(query.call_args[0][0]) == 1
+        assert [len(r.first().array) for r in replies] == [11, 11]
+
+    @patch("pymarketstore.jsonrpc_client.MsgpackRpcClient")
+    def test_empty(self, MockRpcClient):
+        assert pymkts.Client().query_many([]) == []
+        MockRpcClient.return_value.call.assert_not_called()
@@ -0,0 +1,98 @@
+"""Tests for pymarketstore.reconnect.ReconnectPolicy."""
+
+from unittest.mock import patch
+
+import pytest
+
+from pymarketstore.reconnect import CircuitState, ReconnectPolicy
+
+
+class TestBackoff:
+    def test_first_retry_is_immediate(self):
+        policy = ReconnectPolicy(base_delay=1.0, jitter=0)
+        assert [policy.next_delay() for _ in range(5)] == [0.0, 1.0, 2.0, 4.0, 8.0]
+
+    def test_without_immediate_first_retry(self):
+        policy = ReconnectPolicy(base_delay=1.0, jitter=0, immediate_first_retry=False)
+        assert [policy.next_delay() for _ in range(3)] == [1.0, 2.0, 4.0]
+
+    def test_delay_is_capped(self):
+        policy = ReconnectPolicy(base_delay=10.0, max_delay=25.0, jitter=0)
+        assert [policy.next_delay() for _ in range(4)] == [0.0, 10.0, 20.0, 25.0]
+
+    def test_jitter_stays_within_bounds(self):
+        policy = ReconnectPolicy(base_delay=8.0, jitter=0.5, immediate_first_retry=False)
+        for _ in range(100):
+            policy.reset()
+            assert 4.0 <= policy.next_delay() <= 8.0
+
+    def test_reset_restarts_backoff(self):
+        policy = ReconnectPolicy(jitter=0)
+        policy.next_delay()
+        policy.next_delay()
+        policy.reset()
+        assert policy.failures == 0
+        assert policy.next_delay() == 0.0
+
+    @pytest.mark.parametrize(
+        "kwargs",
+        [dict(base_delay=-1), dict(multiplier=0.5), dict(jitter=1.5)],
+    )
+    def test_invalid_arguments(self, kwargs):
+        with pytest.raises(ValueError):
+            ReconnectPolicy(**kwargs)
+
+    def test_exhausted(self):
+        policy = ReconnectPolicy(max_attempts=2)
+        policy.next_delay()
+        assert not policy.exhausted
+        policy.next_delay()
+        assert policy.exhausted
+
+
+class TestCircuitBreaker:
+    def test_opens_after_threshold(self):
+        policy = ReconnectPolicy(jitter=0, failure_threshold=3, reset_timeout=30.0)
+        assert policy.next_delay() == 0.0
+        assert policy.next_delay() == 1.0
+        assert policy.state is CircuitState.CLOSED
+        assert policy.next_delay() == 30.0
+        assert policy.state is CircuitState.OPEN
+
+    @patch("pymarketstore.reconnect.time.monotonic")
+    def test_half_open_after_reset_timeout(self, mock_monotonic):
+        mock_monotonic.return_value = 100.0
+        policy = ReconnectPolicy(jitter=0, failure_threshold=1, reset_timeout=30.0)
+        policy.next_delay()
+        assert policy.state is CircuitState.OPEN
+
+        mock_monotonic.return_value = 131.0
+        assert policy.state is CircuitState.HALF_OPEN
+
+        # a failed probe re-opens the circuit
+        assert policy.next_delay() == 30.0
+        assert policy.state is CircuitState.OPEN
+
+    @patch("pymarketstore.reconnect.time.monotonic")
+    def test_probe_without_reading_state(self, mock_monotonic, caplog):
+        mock_monotonic.return_value = 100.0
+        policy = ReconnectPolicy(jitter=0, failure_threshold=1, reset_timeout=30.0)
+        assert policy.next_delay() == 30.0
+        assert "circuit opened" in caplog.text
+
+        # a failure during the cool-down keeps the circuit open
+        mock_monotonic.return_value = 110.0
+        assert policy.next_delay() == 30.0
+        assert "probe failed" not in caplog.text
+
+        # the next failure after the cool-down was the probe
+        mock_monotonic.return_value = 141.0
+        assert policy.next_delay() == 30.0
+        assert "probe failed" in caplog.text
+        assert policy._opened_at == 141.0
+
+    def test_success_closes_circuit(self):
+        policy = ReconnectPolicy(failure_threshold=1)
+        policy.next_delay()
+        policy.reset()
+        assert policy.state is CircuitState.CLOSED
@@ -0,0 +1,138 @@
+"""Tests for pymarketstore.relay — shared-memory stream fan-out."""
+
+import multiprocessing
+import uuid
+
+import numpy as np
+import pytest
+
+from pymarketstore.relay import RingBuffer, RingReader, StreamRelay, bar_dtype
+
+
+def _bar(epoch, close=100.0):
+    return {"Open": 1.0, "High": 2.0, "Low": 0.5, "Close": close, "Epoch": epoch}
+
+
+def _read_in_child(key, prefix, queue):
+    with RingReader(key, prefix=prefix, from_start=True) as reader:
+        queue.put(reader.read(copy=True)["Epoch"].tolist())
+
+
+@pytest.fixture
+def relay():
+    relay = StreamRelay(
+        "ws://localhost:5993/ws",
+        capacity=4,
+        prefix=f"pymkts_test_{uuid.uuid4().hex[:8]}",
+    )
+    yield relay
+    relay.close()
+
+
+class TestBarDtype:
+    def test_epoch_first_and_typed(self):
+        dtype = bar_dtype({"Open": 1.0, "Epoch": 1, "Volume": 10})
+        assert dtype.names == ("Epoch", "Open", "Volume")
+        assert dtype["Epoch"] == np.dtype("i8")
+        assert dtype["Volume"] == np.dtype("f8")
+
+
+class TestRingBuffer:
+    def test_attach_sees_writer_records(self):
+        name = f"pymkts_test_{uuid.uuid4().hex[:8]}"
+        dtype = np.dtype([("Epoch", "i8"), ("Close", "f8")])
+        writer = RingBuffer.create(name, dtype, capacity=8)
+        try:
+            writer.append((1, 10.0))
+            reader = RingBuffer.attach(name)
+            assert reader.dtype == dtype
+            assert reader.capacity == 8
+            assert reader.seq == 1
+            assert reader.records[0]["Close"] == 10.0
+            reader.close()
+        finally:
+            writer.close()
+
+
+class TestStreamRelay:
+    def test_publish_creates_one_ring_per_key(self, relay):
+        relay.publish("AAPL/1Min/OHLCV", _bar(60))
+        relay.publish("MSFT/1Min/OHLCV", _bar(60))
+        relay.publish("AAPL/1Min/OHLCV", _bar(120))
+
+        assert sorted(relay.keys) == ["AAPL/1Min/OHLCV", "MSFT/1Min/OHLCV"]
+
+    def test_mismatched_payloads_are_rejected(self, relay, caplog):
+        key = "AAPL/1Min/OHLCV"
+        relay.publish(key, _bar(60))
+        partial = _bar(120)
+        del partial["Close"]
+        relay.publish(key, partial)
+        relay.publish(key, dict(_bar(180), Volume=10.0))
+        relay.publish(key, _bar(240))
+
+        assert relay.rejected == 2
+        assert "Rejected AAPL/1Min/OHLCV payload" in caplog.text
+        with RingReader(key, prefix=relay.prefix, from_start=True) as reader:
+            assert reader.read()["Epoch"].tolist() == [60, 240]
+
+    def test_registered_on_connection(self, relay):
+        relay.conn._dispatch("AAPL/1Min/OHLCV", _bar(60))
+        assert relay.keys == ["AAPL/1Min/OHLCV"]
+
+    def test_reader_for_unknown_key_raises(self, relay):
+        with pytest.raises(FileNotFoundError):
+            RingReader("NOPE/1Min/OHLCV", prefix=relay.prefix)
+
+
+class TestRingReader:
+    def test_reads_only_new_records(self, relay):
+        relay.publish("AAPL/1Min/OHLCV", _bar(60))
+        with RingReader("AAPL/1Min/OHLCV", prefix=relay.prefix) as reader:
+            assert len(reader.read()) == 0
+
+            relay.publish("AAPL/1Min/OHLCV", _bar(120, close=101.0))
+            relay.publish("AAPL/1Min/OHLCV", _bar(180, close=102.0))
+            bars = reader.read(copy=True)
+
+            assert bars["Epoch"].tolist() == [120, 180]
+            assert bars["Close"].tolist() == [101.0, 102.0]
+            assert len(reader.read()) == 0
+
+    def test_from_start(self, relay):
+        relay.publish("AAPL/1Min/OHLCV", _bar(60))
+        with RingReader("AAPL/1Min/OHLCV", prefix=relay.prefix, from_start=True) as r:
+            assert r.read(copy=True)["Epoch"].tolist() == [60]
+
+    def test_wraparound_and_dropped_records(self, relay):
+        relay.publish("AAPL/1Min/OHLCV", _bar(0))
+        with RingReader("AAPL/1Min/OHLCV", prefix=relay.prefix) as reader:
+            for i in range(1, 7):
+                relay.publish("AAPL/1Min/OHLCV", _bar(i * 60))
+
+            bars = reader.read()
+
+            # capacity is 4: the oldest two of the six new bars were overwritten
+            assert bars["Epoch"].tolist() == [180, 240, 300, 360]
+            assert reader.dropped == 2
+
+    def test_latest(self, relay):
+        relay.publish("AAPL/1Min/OHLCV", _bar(60))
+        relay.publish("AAPL/1Min/OHLCV", _bar(120))
+        with RingReader("AAPL/1Min/OHLCV", prefix=relay.prefix) as reader:
+            assert reader.latest()["Epoch"] == 120
+
+    def test_read_from_another_process(self, relay):
+        relay.publish("AAPL/1Min/OHLCV", _bar(60))
+        relay.publish("AAPL/1Min/OHLCV", _bar(120))
+
+        ctx = multiprocessing.get_context("spawn")
+        queue = ctx.Queue()
+        proc = ctx.Process(
+            target=_read_in_child, args=("AAPL/1Min/OHLCV", relay.prefix, queue)
+        )
+        proc.start()
+        proc.join(timeout=30)
+
+        assert proc.exitcode == 0
+        assert queue.get(timeout=5) == [60, 120]
@@ -0,0 +1,196 @@
+"""Tests for pymarketstore.resample."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pymarketstore.enums import Freq
+from pymarketstore.resample import bucket_starts, resample, resample_many
+
+
+DTYPE = np.dtype(
+    [
+        ("Epoch", "i8"),
+        ("Open", "f8"),
+        ("High", "f8"),
+        ("Low", "f8"),
+        ("Close", "f8"),
+        ("Volume", "f8"),
+    ]
+)
+
+# 2023-11-14 22:00:00 UTC
+START = 1700000400 - 1700000400 % 3600
+
+
+def _bars(epochs, seed=0):
+    rng = np.random.default_rng(seed)
+    arr = np.empty(len(epochs), dtype=DTYPE)
+    arr["Epoch"] = epochs
+    arr["Open"] = rng.uniform(90, 110, len(epochs))
+    arr["Close"] = rng.uniform(90, 110, len(epochs))
+    arr["High"] = np.maximum(arr["Open"], arr["Close"]) + rng.uniform(0, 2, len(epochs))
+    arr["Low"] = np.minimum(arr["Open"], arr["Close"]) - rng.uniform(0, 2, len(epochs))
+    arr["Volume"] = rng.integers(100, 10000, len(epochs))
+    return arr
+
+
+def _pandas_resample(arr, rule):
+    df = pd.DataFrame(arr).set_index("Epoch")
+    df.index = pd.to_datetime(df.index, unit="s")
+    out = df.resample(rule).agg(
+        {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+    )
+    return out.dropna()
+
+
+# ---------------------------------------------------------------------------
+# bucket_starts()
+# ---------------------------------------------------------------------------
+
+
+class TestBucketStarts:
+    def test_fixed_duration(self):
+        epochs = np.array([START, START + 299, START + 300, START + 3599])
+        assert bucket_starts(epochs, Freq.min_5).tolist() == [
+            START,
+            START,
+            START + 300,
+            START + 3300,
+        ]
+
+    def test_week_starts_on_monday(self):
+        # Wednesday 2024-01-03 12:00 UTC -> Monday 2024-01-01
+        epoch = int(pd.Timestamp("2024-01-03 12:00", tz="UTC").timestamp())
+        monday = int(pd.Timestamp("2024-01-01", tz="UTC").timestamp())
+        assert bucket_starts([epoch], Freq.week).tolist() == [monday]
+
+    @pytest.mark.parametrize(
+        "freq, expected",
+        [
+            (Freq.month, "2024-05-01"),
+            (Freq.quarter, "2024-04-01"),
+            (Freq.year, "2024-01-01"),
+        ],
+    )
+    def test_calendar(self, freq, expected):
+        epoch = int(pd.Timestamp("2024-05-17 15:30", tz="UTC").timestamp())
+        start = int(pd.Timestamp(expected, tz="UTC").timestamp())
+        assert bucket_starts([epoch], freq).tolist() == [start]
+
+    @pytest.mark.parametrize(
+        "freq, expected",
+        [
+            (Freq.day, "2024-03-10"),
+            (Freq.week, "2024-03-04"),
+            (Freq.month, "2024-03-01"),
+            (Freq.year, "2024-01-01"),
+        ],
+    )
+    def test_timezone(self, freq, expected):
+        # Sunday 23:30 in New York (after the DST switch) is Monday in UTC
+        epoch = int(pd.Timestamp("2024-03-10 23:30", tz="America/New_York").timestamp())
+        start = int(pd.Timestamp(expected, tz="America/New_York").timestamp())
+        assert bucket_starts([epoch], freq, "America/New_York").tolist() == [start]
+        assert bucket_starts([epoch], freq).tolist() != [start]
+
+    def test_timezone_leaves_intraday_buckets_alone(self):
+        epochs = np.array([START + 61, START + 3601])
+        assert bucket_starts(epochs, Freq.hour, "Asia/Kolkata").tolist() == (
+            bucket_starts(epochs, Freq.hour).tolist()
+        )
+
+    def test_accepts_string_freq(self):
+        assert bucket_starts([START + 61], "1Min").tolist() == [START + 60]
+
+
+# ---------------------------------------------------------------------------
+# resample()
+# ---------------------------------------------------------------------------
+
+
+class TestResample:
+    def test_matches_pandas(self):
+        arr = _bars(np.arange(START, START + 600 * 60, 60))
+        result = resample(arr, Freq.min_15)
+        expected = _pandas_resample(arr, "15min")
+
+        assert len(result) == len(expected)
+        np.testing.assert_array_equal(
+            result["Epoch"], (expected.index - pd.Timestamp(0)) // pd.Timedelta("1s")
+        )
+        for name in ("Open", "High", "Low", "Close", "Volume"):
+            np.testing.assert_allclose(result[name], expected[name].values)
+
+    def test_gaps_produce_no_empty_bars(self):
+        epochs = np.array([START, START + 60, START + 7200, START + 7260])
+        result = resample(_bars(epochs), Freq.hour)
+        assert result["Epoch"].tolist() == [START, START + 7200]
+
+    def test_partial_period(self):
+        arr = _bars(np.arange(START, START + 7 * 60, 60))
+        result = resample(arr, Freq.min_5)
+        assert len(result) == 2
+        assert result["Open"][1] == arr["Open"][5]
+        assert result["Close"][1] == arr["Close"][6]
+        assert result["Volume"][1] == arr["Volume"][5:].sum()
+
+    def test_other_columns_keep_last_value(self):
+        dt = np.dtype([("Epoch", "i8"), ("Close", "f8"), ("Count", "i4")])
+        arr = np.array([(START, 1.0, 1), (START + 60, 2.0, 7)], dtype=dt)
+        result = resample(arr, Freq.min_5)
+        assert result.dtype == dt
+        assert result["Count"].tolist() == [7]
+
+    def test_empty(self):
+        result = resample(np.empty(0, dtype=DTYPE), Freq.min_5)
+        assert len(result) == 0
+        assert result.dtype == DTYPE
+
+
+# ---------------------------------------------------------------------------
+# resample_many()
+# ---------------------------------------------------------------------------
+
+
+class TestResampleMany:
+    def test_matches_per_symbol_resample(self):
+        arrays = {
+            "AAPL/1Min/OHLCV": _bars(np.arange(START, START + 120 * 60, 60), 1),
+            "AMD/1Min/OHLCV": _bars(np.arange(START + 600, START + 90 * 60, 60), 2),
+            "NVDA/1Min/OHLCV": _bars(np.arange(START, START + 3 * 60, 60), 3),
+        }
+        result = resample_many(arrays, Freq.min_15)
+
+        assert list(result) == list(arrays)
+        for key, array in arrays.items():
+            np.testing.assert_array_equal(result[key], resample(array, Freq.min_15))
+
+    def test_same_bucket_across_symbols_is_not_merged(self):
+        # the last bar of one symbol and the first of the next share a bucket
+        arrays = {
+            "A": _bars([START, START + 60], 1),
+            "B": _bars([START + 120, START + 180], 2),
+        }
+        result = resample_many(arrays, Freq.min_5)
+        assert len(result["A"]) == 1
+        assert len(result["B"]) == 1
+        assert result["B"]["Open"][0] == arrays["B"]["Open"][0]
+
+    def test_empty_array_among_others(self):
+        arrays = {
+            "A": _bars([START, START + 60], 1),
+            "B": np.empty(0, dtype=DTYPE),
+            "C": _bars([START + 300], 2),
+        }
+        result = resample_many(arrays, Freq.min_5)
+        assert len(result["A"]) == 1
+        assert len(result["B"]) == 0
+        assert result["C"]["Epoch"].tolist() == [START + 300]
+
+    def test_mixed_dtypes(self):
+        other = np.array([(START, 1.0)], dtype=[("Epoch", "i8"), ("Close", "f8")])
+        arrays = {"A": _bars([START, START + 60]), "B": other}
+        result = resample_many(arrays, Freq.min_5)
+        assert result["A"].dtype == DTYPE
+        assert result["B"].dtype == other.dtype
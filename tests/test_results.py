@@ -200,6 +200,60 @@ class TestDataSet:
         assert str(df.index.tz) == "America/New_York"
 
 
+class TestDataSetTimeSlicing:
+    def _ds(self):
+        arr = np.zeros(5, dtype=[("Epoch", "i8"), ("Close", "f8")])
+        arr["Epoch"] = 1704067200 + 60 * np.arange(5)
+        arr["Close"] = np.arange(5)
+        return DataSet(arr, "BTC/1Min/OHLCV", "UTC")
+
+    def test_between(self):
+        ds = self._ds()
+        sub = ds.between(1704067260, "2024-01-01 00:03:00")
+        assert sub.array["Close"].tolist() == [1.0, 2.0, 3.0]
+        assert sub.key == ds.key
+        assert np.shares_memory(sub.array, ds.array)
+
+        assert len(ds.between(start="2024-01-01 00:03:30").array) == 1
+        assert len(ds.between(end=pd.Timestamp("2024-01-01 00:00:59")).array) == 1
+        assert len(ds.between().array) == 5
+        assert len(ds.between("2025-01-01").array) == 0
+
+    def test_between_tz_aware(self):
+        ds = self._ds()
+        sub = ds.between(pd.Timestamp("2023-12-31 19:01:00", tz="America/New_York"))
+        assert sub.array["Close"].tolist() == [1.0, 2.0, 3.0, 4.0]
+
+    def test_asof(self):
+        ds = self._ds()
+        assert ds.asof("2024-01-01 00:02:30")["Close"] == 2.0
+        assert ds.asof("2024-01-01 00:02:00")["Close"] == 2.0
+        assert ds.asof("2030-01-01")["Close"] == 4.0
+        assert ds.asof("2023-12-31") is None
+
+    def test_at(self):
+        ds = self._ds()
+        row = ds.at(1704067320)
+        assert row["Close"] == 2.0
+        row["Close"] = 20.0  # a view
+        assert ds.array["Close"][2] == 20.0
+        with pytest.raises(KeyError):
+            ds.at("2024-01-01 00:02:30")
+
+    def test_nanoseconds(self):
+        arr = np.zeros(4, dtype=[("Epoch", "i8"), ("Price", "f8"), ("Nanoseconds", "i4")])
+        arr["Epoch"] = [100, 100, 100, 101]
+        arr["Nanoseconds"] = [0, 500, 900, 0]
+        arr["Price"] = [1, 2, 3, 4]
+        ds = DataSet(arr, "BTC/1Sec/TICK", "UTC")
+
+        start = pd.Timestamp(100 * 10**9 + 500)
+        assert ds.between(start, start).array["Price"].tolist() == [2.0]
+        assert ds.asof(pd.Timestamp(100 * 10**9 + 899))["Price"] == 2.0
+        assert ds.at(pd.Timestamp(100 * 10**9 + 900))["Price"] == 3.0
+        assert ds.at(101)["Price"] == 4.0
+
+
 # ---------------------------------------------------------------------------
 # QueryResult
 # ---------------------------------------------------------------------------
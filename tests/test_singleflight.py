@@ -0,0 +1,169 @@
+"""Tests for pymarketstore.singleflight and Client(coalesce=True)."""
+
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+import pymarketstore as pymkts
+
+from pymarketstore.filters import Volume
+from pymarketstore.params import Params
+from pymarketstore.results import QueryReply, QueryResult
+from pymarketstore.singleflight import SingleFlight
+
+
+def _reply():
+    arr = np.array([(1700000000, 1.0)], dtype=[("Epoch", "i8"), ("Close", "f8")])
+    return QueryReply([QueryResult({"AAPL/1Min/OHLCV": arr}, "UTC")], "UTC")
+
+
+def _run_concurrently(n, fn):
+    barrier = threading.Barrier(n)
+
+    def worker():
+        barrier.wait()
+        return fn()
+
+    with ThreadPoolExecutor(n) as pool:
+        futures = [pool.submit(worker) for _ in range(n)]
+        return [f.result() for f in futures]
+
+
+# ---------------------------------------------------------------------------
+# SingleFlight
+# ---------------------------------------------------------------------------
+
+
+class TestSingleFlight:
+    def test_concurrent_calls_share_one_result(self):
+        flight = SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return object()
+
+        results = _run_concurrently(8, lambda: flight.do("k", slow))
+
+        assert len(calls) == 1
+        assert all(r is results[0] for r in results)
+        assert flight.calls == 1
+        assert flight.shared == 7
+        assert flight.in_flight == 0
+
+    def test_different_keys_run_separately(self):
+        flight = SingleFlight()
+        assert flight.do("a", lambda: 1) == 1
+        assert flight.do("b", lambda: 2) == 2
+        assert flight.calls == 2
+
+    def test_result_is_not_cached(self):
+        flight = SingleFlight()
+        assert flight.do("k", lambda: 1) == 1
+        assert flight.do("k", lambda: 2) == 2
+
+    def test_exception_is_shared(self):
+        flight = SingleFlight()
+
+        def fail():
+            time.sleep(0.1)
+            raise ConnectionError("server down")
+
+        def call():
+            try:
+                flight.do("k", fail)
+            except ConnectionError as e:
+                return e
+
+        errors = _run_concurrently(4, call)
+        assert all(isinstance(e, ConnectionError) for e in errors)
+        assert flight.calls == 1
+        assert flight.in_flight == 0
+
+    def test_repr(self):
+        assert repr(SingleFlight()) == "SingleFlight(in_flight=0, calls=0, shared=0)"
+
+
+# ---------------------------------------------------------------------------
+# Params.cache_key() / QueryReply.readonly()
+# ---------------------------------------------------------------------------
+
+
+class TestCacheKey:
+    def test_equal_params_have_equal_keys(self):
+        a = Params("AAPL", "1Min", "OHLCV", start="2024-01-02")
+        b = Params(["AAPL"], "1Min", "OHLCV", start=1704153600)
+        assert a.cache_key() == b.cache_key()
+        assert hash(a.cache_key()) == hash(b.cache_key())
+
+    def test_key_includes_window_functions_and_filter(self):
+        base = Params("AAPL", "1Min", "OHLCV")
+        keys = {
+            base.cache_key(),
+            Params("AAPL", "1Min", "OHLCV", limit=5).cache_key(),
+            Params("AAPL", "1Min", "OHLCV").apply("max(Close)").cache_key(),
+            Params("AAPL", "1Min", "OHLCV").where(Volume > 1).cache_key(),
+            Params("AAPL", "1Min", "OHLCV").where(Volume > 2).cache_key(),
+        }
+        assert len(keys) == 5
+
+
+class TestReadonly:
+    def test_readonly_views(self):
+        reply = _reply()
+        view = reply.readonly()
+        arr = view.first().array
+        assert not arr.flags.writeable
+        assert np.shares_memory(arr, reply.first().array)
+        with pytest.raises(ValueError):
+            arr["Close"][0] = 2.0
+        assert view.timezone == "UTC"
+        assert view.keys() == reply.keys()
+
+
+# ---------------------------------------------------------------------------
+# Client(coalesce=True)
+# ---------------------------------------------------------------------------
+
+
+class TestClientCoalesce:
+    @patch("pymarketstore.jsonrpc_client.MsgpackRpcClient")
+    def test_concurrent_identical_queries_share_one_request(self, MockRpcClient):
+        client = pymkts.Client(coalesce=True)
+
+        def slow_query(params):
+            time.sleep(0.1)
+            return _reply()
+
+        with patch.object(client.client, "query", side_effect=slow_query) as query:
+            replies = _run_concurrently(
+                6, lambda: client.query(Params("AAPL", "1Min", "OHLCV"))
+            )
+
+        assert query.call_count == 1
+        arrays = [r.first().array for r in replies]
+        assert all(not a.flags.writeable for a in arrays)
+        assert all(np.shares_memory(a, arrays[0]) for a in arrays)
+
+    @patch("pymarketstore.jsonrpc_client.MsgpackRpcClient")
+    def test_different_queries_are_not_shared(self, MockRpcClient):
+        client = pymkts.Client(coalesce=True)
+
+        with patch.object(client.client, "query", return_value=_reply()) as query:
+            client.query(Params("AAPL", "1Min", "OHLCV"))
+            client.query([Params("AMD", "1Min", "OHLCV")])
+
+        assert query.call_count == 2
+
+    @patch("pymarketstore.jsonrpc_client.MsgpackRpcClient")
+    def test_disabled_by_default(self, MockRpcClient):
+        client = pymkts.Client()
+        reply = _reply()
+        with patch.object(client.client, "query", return_value=reply):
+            assert client.query(Params("AAPL", "1Min", "OHLCV")) is reply
@@ -7,6 +7,7 @@ import pandas as pd
 import pytest
 
 from pymarketstore.enums import Freq
+from pymarketstore.local_store import LocalClient
 from pymarketstore.results import DataSet, QueryReply, QueryResult
 from pymarketstore.store import Store
 
@@ -36,6 +37,20 @@ def _make_dataset(symbol, timeframe, n=5):
     return DataSet(arr, key, "UTC")
 
 
+T0 = 1704067200  # 2024-01-01
+
+
+def _bars(start, closes, step):
+    arr = np.zeros(
+        len(closes),
+        dtype=[("Epoch", "i8"), ("Open", "f8"), ("Close", "f8"), ("Volume", "f8")],
+    )
+    arr["Epoch"] = start + step * np.arange(len(closes))
+    arr["Open"] = arr["Close"] = closes
+    arr["Volume"] = 1.0
+    return arr
+
+
 def _make_query_reply(datasets):
     """Build a QueryReply from a list of DataSets."""
     result_dict = {ds.key: ds for ds in datasets}
@@ -154,6 +169,123 @@ class TestGet:
         assert call_args.limit == 10
 
 
+# ---------------------------------------------------------------------------
+# get(resample_from=...)
+# ---------------------------------------------------------------------------
+
+
+class TestGetResampleFrom:
+    @patch("pymarketstore.store.JsonRpcClient")
+    def test_missing_symbol_is_resampled_from_finer_bars(self, MockClient):
+        mock_client = MockClient.return_value
+        daily = _make_dataset("AAPL", "1D")
+        minutes = _make_dataset("TSLA", "1Min", n=10)
+        mock_client.query.side_effect = [
+            _make_query_reply([daily]),
+            Exception("no results returned from query"),
+            _make_query_reply([minutes]),
+        ]
+
+        store = Store()
+        result = store.get(["AAPL", "TSLA"], Freq.min_5, resample_from=Freq.min_1)
+
+        assert set(result) == {"AAPL", "TSLA"}
+        fine_params = mock_client.query.call_args_list[2][0][0]
+        assert fine_params.tbk == "TSLA/1Min/OHLCV"
+        df = result["TSLA"]
+        assert list(df.columns) == ["Open", "High", "Low", "Close", "Volume"]
+        assert (df.index.minute % 5 == 0).all()
+        assert df["Volume"].sum() == pytest.approx(minutes.array["Volume"].sum())
+
+    @patch("pymarketstore.store.JsonRpcClient")
+    def test_single_symbol_no_coarse_data(self, MockClient):
+        mock_client = MockClient.return_value
+        mock_client.query.side_effect = [
+            Exception("no results returned from query"),
+            _make_query_reply([_make_dataset("AAPL", "1Min", n=10)]),
+        ]
+
+        store = Store()
+        result = store.get("AAPL", Freq.min_5, resample_from=Freq.min_1)
+
+        assert isinstance(result, pd.DataFrame)
+        assert not result.empty
+
+    @patch("pymarketstore.store.JsonRpcClient")
+    def test_up_to_date_coarse_bars_are_returned(self, MockClient):
+        mock_client = MockClient.return_value
+        coarse = _make_dataset("AAPL", "5Min")
+        mock_client.query.side_effect = [
+            _make_query_reply([coarse]),
+            Exception("no results returned from query"),
+        ]
+
+        store = Store()
+        df = store.get("AAPL", Freq.min_5, resample_from=Freq.min_1)
+
+        assert len(df) == 5
+        # only the fine bars from the last coarse bar on are checked
+        fine_params = mock_client.query.call_args_list[1][0][0]
+        assert fine_params.tbk == "AAPL/1Min/OHLCV"
+        assert fine_params.start.value == coarse.array["Epoch"][-1] * 10**9
+
+    def test_stale_coarse_bars_are_extended(self, tmp_path):
+        local = LocalClient(tmp_path)
+        day = 86400
+        local.write(_bars(T0, [100.0, 101.0], day), "AAPL/1D/OHLCV")
+        # today's minute bars, not yet rolled up into a daily bar
+        local.write(_bars(T0 + 2 * day, [102.0, 103.0, 104.0], 60), "AAPL/1Min/OHLCV")
+        with patch("pymarketstore.store.JsonRpcClient", return_value=local):
+            store = Store()
+
+        df = store.get("AAPL", Freq.day, resample_from=Freq.min_1)
+        assert df["Close"].tolist() == [100.0, 101.0, 104.0]
+        assert df["Volume"].tolist()[-1] == 3.0
+        assert store.get("AAPL", Freq.day, limit=2, resample_from=Freq.min_1)[
+            "Close"
+        ].tolist() == [101.0, 104.0]
+        assert len(store.get("AAPL", Freq.day)) == 2
+
+    def test_days_start_at_midnight_in_the_reply_timezone(self, tmp_path):
+        local = LocalClient(tmp_path)
+        local.timezone = "America/New_York"
+        # 23:00 and 01:00 New York time, on either side of midnight
+        local.write(_bars(T0 + 4 * 3600, [1.0, 2.0, 3.0], 7200), "AAPL/1Min/OHLCV")
+        with patch("pymarketstore.store.JsonRpcClient", return_value=local):
+            store = Store()
+
+        df = store.get("AAPL", Freq.day, resample_from=Freq.min_1)
+        assert str(df.index.tz) == "America/New_York"
+        assert [str(ts) for ts in df.index] == [
+            "2023-12-31 00:00:00-05:00",
+            "2024-01-01 00:00:00-05:00",
+        ]
+        assert df["Close"].tolist() == [1.0, 3.0]
+
+    @patch("pymarketstore.store.JsonRpcClient")
+    def test_limit_applies_to_resampled_bars(self, MockClient):
+        mock_client = MockClient.return_value
+        mock_client.query.side_effect = [
+            Exception("no results returned from query"),
+            _make_query_reply([_make_dataset("AAPL", "1Min", n=30)]),
+        ]
+
+        store = Store()
+        result = store.get("AAPL", Freq.min_5, limit=2, resample_from=Freq.min_1)
+
+        assert len(result) == 2
+        assert mock_client.query.call_args_list[1][0][0].limit == 15
+
+    @patch("pymarketstore.store.JsonRpcClient")
+    def test_source_must_be_finer(self, MockClient):
+        mock_client = MockClient.return_value
+        mock_client.query.side_effect = Exception("no results returned from query")
+
+        store = Store()
+        with pytest.raises(ValueError):
+            store.get("AAPL", Freq.min_5, resample_from=Freq.hour)
+
+
 # ---------------------------------------------------------------------------
 # get_latest_dt()
 # ---------------------------------------------------------------------------
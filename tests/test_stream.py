@@ -9,6 +9,7 @@ import pytest
 
 from websocket import ABNF
 
+from pymarketstore.reconnect import ReconnectPolicy
 from pymarketstore.stream import StreamConn
 
 
@@ -106,6 +107,17 @@ class TestDispatch:
         handler_a.assert_called_once_with(conn, msg)
         handler_b.assert_called_once_with(conn, msg)
 
+    def test_deregister_after_dispatch_invalidates_cache(self):
+        conn = StreamConn("ws://localhost:5993/ws")
+        handler = MagicMock()
+        conn.register(r"^BTC/", handler)
+        conn._dispatch("BTC/1Min/OHLCV", {})
+
+        conn.deregister(r"^BTC/")
+        conn._dispatch("BTC/1Min/OHLCV", {})
+
+        handler.assert_called_once()
+
 
 # ---------------------------------------------------------------------------
 # Connect and subscribe
@@ -198,3 +210,51 @@ class TestRun:
             conn.run(["BTC/*/*"])
 
         mock_ws.close.assert_called_once()
+
+
+# ---------------------------------------------------------------------------
+# run() — reconnection
+# ---------------------------------------------------------------------------
+
+
+class TestRunReconnection:
+    @patch("pymarketstore.stream.time.sleep")
+    @patch("pymarketstore.stream.websocket.WebSocket")
+    def test_reconnects_with_policy(self, MockWebSocket, mock_sleep):
+        mock_ws = MockWebSocket.return_value
+        msg = {"key": "BTC/1Min/OHLCV", "Open": 100.0}
+        mock_ws.recv.side_effect = [
+            ConnectionError("dropped"),
+            msgpack.dumps(msg),
+            KeyboardInterrupt,
+        ]
+
+        policy = ReconnectPolicy(jitter=0)
+        conn = StreamConn("ws://localhost:5993/ws", reconnect_policy=policy)
+        handler = MagicMock()
+        conn.register(r".*", handler)
+
+        with pytest.raises(KeyboardInterrupt):
+            conn.run(["BTC/*/*"])
+
+        assert mock_ws.connect.call_count == 2
+        mock_sleep.assert_called_once_with(0.0)
+        handler.assert_called_once_with(conn, msg)
+        assert policy.failures == 0
+
+    @patch("pymarketstore.stream.time.sleep")
+    @patch("pymarketstore.stream.websocket.WebSocket")
+    def test_gives_up_after_max_attempts(self, MockWebSocket, mock_sleep):
+        mock_ws = MockWebSocket.return_value
+        mock_ws.connect.side_effect = ConnectionRefusedError("refused")
+
+        conn = StreamConn(
+            "ws://localhost:5993/ws",
+            reconnect_policy=ReconnectPolicy(max_attempts=3),
+        )
+
+        with pytest.raises(ConnectionRefusedError):
+            conn.run(["BTC/*/*"])
+
+        assert mock_ws.connect.call_count == 3
+        assert mock_sleep.call_count == 2
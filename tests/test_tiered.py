@@ -0,0 +1,285 @@
+"""Tests for pymarketstore.tiered and Store(tiers=...)."""
+
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from pymarketstore.cache import ResultCache
+from pymarketstore.enums import Freq
+from pymarketstore.filters import Volume
+from pymarketstore.local_store import LocalClient
+from pymarketstore.params import Params
+from pymarketstore.store import Store
+from pymarketstore.tiered import Coverage, TieredClient, settled_before
+
+
+T0 = 1704067200  # 2024-01-01
+NS = 10**9
+
+
+def _bars(start, n):
+    arr = np.zeros(n, dtype=[("Epoch", "i8"), ("Close", "f8"), ("Volume", "f8")])
+    arr["Epoch"] = start + 60 * np.arange(n)
+    arr["Close"] = 100 + np.arange(n)
+    arr["Volume"] = 1000 * np.arange(n)
+    return arr
+
+
+class FakeRemote:
+    """A server stand-in backed by a LocalClient, recording its queries."""
+
+    def __init__(self, root, delay=0.0):
+        self.store = LocalClient(root)
+        self.store.write(_bars(T0, 600), "AAPL/1Min/OHLCV")
+        self.store.write(_bars(T0, 10), "AMD/1Min/OHLCV")
+        self.delay = delay
+        self.queries = []
+        self.writes = []
+        self._lock = threading.Lock()
+
+    def query(self, params):
+        with self._lock:
+            self.queries.append(params)
+        time.sleep(self.delay)
+        return self.store.query(params)
+
+    def write(self, data, tbk, is_variable_length=False):
+        self.writes.append(tbk)
+        return self.store.write(data, tbk)
+
+    def list_symbols(self, *args, **kwargs):
+        return self.store.list_symbols(*args, **kwargs)
+
+
+def _params(start, end, symbol="AAPL", **kwargs):
+    return Params(symbol, "1Min", "OHLCV", start=start, end=end, **kwargs)
+
+
+@pytest.fixture
+def remote(tmp_path):
+    return FakeRemote(tmp_path / "server")
+
+
+@pytest.fixture
+def local(tmp_path):
+    return LocalClient(tmp_path / "local")
+
+
+# ---------------------------------------------------------------------------
+# Coverage
+# ---------------------------------------------------------------------------
+
+
+class TestSettledBefore:
+    def test_bar_start(self):
+        now = (T0 + 90) * NS
+        assert settled_before("1Min", now) == (T0 + 60) * NS
+        assert settled_before("5Min", now) == T0 * NS
+        assert settled_before("1D", now) == T0 * NS
+
+    def test_calendar_timeframes_stay_clear(self):
+        now = (T0 + 20 * 86400) * NS  # 2024-01-21
+        assert settled_before("1M", now) <= T0 * NS
+        assert settled_before("1W", now) <= (T0 + 14 * 86400) * NS
+
+    def test_unknown_timeframe(self):
+        assert settled_before("tick", 123) == 123
+
+
+class TestCoverage:
+    def test_gaps_and_merging(self, tmp_path):
+        coverage = Coverage()
+        d = str(tmp_path)
+        assert coverage.gaps(d, 0, 100) == [(0, 100)]
+
+        coverage.add(d, 10 * NS, 20 * NS)
+        coverage.add(d, 40 * NS, 50 * NS)
+        assert coverage.gaps(d, 0, 60 * NS) == [
+            (0, 10 * NS - 1),
+            (20 * NS + 1, 40 * NS - 1),
+            (50 * NS + 1, 60 * NS),
+        ]
+        assert coverage.gaps(d, 12 * NS, 18 * NS) == []
+
+        coverage.add(d, 21 * NS, 39 * NS)  # adjacent on both sides
+        assert coverage.intervals(d) == [[10 * NS, 50 * NS]]
+
+        coverage.clear(d)
+        assert coverage.intervals(d) == []
+
+    def test_timezone(self, tmp_path):
+        coverage = Coverage()
+        d = str(tmp_path)
+        assert coverage.timezone(d) is None
+        coverage.add(d, 0, NS, "America/New_York")
+        coverage.add(d, 2 * NS, 3 * NS)
+        assert coverage.timezone(d) == "America/New_York"
+        assert coverage.intervals(d) == [[0, 3 * NS]]
+
+    def test_reads_files_without_timezone(self, tmp_path):
+        (tmp_path / Coverage.FILENAME).write_text("[[0, 10]]")
+        coverage = Coverage()
+        assert coverage.intervals(str(tmp_path)) == [[0, 10]]
+        assert coverage.timezone(str(tmp_path)) is None
+
+
+# ---------------------------------------------------------------------------
+# TieredClient
+# ---------------------------------------------------------------------------
+
+
+class TestTieredClient:
+    def test_local_tier_is_filled_once(self, remote, local):
+        client = TieredClient(remote, local=local)
+        p = _params(T0, T0 + 3600)
+
+        first = client.query(p).first().array
+        second = client.query(_params(T0, T0 + 3600)).first().array
+
+        assert len(remote.queries) == 1
+        assert len(first) == len(second) == 61
+        assert local.list_symbols() == ["AAPL"]
+
+    def test_only_missing_ranges_are_fetched(self, remote, local):
+        client = TieredClient(remote, local=local)
+        client.query(_params(T0, T0 + 3600))
+        arr = client.query(_params(T0 + 1800, T0 + 7200)).first().array
+
+        assert len(remote.queries) == 2
+        fetched = remote.queries[1]
+        assert fetched.start.value == (T0 + 3600) * NS + 1
+        assert fetched.end.value == (T0 + 7200) * NS
+        assert arr["Epoch"][0] == T0 + 1800
+        assert arr["Epoch"][-1] == T0 + 7200
+
+    def test_forming_bar_is_refetched(self, remote, local):
+        client = TieredClient(remote, local=local)
+        live = T0 + 300 * 60  # the 1Min bar forming at "now"
+        p = _params(T0, None)
+        with patch("pymarketstore.tiered.time.time_ns", return_value=(live + 30) * NS):
+            first = client.query(p).first().array
+            update = _bars(live, 1)
+            update["Close"] = -1.0
+            remote.store.write(update, "AAPL/1Min/OHLCV")
+            second = client.query(_params(T0, None)).first().array
+
+        assert first["Epoch"][-1] == second["Epoch"][-1] == live
+        assert first["Close"][-1] != -1.0
+        assert second["Close"][-1] == -1.0
+        assert len(remote.queries) == 2
+        assert remote.queries[1].start.value == live * NS
+        assert local.query(_params(T0, None)).first().array["Close"][-1] == -1.0
+
+    def test_no_data_is_remembered(self, remote, local):
+        client = TieredClient(remote, local=local)
+        for _ in range(2):
+            with pytest.raises(Exception, match="no results returned from query"):
+                client.query(_params(T0, T0 + 60, symbol="NONE"))
+        assert len(remote.queries) == 1
+
+    def test_filters_are_applied_but_not_sent(self, remote, local):
+        client = TieredClient(remote, local=local)
+        p = _params(T0, T0 + 600).where(Volume >= 5000)
+        arr = client.query(p).first().array
+        assert arr["Volume"].tolist() == [1000.0 * i for i in range(5, 11)]
+        assert remote.queries[0].filter is None
+
+    def test_limit_goes_to_remote(self, remote, local):
+        client = TieredClient(remote, local=local)
+        assert len(client.query(_params(None, None, limit=3)).first().array) == 3
+        assert len(client.query(_params(None, None, limit=3)).first().array) == 3
+        assert len(remote.queries) == 2
+        assert local.list_symbols() == []
+
+    def test_memory_tier(self, remote, local):
+        cache = ResultCache()
+        client = TieredClient(remote, local=local, cache=cache)
+        p = _params(T0, T0 + 600)
+        client.query(p)
+        with patch.object(local, "query", side_effect=AssertionError):
+            assert len(client.query(_params(T0, T0 + 600)).first().array) == 11
+        assert cache.hits == 1
+
+    def test_multi_symbol_params(self, remote, local):
+        client = TieredClient(remote, local=local)
+        reply = client.query(_params(T0, T0 + 3600, symbol=["AAPL", "AMD"]))
+        assert sorted(reply.keys()) == ["AAPL/1Min/OHLCV", "AMD/1Min/OHLCV"]
+        client.query(_params(T0, T0 + 3600, symbol=["AAPL", "AMD"]))
+        assert len(remote.queries) == 2  # one fill per symbol
+
+    def test_concurrent_fills_are_deduplicated(self, tmp_path, local):
+        remote = FakeRemote(tmp_path / "server", delay=0.1)
+        client = TieredClient(remote, local=local)
+        barrier = threading.Barrier(6)
+
+        def worker():
+            barrier.wait()
+            return len(client.query(_params(T0, T0 + 3600)).first().array)
+
+        with ThreadPoolExecutor(6) as pool:
+            counts = list(pool.map(lambda _: worker(), range(6)))
+
+        assert counts == [61] * 6
+        assert len(remote.queries) == 1
+
+    def test_write_invalidates(self, remote, local):
+        cache = ResultCache()
+        client = TieredClient(remote, local=local, cache=cache)
+        client.query(_params(T0, T0 + 600))
+        client.write(_bars(T0, 1), "AAPL/1Min/OHLCV")
+
+        assert remote.writes == ["AAPL/1Min/OHLCV"]
+        assert len(cache) == 0
+        client.query(_params(T0, T0 + 600))
+        assert len(remote.queries) == 2
+
+    def test_results_keep_the_server_timezone(self, remote, tmp_path):
+        remote.store.timezone = "America/New_York"
+        p = _params(T0, T0 + 600)
+        direct = remote.query(p).first().df()
+
+        client = TieredClient(remote, local=LocalClient(tmp_path / "local"))
+        filled = client.query(p).first().df()
+        assert len(remote.queries) == 2
+        assert str(filled.index.tz) == str(direct.index.tz) == "America/New_York"
+        assert filled.index.equals(direct.index)
+
+        # served from disk by a new client, and a limit query sent to the server
+        client = TieredClient(remote, local=LocalClient(tmp_path / "local"))
+        reply = client.query(p)
+        assert len(remote.queries) == 2
+        assert reply.timezone == "America/New_York"
+        assert str(reply.first().df().index.tz) == "America/New_York"
+        limited = client.query(_params(T0, T0 + 600, limit=5)).first().df()
+        assert str(limited.index.tz) == "America/New_York"
+
+    def test_from_tiers(self, remote, tmp_path):
+        cache = ResultCache()
+        client = TieredClient.from_tiers(remote, [cache, str(tmp_path / "x")])
+        assert client.cache is cache
+        assert isinstance(client.local, LocalClient)
+        with pytest.raises(TypeError):
+            TieredClient.from_tiers(remote, [object()])
+
+
+# ---------------------------------------------------------------------------
+# Store(tiers=...)
+# ---------------------------------------------------------------------------
+
+
+class TestStoreTiers:
+    def test_store_reads_through_tiers(self, remote, tmp_path):
+        with patch("pymarketstore.store.JsonRpcClient", return_value=remote):
+            store = Store(tiers=[ResultCache(), tmp_path / "local"])
+
+        assert isinstance(store.client, TieredClient)
+        df = store.get("AAPL", Freq.min_1, start_dt=T0, end_dt=T0 + 600)
+        assert len(df) == 11
+        store.get("AAPL", Freq.min_1, start_dt=T0, end_dt=T0 + 600)
+        assert len(remote.queries) == 1
+        assert store.get_symbols(Freq.min_1) == ["AAPL", "AMD"]